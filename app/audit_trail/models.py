@@ -1,10 +1,12 @@
 ## app/audit_trail/models.py
 
 # Standard library imports
+import re
 from datetime import datetime, timezone
+from typing import Dict, Optional
 
 # Third party imports
-from sqlalchemy import Column, String, DateTime, Integer, Enum, ForeignKey, JSON
+from sqlalchemy import Column, String, DateTime, Integer, Enum, ForeignKey, Index, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 # Local imports
@@ -32,4 +34,65 @@ class AuditTrail(Base, AuditMixin):
 
     # Relationships
     case = relationship("Case", back_populates="audit_trail")
-    user = relationship("User", back_populates="audit_trail", foreign_keys=[done_by])
\ No newline at end of file
+    user = relationship("User", back_populates="audit_trail", foreign_keys=[done_by])
+
+    links = relationship("AuditTrailLink", back_populates="audit_trail", cascade="all, delete", passive_deletes=True)
+
+
+# Keys of meta_data that relate an audit trail entry to an entity
+RELATED_ENTITY_KEYS = (
+    "medallion_id",
+    "driver_id",
+    "vehicle_id",
+    "lease_id",
+    "medallion_owner_id",
+    "vehicle_owner_id",
+    "ledger_id",
+    "pvb_id",
+    "correspondence_id",
+)
+
+# A linkable reference: a non-negative integer, or a string of its digits
+ENTITY_ID_PATTERN = re.compile(r"[0-9]+")
+
+
+def related_entity_ids(meta_data: Optional[dict]) -> Dict[str, int]:
+    """
+    Entity references of an audit trail entry's meta_data, by key.
+
+    Matches the audit_trail_links backfill, which links values whose JSON
+    text is all digits: 12 and "12" link, while 12.5, -3, true and "abc" do
+    not.
+    """
+    related = {}
+    for key in RELATED_ENTITY_KEYS:
+        value = (meta_data or {}).get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            continue
+        if ENTITY_ID_PATTERN.fullmatch(str(value)):
+            related[key] = int(value)
+    return related
+
+
+class AuditTrailLink(Base):
+    """
+    Indexed copy of the entity references in AuditTrail.meta_data
+
+    One row per (audit trail entry, meta_data key) so related-view lookups
+    are index seeks on (entity_type, entity_id) instead of JSON scans.
+    Rows are written by AuditTrailService whenever meta_data is set.
+    """
+    __tablename__ = "audit_trail_links"
+    __table_args__ = (
+        UniqueConstraint("audit_trail_id", "entity_type", name="uq_audit_trail_links_entry_type"),
+        Index("ix_audit_trail_links_entity", "entity_type", "entity_id", "audit_timestamp", "audit_trail_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    audit_trail_id = Column(Integer, ForeignKey("audit_trail.id", ondelete="CASCADE"), nullable=False)
+    entity_type = Column(String(32), nullable=False, comment="meta_data key, e.g. driver_id")
+    entity_id = Column(Integer, nullable=False)
+    audit_timestamp = Column(DateTime, nullable=False, comment="Copy of audit_trail.timestamp for ordering")
+
+    # Relationships
+    audit_trail = relationship("AuditTrail", back_populates="links")
@@ -10,6 +10,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 # Local application imports
 from app.utils.logger import get_logger
+from app.core.concurrency import run_sync
 from app.core.db import get_db
 from app.users.models import User
 from app.users.utils import get_current_user
@@ -23,7 +24,7 @@ router = APIRouter(prefix="/audit-trail", tags=["Audit Trail"])
 logger = get_logger(__name__)
 
 @router.post("/manual", status_code=status.HTTP_201_CREATED)
-async def create_manual_audit_trail(
+def create_manual_audit_trail(
     entry: AuditTrailCreate,
     db: Session = Depends(get_db),
     get_current_user: User = Depends(get_current_user)
@@ -85,11 +86,11 @@ async def get_case_audit(
     Get the audit trail for a given case.
     """
     try:
-        case_info = bpm_service.get_cases(db, case_no=case_no, multiple=True)
+        case_info = await run_sync(bpm_service.get_cases, db, case_no=case_no, multiple=True)
         if not case_info:
             return {}
         case_ids = [case.id for case in case_info]
-        audits = audit_trail_service.get_audit_trail_by_case_ids(db, case_ids)
+        audits = await run_sync(audit_trail_service.get_audit_trail_by_case_ids, db, case_ids)
        
         results=[]
 
@@ -130,7 +131,7 @@ async def get_case_audit(
 
 
 @router.get("/related-view", status_code=status.HTTP_200_OK)
-async def get_related_view(
+def get_related_view(
     medallion_id: Optional[int] = None,
     driver_id: Optional[int] = None,
     vehicle_id: Optional[int] = None,
@@ -142,6 +143,7 @@ async def get_related_view(
     correspondence_id: Optional[int] = None,
     page: Optional[int] = Query(1, ge=1),
     per_page: Optional[int] = Query(10, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     db: Session = Depends(get_db)
 ):
     """
@@ -154,14 +156,15 @@ async def get_related_view(
         total , audit_trails = audit_trail_service.get_related_audit_trail(db=db, medallion_id=medallion_id, driver_id=driver_id, vehicle_id=vehicle_id , 
                                                                    lease_id=lease_id , vehicle_owner_id=vehicle_owner_id , pvb_id= pvb_id,
                                                                    correspondence_id=correspondence_id, medallion_owner_id = medallion_owner_id, ledger_id=ledger_id,
-                                                                   page=page, per_page=per_page
+                                                                   page=page, per_page=per_page, cursor=cursor
                                                                    )
         return {
             "items": audit_trails,
             "page": page,
             "per_page": per_page,
             "total_items": total,
-            "total_pages": (total // per_page) + (1 if total % per_page > 0 else 0)
+            "total_pages": (total // per_page) + (1 if total % per_page > 0 else 0),
+            "next_cursor": audit_trails.next_cursor
         }
     except ValueError as e:
         logger.error("Validation error: %s", e)
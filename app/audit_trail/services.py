@@ -5,12 +5,13 @@ from typing import Optional, Dict, List
 
 # Third party imports
 from sqlalchemy import asc , desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased, joinedload
 from fastapi import HTTPException
 
 # Local imports
 from app.utils.logger import get_logger
-from app.audit_trail.models import AuditTrail
+from app.utils.pagination import CursorPage, SortKey, count_query, paginate, to_page
+from app.audit_trail.models import AuditTrail, AuditTrailLink, related_entity_ids
 from app.audit_trail.schemas import AuditTrailType
 from app.bpm.models import Case
 from app.users.models import User
@@ -62,37 +63,52 @@ class AuditTrailService:
             pvb_id: Optional[int] = None,
             correspondence_id: Optional[int] = None,
             page: Optional[int] = None,
-            per_page: Optional[int] = None
+            per_page: Optional[int] = None,
+            cursor: Optional[str] = None
     ) -> List[AuditTrail]:
-        """Get related audit trail"""
+        """
+        Get related audit trail, newest first.
+
+        Entity filters are resolved through the audit_trail_links index. With
+        page and per_page the result is a CursorPage; a cursor (its
+        next_cursor) starts the page after it instead of at the page offset.
+        """
         try:
-            query = db.query(AuditTrail)
-
-            if medallion_id:
-                query = query.filter(AuditTrail.meta_data["medallion_id"].as_integer() == medallion_id)
-            if driver_id:
-                query = query.filter(AuditTrail.meta_data["driver_id"].as_integer() == driver_id)
-            if vehicle_id:
-                query = query.filter(AuditTrail.meta_data["vehicle_id"].as_integer() == vehicle_id)
-            if lease_id:
-                query = query.filter(AuditTrail.meta_data["lease_id"].as_integer() == lease_id)
-            if vehicle_owner_id:
-                query = query.filter(AuditTrail.meta_data["vehicle_owner_id"].as_integer() == vehicle_owner_id)
-            if medallion_owner_id:
-                query = query.filter(AuditTrail.meta_data["medallion_owner_id"].as_integer() == medallion_owner_id)
-            if ledger_id:
-                query = query.filter(AuditTrail.meta_data["ledger_id"].as_integer() == ledger_id)
-            if pvb_id:
-                query = query.filter(AuditTrail.meta_data["pvb_id"].as_integer() == pvb_id)
-            if correspondence_id:
-                query = query.filter(AuditTrail.meta_data["correspondence_id"].as_integer() == correspondence_id)
-
-            query = query.order_by(desc(AuditTrail.timestamp))
-            
+            requested = {
+                "medallion_id": medallion_id,
+                "driver_id": driver_id,
+                "vehicle_id": vehicle_id,
+                "lease_id": lease_id,
+                "vehicle_owner_id": vehicle_owner_id,
+                "medallion_owner_id": medallion_owner_id,
+                "ledger_id": ledger_id,
+                "pvb_id": pvb_id,
+                "correspondence_id": correspondence_id,
+            }
+            query = db.query(AuditTrail).options(joinedload(AuditTrail.user))
+
+            order_timestamp, order_id = AuditTrail.timestamp, AuditTrail.id
+            for entity_type, entity_id in requested.items():
+                if not entity_id:
+                    continue
+                link = aliased(AuditTrailLink)
+                query = query.join(link, link.audit_trail_id == AuditTrail.id).filter(
+                    link.entity_type == entity_type, link.entity_id == entity_id
+                )
+                if order_id is AuditTrail.id:
+                    # Order on the first link so the entity index serves the sort
+                    order_timestamp, order_id = link.audit_timestamp, link.audit_trail_id
+
             if page and per_page:
-                total = query.count()
-                query = query.offset((page - 1) * per_page).limit(per_page)
-                result = [
+                total = count_query(query, cached=bool(cursor))
+                order = [
+                    SortKey(order_timestamp, descending=True, key="timestamp"),
+                    SortKey(order_id, descending=True, key="id"),
+                ]
+                audits = to_page(
+                    paginate(query, order, per_page, page, cursor).all(), order, per_page
+                )
+                result = CursorPage([
                 {
                     "id": audit.id,
                     "timestamp": audit.timestamp,
@@ -109,8 +125,8 @@ class AuditTrailService:
                     "created_on": audit.created_on,
                     "user": {"id": audit.user.id, "first_name": audit.user.first_name, "last_name": audit.user.last_name, "email": audit.user.email_address}
                 }
-                for audit in query.all()
-                ]
+                for audit in audits
+                ], next_cursor=audits.next_cursor)
 
                 return total, result
 
@@ -131,13 +147,26 @@ class AuditTrailService:
                     "created_on": audit.created_on,
                     "user": {"id": audit.user.id, "first_name": audit.user.first_name, "last_name": audit.user.last_name, "email": audit.user.email_address}
                 }
-                for audit in query.all()
+                for audit in query.order_by(desc(order_timestamp), desc(order_id)).all()
             ]
             return result
         except Exception as e:
             logger.error("Error getting related audit trail: %s", e)
             raise e
-        
+
+    def sync_audit_links(self, db: Session, audit: AuditTrail) -> None:
+        """Rewrite the entity links of an audit trail entry from its meta_data"""
+        db.query(AuditTrailLink).filter(AuditTrailLink.audit_trail_id == audit.id).delete(
+            synchronize_session=False
+        )
+        for entity_type, entity_id in related_entity_ids(audit.meta_data).items():
+            db.add(AuditTrailLink(
+                audit_trail_id=audit.id,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                audit_timestamp=audit.timestamp,
+            ))
+
     def create_audit_trail(
             self, db: Session,
             case: Case, 
@@ -159,6 +188,8 @@ class AuditTrailService:
                 meta_data=meta_data
             )
             db.add(new_audit_log)
+            db.flush()
+            self.sync_audit_links(db, new_audit_log)
             db.commit()
             db.refresh(new_audit_log)
             return new_audit_log
@@ -176,6 +207,8 @@ class AuditTrailService:
             for key, value in update_data.items():
                 setattr(audit, key, value)
 
+            if "meta_data" in update_data or "timestamp" in update_data:
+                self.sync_audit_links(db, audit)
             db.commit()
             db.refresh(audit)
             return audit
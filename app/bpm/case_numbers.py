@@ -0,0 +1,102 @@
+## app/bpm/case_numbers.py
+
+"""
+Case number allocation backed by the case_number_sequences table.
+
+Numbers are reserved on a short transaction of their own: the prefix row is
+locked with SELECT ... FOR UPDATE, advanced by the requested count and
+committed immediately, so the lock is never held for the rest of a request.
+Like a database sequence, numbers of cases that fail to be created are not
+reused. The statements work on the tables directly, as they only read and
+advance one counter.
+
+The c61e0f4a9b27 migration seeds existing prefixes on MySQL only (it uses
+CAST ... AS UNSIGNED). A prefix without a row, on any database, is seeded on
+first use from its highest existing case_no.
+"""
+
+# Standard library imports
+from typing import List
+
+# Third party imports
+from sqlalchemy import desc, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Local imports
+from app.bpm.models import Case, CaseNumberSequence
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CASE_NUMBER_WIDTH = 6
+
+
+def format_case_number(prefix: str, number: int) -> str:
+    """Render a case number, e.g. 'ABC000001'"""
+    return f"{prefix}{str(number).zfill(CASE_NUMBER_WIDTH)}"
+
+
+def allocate_case_numbers(db: Session, prefix: str, count: int = 1) -> List[int]:
+    """
+    Reserve `count` consecutive case numbers for a prefix.
+
+    Args:
+        db: Session whose engine is used; the reservation itself runs and
+            commits on a separate session
+        prefix: Case type prefix
+        count: Size of the range to reserve
+
+    Returns:
+        The reserved numbers in increasing order
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    sequences = CaseNumberSequence.__table__
+
+    # A missing row is created on first use; a concurrent creator wins the
+    # primary key race and the loser simply retries with the row in place.
+    for _ in range(3):
+        with Session(bind=db.get_bind()) as allocator:
+            try:
+                last_value = allocator.execute(
+                    select(sequences.c.last_value)
+                    .where(sequences.c.prefix == prefix)
+                    .with_for_update()
+                ).scalar_one_or_none()
+                if last_value is None:
+                    last_value = _last_used_number(allocator, prefix)
+                    allocator.execute(
+                        insert(sequences).values(prefix=prefix, last_value=last_value + count)
+                    )
+                else:
+                    allocator.execute(
+                        update(sequences)
+                        .where(sequences.c.prefix == prefix)
+                        .values(last_value=last_value + count)
+                    )
+                allocator.commit()
+                return list(range(last_value + 1, last_value + count + 1))
+            except IntegrityError:
+                allocator.rollback()
+                logger.info("Case number sequence created concurrently, retrying", prefix=prefix)
+
+    raise RuntimeError(f"Could not allocate a case number for prefix {prefix}")
+
+
+def _last_used_number(db: Session, prefix: str) -> int:
+    """Highest number already used by a prefix; only read when its sequence row is created"""
+    cases = Case.__table__
+    last_case_no = db.execute(
+        select(cases.c.case_no)
+        .where(cases.c.case_no.like(f"{prefix}%"))
+        .order_by(desc(cases.c.case_no))
+        .limit(1)
+    ).scalar_one_or_none()
+    if not last_case_no:
+        return 0
+    try:
+        return int(last_case_no[len(prefix):])
+    except ValueError:
+        return 0
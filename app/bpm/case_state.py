@@ -0,0 +1,164 @@
+## app/bpm/case_state.py
+
+"""
+Current state of every case.
+
+`cases` keeps one row per step transition, so the latest row of a case is
+its current state. case_current_states mirrors that row per case number and
+is maintained by an after_insert listener on Case, which covers every path
+appending history (creation, moves, closing, reassignment and SLA
+escalation). Work baskets query it through the (is_open, user_id / role_id,
+last_updated_on) indexes with keyset pagination instead of grouping the
+whole history and filtering it in Python.
+"""
+
+# Standard library imports
+from datetime import date, datetime, time
+from typing import Dict, List, Optional
+
+# Third party imports
+from sqlalchemy import event, false, insert, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session, aliased
+
+# Local imports
+from app.bpm.models import (
+    SLA,
+    Case,
+    CaseCurrentState,
+    CaseStatus,
+    CaseStepConfig,
+    CaseType,
+)
+from app.users.models import Role, User
+from app.utils.logger import get_logger
+from app.utils.pagination import SortKey
+
+logger = get_logger(__name__)
+
+OPEN_CASE_STATUSES = ("Open", "In Progress")
+
+# Case statuses are seeded reference data; cache id -> is open per process
+_open_by_status_id: Dict[int, bool] = {}
+
+
+def _is_open_status(connection: Connection, case_status_id: int) -> bool:
+    """Whether a case status counts as open, looked up once per status id"""
+    if case_status_id not in _open_by_status_id:
+        name = connection.execute(
+            select(CaseStatus.name).where(CaseStatus.id == case_status_id)
+        ).scalar()
+        _open_by_status_id[case_status_id] = name in OPEN_CASE_STATUSES
+    return _open_by_status_id[case_status_id]
+
+
+def sync_case_state(connection: Connection, case_row: Case) -> None:
+    """Make the current-state row of case_row's case point at case_row"""
+    created_on = select(Case.created_on).where(Case.id == case_row.id).scalar_subquery()
+    values = {
+        "case_id": case_row.id,
+        "case_type_id": case_row.case_type_id,
+        "case_status_id": case_row.case_status_id,
+        "case_step_config_id": case_row.case_step_config_id,
+        "sla_id": case_row.sla_id,
+        "user_id": case_row.user_id,
+        "role_id": case_row.role_id,
+        "is_open": _is_open_status(connection, case_row.case_status_id),
+        "last_updated_on": created_on,
+    }
+    first_values = {
+        "case_no": case_row.case_no,
+        "opened_on": created_on,
+        "opened_by_user_id": case_row.user_id,
+    }
+
+    if connection.dialect.name == "mysql":
+        stmt = mysql_insert(CaseCurrentState).values(**values, **first_values)
+        connection.execute(
+            stmt.on_duplicate_key_update(**{key: stmt.inserted[key] for key in values})
+        )
+        return
+
+    result = connection.execute(
+        update(CaseCurrentState)
+        .where(CaseCurrentState.case_no == case_row.case_no)
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(CaseCurrentState).values(**values, **first_values))
+
+
+@event.listens_for(Case, "after_insert")
+def _track_case_state(mapper, connection, target: Case) -> None:
+    sync_case_state(connection, target)
+
+
+def workbasket_query(
+    db: Session,
+    user_id: Optional[int],
+    role_ids: List[int],
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+) -> Query:
+    """
+    Open cases currently assigned to user_id or to one of role_ids, newest
+    first, with the columns the work basket renders.
+    """
+    assignee = aliased(User, name="assignee")
+    opener = aliased(User, name="opener")
+    assignee_filters = [CaseCurrentState.user_id == user_id] if user_id else []
+    if role_ids:
+        assignee_filters.append(CaseCurrentState.role_id.in_(role_ids))
+    if not assignee_filters:
+        assignee_filters.append(false())
+
+    query = (
+        db.query(
+            CaseCurrentState.case_id.label("id"),
+            CaseCurrentState.case_no,
+            CaseCurrentState.role_id,
+            CaseCurrentState.sla_id,
+            CaseCurrentState.opened_on,
+            CaseCurrentState.last_updated_on.label("latest_created_on"),
+            assignee.first_name.label("current_step_assignee"),
+            assignee.id.label("current_user_id"),
+            CaseStepConfig.step_name,
+            CaseStepConfig.id.label("case_step_id"),
+            CaseType.name.label("case_type"),
+            CaseStatus.name.label("case_status"),
+            Role.name.label("role_name"),
+            SLA.time_limit.label("sla_time_limit"),
+            assignee,
+            opener,
+        )
+        .join(CaseType, CaseType.id == CaseCurrentState.case_type_id)
+        .join(CaseStatus, CaseStatus.id == CaseCurrentState.case_status_id)
+        .join(CaseStepConfig, CaseStepConfig.id == CaseCurrentState.case_step_config_id)
+        .outerjoin(assignee, assignee.id == CaseCurrentState.user_id)
+        .outerjoin(opener, opener.id == CaseCurrentState.opened_by_user_id)
+        .outerjoin(Role, Role.id == CaseCurrentState.role_id)
+        .outerjoin(SLA, SLA.id == CaseCurrentState.sla_id)
+        .filter(CaseCurrentState.is_open.is_(True), or_(*assignee_filters))
+    )
+
+    if from_date and to_date:
+        query = query.filter(
+            CaseCurrentState.last_updated_on >= datetime.combine(from_date, time(0, 0, 0)),
+            CaseCurrentState.last_updated_on <= datetime.combine(to_date, time(23, 59, 59)),
+        )
+    return query
+
+
+# Newest first; the row attribute of last_updated_on is latest_created_on
+WORKBASKET_ORDER = [
+    SortKey(CaseCurrentState.last_updated_on, descending=True, key="latest_created_on"),
+    SortKey(CaseCurrentState.case_no, descending=True),
+]
+
+
+def order_newest_first(query: Query) -> Query:
+    """Order a work basket query newest first"""
+    return query.order_by(
+        CaseCurrentState.last_updated_on.desc(), CaseCurrentState.case_no.desc()
+    )
@@ -4,7 +4,16 @@
 import json
 
 # Third party imports
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+)
 from sqlalchemy.orm import relationship
 
 # Local imports
@@ -213,7 +222,7 @@ class Case(Base, AuditMixin):
     __tablename__ = "cases"
 
     id = Column(Integer, primary_key=True, index=True)
-    case_no = Column(String(255), nullable=False)
+    case_no = Column(String(255), nullable=False, index=True)
 
     # Foreign keys for relationships to other tables
     case_type_id = Column(Integer, ForeignKey("case_types.id"), nullable=False)
@@ -226,6 +235,14 @@ class Case(Base, AuditMixin):
         Integer, ForeignKey("case_step_configs.id"), nullable=True
     )  # New field
 
+    # SLA due queue: set on the current row of a case while its SLA is running
+    sla_due_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        index=True,
+        comment="Deadline of the running SLA, cleared once escalated or moved on",
+    )
+
     # Relationships to other tables
     case_type = relationship(
         "CaseType", foreign_keys=[case_type_id], back_populates="cases"
@@ -257,6 +274,77 @@ class Case(Base, AuditMixin):
         )
 
 
+class CaseCurrentState(Base, AuditMixin):
+    """
+    Current state of a case
+
+    One row per case number mirroring its latest `cases` row, kept in sync
+    whenever a case row is appended (see app.bpm.case_state). Work baskets
+    read this table instead of grouping the whole case history.
+    """
+
+    __tablename__ = "case_current_states"
+    __table_args__ = (
+        Index(
+            "ix_case_current_states_user_queue",
+            "is_open", "user_id", "last_updated_on", "case_no",
+        ),
+        Index(
+            "ix_case_current_states_role_queue",
+            "is_open", "role_id", "last_updated_on", "case_no",
+        ),
+    )
+
+    case_no = Column(String(255), primary_key=True, comment="Case number")
+    case_id = Column(
+        Integer, ForeignKey("cases.id"), nullable=False,
+        comment="Latest case row of the case",
+    )
+    case_type_id = Column(Integer, ForeignKey("case_types.id"), nullable=False)
+    case_status_id = Column(Integer, ForeignKey("case_statuses.id"), nullable=False)
+    case_step_config_id = Column(
+        Integer, ForeignKey("case_step_configs.id"), nullable=True
+    )
+    sla_id = Column(Integer, ForeignKey("slas.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    role_id = Column(Integer, ForeignKey("roles.id"), nullable=True)
+    is_open = Column(
+        Boolean, nullable=False, default=True,
+        comment="Flag to indicate if the case is Open or In Progress",
+    )
+    opened_on = Column(
+        DateTime(timezone=True), nullable=True, comment="Creation time of the case"
+    )
+    opened_by_user_id = Column(
+        Integer, ForeignKey("users.id"), nullable=True,
+        comment="User the case was first assigned to",
+    )
+    last_updated_on = Column(
+        DateTime(timezone=True), nullable=True,
+        comment="Creation time of the latest case row",
+    )
+
+    # Relationships
+    case = relationship("Case", foreign_keys=[case_id])
+
+
+class CaseNumberSequence(Base, AuditMixin):
+    """
+    Per-prefix case number counter
+
+    One row per case type prefix holding the last allocated number. Rows are
+    incremented under a row lock, so concurrent case creation never reuses a
+    number and allocation cost does not depend on the size of the cases table.
+    """
+
+    __tablename__ = "case_number_sequences"
+
+    prefix = Column(String(255), primary_key=True, comment="Case type prefix")
+    last_value = Column(
+        Integer, nullable=False, default=0, comment="Last allocated case number"
+    )
+
+
 class CaseStepConfigPath(Base, AuditMixin):
     """
     CaseStepConfigPath model
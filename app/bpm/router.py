@@ -4,35 +4,40 @@
 import json
 import os
 from datetime import date
+from typing import Optional
 
 # Third party imports
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request, Response
 from fastapi.responses import JSONResponse
-from jsonschema import ValidationError, validate
+from jsonschema import SchemaError, ValidationError
 from sqlalchemy.orm import Session
 
 from app.audit_trail.schemas import AuditTrailType
 from app.audit_trail.services import audit_trail_service
+from app.bpm.case_state import WORKBASKET_ORDER
 from app.bpm.exception import CaseStopException
+from app.bpm.schema_registry import SchemaStoreUnavailableError, schema_registry
 from app.bpm.schemas import CreateCaseRequest, StepDataRequest
 from app.bpm.services import CaseReassignService, bpm_service
+from app.bpm.step_hydration import hydrate_case_steps, server_timing_header
 from app.bpm.step_info import STEP_REGISTRY
 from app.bpm.utils import calculate_time_due
 
 # Local imports
+from app.core.concurrency import run_sync
 from app.core.config import settings
 from app.core.db import get_db
 from app.utils.logger import get_logger
+from app.utils.pagination import count_query, paginate, to_page
 from app.users.models import User
 from app.users.utils import get_current_user
-from app.utils.s3_utils import s3_utils
 
 router = APIRouter(tags=["BPM"])
 logger = get_logger(__name__)
 
 
 @router.post("/case", tags=["BPM"])
-async def create_new_case(
+def create_new_case(
     request: Request,
     case_request: CreateCaseRequest,
     db: Session = Depends(get_db),
@@ -79,15 +84,10 @@ async def create_new_case(
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 
-@router.post("/case/{case_no}", tags=["BPM"])
-async def process_case_step(
-    request: Request,
-    case_no: str = Path(..., description="The case number"),
-    step_data: StepDataRequest = Body(..., description="The JSON data to validate"),
-    db: Session = Depends(get_db),
-    logged_in_user: User = Depends(get_current_user),
+def _validate_step_submission(
+    db: Session, case_no: str, step_data: StepDataRequest, logged_in_user: User
 ):
-    """Validate JSON data with the schema configured for this step id. Then process the step."""
+    """Check the case, step registration, role and step schema of a submission"""
 
     # Step 1: Validate the case_no
     result = bpm_service.get_cases(db, case_no=case_no, sort_order="desc")
@@ -136,34 +136,44 @@ async def process_case_step(
         )
 
     if config_path_entry.path:
+        # Step 5: Validate the incoming JSON data against the cached, compiled schema
         try:
-            s3_key = settings.json_config + "/" + config_path_entry.path
-            logger.info("Fetching schema from S3: %s", s3_key)
-            schema_content = s3_utils.download_file(s3_key)
-            if not schema_content:
+            if not schema_registry.validate(config_path_entry.path, step_data.data):
                 raise HTTPException(
-                    status_code=404, detail=f"Schema file not found in S3: {s3_key}"
+                    status_code=404,
+                    detail=f"Schema file not found in S3: {settings.json_config}/{config_path_entry.path}",
                 )
-
-            schema = json.loads(schema_content)
-            logger.info("Successfully loaded schema from S3")
-        except FileNotFoundError as exc:
-            raise HTTPException(
-                status_code=500, detail="Schema file not found on the server"
-            ) from exc
-        except json.JSONDecodeError as exc:
-            raise HTTPException(
-                status_code=500, detail="Invalid JSON schema format"
-            ) from exc
-
-        # Step 5: Validate the incoming JSON data against the schema
-        try:
-            validate(instance=step_data.data, schema=schema)
             logger.info("Incoming Schema Validated")
         except ValidationError as e:
             raise HTTPException(
                 status_code=400, detail=f"JSON validation error: {e.message}"
             ) from e
+        except (json.JSONDecodeError, SchemaError) as exc:
+            raise HTTPException(
+                status_code=500, detail="Invalid JSON schema format"
+            ) from exc
+        except SchemaStoreUnavailableError as exc:
+            raise HTTPException(
+                status_code=503, detail="Schema storage is unavailable, please retry"
+            ) from exc
+
+    return result
+
+
+@router.post("/case/{case_no}", tags=["BPM"])
+async def process_case_step(
+    request: Request,
+    case_no: str = Path(..., description="The case number"),
+    step_data: StepDataRequest = Body(..., description="The JSON data to validate"),
+    db: Session = Depends(get_db),
+    logged_in_user: User = Depends(get_current_user),
+):
+    """Validate JSON data with the schema configured for this step id. Then process the step."""
+
+    # Steps 1-5 run on the threadpool, they only use the sync session
+    result = await run_sync(
+        _validate_step_submission, db, case_no, step_data, logged_in_user
+    )
 
     # Step 6: Call the step-specific function from the registry
     try:
@@ -174,7 +184,7 @@ async def process_case_step(
         if inspect.iscoroutinefunction(func):
             await func(db, case_no, step_data.data)
         else:
-            func(db, case_no, step_data.data)
+            await run_sync(func, db, case_no, step_data.data)
     except ValueError as e:
         logger.error(e)
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -183,7 +193,8 @@ async def process_case_step(
         raise HTTPException(status_code=500, detail=str(e)) from e
 
     # Create audit trail for the step
-    audit_trail_service.create_audit_trail(
+    await run_sync(
+        audit_trail_service.create_audit_trail,
         db,
         case=result,
         user=logged_in_user,
@@ -195,7 +206,7 @@ async def process_case_step(
 
 
 @router.post("/case/{case_no}/move", tags=["BPM"])
-async def move_case_to_next_step(
+def move_case_to_next_step(
     request: Request,
     case_no: str,
     step_id: str = "",
@@ -256,7 +267,7 @@ async def move_case_to_next_step(
 
 
 @router.get("/case-history/{case_no}", tags=["BPM"])
-async def get_case_history(
+def get_case_history(
     case_no: str,
     db: Session = Depends(get_db),
     logged_in_user: User = Depends(get_current_user),
@@ -287,7 +298,7 @@ async def get_case_history(
 
 
 @router.get("/cases/by-type/{case_type}", tags=["BPM"])
-async def get_cases_by_type(
+def get_cases_by_type(
     case_type: str,
     db: Session = Depends(get_db),
     logged_in_user: User = Depends(get_current_user),
@@ -319,17 +330,8 @@ async def get_cases_by_type(
     return case_list
 
 
-@router.get("/case/{case_no}", tags=["BPM"])
-async def get_case_steps(
-    request: Request,
-    case_no: str,
-    db: Session = Depends(get_db),
-    logged_in_user: User = Depends(get_current_user),
-):
-    """Get the case steps for a given case number."""
-    case_params = dict(request.query_params)
-
-    # Step 1: Fetch all the schema configs from all the steps
+def _load_case_steps(db: Session, case_no: str, logged_in_user: User):
+    """Case header and grouped step information of a case"""
     case_obj = bpm_service.get_cases(db, case_no=case_no, sort_order="desc")
 
     calculate_due = {"due_date": "", "time_left": ""}
@@ -351,27 +353,28 @@ async def get_case_steps(
         db, case_obj.case_type.prefix, logged_in_user, case_obj
     )
 
-    for step_info in list(grouped_steps.values()):
-        for sub_step in step_info["sub_steps"]:
-            step_function = STEP_REGISTRY[f"{sub_step['step_id']}-fetch"]
-            logger.info("Calling function with %s-fetch", sub_step["step_id"])
-            case_step_data = step_function["function"](db, case_no, case_params)
-            case_step_config = bpm_service.get_case_step_config(
-                db, step_id=sub_step["step_id"]
-            )
-
-            cases = bpm_service.get_cases(
-                db,
-                case_no=case_no,
-                case_status="Open,In Progress",
-                case_step_config_id=case_step_config.id,
-                multiple=True,
-            )
-            sub_step["step_data"] = case_step_data
-            sub_step["is_current_step"] = (
-                case_obj.case_step_config_id == case_step_config.id
-            )
-            sub_step["has_already_been_used"] = len(cases) > 0
+    return case_obj, case_step_information, grouped_steps
+
+
+@router.get("/case/{case_no}", tags=["BPM"])
+async def get_case_steps(
+    request: Request,
+    response: Response,
+    case_no: str,
+    db: Session = Depends(get_db),
+    logged_in_user: User = Depends(get_current_user),
+):
+    """Get the case steps for a given case number."""
+    case_params = dict(request.query_params)
+
+    # Step 1: Load the case and its step walk on the threadpool
+    case_obj, case_step_information, grouped_steps = await run_sync(
+        _load_case_steps, db, case_no, logged_in_user
+    )
+
+    # Step 2: Run the step fetches in order with step configs and case history prefetched
+    timings = await hydrate_case_steps(db, case_obj, grouped_steps, case_params)
+    response.headers["Server-Timing"] = server_timing_header(timings)
 
     case_step_information["steps"] = list(grouped_steps.values())
     logger.info(case_step_information)
@@ -379,7 +382,7 @@ async def get_case_steps(
 
 
 @router.get("/case/{case_no}/{step_id}", tags=["BPM"])
-async def get_case_step_information(
+def get_case_step_information(
     request: Request,
     case_no: str,
     step_id: str,
@@ -415,58 +418,32 @@ async def get_case_step_information(
 
 
 @router.get("/cases/workbasket/", tags=["BPM"])
-async def get_workbasket(
+def get_workbasket(
     from_date: date = None,
     to_date: date = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor of the previous page; takes precedence over page"
+    ),
     db: Session = Depends(get_db),
     logged_in_user: User = Depends(get_current_user),
 ):
     """Retrieve all the cases that are associated with the logged in user."""
     try:
-        logged_in_user_role_ids = [role.id for role in logged_in_user.roles]
+        case_query = bpm_service.get_cases_info(db, logged_in_user, from_date, to_date)
+        total_count = count_query(case_query, cached=bool(cursor))
 
-        # Create a subquery to find case numbers that have any Closed status
-        closed_cases = bpm_service.get_cases(
-            db, case_status="Closed", multiple=True, unique=True
+        paginated_cases = to_page(
+            paginate(case_query, WORKBASKET_ORDER, per_page, page, cursor).all(),
+            WORKBASKET_ORDER,
+            per_page,
         )
-        closed_case_nos = [case.case_no for case in closed_cases]
-        all_cases = bpm_service.get_cases_info(db, closed_case_nos, from_date, to_date)
-
-        filtered_cases = []
-
-        unique_case = set()
-        for case in all_cases:
-            process_case_details = False
-            # Check if user is assigned to case
-            if case.current_user_id and case.current_user_id == logged_in_user.id:
-                process_case_details = True
-
-            # Check if role is assigned to case
-            if case.role_id and case.role_id in logged_in_user_role_ids:
-                process_case_details = True
-
-            if process_case_details and case.case_no not in unique_case:
-                filtered_cases.append(case)
-                unique_case.add(case.case_no)
-
-
-        total_count = len(filtered_cases)
-
-        paginated_cases = filtered_cases[(page - 1) * per_page : page * per_page]
 
         # Process and format cases
-        detailed_cases = []
-        for case in paginated_cases:
-            try:
-                case_details = bpm_service.get_case_details(db, case)
-                detailed_cases.append(case_details)
-            except Exception as e:
-                logger.error(e)
-                raise HTTPException(
-                    status_code=500, detail="Error while fetching details"
-                ) from e
+        detailed_cases = [
+            bpm_service.get_case_details(db, case) for case in paginated_cases
+        ]
 
         return {
             "total_cases": total_count,
@@ -475,7 +452,11 @@ async def get_workbasket(
             "total_pages": (total_count // per_page)
             + (1 if total_count % per_page > 0 else 0),
             "cases": detailed_cases,
+            "next_cursor": paginated_cases.next_cursor,
         }
+    except ValueError as e:
+        logger.error(e)
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         logger.error("****************** %s", e)
         raise HTTPException(
@@ -484,7 +465,7 @@ async def get_workbasket(
 
 
 @router.put("/reassign-case", tags=["BPM"])
-async def reassign_case(
+def reassign_case(
     case_no: str,
     role_id: int = None,
     user_id: int = None,
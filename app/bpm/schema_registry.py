@@ -0,0 +1,239 @@
+## app/bpm/schema_registry.py
+
+"""
+Compiled JSON-schema cache for BPM step submissions.
+
+Validators are compiled once per CaseStepConfigPath.path and kept in process
+memory. An entry is trusted for settings.bpm_schema_revalidate_seconds; after
+that its S3 ETag / Last-Modified is checked with a HEAD request and the schema
+is only downloaded and recompiled when the object changed. With
+settings.bpm_schema_redis_cache enabled, schema documents and their last
+revalidation time are shared across workers through Redis, so a fleet pays
+one S3 round trip per schema and interval instead of one per worker.
+
+If S3 cannot be reached while revalidating, the last compiled validator keeps
+being served; only a schema that was never loaded raises
+SchemaStoreUnavailableError.
+"""
+
+# Standard library imports
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Third party imports
+import redis
+from botocore.exceptions import BotoCoreError, ClientError
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from sqlalchemy.orm import Session
+
+# Local imports
+from app.bpm.models import CaseStepConfigPath
+from app.core.config import settings
+from app.utils.logger import get_logger
+from app.utils.s3_utils import s3_utils
+
+logger = get_logger(__name__)
+
+REDIS_KEY_PREFIX = "bpm:schema:"
+
+
+class SchemaStoreUnavailableError(Exception):
+    """S3 could not be reached and no compiled copy of the schema is cached"""
+
+
+@dataclass
+class CachedSchema:
+    """A compiled validator and the S3 version it was built from"""
+    validator: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    checked_at: float
+
+
+class StepSchemaRegistry:
+    """In-memory (optionally Redis-backed) registry of compiled step schemas"""
+
+    def __init__(self):
+        self._schemas: Dict[str, CachedSchema] = {}
+        self._lock = threading.Lock()
+        self._redis: Optional[redis.Redis] = None
+
+    def validate(self, path: str, data: Any) -> bool:
+        """
+        Validate data against the schema stored at path.
+
+        Returns:
+            False if the schema file does not exist, True when data is valid
+
+        Raises:
+            jsonschema.ValidationError: best matching error when data is invalid
+            json.JSONDecodeError / jsonschema.SchemaError: when the schema is broken
+        """
+        validator = self.get_validator(path)
+        if validator is None:
+            return False
+
+        error = best_match(validator.iter_errors(data))
+        if error is not None:
+            raise error
+        return True
+
+    def get_validator(self, path: str):
+        """Return the compiled validator for path, revalidating it against S3 when stale"""
+        now = time.time()
+        cached = self._schemas.get(path)
+        if cached and now - cached.checked_at < settings.bpm_schema_revalidate_seconds:
+            return cached.validator
+
+        # === Shared tier: another worker revalidated recently ===
+        shared = self._get_shared(path)
+        if shared and now - shared["checked_at"] < settings.bpm_schema_revalidate_seconds:
+            if cached and cached.etag == shared["etag"]:
+                cached.checked_at = shared["checked_at"]
+                return cached.validator
+            return self._store(path, shared["schema"], shared["etag"], shared["last_modified"], shared["checked_at"])
+
+        # === Revalidate against S3 ===
+        s3_key = self._s3_key(path)
+        try:
+            head = s3_utils.head_file(s3_key)
+        except (ClientError, BotoCoreError) as e:
+            return self._serve_stale(path, cached, now, e)
+        if head is None:
+            logger.warning("Schema file not found in S3", s3_key=s3_key)
+            return None
+
+        etag = head["etag"]
+        last_modified = str(head["last_modified"]) if head["last_modified"] else None
+
+        if cached and (cached.etag, cached.last_modified) == (etag, last_modified):
+            cached.checked_at = now
+            if shared and shared["etag"] == etag:
+                self._set_shared(path, shared["schema"], etag, last_modified, now)
+            return cached.validator
+
+        if shared and shared["etag"] == etag:
+            schema_text = shared["schema"]
+        else:
+            logger.info("Fetching schema from S3", s3_key=s3_key)
+            content = s3_utils.download_file(s3_key)
+            if not content:
+                # The object exists (HEAD succeeded), so this is a failed download
+                return self._serve_stale(path, cached, now, "schema download failed")
+            schema_text = content.decode("utf-8") if isinstance(content, bytes) else content
+
+        self._set_shared(path, schema_text, etag, last_modified, now)
+        return self._store(path, schema_text, etag, last_modified, now)
+
+    @staticmethod
+    def _serve_stale(path: str, cached: Optional[CachedSchema], now: float, error: Any):
+        """Keep using the last compiled validator when S3 revalidation fails"""
+        if cached is None:
+            raise SchemaStoreUnavailableError(f"Could not load schema {path} from S3: {error}")
+        logger.warning("Schema revalidation failed, serving cached validator", path=path, error=str(error))
+        cached.checked_at = now
+        return cached.validator
+
+    def warm_up(self, db: Session, max_workers: int = 8) -> int:
+        """Compile the schemas of every configured step; returns how many loaded"""
+        paths = self.get_configured_paths(db)
+        if not paths:
+            return 0
+
+        def load(path: str) -> bool:
+            try:
+                return self.get_validator(path) is not None
+            except Exception as e:
+                logger.warning("Failed to warm up step schema", path=path, error=str(e))
+                return False
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            loaded = sum(pool.map(load, paths))
+
+        logger.info("Warmed up BPM step schemas", loaded=loaded, configured=len(paths))
+        return loaded
+
+    @staticmethod
+    def get_configured_paths(db: Session) -> List[str]:
+        """Distinct non-empty schema paths of all case steps"""
+        rows = db.query(CaseStepConfigPath.path).filter(
+            CaseStepConfigPath.path.is_not(None), CaseStepConfigPath.path != ""
+        ).distinct().all()
+        return [row[0] for row in rows]
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop one or all compiled schemas from this process"""
+        with self._lock:
+            if path is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(path, None)
+
+    def _store(
+        self, path: str, schema_text: str, etag: Optional[str],
+        last_modified: Optional[str], checked_at: float
+    ):
+        """Compile schema_text and cache the validator"""
+        schema = json.loads(schema_text)
+        cls = validator_for(schema, default=Draft202012Validator)
+        cls.check_schema(schema)
+        validator = cls(schema)
+
+        with self._lock:
+            self._schemas[path] = CachedSchema(validator, etag, last_modified, checked_at)
+        logger.debug("Compiled step schema", path=path, etag=etag)
+        return validator
+
+    @staticmethod
+    def _s3_key(path: str) -> str:
+        return settings.json_config + "/" + path
+
+    # --- Redis tier ---
+
+    def _redis_client(self) -> Optional[redis.Redis]:
+        if not settings.bpm_schema_redis_cache:
+            return None
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(settings.cache_manager, decode_responses=True)
+        return self._redis
+
+    def _get_shared(self, path: str) -> Optional[Dict[str, Any]]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(REDIS_KEY_PREFIX + path)
+            return json.loads(raw) if raw else None
+        except (redis.RedisError, ValueError) as e:
+            logger.warning("Schema cache read from Redis failed", path=path, error=str(e))
+            return None
+
+    def _set_shared(
+        self, path: str, schema_text: str, etag: Optional[str],
+        last_modified: Optional[str], checked_at: float
+    ) -> None:
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            client.set(
+                REDIS_KEY_PREFIX + path,
+                json.dumps({
+                    "schema": schema_text,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "checked_at": checked_at,
+                }),
+                ex=settings.bpm_schema_redis_ttl_seconds,
+            )
+        except redis.RedisError as e:
+            logger.warning("Schema cache write to Redis failed", path=path, error=str(e))
+
+
+schema_registry = StepSchemaRegistry()
@@ -2,14 +2,22 @@
 
 # Standard Library Imports
 import copy
-from datetime import date, datetime, time, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Optional, Union
 
 # Third party imports
-from sqlalchemy import and_, asc, desc, func, select
+from sqlalchemy import asc, desc, func, select
 from sqlalchemy.orm import Session, aliased
 
+from app.bpm.case_numbers import allocate_case_numbers, format_case_number
+from app.bpm.case_state import workbasket_query
 from app.bpm.exception import CaseStopException
+from app.bpm.sla.scheduler import dequeue_case_sla, schedule_case_sla
+from app.bpm.step_graph import (
+    StepAccessContext,
+    load_step_access_context,
+    step_graph_cache,
+)
 
 # Local imports
 from app.bpm.models import (
@@ -26,7 +34,7 @@ from app.bpm.models import (
     case_step_config_role_table,
 )
 from app.utils.logger import get_logger
-from app.users.models import Role, User
+from app.users.models import User
 
 logger = get_logger(__name__)
 
@@ -173,171 +181,81 @@ class BPMService:
     def get_case_step_information(
         self, db: Session, case_type: str, logged_in_user: User, case
     ):
-        """Get case step information"""
-        try:
-            first_step = (
-                db.query(CaseTypeFirstStep)
-                .join(CaseType, CaseTypeFirstStep.case_type_id == CaseType.id)
-                .filter(CaseType.prefix == case_type)
-                .first()
-            )
-
-            if not first_step:
-                raise ValueError(
-                    f"First step has not been configured for casetype {case_type}"
-                )
+        """
+        Get case step information
 
+        The step graph of the case type comes from step_graph_cache and the
+        reassignments, users and roles of the case are loaded once, so the
+        walk itself runs in memory.
+        """
+        try:
+            graph = step_graph_cache.get(db, case_type)
             role_ids = set([str(role.id) for role in logged_in_user.roles])
-            # case_step_configs = []
-
-            case_step_configs = (
-                db.query(
-                    CaseStep.name.label("step_name"),  # CaseStep name
-                    CaseStepConfig.step_name.label(
-                        "config_step_name"
-                    ),  # CaseStepConfig step_name
-                    CaseStepConfig.step_id.label(
-                        "config_step_id"
-                    ),  # CaseStepConfig step_id
-                    CaseStepConfig.next_step_id.label(
-                        "next_step_id"
-                    ),  # CaseStepConfig next_step_id
-                    func.group_concat(Role.id).label("roles"),
-                    CaseStep.weight.label("order"),  # Include the order column,
-                    CaseStepConfig.current_assignee_id,
-                )
-                .join(CaseType, CaseStepConfig.case_type_id == CaseType.id)
-                .join(CaseStep, CaseStep.id == CaseStepConfig.case_step_id)
-                .outerjoin(
-                    case_step_config_role_table,
-                    CaseStepConfig.id
-                    == case_step_config_role_table.c.case_step_config_id,
-                )
-                .outerjoin(Role, Role.id == case_step_config_role_table.c.role_id)
-                .filter(CaseType.prefix == case_type)
-                .order_by(asc(CaseStep.weight))
-                .group_by(
-                    CaseStep.name,
-                    CaseStepConfig.step_name,
-                    CaseStepConfig.step_id,
-                    CaseStepConfig.next_step_id,
-                    CaseStep.weight,  # Include the order column in the GROUP BY clause,
-                    CaseStepConfig.current_assignee_id,
-                )
-                .all()
-            )
-
             grouped_steps = {}
-            configs_by_step_id = {
-                config.config_step_id: config for config in case_step_configs
-            }
-
-            logger.info("configs_by_step_id: %s", configs_by_step_id)
 
-            if not first_step.first_step:
+            if not graph.first_step_id:
                 # If first step is not defined
-                for current_config in case_step_configs:
-                    logger.info("current_config: %s", current_config)
-
-                    # Check if the current logged in user has the roles to access the
-                    case_role_ids = set(
-                        current_config.roles.split(",") if current_config.roles else []
-                    )
-                    if not role_ids.intersection(case_role_ids):
+                for node in graph.ordered:
+                    # Check if the current logged in user has the roles to access the step
+                    if not role_ids.intersection(node.role_ids):
                         logger.info("Case role has no intersection")
-                        # Move to the next step in the sequence
-                        current_step_id = current_config.next_step_id
                         continue
-                    #     # Group substeps by step_name
-                    if current_config.step_name not in grouped_steps:
-                        grouped_steps[current_config.step_name] = {
-                            # Split roles string
-                            "step_name": current_config.step_name,
+                    if node.step_name not in grouped_steps:
+                        grouped_steps[node.step_name] = {
+                            "step_name": node.step_name,
                             "sub_steps": [],
                         }
 
-                    grouped_steps[current_config.step_name]["sub_steps"].append(
+                    grouped_steps[node.step_name]["sub_steps"].append(
                         {
-                            "step_name": current_config.config_step_name,
-                            "step_id": current_config.config_step_id,
+                            "step_name": node.config_step_name,
+                            "step_id": node.step_id,
                             "step_data": {},
                         }
                     )
-            else:
-                visited_steps = set()
-                current_step_id = first_step.first_step.step_id
-                while current_step_id:
-                    if current_step_id in visited_steps:
-                        raise ValueError(
-                            "Circular reference detected in next_step_id sequence"
-                        )
-                    visited_steps.add(current_step_id)
+                return grouped_steps
 
-                    current_config = configs_by_step_id.get(current_step_id)
-                    if not current_config:
-                        break
+            walk = graph.walk()
+            step_ids = {node.step_id for node in walk}
+            step_ids.update(node.next_step_id for node in walk if node.next_step_id)
+            access = load_step_access_context(db, case.case_no, graph, list(step_ids))
 
-                    case_role_ids = set(
-                        current_config.roles.split(",") if current_config.roles else []
-                    )
-                    has_access, current_assignee, assigned_roles = self.check_access(
-                        db,
-                        case,
-                        current_step_id,
-                        logged_in_user,
-                        role_ids,
-                        configs_by_step_id,
-                    )
+            for node in walk:
+                has_access, current_assignee, assigned_roles = self.check_access(
+                    access, node.step_id, logged_in_user, role_ids
+                )
 
-                    # Get original assignee information if reassignments exist
-                    original_assignee_info = self.get_original_assignee_info(
-                        db, case.case_no, current_step_id
-                    )
+                # Get original assignee information if reassignments exist
+                original_assignee_info = self.get_original_assignee_info(
+                    access, node.step_id
+                )
 
-                    if current_config.step_name not in grouped_steps:
-                        grouped_steps[current_config.step_name] = {
-                            "step_name": current_config.step_name,
-                            "sub_steps": [],
-                        }
+                if node.step_name not in grouped_steps:
+                    grouped_steps[node.step_name] = {
+                        "step_name": node.step_name,
+                        "sub_steps": [],
+                    }
 
-                    grouped_steps[current_config.step_name]["sub_steps"].append(
-                        {
-                            "step_name": current_config.config_step_name,
-                            "step_id": current_config.config_step_id,
-                            "step_data": {},
-                            "has_access": has_access,
-                            "current_assignee_user": current_assignee,
-                            "current_assignee_role": assigned_roles,
-                            "original_assignee_user": original_assignee_info[
-                                "original_user"
-                            ],
-                            "original_assignee_roles": original_assignee_info[
-                                "original_roles"
-                            ],
-                            "has_reassignment": original_assignee_info[
-                                "has_reassignment"
-                            ],
-                        }
+                sub_step = {
+                    "step_name": node.config_step_name,
+                    "step_id": node.step_id,
+                    "step_data": {},
+                    "has_access": has_access,
+                    "current_assignee_user": current_assignee,
+                    "current_assignee_role": assigned_roles,
+                    "original_assignee_user": original_assignee_info["original_user"],
+                    "original_assignee_roles": original_assignee_info["original_roles"],
+                    "has_reassignment": original_assignee_info["has_reassignment"],
+                }
+
+                if node.next_step_id:
+                    _, next_step_assignee, next_step_assigned_roles = self.check_access(
+                        access, node.next_step_id, logged_in_user, role_ids
                     )
+                    sub_step["next_assignee_user"] = next_step_assignee
+                    sub_step["next_assignee_role"] = next_step_assigned_roles
 
-                    current_step_id = current_config.next_step_id
-                    if current_step_id:
-                        has_access2, next_step_assignee, next_step_assigned_roles = (
-                            self.check_access(
-                                db,
-                                case,
-                                current_step_id,
-                                logged_in_user,
-                                role_ids,
-                                configs_by_step_id,
-                            )
-                        )
-                        grouped_steps[current_config.step_name]["sub_steps"][-1][
-                            "next_assignee_user"
-                        ] = next_step_assignee
-                        grouped_steps[current_config.step_name]["sub_steps"][-1][
-                            "next_assignee_role"
-                        ] = next_step_assigned_roles
+                grouped_steps[node.step_name]["sub_steps"].append(sub_step)
 
             return grouped_steps
         except Exception as e:
@@ -418,105 +336,35 @@ class BPMService:
     def get_cases_info(
         self,
         db: Session,
-        closed_cases: List[str],
+        user: User,
         from_date: Optional[date] = None,
         to_date: Optional[date] = None,
     ):
-        """Get cases info"""
+        """Query the open cases currently assigned to the user or one of their roles"""
         try:
-            case_query = (
-                db.query(
-                    Case.case_no,
-                    User.first_name.label("current_step_assignee"),
-                    User.id.label("current_user_id"),
-                    Case.role_id,
-                    CaseStepConfig.step_name,
-                    Case.sla_id,
-                    CaseStepConfig.id.label("case_step_id"),
-                    Case.id,
-                    CaseType.name.label("case_type"),
-                    CaseStatus.name.label("case_status"),
-                    func.max(Case.created_on).label("latest_created_on"),
-                )
-                .outerjoin(User, Case.user_id == User.id)
-                .join(CaseType, CaseType.id == Case.case_type_id)
-                .join(CaseStatus, CaseStatus.id == Case.case_status_id)
-                .join(CaseStepConfig, Case.case_step_config_id == CaseStepConfig.id)
-                .join(
-                    case_step_config_role_table,
-                    CaseStepConfig.id
-                    == case_step_config_role_table.c.case_step_config_id,
-                )
-                .join(Role, case_step_config_role_table.c.role_id == Role.id)
-                .filter(
-                    CaseStatus.name.in_(
-                        ["Open", "In Progress"]
-                    ),  # Only show Open and In Progress cases
-                    ~Case.case_no.in_(
-                        closed_cases
-                    ),  # Exclude cases that have any Closed status
-                )
-                .group_by(
-                    Case.case_no,
-                    User.first_name,
-                    User.id,
-                    Case.role_id,
-                    CaseStepConfig.step_name,
-                    Case.sla_id,
-                    CaseStepConfig.id,
-                    Case.id,
-                    CaseType.name,
-                    CaseStatus.name,
-                )
+            return workbasket_query(
+                db, user.id, [role.id for role in user.roles], from_date, to_date
             )
-
-            if from_date and to_date:
-                from_datetime = datetime.combine(from_date, time(0, 0, 0))
-                to_datetime = datetime.combine(to_date, time(23, 59, 59))
-
-                case_query = case_query.having(
-                    and_(
-                        func.max(Case.created_on) >= from_datetime,
-                        func.max(Case.created_on) <= to_datetime,
-                    )
-                )
-
-            case_query = case_query.order_by(desc(Case.created_on))
-
-            return case_query.all()
         except Exception as e:
             logger.error("Error getting cases info: %s", e)
             raise e
 
-    def get_case_details(self, db: Session, case: Case) -> dict:
-        """Retrieve detailed information about a case, including case type, status, SLA, and user activity."""
-        # Step 1: Get the first case entry for the given case_no
-        first_case = self.get_cases(db, case_no=case.case_no)
-
-        # Step 2: Get the previous case entry for the given case_no
-        previous_case_rec = self.get_cases(db, case_no=case.case_no, sort_order="desc")
-        previous_case_rec_created_by = (
-            previous_case_rec.users if previous_case_rec else None
-        )
-        previous_case_rec_created_by_name = (
-            previous_case_rec_created_by.name if previous_case_rec_created_by else ""
-        )
-
-        if not previous_case_rec_created_by_name:
-            previous_case_rec_created_by_name = (
-                previous_case_rec.role.name if previous_case_rec else "Unknown"
-            )
+    def get_case_details(self, db: Session, case) -> dict:
+        """
+        Format a work basket row (see get_cases_info) with its case type,
+        status, SLA target date and user activity.
+        """
+        last_updated_by_name = case.assignee.name if case.assignee else ""
+        if not last_updated_by_name:
+            last_updated_by_name = case.role_name or "Unknown"
 
-        created_by = first_case.users
-        created_by_name = created_by.name if created_by else "Unknown"
-        associated_sla = self.get_sla(db, case_step_config=case.sla_id)
+        created_by_name = case.opener.name if case.opener else "Unknown"
         target_date = None
-        if associated_sla:
+        if case.sla_time_limit and case.latest_created_on:
             target_date = case.latest_created_on + timedelta(
-                minutes=associated_sla.time_limit
+                minutes=case.sla_time_limit
             )
 
-        # Step 6: Compile the results
         case_details = {
             "case_id": case.id,
             "case_no": case.case_no,
@@ -528,17 +376,15 @@ class BPMService:
             "created_by": created_by_name,
             "current_step_assignee": case.current_step_assignee,
             "current_user_id": case.current_user_id,
-            "created_on": first_case.created_on.strftime("%Y-%m-%d %H:%M:%S")
-            if first_case.created_on
+            "created_on": case.opened_on.strftime("%Y-%m-%d %H:%M:%S")
+            if case.opened_on
             else "-",
             "target_date": target_date.strftime("%Y-%m-%d %H:%M:%S")
             if target_date
             else "-",
             "updated_date": case.latest_created_on,
-            "last_updated_by": previous_case_rec_created_by_name,
-            "last_updated_on": previous_case_rec.created_on
-            if previous_case_rec
-            else "-",
+            "last_updated_by": last_updated_by_name,
+            "last_updated_on": case.latest_created_on or "-",
         }
 
         return case_details
@@ -546,20 +392,8 @@ class BPMService:
     def generate_case_number(self, db: Session, case_type_prefix: str) -> str:
         """Generate a unique case number with the given prefix."""
         try:
-            last_case = (
-                db.query(Case)
-                .filter(Case.case_no.like(f"{case_type_prefix}%"))
-                .order_by(desc(Case.case_no))
-                .first()
-            )
-
-            if last_case:
-                last_number = int(last_case.case_no[len(case_type_prefix) :])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-
-            return f"{case_type_prefix}{str(new_number).zfill(6)}"  # e.g., 'ABC000001'
+            number = allocate_case_numbers(db, case_type_prefix)[0]
+            return format_case_number(case_type_prefix, number)  # e.g., 'ABC000001'
         except Exception as e:
             logger.error("Error generating case number: %s", e)
             raise e
@@ -615,9 +449,9 @@ class BPMService:
                 if case_step_config.first_step
                 else None,
                 user_id=user.id,
-                sla=sla,
                 created_by=user.id,
             )
+            schedule_case_sla(db, new_case, sla)
 
             # Add the new case to the session and commit
             db.add(new_case)
@@ -659,6 +493,7 @@ class BPMService:
                 user_id=next_user_id,
                 role_id=next_role_id,
             )
+            schedule_case_sla(db, new_case, self.get_sla(db, step_config, 1))
             db.add(new_case)
             db.commit()
             db.refresh(new_case)
@@ -717,6 +552,7 @@ class BPMService:
                 role_id=next_role_id,
                 created_by=user.id,
             )
+            schedule_case_sla(db, new_case, self.get_sla(db, next_step_config, 1))
             db.add(new_case)
             db.commit()
             db.refresh(new_case)
@@ -767,7 +603,8 @@ class BPMService:
                 role_id=original_case.role_id,
             )
 
-            # Step 4: Add the new case to the session and commit
+            # Step 4: Stop the SLA clock, add the new case to the session and commit
+            dequeue_case_sla(db, case_no)
             db.add(new_case)
             db.commit()
             db.refresh(new_case)
@@ -849,71 +686,39 @@ class BPMService:
             logger.error("Error getting case entity: %s", str(e))
             raise e
 
+    @staticmethod
+    def _user_summary(user: Optional[User]) -> dict:
+        """Assignee dictionary returned with step information"""
+        return {
+            "id": user.id if user else None,
+            "first_name": user.first_name if user else None,
+            "middle_name": user.middle_name if user else None,
+            "last_name": user.last_name if user else None,
+        }
+
     def check_access(
         self,
-        db: Session,
-        case,
+        access: StepAccessContext,
         current_step_id,
         logged_in_user,
         role_ids,
-        configs_by_step_id,
     ):
         """Checks if the logged-in user has access to the given step_id."""
-        assigned_user = None
-        assigned_roles = []
-
-        # Fetch latest case_reassignment entry for this case and step_id
-        latest_reassignment = (
-            db.query(CaseReassignment)
-            .filter(
-                CaseReassignment.case_no == case.case_no,
-                CaseReassignment.step_id == current_step_id,
-            )
-            # Get the latest reassignment
-            .order_by(desc(CaseReassignment.created_on))
-            .first()
-        )
+        # Latest case_reassignment entry for this case and step_id
+        latest_reassignment = access.reassignments.get(current_step_id)
 
         if latest_reassignment:
+            assigned_roles = access.roles_of(
+                [latest_reassignment.role_id] if latest_reassignment.role_id else []
+            )
             if latest_reassignment.user_id:
-                assigned_user = (
-                    db.query(User)
-                    .filter(User.id == latest_reassignment.user_id)
-                    .first()
-                )
-
-                # Fetch role details
-                assigned_roles = (
-                    db.query(Role).filter(Role.id == latest_reassignment.role_id).all()
-                )
-                assigned_roles = [
-                    {"id": role.id, "name": role.name} for role in assigned_roles
-                ]
-
                 return (
                     latest_reassignment.user_id == logged_in_user.id,
-                    {
-                        "id": assigned_user.id if assigned_user else None,
-                        "first_name": assigned_user.first_name
-                        if assigned_user
-                        else None,
-                        "middle_name": assigned_user.middle_name
-                        if assigned_user
-                        else None,
-                        "last_name": assigned_user.last_name if assigned_user else None,
-                    },
+                    self._user_summary(access.users.get(latest_reassignment.user_id)),
                     assigned_roles,
                 )
 
             elif latest_reassignment.role_id:
-                # Fetch role details
-                assigned_roles = (
-                    db.query(Role).filter(Role.id == latest_reassignment.role_id).all()
-                )
-                assigned_roles = [
-                    {"id": role.id, "name": role.name} for role in assigned_roles
-                ]
-
                 return (
                     str(latest_reassignment.role_id) in role_ids,
                     None,
@@ -924,78 +729,37 @@ class BPMService:
                 return False, None, []
 
         # If no reassignment entry exists, check case_step_configs
-        current_config = configs_by_step_id.get(current_step_id)
+        current_config = access.graph.nodes.get(current_step_id)
         if current_config:
-            if current_config.current_assignee_id:
-                assigned_user = (
-                    db.query(User)
-                    .filter(User.id == current_config.current_assignee_id)
-                    .first()
-                )
-
-                step_role_ids = (
-                    set(current_config.roles.split(",")) if current_config.roles else []
-                )
-                assigned_roles = db.query(Role).filter(Role.id.in_(step_role_ids)).all()
-                assigned_roles = [
-                    {"id": role.id, "name": role.name} for role in assigned_roles
-                ]
+            assigned_roles = access.roles_of(current_config.role_ids)
 
+            if current_config.current_assignee_id:
                 return (
                     current_config.current_assignee_id == logged_in_user.id,
-                    {
-                        "id": assigned_user.id if assigned_user else None,
-                        "first_name": assigned_user.first_name
-                        if assigned_user
-                        else None,
-                        "middle_name": assigned_user.middle_name
-                        if assigned_user
-                        else None,
-                        "last_name": assigned_user.last_name if assigned_user else None,
-                    },
+                    self._user_summary(access.users.get(current_config.current_assignee_id)),
                     assigned_roles,
                 )
 
-            else:
-                step_role_ids = (
-                    set(current_config.roles.split(",")) if current_config.roles else []
-                )
-                assigned_roles = db.query(Role).filter(Role.id.in_(step_role_ids)).all()
-                assigned_roles = [
-                    {"id": role.id, "name": role.name} for role in assigned_roles
-                ]
-
-                return bool(role_ids.intersection(step_role_ids)), None, assigned_roles
+            return bool(role_ids.intersection(current_config.role_ids)), None, assigned_roles
 
         return False, None, []  # Default to no access if none of the conditions are met
 
     def get_original_assignee_info(
-        self, db: Session, case_no: str, step_id: str
+        self, access: StepAccessContext, step_id: str
     ) -> dict:
         """
         Returns the original user and role information for a case step if there are reassignments.
         Checks the latest reassignment to get user_id_at_assignment and roles_at_assignment.
 
         Args:
-            db: Database session
-            case_no: Case number
+            access: Prefetched reassignments, users and roles of the case
             step_id: Step ID to check
 
         Returns:
             dict: Contains original_user and original_roles information, or None if no reassignment
         """
         try:
-            # Fetch latest case_reassignment entry for this case and step_id
-            latest_reassignment = (
-                db.query(CaseReassignment)
-                .filter(
-                    CaseReassignment.case_no == case_no,
-                    CaseReassignment.step_id == step_id,
-                )
-                # Get the latest reassignment
-                .order_by(desc(CaseReassignment.created_on))
-                .first()
-            )
+            latest_reassignment = access.reassignments.get(step_id)
             if not latest_reassignment:
                 return {
                     "original_user": None,
@@ -1005,28 +769,21 @@ class BPMService:
 
             # Get original user info from reassignment record
             original_user_info = None
-            if latest_reassignment.user_id_at_assignment:
-                original_user = (
-                    db.query(User)
-                    .filter(User.id == latest_reassignment.user_id_at_assignment)
-                    .first()
-                )
-                if original_user:
-                    original_user_info = {
-                        "id": original_user.id,
-                        "first_name": original_user.first_name,
-                        "middle_name": original_user.middle_name,
-                        "last_name": original_user.last_name,
-                        "name": original_user.name,
-                    }
+            original_user = access.users.get(latest_reassignment.user_id_at_assignment)
+            if original_user:
+                original_user_info = {
+                    "id": original_user.id,
+                    "first_name": original_user.first_name,
+                    "middle_name": original_user.middle_name,
+                    "last_name": original_user.last_name,
+                    "name": original_user.name,
+                }
 
             # Get original roles info from reassignment record
-            original_roles_info = []
-            if latest_reassignment.roles_at_assignment:
-                original_roles_info = [
-                    {"id": role.id, "name": role.name}
-                    for role in latest_reassignment.roles_at_assignment
-                ]
+            original_roles_info = [
+                {"id": role.id, "name": role.name}
+                for role in latest_reassignment.roles_at_assignment
+            ]
 
             return {
                 "original_user": original_user_info,
@@ -1091,7 +848,9 @@ class CaseReassignService:
             cls.update_case_reassignments_role(
                 db, logged_in_user, latest_case, role_id, current_step_only
             )
-        # Add new case record
+        # Add new case record, carrying the running SLA deadline over to it
+        sla_due_at = latest_case.sla_due_at
+        dequeue_case_sla(db, case_no)
         new_case = Case(
             case_no=case_no,
             case_type_id=latest_case.case_type_id,
@@ -1100,6 +859,7 @@ class CaseReassignService:
             user_id=user_id,
             role_id=role_id,
             sla=latest_case.sla,
+            sla_due_at=sla_due_at,
             created_by=logged_in_user.id,
         )
         db.add(new_case)
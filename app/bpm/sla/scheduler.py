@@ -0,0 +1,146 @@
+## app/bpm/sla/scheduler.py
+
+"""
+Event-driven SLA escalation.
+
+When a case enters a step, the row created for it records `sla_due_at`
+(entry time + SLA.time_limit minutes). The indexed column is the due queue:
+the periodic task only reads rows whose deadline has passed, so its cost
+follows the number of due cases rather than the size of the case history.
+
+Escalating a due case appends a history row on the next escalation level's
+SLA (assigned to that level's user / role when configured) with a fresh
+deadline; cases at their last level are logged as breached and dequeued.
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+# Third party imports
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm import Session, selectinload
+
+# Local imports
+from app.bpm import case_state  # noqa: F401  registers the current-state listener
+from app.bpm.models import SLA, Case
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def compute_due_at(sla: Optional[SLA], entered_at: Optional[datetime] = None) -> Optional[datetime]:
+    """Deadline of an SLA for a step entered at entered_at (defaults to now)"""
+    if not sla or not sla.is_active or not sla.time_limit:
+        return None
+    return (entered_at or datetime.now(timezone.utc)) + timedelta(minutes=sla.time_limit)
+
+
+def schedule_case_sla(
+    db: Session, case_row: Case, sla: Optional[SLA], entered_at: Optional[datetime] = None
+) -> None:
+    """
+    Put a newly entered case step on the due queue.
+
+    Any pending deadline of earlier rows of the same case is dequeued first,
+    so only the current row of a case can ever be escalated.
+    """
+    dequeue_case_sla(db, case_row.case_no)
+    case_row.sla = sla
+    case_row.sla_due_at = compute_due_at(sla, entered_at)
+
+
+def dequeue_case_sla(db: Session, case_no: str) -> None:
+    """Remove all pending SLA deadlines of a case"""
+    db.execute(
+        update(Case)
+        .where(Case.case_no == case_no, Case.sla_due_at.is_not(None))
+        .values(sla_due_at=None)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def escalate_due_cases(
+    db: Session, now: Optional[datetime] = None, batch_size: int = 500
+) -> Dict[str, int]:
+    """
+    Escalate every case whose SLA deadline has passed, one batch per transaction.
+
+    Returns:
+        Counts of escalated and breached (no further level) cases
+    """
+    now = now or datetime.now(timezone.utc)
+    escalated = breached = 0
+
+    while True:
+        due_cases = (
+            db.query(Case)
+            .options(selectinload(Case.sla))
+            .filter(Case.sla_due_at.is_not(None), Case.sla_due_at <= now)
+            .order_by(Case.sla_due_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not due_cases:
+            break
+
+        next_levels = _next_level_slas(db, due_cases)
+
+        new_rows = []
+        for case in due_cases:
+            current_level = case.sla.escalation_level if case.sla else 0
+            next_sla = next_levels.get((case.case_step_config_id, current_level + 1))
+            if next_sla is None:
+                breached += 1
+                logger.warning(
+                    "SLA breached at final escalation level",
+                    case_no=case.case_no,
+                    escalation_level=current_level,
+                )
+                continue
+
+            new_rows.append(Case(
+                case_no=case.case_no,
+                case_type_id=case.case_type_id,
+                case_status_id=case.case_status_id,
+                case_step_config_id=case.case_step_config_id,
+                user_id=next_sla.user_id or case.user_id,
+                role_id=next_sla.role_id or case.role_id,
+                sla=next_sla,
+                sla_due_at=compute_due_at(next_sla, now),
+            ))
+            escalated += 1
+
+        # Dequeue the whole batch in one statement, then enqueue the new levels
+        db.execute(
+            update(Case)
+            .where(Case.id.in_([case.id for case in due_cases]))
+            .values(sla_due_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.add_all(new_rows)
+        db.commit()
+
+        if len(due_cases) < batch_size:
+            break
+
+    logger.info("SLA escalation completed", escalated=escalated, breached=breached)
+    return {"escalated": escalated, "breached": breached}
+
+
+def _next_level_slas(db: Session, cases) -> Dict[Tuple[int, int], SLA]:
+    """Active SLAs one level above each case's current level, in one query"""
+    keys = {
+        (case.case_step_config_id, (case.sla.escalation_level if case.sla else 0) + 1)
+        for case in cases
+        if case.case_step_config_id
+    }
+    if not keys:
+        return {}
+
+    slas = db.query(SLA).filter(
+        tuple_(SLA.case_step_config_id, SLA.escalation_level).in_(list(keys)),
+        SLA.is_active.is_(True),
+    ).all()
+    return {(sla.case_step_config_id, sla.escalation_level): sla for sla in slas}
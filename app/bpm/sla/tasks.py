@@ -1,21 +1,26 @@
-import logging
-from datetime import datetime
+## app/bpm/sla/tasks.py
 
-from app.bpm.bpm_schema import CaseStatusEnum
-from app.bpm.models import SLA, Case
-from app.bpm.utils import escalate_cases
+# Third party imports
+from celery import shared_task
+
+# Local imports
+from app.bpm.sla.scheduler import escalate_due_cases
+from app.core.config import settings
 from app.core.db import SessionLocal
-from celery import Celery
-from sqlalchemy.exc import IntegrityError
+from app.utils.logger import get_logger
 
-app = Celery('tasks', broker='redis://localhost:6379/10')
+logger = get_logger(__name__)
 
 
-@app.task
+@shared_task(name="app.bpm.sla.tasks.process_case_sla")
 def process_case_sla():
+    """Escalate the cases whose SLA deadline has passed"""
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        escalate_cases(db)
-        db.commit()
+        return escalate_due_cases(db, batch_size=settings.bpm_sla_escalation_batch_size)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"SLA escalation failed: {e}", exc_info=True)
+        raise
     finally:
         db.close()
@@ -0,0 +1,273 @@
+## app/bpm/step_graph.py
+
+"""
+Compiled BPM step graphs.
+
+A case type's step configs, their roles and its first step are compiled once
+into a CaseStepGraph, which keeps the ordered walk along next_step_id and the
+role ids / names of every step. Graphs are cached per case type prefix and
+recompiled when the step-config signature changes (row counts and last
+update of case_step_configs, case_type_first_steps, case_steps and roles, and
+a count plus checksum of the case_step_config_role links), so edits made by
+the seeders are picked up without a restart.
+"""
+
+# Standard library imports
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Third party imports
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session, selectinload
+
+# Local imports
+from app.bpm.models import (
+    CaseReassignment,
+    CaseStep,
+    CaseStepConfig,
+    CaseType,
+    CaseTypeFirstStep,
+    case_step_config_role_table,
+)
+from app.users.models import Role, User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class StepNode:
+    """One configured step of a case type"""
+    config_id: int
+    step_name: str
+    config_step_name: str
+    step_id: str
+    next_step_id: Optional[str]
+    order: Optional[int]
+    current_assignee_id: Optional[int]
+    role_ids: FrozenSet[str]
+
+
+@dataclass
+class CaseStepGraph:
+    """Steps of a case type in weight order plus the first-step walk"""
+    case_type: str
+    first_step_id: Optional[str]
+    nodes: Dict[str, StepNode]
+    ordered: List[StepNode]
+    role_names: Dict[int, str] = field(default_factory=dict)
+
+    def walk(self) -> List[StepNode]:
+        """Steps reachable from the first step along next_step_id"""
+        path, visited = [], set()
+        step_id = self.first_step_id
+        while step_id:
+            if step_id in visited:
+                raise ValueError("Circular reference detected in next_step_id sequence")
+            visited.add(step_id)
+
+            node = self.nodes.get(step_id)
+            if not node:
+                break
+            path.append(node)
+            step_id = node.next_step_id
+        return path
+
+
+class StepGraphCache:
+    """Process-wide cache of compiled step graphs keyed by case type prefix"""
+
+    def __init__(self):
+        self._graphs: Dict[str, Tuple[tuple, CaseStepGraph]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, case_type: str) -> CaseStepGraph:
+        """Return the compiled graph for case_type, recompiling it if configs changed"""
+        signature = self._signature(db)
+        cached = self._graphs.get(case_type)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        graph = compile_step_graph(db, case_type)
+        with self._lock:
+            self._graphs[case_type] = (signature, graph)
+        logger.info("Compiled BPM step graph", case_type=case_type, steps=len(graph.ordered))
+        return graph
+
+    def invalidate(self, case_type: Optional[str] = None) -> None:
+        """Drop one or all compiled graphs"""
+        with self._lock:
+            if case_type is None:
+                self._graphs.clear()
+            else:
+                self._graphs.pop(case_type, None)
+
+    @staticmethod
+    def _signature(db: Session) -> tuple:
+        """
+        Cheap fingerprint of the step configuration tables.
+
+        Role links carry no timestamps, so besides their count a CRC32
+        checksum of every (case_step_config_id, role_id) pair is compared;
+        swapping one role for another changes it even when the count stays.
+        Only table columns are read, so no ORM mapper needs to be configured.
+        """
+        configs, first_steps = CaseStepConfig.__table__.c, CaseTypeFirstStep.__table__.c
+        steps, roles = CaseStep.__table__.c, Role.__table__.c
+        links = case_step_config_role_table.c
+        return tuple(db.execute(
+            select(
+                select(func.count(configs.id)).scalar_subquery(),
+                select(func.max(configs.updated_on)).scalar_subquery(),
+                select(func.count()).select_from(case_step_config_role_table).scalar_subquery(),
+                select(
+                    func.coalesce(func.sum(func.crc32(func.concat(links.case_step_config_id, ":", links.role_id))), 0)
+                ).scalar_subquery(),
+                select(func.count(first_steps.id)).scalar_subquery(),
+                select(func.max(first_steps.updated_on)).scalar_subquery(),
+                select(func.max(steps.updated_on)).scalar_subquery(),
+                select(func.max(roles.updated_on)).scalar_subquery(),
+            )
+        ).one())
+
+
+def compile_step_graph(db: Session, case_type: str) -> CaseStepGraph:
+    """Build the step graph of a case type with three queries"""
+    first_step = (
+        db.query(CaseTypeFirstStep)
+        .join(CaseType, CaseTypeFirstStep.case_type_id == CaseType.id)
+        .filter(CaseType.prefix == case_type)
+        .first()
+    )
+    if not first_step:
+        raise ValueError(f"First step has not been configured for casetype {case_type}")
+
+    configs = (
+        db.query(
+            CaseStepConfig.id,
+            CaseStep.name.label("step_name"),
+            CaseStepConfig.step_name.label("config_step_name"),
+            CaseStepConfig.step_id,
+            CaseStepConfig.next_step_id,
+            CaseStep.weight.label("order"),
+            CaseStepConfig.current_assignee_id,
+        )
+        .join(CaseType, CaseStepConfig.case_type_id == CaseType.id)
+        .join(CaseStep, CaseStep.id == CaseStepConfig.case_step_id)
+        .filter(CaseType.prefix == case_type)
+        .order_by(CaseStep.weight)
+        .all()
+    )
+
+    roles_by_config: Dict[int, set] = {}
+    role_names: Dict[int, str] = {}
+    if configs:
+        for config_id, role_id, role_name in db.execute(
+            select(
+                case_step_config_role_table.c.case_step_config_id,
+                Role.id,
+                Role.name,
+            )
+            .join(Role, Role.id == case_step_config_role_table.c.role_id)
+            .where(case_step_config_role_table.c.case_step_config_id.in_([c.id for c in configs]))
+        ).all():
+            roles_by_config.setdefault(config_id, set()).add(str(role_id))
+            role_names[role_id] = role_name
+
+    ordered = [
+        StepNode(
+            config_id=c.id,
+            step_name=c.step_name,
+            config_step_name=c.config_step_name,
+            step_id=c.step_id,
+            next_step_id=c.next_step_id,
+            order=c.order,
+            current_assignee_id=c.current_assignee_id,
+            role_ids=frozenset(roles_by_config.get(c.id, ())),
+        )
+        for c in configs
+    ]
+
+    return CaseStepGraph(
+        case_type=case_type,
+        first_step_id=first_step.first_step.step_id if first_step.first_step else None,
+        nodes={node.step_id: node for node in ordered},
+        ordered=ordered,
+        role_names=role_names,
+    )
+
+
+@dataclass
+class StepAccessContext:
+    """Reassignments, users and roles a case's step walk needs, loaded once"""
+    graph: CaseStepGraph
+    reassignments: Dict[str, CaseReassignment]
+    users: Dict[int, User]
+    role_names: Dict[int, str]
+
+    def roles_of(self, role_ids) -> List[dict]:
+        """Id / name dictionaries for role ids, ordered by id"""
+        return [
+            {"id": role_id, "name": self.role_names[role_id]}
+            for role_id in sorted({int(r) for r in role_ids})
+            if role_id in self.role_names
+        ]
+
+
+def load_step_access_context(
+    db: Session, case_no: str, graph: CaseStepGraph, step_ids: List[str]
+) -> StepAccessContext:
+    """
+    Load the latest reassignment per step of a case plus the users and roles
+    they and the step configs refer to, with a fixed number of queries.
+    """
+    reassignments: Dict[str, CaseReassignment] = {}
+    if step_ids:
+        rows = (
+            db.query(CaseReassignment)
+            .options(
+                selectinload(CaseReassignment.roles_at_assignment),
+                selectinload(CaseReassignment.creator),
+            )
+            .filter(
+                CaseReassignment.case_no == case_no,
+                CaseReassignment.step_id.in_(step_ids),
+            )
+            .order_by(desc(CaseReassignment.created_on))
+            .all()
+        )
+        for reassignment in rows:
+            reassignments.setdefault(reassignment.step_id, reassignment)
+
+    user_ids = {
+        user_id
+        for reassignment in reassignments.values()
+        for user_id in (reassignment.user_id, reassignment.user_id_at_assignment)
+        if user_id
+    }
+    user_ids.update(
+        graph.nodes[step_id].current_assignee_id
+        for step_id in step_ids
+        if step_id in graph.nodes and graph.nodes[step_id].current_assignee_id
+    )
+    users = {
+        user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()
+    } if user_ids else {}
+
+    role_names = dict(graph.role_names)
+    missing_role_ids = {
+        reassignment.role_id for reassignment in reassignments.values()
+        if reassignment.role_id and reassignment.role_id not in role_names
+    }
+    if missing_role_ids:
+        role_names.update(
+            db.query(Role.id, Role.name).filter(Role.id.in_(missing_role_ids)).all()
+        )
+
+    return StepAccessContext(
+        graph=graph, reassignments=reassignments, users=users, role_names=role_names
+    )
+
+
+step_graph_cache = StepGraphCache()
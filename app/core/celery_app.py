@@ -26,6 +26,8 @@ app.autodiscover_tasks([
     "app.worker",
     "app.curb",  # Include curb tasks
     "app.bpm.sla",  # Include BPM SLA tasks
+    "app.ezpass",  # Include EZPass import tasks
+    "app.pvb",  # Include PVB import tasks
 ])
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+# app/core/concurrency.py
+
+"""
+Keeping the event loop free of synchronous work.
+
+run_sync moves blocking code (sync Session queries, services built on
+get_db) onto the threadpool from inside async endpoints. Endpoints that
+never await should simply be declared with `def`; FastAPI runs those on the
+threadpool already.
+
+EventLoopBlockMonitor detects event-loop stalls: a ticker coroutine
+measures how late it wakes up, while a watchdog thread captures the request
+and the stack that hold the loop while a stall is in progress. Enable it by
+setting EVENT_LOOP_BLOCK_THRESHOLD_MS; EventLoopBlockMiddleware labels each
+request task with its route so stalls are reported per route.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking callable on the threadpool and await its result"""
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+class EventLoopBlockMonitor:
+    """
+    Report event-loop blocks longer than threshold_ms.
+
+    Stats per route (count and longest block) are kept in `stats`.
+    """
+
+    def __init__(self, threshold_ms: int, interval_ms: Optional[int] = None):
+        self.threshold = threshold_ms / 1000
+        self.interval = (interval_ms or max(threshold_ms // 4, 10)) / 1000
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._culprit: Optional[Dict[str, Any]] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        """Start monitoring the running loop"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._ticker = asyncio.create_task(self._tick(), name="event-loop-block-monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch, name="event-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info("Event loop block monitor started", threshold_ms=int(self.threshold * 1000))
+
+    async def stop(self) -> None:
+        """Stop the ticker and the watchdog thread"""
+        self._stopped.set()
+        if self._ticker:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+
+    async def _tick(self) -> None:
+        while True:
+            started = time.monotonic()
+            self._last_beat = started
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - started - self.interval
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _watch(self) -> None:
+        """Capture what holds the loop while a block is in progress"""
+        while not self._stopped.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled < self.threshold or self._culprit is not None:
+                continue
+
+            task = asyncio.current_task(self._loop)
+            frame = sys._current_frames().get(self._loop_thread_id)
+            self._culprit = {
+                "route": task.get_name() if task else "unknown",
+                "stack": "".join(traceback.format_stack(frame, limit=12)) if frame else "",
+            }
+
+    def _report(self, lag: float) -> None:
+        culprit, self._culprit = self._culprit or {"route": "unknown", "stack": ""}, None
+        blocked_ms = round(lag * 1000, 1)
+
+        route_stats = self.stats.setdefault(culprit["route"], {"count": 0, "max_ms": 0.0})
+        route_stats["count"] += 1
+        route_stats["max_ms"] = max(route_stats["max_ms"], blocked_ms)
+
+        logger.warning(
+            "Event loop blocked",
+            route=culprit["route"],
+            blocked_ms=blocked_ms,
+            stack=culprit["stack"],
+        )
+
+
+class EventLoopBlockMiddleware:
+    """ASGI middleware naming each request task after its method and path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        task = asyncio.current_task() if scope["type"] == "http" else None
+        if task is None:
+            await self.app(scope, receive, send)
+            return
+
+        previous_name = task.get_name()
+        task.set_name(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            task.set_name(previous_name)
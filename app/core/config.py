@@ -1,5 +1,7 @@
 ## app/core/config.py
 
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -65,6 +67,38 @@ class Settings(BaseSettings):
     curb_merchant: str = None
     curb_username: str = None
     curb_password: str = None
+    curb_import_chunk_size: int = 1000
+    curb_association_batch_size: int = 5000
+    curb_reconcile_batch_size: int = 500
+    curb_reconcile_concurrency: int = 4
+    curb_fetch_concurrency: int = 4
+
+    ezpass_batch_size: int = 1000
+    loan_posting_batch_size: int = 1000
+
+    # Rows per chunk when streaming CSV / Excel uploads, and where uploads are spooled
+    ingestion_chunk_size: int = 5000
+    ingestion_spool_dir: Optional[str] = None
+
+    ledger_settlement_batch_size: int = 500
+    # Celery prefork children use base + pool child index as their ledger ID worker id;
+    # other processes hash hostname:pid into the id space, and with ledger_worker_id_redis
+    # reserve the hashed id in Redis for this many seconds
+    ledger_worker_id_base: Optional[int] = None
+    ledger_worker_id_redis: bool = False
+    ledger_worker_id_lease_seconds: int = 86400
+    dtr_render_chunk_size: int = 50
+
+    bpm_schema_revalidate_seconds: int = 60
+    bpm_schema_redis_cache: bool = False
+    bpm_schema_redis_ttl_seconds: int = 86400
+    bpm_sla_escalation_batch_size: int = 500
+
+    # Report event loop blocks longer than this many milliseconds (0 disables)
+    event_loop_block_threshold_ms: int = 0
+
+    # List totals are reused for this many seconds while paging with a cursor (0 disables)
+    pagination_count_cache_seconds: int = 30
 
     secret_key: str = None
     algorithm: str = None
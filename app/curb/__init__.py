@@ -16,6 +16,8 @@ Architecture:
 - Router: FastAPI endpoints with async handlers
 - Tasks: Celery tasks for automated processing
 - SOAP Client: Async HTTP client for CURB API
+- Fetcher: Sharded, concurrent fetch orchestration with resumable backfills
+- Transform: Vectorized validation and transformation of imported trips
 - Utils: XML parsing and data transformation utilities
 """
 
@@ -25,6 +27,7 @@ from app.curb.tasks import (
     post_curb_trips,
     process_curb_trips_full,
     manual_fetch_curb_trips,
+    backfill_curb_trips,
 )
 
 __all__ = [
@@ -33,4 +36,5 @@ __all__ = [
     'post_curb_trips',
     'process_curb_trips_full',
     'manual_fetch_curb_trips',
+    'backfill_curb_trips',
 ]
\ No newline at end of file
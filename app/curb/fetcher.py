@@ -0,0 +1,272 @@
+# app/curb/fetcher.py
+
+"""
+Sharded, concurrent fetch orchestration for CURB trip imports.
+
+A date range is split into day (and optionally cab-number) shards. Shards
+are fetched concurrently over one keep-alive SOAP client with a bounded
+number of requests in flight, and each shard is imported as soon as its
+payloads arrive. Every shard import is tagged with its shard key on the
+import log, so re-running the same range resumes a backfill by skipping
+shards that already completed.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.curb.repository import CURBRepository
+from app.curb.schemas import CURBFetchResult, CURBFetchShardResult
+from app.curb.services import CURBService
+from app.curb.soap_client import (
+    create_soap_client, fetch_trans_by_date_cab12, fetch_trips_log10,
+)
+from app.curb.utils import format_date_for_soap
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SHARD_BY_DAY = "day"
+SHARD_BY_CAB = "cab"
+
+
+@dataclass(frozen=True)
+class CURBFetchShard:
+    """
+    One unit of CURB fetch work.
+
+    The SOAP window runs from from_date up to to_date, following the same
+    [start, next day) convention as the nightly 24 hour fetch.
+    """
+    from_date: date
+    to_date: date
+    cab_number: str = ""
+    driver_id: str = ""
+
+    @property
+    def key(self) -> str:
+        """Stable identifier recorded on the import log for resume"""
+        key = f"{self.from_date:%Y%m%d}-{self.to_date:%Y%m%d}:{self.cab_number or 'ALL'}"
+        if self.driver_id:
+            key = f"{key}:{self.driver_id}"
+        return key
+
+
+def build_fetch_shards(
+    from_date: date,
+    to_date: date,
+    shard_by: str = SHARD_BY_DAY,
+    cab_numbers: Optional[List[str]] = None,
+    driver_id: str = "",
+) -> List[CURBFetchShard]:
+    """
+    Split [from_date, to_date) into fetch shards.
+
+    Args:
+        from_date: First day to fetch
+        to_date: Day after the last day to fetch
+        shard_by: "day" for one shard per day (per cab if cab_numbers given),
+                  "cab" for one shard per cab covering the whole range
+        cab_numbers: Optional cab numbers to fetch individually
+        driver_id: Optional driver filter applied to the trips log fetch
+
+    Returns:
+        List of shards in chronological order
+    """
+    if to_date <= from_date:
+        raise ValueError("to_date must be after from_date")
+
+    cabs = [c.strip() for c in (cab_numbers or []) if c and c.strip()] or [""]
+
+    if shard_by == SHARD_BY_CAB:
+        return [CURBFetchShard(from_date, to_date, cab, driver_id) for cab in cabs]
+
+    if shard_by != SHARD_BY_DAY:
+        raise ValueError(f"Unsupported shard_by: {shard_by}")
+
+    shards = []
+    day = from_date
+    while day < to_date:
+        for cab in cabs:
+            shards.append(CURBFetchShard(day, day + timedelta(days=1), cab, driver_id))
+        day += timedelta(days=1)
+    return shards
+
+
+class CURBFetchOrchestrator:
+    """
+    Fetch CURB shards concurrently and import them as they arrive.
+
+    Network calls run concurrently (bounded by `concurrency`) over a single
+    shared client; imports run one shard at a time on their own session so
+    the database sees a steady stream of small transactions.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        import_source: str = "SOAP",
+        import_by: str = "SYSTEM",
+        resume: bool = True,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.concurrency = concurrency or settings.curb_fetch_concurrency
+        self.import_source = import_source
+        self.import_by = import_by
+        self.resume = resume
+        self.session_factory = session_factory
+
+    async def run(self, shards: List[CURBFetchShard]) -> CURBFetchResult:
+        """
+        Fetch and import every shard, skipping completed ones when resuming.
+
+        Returns:
+            CURBFetchResult with one entry per shard
+        """
+        logger.info("Starting sharded CURB fetch", shards=len(shards), concurrency=self.concurrency)
+
+        results: List[CURBFetchShardResult] = []
+        pending = shards
+
+        # === Skip shards already imported by an earlier run ===
+        if self.resume and shards:
+            async with self.session_factory() as db:
+                completed = await CURBRepository(db).get_completed_shard_keys(
+                    [shard.key for shard in shards]
+                )
+            pending = [shard for shard in shards if shard.key not in completed]
+            results.extend(
+                CURBFetchShardResult(shard_key=shard.key, status="Skipped")
+                for shard in shards if shard.key in completed
+            )
+            logger.info("Resuming CURB fetch", completed=len(completed), pending=len(pending))
+
+        # === Fetch concurrently, import as each shard lands ===
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with create_soap_client(max_connections=self.concurrency * 2) as client:
+
+            async def produce(shard: CURBFetchShard) -> None:
+                async with semaphore:
+                    try:
+                        payload = await self._fetch_shard(client, shard)
+                        await queue.put((shard, payload, None))
+                    except Exception as e:
+                        logger.error("Failed to fetch CURB shard", shard=shard.key, error=str(e))
+                        await queue.put((shard, None, str(e)))
+
+            producers = [asyncio.create_task(produce(shard)) for shard in pending]
+            try:
+                for _ in pending:
+                    shard, payload, error = await queue.get()
+                    results.append(await self._import_shard(shard, payload, error))
+            finally:
+                for task in producers:
+                    task.cancel()
+                await asyncio.gather(*producers, return_exceptions=True)
+
+        return self._summarize(results)
+
+    async def _fetch_shard(
+        self, client: httpx.AsyncClient, shard: CURBFetchShard
+    ) -> Tuple[str, str]:
+        """Fetch the card and cash payloads of one shard in parallel"""
+        from_str = format_date_for_soap(shard.from_date)
+        to_str = format_date_for_soap(shard.to_date)
+
+        card_xml, cash_xml = await asyncio.gather(
+            fetch_trans_by_date_cab12(
+                from_datetime=from_str,
+                to_datetime=to_str,
+                cab_number=shard.cab_number,
+                tran_type="ALL",
+                client=client,
+            ),
+            fetch_trips_log10(
+                from_date=from_str,
+                to_date=to_str,
+                recon_stat=-1,
+                cab_number=shard.cab_number,
+                driver_id=shard.driver_id,
+                client=client,
+            ),
+        )
+        logger.debug("Fetched CURB shard", shard=shard.key)
+        return card_xml, cash_xml
+
+    async def _import_shard(
+        self,
+        shard: CURBFetchShard,
+        payload: Optional[Tuple[str, str]],
+        error: Optional[str],
+    ) -> CURBFetchShardResult:
+        """Import one fetched shard on its own session"""
+        if error is not None:
+            return CURBFetchShardResult(shard_key=shard.key, status="Failed", error=error)
+
+        card_xml, cash_xml = payload
+        try:
+            async with self.session_factory() as db:
+                result = await CURBService(CURBRepository(db)).import_trips(
+                    xml_data=card_xml,
+                    cash_xml_data=cash_xml,
+                    import_source=self.import_source,
+                    import_by=self.import_by,
+                    shard_key=shard.key,
+                )
+        except Exception as e:
+            logger.error("Failed to import CURB shard", shard=shard.key, error=str(e))
+            return CURBFetchShardResult(shard_key=shard.key, status="Failed", error=str(e))
+
+        logger.info(
+            "Imported CURB shard",
+            shard=shard.key,
+            total=result.total_records,
+            success=result.success_count,
+            duplicates=result.duplicate_count,
+        )
+        return CURBFetchShardResult(
+            shard_key=shard.key,
+            status="Imported",
+            log_id=result.log_id,
+            total_records=result.total_records,
+            success_count=result.success_count,
+            duplicate_count=result.duplicate_count,
+        )
+
+    @staticmethod
+    def _summarize(results: List[CURBFetchShardResult]) -> CURBFetchResult:
+        """Aggregate per-shard outcomes"""
+        results = sorted(results, key=lambda r: r.shard_key)
+        imported = [r for r in results if r.status == "Imported"]
+        skipped = [r for r in results if r.status == "Skipped"]
+        failed = [r for r in results if r.status == "Failed"]
+        success_count = sum(r.success_count for r in imported)
+
+        logger.info(
+            "Sharded CURB fetch completed",
+            imported=len(imported), skipped=len(skipped), failed=len(failed),
+        )
+
+        return CURBFetchResult(
+            success=not failed,
+            total_shards=len(results),
+            imported_shards=len(imported),
+            skipped_shards=len(skipped),
+            failed_shards=len(failed),
+            total_records=sum(r.total_records for r in imported),
+            success_count=success_count,
+            duplicate_count=sum(r.duplicate_count for r in imported),
+            message=(
+                f"Imported {success_count} trips from {len(imported)} shards, "
+                f"{len(skipped)} already complete, {len(failed)} failed"
+            ),
+            shards=results,
+        )
@@ -27,7 +27,7 @@ class CURBTrip(Base, AuditMixin):
     __tablename__ = "curb_trips"
 
     __table_args__ = (
-        Index('idx_curb_trip_record_period', 'record_id', 'period'),
+        UniqueConstraint('record_id', 'period', name='uq_curb_trip_record_period'),
         Index('idx_curb_trip_dates', 'start_date', 'end_date'),
         Index('idx_curb_trip_cab_driver', 'cab_number', 'driver_id'),
         Index('idx_curb_trip_reconcile', 'is_reconciled', 'is_posted'),
@@ -132,6 +132,7 @@ class CURBImportLog(Base, AuditMixin):
     duplicate_count: Mapped[int] = mapped_column(default=0)
 
     status: Mapped[str] = mapped_column(String(32), default="IN_PROGRESS", index=True)
+    shard_key: Mapped[Optional[str]] = mapped_column(String(128), nullable=True, index=True)
     error_summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     trips: Mapped[list["CURBTrip"]] = relationship("CURBTrip", back_populates="import_log")
@@ -4,18 +4,25 @@
 Data Access Layer for CURB module using async SQLAlchemy 2.x
 """
 
-from typing import List, Optional, Tuple
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import select, func, and_, desc, asc
+from sqlalchemy import select, insert, update, func, and_, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.curb.models import CURBTrip, CURBImportLog, CURBTripReconciliation
+from app.drivers.models import Driver
+from app.leases.models import Lease, LeaseDriver
+from app.medallions.models import Medallion
 from app.curb.schemas import (
     CURBTripCreate, CURBTripUpdate, CURBTripFilters,
     CURBImportLogCreate, CURBImportLogUpdate, CURBImportLogFilters,
     CURBTripReconciliationCreate,
 )
 from app.utils.logger import get_logger
+from app.utils.pagination import count_rows, keyset_order, paginate, to_page
 
 logger = get_logger(__name__)
 
@@ -129,27 +136,21 @@ class CURBRepository:
             count_stmt = count_stmt.where(and_(*conditions))
 
         # === Get total count ===
-        total_result = await self.db.execute(count_stmt)
-        total_count = total_result.scalar() or 0
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
-        # === Apply Sorting ===
+        # === Apply sorting and pagination ===
+        sort_column = CURBTrip.id
         if filters.sort_by and hasattr(CURBTrip, filters.sort_by):
             sort_column = getattr(CURBTrip, filters.sort_by)
-            if filters.sort_order == "asc":
-                stmt = stmt.order_by(asc(sort_column))
-            else:
-                stmt = stmt.order_by(desc(sort_column))
-
-        # === Apply pagination ===
-        offset = (filters.page - 1) * filters.per_page
-        stmt = stmt.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order != "asc", CURBTrip.id)
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
 
         # === Execute query ===
         result = await self.db.execute(stmt)
-        trips = result.scalars().all()
+        trips = to_page(result.scalars().all(), order, filters.per_page)
 
-        logger.inf("Retrieved trips", count=len(trips), total=total_count)
-        return list(trips), total_count
+        logger.info("Retrieved trips", count=len(trips), total=total_count)
+        return trips, total_count
     
     async def create_trip(self, trip_data: CURBTripCreate) -> CURBTrip:
         """Create a new trip"""
@@ -173,6 +174,77 @@ class CURBRepository:
 
         logger.info("Trips bulk created", count=len(trips))
         return trips
+
+    async def bulk_insert_trips(self, trip_rows: List[Dict[str, Any]]) -> int:
+        """Insert trips with a single multi-row core INSERT (no ORM objects)"""
+        if not trip_rows:
+            return 0
+
+        logger.debug("Bulk inserting trips", count=len(trip_rows))
+
+        await self.db.execute(insert(CURBTrip).values(trip_rows))
+
+        logger.info("Trips bulk inserted", count=len(trip_rows))
+        return len(trip_rows)
+
+    @property
+    def supports_upsert(self) -> bool:
+        """Whether the bound database supports INSERT ... ON DUPLICATE KEY UPDATE"""
+        return self.db.get_bind().dialect.name == "mysql"
+
+    async def get_existing_trip_keys(self, keys: Iterable[Tuple[str, str]]) -> set:
+        """Those of the (record_id, period) keys that are already imported"""
+        keys = set(keys)
+        if not keys:
+            return set()
+
+        stmt = select(CURBTrip.record_id, CURBTrip.period).where(
+            CURBTrip.record_id.in_({record_id for record_id, _ in keys})
+        )
+        result = await self.db.execute(stmt)
+        return {(record_id, period or "") for record_id, period in result.all()} & keys
+
+    async def insert_new_trips(self, trip_rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert trips with one multi-row INSERT, skipping ones already imported.
+
+        On MySQL the statement carries ON DUPLICATE KEY UPDATE, so trips
+        already stored under the uq_curb_trip_record_period key (including
+        ones an overlapping import just wrote) are left in place without a
+        lookup query. Unlike INSERT IGNORE this still raises on truncation,
+        bad values or missing NOT NULL columns. trip_rows must not repeat a
+        key.
+
+        The duplicate branch bumps updated_on so every skipped row is a
+        changed row: the MySQL drivers always set CLIENT_FOUND_ROWS, under
+        which an id = id no-op reports 1 affected row just like an insert.
+        With 1 per inserted row and 2 per duplicate, the inserted count
+        follows from the statement's affected rows.
+
+        Other databases look the keys up first and insert the rest.
+
+        Returns:
+            Number of rows inserted
+        """
+        if not trip_rows:
+            return 0
+
+        if not self.supports_upsert:
+            existing = await self.get_existing_trip_keys(
+                (row["record_id"], row["period"] or "") for row in trip_rows
+            )
+            return await self.bulk_insert_trips([
+                row for row in trip_rows
+                if (row["record_id"], row["period"] or "") not in existing
+            ])
+
+        stmt = mysql_insert(CURBTrip).values(trip_rows)
+        stmt = stmt.on_duplicate_key_update(updated_on=func.now())
+        result = await self.db.execute(stmt)
+        inserted = 2 * len(trip_rows) - result.rowcount
+
+        logger.debug("Trips inserted", count=inserted, duplicates=len(trip_rows) - inserted)
+        return inserted
     
     async def update_trip(self, trip_id: int, trip_data: CURBTripUpdate) -> Optional[CURBTrip]:
         """Update a trip"""
@@ -208,6 +280,43 @@ class CURBRepository:
         logger.info("Retrieved unreconciled trips", count=len(trips))
         return list(trips)
     
+    async def get_trip_recon_keys(self, trip_ids: List[int]) -> List[Row]:
+        """
+        Get (id, record_id, is_reconciled) for the given trip IDs in one query.
+        Unknown IDs are simply absent from the result.
+        """
+        logger.debug("Fetching trip reconciliation keys", count=len(trip_ids))
+
+        if not trip_ids:
+            return []
+
+        stmt = select(
+            CURBTrip.id, CURBTrip.record_id, CURBTrip.is_reconciled
+        ).where(CURBTrip.id.in_(trip_ids)).order_by(CURBTrip.id)
+
+        result = await self.db.execute(stmt)
+        rows = result.all()
+
+        logger.info("Retrieved trip reconciliation keys", count=len(rows))
+        return list(rows)
+
+    async def get_unreconciled_trip_keys(self, limit: Optional[int] = None) -> List[Row]:
+        """Get (id, record_id, is_reconciled) for all unreconciled trips"""
+        logger.debug("Fetching unreconciled trip keys")
+
+        stmt = select(
+            CURBTrip.id, CURBTrip.record_id, CURBTrip.is_reconciled
+        ).where(CURBTrip.is_reconciled == False).order_by(CURBTrip.id)
+
+        if limit:
+            stmt = stmt.limit(limit)
+
+        result = await self.db.execute(stmt)
+        rows = result.all()
+
+        logger.info("Retrieved unreconciled trip keys", count=len(rows))
+        return list(rows)
+
     async def get_reconciled_unposted_trips(self, limit: Optional[int] = None) -> List[CURBTrip]:
         """Get reconciled but unposted trips"""
         logger.debug("Fetching reconciled unposted trips")
@@ -225,6 +334,131 @@ class CURBRepository:
         logger.info("Retrieved reconciled unposted trips", count=len(trips))
         return list(trips)
     
+    async def get_reconciled_unposted_trip_keys(
+        self, after_id: int = 0, limit: int = 5000
+    ) -> List[Row]:
+        """
+        Get the association keys of reconciled but unposted trips.
+
+        Returns lightweight rows (id, record_id, trip_number, cab_number,
+        driver_id, start_date, total_amount) ordered by id, starting after `after_id`, so callers can walk the
+        backlog in keyset batches without loading ORM objects.
+        """
+        logger.debug("Fetching reconciled unposted trip keys", after_id=after_id, limit=limit)
+
+        stmt = select(
+            CURBTrip.id,
+            CURBTrip.record_id,
+            CURBTrip.trip_number,
+            CURBTrip.cab_number,
+            CURBTrip.driver_id,
+            CURBTrip.start_date,
+            CURBTrip.total_amount,
+        ).where(
+            and_(
+                CURBTrip.is_reconciled == True,
+                CURBTrip.is_posted == False,
+                CURBTrip.id > after_id,
+            )
+        ).order_by(CURBTrip.id).limit(limit)
+
+        result = await self.db.execute(stmt)
+        rows = result.all()
+
+        logger.info("Retrieved reconciled unposted trip keys", count=len(rows))
+        return list(rows)
+
+    async def get_candidate_leases(
+        self,
+        cab_numbers: Iterable[str],
+        driver_ids: Iterable[str],
+        date_from: date,
+        date_to: date,
+    ) -> List[Row]:
+        """
+        Load every active lease/driver pairing that could match a batch of trips.
+
+        One query covers all cab numbers, driver IDs and the batch's date span.
+        Each row carries lease_id, driver_id, driver_pk, medallion_number,
+        medallion_id, vehicle_id, lease_start_date and lease_end_date.
+        """
+        cab_numbers = list(set(cab_numbers))
+        driver_ids = list(set(driver_ids))
+        logger.debug(
+            "Fetching candidate leases",
+            cabs=len(cab_numbers), drivers=len(driver_ids),
+            date_from=date_from, date_to=date_to,
+        )
+
+        if not cab_numbers or not driver_ids:
+            return []
+
+        stmt = select(
+            Lease.id.label("lease_id"),
+            LeaseDriver.driver_id,
+            Driver.id.label("driver_pk"),
+            Medallion.medallion_number,
+            Lease.medallion_id,
+            Lease.vehicle_id,
+            Lease.lease_start_date,
+            Lease.lease_end_date,
+        ).join(
+            LeaseDriver, LeaseDriver.lease_id == Lease.id
+        ).join(
+            Medallion, Medallion.id == Lease.medallion_id
+        ).outerjoin(
+            Driver, Driver.driver_id == LeaseDriver.driver_id
+        ).where(
+            and_(
+                Medallion.medallion_number.in_(cab_numbers),
+                LeaseDriver.driver_id.in_(driver_ids),
+                Lease.lease_status == "Active",
+                Lease.lease_start_date <= date_to,
+                or_(Lease.lease_end_date == None, Lease.lease_end_date >= date_from),
+            )
+        )
+
+        result = await self.db.execute(stmt)
+        rows = result.all()
+
+        logger.info("Retrieved candidate leases", count=len(rows))
+        return list(rows)
+
+    async def bulk_update_trips(self, trip_rows: List[Dict[str, Any]]) -> int:
+        """
+        Update many trips with per-row values in a single executemany UPDATE.
+
+        Each dict must contain the trip `id` plus the columns to set; all dicts
+        in one call should carry the same keys.
+        """
+        if not trip_rows:
+            return 0
+
+        logger.debug("Bulk updating trips", count=len(trip_rows))
+
+        await self.db.execute(update(CURBTrip), trip_rows)
+
+        logger.info("Trips bulk updated", count=len(trip_rows))
+        return len(trip_rows)
+
+    async def update_trips_by_ids(self, trip_ids: List[int], values: Dict[str, Any]) -> int:
+        """Apply the same column values to every trip in trip_ids with one UPDATE"""
+        if not trip_ids:
+            return 0
+
+        logger.debug("Updating trips by IDs", count=len(trip_ids), fields=list(values))
+
+        stmt = (
+            update(CURBTrip)
+            .where(CURBTrip.id.in_(trip_ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(stmt)
+
+        logger.info("Trips updated by IDs", count=result.rowcount)
+        return result.rowcount
+
     # === Import Log Operations ===
 
     async def get_import_log_by_id(self, log_id: int) -> Optional[CURBImportLog]:
@@ -278,24 +512,19 @@ class CURBRepository:
             stmt = stmt.where(and_(*conditions))
             count_stmt = count_stmt.where(and_(*conditions))
 
-        total_result = await self.db.execute(count_stmt)
-        total_count = total_result.scalar() or 0
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
+        sort_column = CURBImportLog.id
         if filters.sort_by and hasattr(CURBImportLog, filters.sort_by):
             sort_column = getattr(CURBImportLog, filters.sort_by)
-            if filters.sort_order == "asc":
-                stmt = stmt.order_by(asc(sort_column))
-            else:
-                stmt = stmt.order_by(desc(sort_column))
-
-        offset = (filters.page - 1) * filters.per_page
-        stmt = stmt.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order != "asc", CURBImportLog.id)
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
 
         result = await self.db.execute(stmt)
-        logs = result.scalars().all()
+        logs = to_page(result.scalars().all(), order, filters.per_page)
 
         logger.info("Retrieved import logs", count=len(logs), total=total_count)
-        return list(logs), total_count
+        return logs, total_count
     
     async def create_import_log(self, log_data: CURBImportLogCreate) -> CURBImportLog:
         """Create a new import log"""
@@ -330,6 +559,32 @@ class CURBRepository:
         logger.info("Import log updated", log_id=log_id)
         return log
     
+    async def get_completed_shard_keys(self, shard_keys: List[str]) -> set:
+        """
+        Return the subset of shard_keys that already have a finished import,
+        so a resumed backfill can skip them.
+
+        An import that finished is complete even if some of its records were
+        rejected by validation: fetching the shard again would only reject
+        them again. Fetch or import errors roll the import back before
+        import_end is written, so those shards are retried.
+        """
+        if not shard_keys:
+            return set()
+
+        stmt = select(CURBImportLog.shard_key).where(
+            and_(
+                CURBImportLog.shard_key.in_(shard_keys),
+                CURBImportLog.import_end.is_not(None),
+            )
+        ).distinct()
+
+        result = await self.db.execute(stmt)
+        completed = {row[0] for row in result.all()}
+
+        logger.info("Retrieved completed shard keys", requested=len(shard_keys), completed=len(completed))
+        return completed
+
     # === REconciliation Operations ===
 
     async def create_reconciliation(
@@ -360,5 +615,20 @@ class CURBRepository:
 
         logger.info("Reconciliations bulk created", count=len(reconciliations))
         return reconciliations
-    
 
+    async def bulk_insert_reconciliations(self, recon_rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert reconciliation records with a single multi-row core INSERT.
+
+        Unlike bulk_create_reconciliations no ORM objects are built, so this is
+        the path used by batch reconciliation.
+        """
+        if not recon_rows:
+            return 0
+
+        logger.debug("Bulk inserting reconciliations", count=len(recon_rows))
+
+        await self.db.execute(insert(CURBTripReconciliation).values(recon_rows))
+
+        logger.info("Reconciliations bulk inserted", count=len(recon_rows))
+        return len(recon_rows)
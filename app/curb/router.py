@@ -129,6 +129,7 @@ async def list_trips(
     status: Optional[str] = Query(None, description="Comma-separated statuses"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("updated_on", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     curb_service: CURBService = Depends(),
@@ -156,6 +157,7 @@ async def list_trips(
             status=status,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order,
         )
@@ -168,6 +170,7 @@ async def list_trips(
             page=page,
             per_page=per_page,
             total_pages=math.ceil(total_count / per_page) if total_count > 0 else 0,
+            next_cursor=trips.next_cursor,
         )
 
     except CURBBaseException as e:
@@ -437,6 +440,7 @@ async def list_import_logs(
     status: Optional[str] = Query(None, description="Comma-separated statuses"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("import_start", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     curb_service: CURBService = Depends(),
@@ -457,6 +461,7 @@ async def list_import_logs(
             status=status,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order,
         )
@@ -469,6 +474,7 @@ async def list_import_logs(
             page=page,
             per_page=per_page,
             total_pages=math.ceil(total_count / per_page) if total_count > 0 else 0,
+            next_cursor=logs.next_cursor,
         )
 
     except CURBBaseException as e:
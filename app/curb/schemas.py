@@ -107,6 +107,7 @@ class PaginatedCURBTripResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["Imported", "Associated", "Posted", "Failed"]
     payment_types: List[str] = ["T", "P", "C"]
 
@@ -126,7 +127,7 @@ class CURBImportLogBase(BaseModel):
 
 class CURBImportLogCreate(CURBImportLogBase):
     """Schema for creating CURB Import Log."""
-    pass
+    shard_key: Optional[str] = None
 
 
 class CURBImportLogUpdate(BaseModel):
@@ -147,6 +148,7 @@ class CURBImportLogResponse(CURBImportLogBase):
     id: int
     import_start: datetime
     import_end: Optional[datetime] = None
+    shard_key: Optional[str] = None
     error_summary: Optional[str] = None
     created_on: Optional[datetime] = None
     updated_on: Optional[datetime] = None
@@ -161,6 +163,7 @@ class PaginatedCURBImportLogResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["IN_PROGRESS", "COMPLETED", "FAILED", "PARTIAL"]
 
 
@@ -200,6 +203,39 @@ class CURBImportResult(BaseModel):
     failed_rows: Optional[dict] = None
 
 
+class CURBFetchShardResult(BaseModel):
+    """Schema for the outcome of one fetch shard."""
+    shard_key: str
+    status: str  # Imported, Skipped, Failed
+    log_id: Optional[int] = None
+    total_records: int = 0
+    success_count: int = 0
+    duplicate_count: int = 0
+    error: Optional[str] = None
+
+
+class CURBFetchResult(BaseModel):
+    """Schema for a sharded fetch/backfill run."""
+    success: bool
+    total_shards: int
+    imported_shards: int
+    skipped_shards: int
+    failed_shards: int
+    total_records: int
+    success_count: int
+    duplicate_count: int
+    message: str
+    shards: List[CURBFetchShardResult] = []
+
+
+class CURBReconciliationBatchResult(BaseModel):
+    """Schema for the outcome of one reconciliation batch."""
+    batch_number: int
+    trip_ids: List[int]
+    success: bool
+    error: Optional[str] = None
+
+
 class CURBReconciliationResult(BaseModel):
     """Schema for reconciliation operation result."""
     success: bool
@@ -210,6 +246,7 @@ class CURBReconciliationResult(BaseModel):
     recon_stat: int
     message: str
     details: Optional[List[dict]] = None
+    batches: Optional[List[CURBReconciliationBatchResult]] = None
 
 
 class CURBAssociationResult(BaseModel):
@@ -252,6 +289,7 @@ class CURBTripFilters(BaseModel):
     status: Optional[str] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
     sort_by: str = "updated_on"
     sort_order: str = "desc"
 
@@ -266,6 +304,7 @@ class CURBImportLogFilters(BaseModel):
     status: Optional[str] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
     sort_by: str = "import_start"
     sort_order: str = "desc"
 
@@ -5,20 +5,23 @@ Business logic layer for CURB (Taxi fleet) operations.
 Implements complete import, association, reconciliation, and posting logic.
 """
 
+import asyncio
 from datetime import datetime, timezone
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 
+import httpx
+import pandas as pd
 from fastapi import Depends
-from sqlalchemy import select, and_, or_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.db import get_async_db
 from app.curb.repository import CURBRepository
 from app.curb.schemas import (
     CURBTripCreate, CURBTripUpdate, CURBTripFilters,
     CURBImportLogCreate, CURBImportLogUpdate, CURBImportLogFilters,
-    CURBTripReconciliationCreate,
-    CURBImportResult, CURBReconciliationResult,
+    CURBImportResult, CURBReconciliationResult, CURBReconciliationBatchResult,
     CURBPostingResult,
 )
 from app.curb.models import CURBTrip, CURBImportLog
@@ -27,18 +30,25 @@ from app.curb.exceptions import (
     CURBImportException, CURBReconciliationException,
     CURBPostingException, 
 )
-from app.curb.utils import parse_trips_xml, parse_card_transactions_xml
-from app.curb.soap_client import reconcile_trips_on_server
+from app.curb.utils import (
+    iter_trips_xml, iter_card_transactions_xml, chunked, LeaseIntervalIndex,
+)
+from app.curb.soap_client import create_soap_client, reconcile_trips_on_server
+from app.curb.transform import (
+    card_transactions_frame, trips_log_frame, validate_trip_frame, frame_to_rows,
+)
 
-from app.leases.models import Lease
-from app.medallions.models import Medallion
 from app.ledger.models import LedgerBalance
 from app.ledger.schemas import LedgerCategory
+from app.ledger.services import LedgerService
 
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Ledger reference_type of CURB trip earnings; reference_id is the trip id
+CURB_TRIP_REFERENCE_TYPE = "CURB_TRIP"
+
 def get_curb_repository(db: AsyncSession = Depends(get_async_db)) -> CURBRepository:
     """Get CURB repository"""
     return CURBRepository(db)
@@ -95,124 +105,91 @@ class CURBService:
 
     async def import_trips(
         self, xml_data: str, cash_xml_data: Optional[str] = None,
-        import_source: str = "SOAP", import_by: str = "SYSTEM"
+        import_source: str = "SOAP", import_by: str = "SYSTEM",
+        chunk_size: Optional[int] = None, shard_key: Optional[str] = None,
     ) -> CURBImportResult:
         """
         Import trips from XML data
-        
+
+        The XML payloads are stream-parsed and deduplicated/inserted one chunk
+        at a time, so peak memory depends on chunk_size rather than on the
+        size of the imported date range. Each chunk is coerced and validated
+        as a DataFrame (see transform.py); rejected rows count as failures.
+
         Args:
             xml_data: XML data from card transaction API
             cash_xml_data: Optional XML data from trips log (cash trips)
             import_source: Source of import (SOAP, Upload, Manual)
             import_by: User or system performing import
+            chunk_size: Records per parse/insert chunk (defaults to settings.curb_import_chunk_size)
+            shard_key: Optional fetch shard identifier recorded on the import log
 
         Returns:
             CURBImportResult: Result of the import operation
         """
-        logger.info("Starting trip import", source=import_source, by=import_by)
+        chunk_size = chunk_size or settings.curb_import_chunk_size
+        logger.info("Starting trip import", source=import_source, by=import_by, chunk_size=chunk_size)
 
         try:
-            # === Parse XML data ===
-            trips = parse_card_transactions_xml(xml_data)
-            logger.info("Parsed card transactions", count=len(trips))
-
-            # === Merge cash trips if provided ===
-            if cash_xml_data:
-                cash_trips = parse_trips_xml(cash_xml_data)
-                cash_only = [t for t in cash_trips if t.get("payment_type") == "$"]
-                trips.extend(cash_only)
-                logger.info("Merged cash trips", count=len(cash_only), total=len(trips))
-
             # === Create import log ===
             log_data = CURBImportLogCreate(
                 import_source=import_source,
                 import_by=import_by,
-                total_records=len(trips),
+                total_records=0,
                 status="IN_PROGRESS",
+                shard_key=shard_key,
             )
             import_log = await self.repo.create_import_log(log_data)
-            logger.info("Created import log", log_id=import_log.id)
+            import_log_id = import_log.id
+            logger.info("Created import log", log_id=import_log_id)
 
-            # === Check for existing trips ===
-            existing_records_ids = set()
-            stmt = select(CURBTrip.record_id).where(
-                CURBTrip.record_id.in_([t["record_id"] for t in trips if "record_id" in t])
-            )
-            result = await self.repo.db.execute(stmt)
-            existing_record_ids = {row[0] for row in result.all()}
-
-            # === Prepare new trips ===
-            new_trips_data = []
+            total_records = 0
+            success_count = 0
             duplicate_count = 0
-
-            for trip_dict in trips:
-                record_id = trip_dict.get("record_id")
-
-                if record_id in existing_record_ids:
-                    duplicate_count += 1
-                    logger.debug("Duplicate trip skipped", record_id=record_id)
-                    continue
-
-                # === Create trip data ===
-                try:
-                    trip_create = CURBTripCreate(
-                        record_id=record_id,
-                        period=trip_dict.get("period"),
-                        trip_number=trip_dict.get("trip_number"),
-                        cab_number=trip_dict.get("cab_number"),
-                        driver_id=trip_dict.get("driver_id"),
-                        start_date=trip_dict.get("start_date"),
-                        end_date=trip_dict.get("end_date"),
-                        start_time=trip_dict.get("start_time"),
-                        end_time=trip_dict.get("end_time"),
-                        trip_amount=trip_dict.get("trip_amount", 0.0),
-                        tips=trip_dict.get("tips", 0.0),
-                        extras=trip_dict.get("extras", 0.0),
-                        tolls=trip_dict.get("tolls", 0.0),
-                        tax=trip_dict.get("tax", 0.0),
-                        imp_tax=trip_dict.get("imp_tax", 0.0),
-                        total_amount=trip_dict.get("total_amount", 0.0),
-                        gps_start_lat=trip_dict.get("gps_start_lat"),
-                        gps_start_lon=trip_dict.get("gps_start_lon"),
-                        gps_end_lat=trip_dict.get("gps_end_lat"),
-                        gps_end_lon=trip_dict.get("gps_end_lon"),
-                        from_address=trip_dict.get("from_address"),
-                        to_address=trip_dict.get("to_address"),
-                        payment_type=trip_dict.get("payment_type", "T"),
-                        cc_number=trip_dict.get("cc_number"),
-                        auth_code=trip_dict.get("auth_code"),
-                        auth_amount=trip_dict.get("auth_amount", 0.0),
-                        ehail_fee=trip_dict.get("ehail_fee", 0.0),
-                        health_fee=trip_dict.get("health_fee", 0.0),
-                        congestion_fee=trip_dict.get("congestion_fee", 0.0),
-                        airport_fee=trip_dict.get("airport_fee", 0.0),
-                        cbdt_fee=trip_dict.get("cbdt_fee", 0.0),
-                        passengers=trip_dict.get("passengers", 1),
-                        distance_service=trip_dict.get("distance_service", 0.0),
-                        distance_bs=trip_dict.get("distance_bs", 0.0),
-                        reservation_number=trip_dict.get("reservation_number"),
-                        import_id=import_log.id,
+            rejected_count = 0
+            seen_keys = set()
+
+            # === Validate, dedupe and insert chunk by chunk ===
+            for chunk_no, frame in enumerate(
+                self._iter_trip_frames(xml_data, cash_xml_data, chunk_size), start=1
+            ):
+                total_records += len(frame)
+                valid, errors = validate_trip_frame(frame, import_log_id)
+                rejected_count += len(errors)
+                if not errors.empty:
+                    logger.warning(
+                        "Rejected invalid trips",
+                        log_id=import_log_id,
+                        chunk=chunk_no,
+                        count=len(errors),
+                        reasons=errors["error"].value_counts().to_dict(),
                     )
-                    new_trips_data.append(trip_create)
-                except Exception as e:
-                    logger.error("Failed to create trip data", record_id=record_id, error=str(e))
-                    continue
 
-            # === Bulk insert new trips ===
-            success_count = 0
-            if new_trips_data:
-                created_trips = await self.repo.bulk_create_trips(new_trips_data)
-                success_count = len(created_trips)
-                logger.info("Trips inserted", count=success_count)
+                inserted, duplicates = await self._import_trip_rows(frame_to_rows(valid), seen_keys)
+                success_count += inserted
+                duplicate_count += duplicates
+
+                logger.info(
+                    "Imported trip chunk",
+                    log_id=import_log_id,
+                    chunk=chunk_no,
+                    size=len(frame),
+                    inserted=inserted,
+                    duplicates=duplicates,
+                    rejected=len(errors),
+                )
+
+            failure_count = total_records - success_count - duplicate_count
 
             # === Update import log ===
             await self.repo.update_import_log(
-                import_log.id,
+                import_log_id,
                 CURBImportLogUpdate(
                     import_end=datetime.now(timezone.utc),
+                    total_records=total_records,
                     success_count=success_count,
                     duplicate_count=duplicate_count,
-                    failure_count=len(trips) - success_count - duplicate_count,
+                    failure_count=failure_count,
                     status="COMPLETED" if success_count > 0 else "FAILED"
                 )
             )
@@ -222,50 +199,93 @@ class CURBService:
 
             logger.info(
                 "Import completed",
-                log_id=import_log.id,
-                total=len(trips),
+                log_id=import_log_id,
+                total=total_records,
                 success=success_count,
                 duplicates=duplicate_count,
             )
 
             return CURBImportResult(
                 success=True,
-                log_id=import_log.id,
-                total_records=len(trips),
+                log_id=import_log_id,
+                total_records=total_records,
                 success_count=success_count,
                 duplicate_count=duplicate_count,
-                failure_count=len(trips) - success_count - duplicate_count,
+                failure_count=failure_count,
                 message=f"Successfully imported {success_count} trips {duplicate_count} duplicates skipped"
             )
         except Exception as e:
             logger.error("Import failed", error=str(e), exc_info=True)
             await self.repo.db.rollback()
             raise CURBImportException(str(e)) from e
-        
+
+    def _iter_trip_frames(
+        self, xml_data: str, cash_xml_data: Optional[str], chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield normalized trip frames in chunks: card transactions first,
+        then cash-only trips from the trips log.
+        """
+        for records in iter_card_transactions_xml(xml_data, chunk_size=chunk_size, raw=True):
+            yield card_transactions_frame(records)
+
+        if cash_xml_data:
+            for records in iter_trips_xml(cash_xml_data, chunk_size=chunk_size, raw=True):
+                frame = trips_log_frame(records)
+                cash_only = frame[frame["payment_type"] == "$"]
+                if not cash_only.empty:
+                    yield cash_only
+
+    async def _import_trip_rows(
+        self, trip_rows: List[dict], seen: set
+    ) -> Tuple[int, int]:
+        """
+        Insert one chunk of validated trip rows, skipping ones already imported.
+
+        Repeats of a (record_id, period) key earlier in the same import are
+        dropped in memory via `seen`; the rest go out as one multi-row INSERT
+        that leaves already stored trips alone (see insert_new_trips).
+
+        Returns:
+            Tuple of (inserted count, duplicate count)
+        """
+        if not trip_rows:
+            return 0, 0
+
+        new_rows = []
+        for row in trip_rows:
+            key = (row["record_id"], row["period"] or "")
+            if key in seen:
+                logger.debug("Duplicate trip in payload skipped", record_id=row["record_id"])
+                continue
+            seen.add(key)
+            new_rows.append(row)
+
+        inserted = await self.repo.insert_new_trips(new_rows)
+        return inserted, len(trip_rows) - inserted
+
     # === Reconciliation Operations ===
 
     async def reconcile_trips_locally(
         self,
         trip_ids: Optional[List[int]] = None,
         recon_stat: Optional[int] = None,
-        recon_by: str = "SYSTEM"
+        recon_by: str = "SYSTEM",
+        batch_size: Optional[int] = None,
     ) -> CURBReconciliationResult:
         """
         Reconcile trips locally in the database.
         For dev/uat: marks trips as reconciled without calling CURB API.
+
+        Trips are marked with one UPDATE and one multi-row reconciliation
+        INSERT per batch of batch_size trips.
         """
-        logger.info("Starting local reconciliation", trip_ids=trip_ids, recon_stat=recon_stat)
+        batch_size = batch_size or settings.curb_reconcile_batch_size
+        logger.info("Starting local reconciliation", trip_count=len(trip_ids or []), recon_stat=recon_stat)
 
         try:
             # === Get trips to reconcile ===
-            if trip_ids:
-                trips = []
-                for trip_id in trip_ids:
-                    trip = await self.repo.get_trip_by_id(trip_id)
-                    if trip:
-                        trips.append(trip)
-            else:
-                trips = await self.repo.get_unreconciled_trips()
+            trips = await self._get_recon_candidates(trip_ids, batch_size)
 
             if not trips:
                 logger.info("No trips to reconcile")
@@ -278,52 +298,23 @@ class CURBService:
                     recon_stat=recon_stat or 0,
                     message="No trips to reconcile"
                 )
-            
+
             # === Generate recon stat if not provided ===
             if not recon_stat:
                 recon_stat = int(datetime.now(timezone.utc).timestamp())
 
-            # === Process trips ===
-            reconciled_count = 0
-            already_reconciled = 0
-            failed_count = 0
-            reconciliations_to_create = []
+            pending = [t for t in trips if not t.is_reconciled]
+            already_reconciled = len(trips) - len(pending)
 
-            for trip in trips:
-                if trip.is_reconciled:
-                    already_reconciled += 1
-                    logger.debug("Trip already reconciled", trip_id=trip.id)
-                    continue
-
-                try:
-                    # === Update trip status ===
-                    await self.repo.update_trip(
-                        trip.id,
-                        CURBTripUpdate(
-                            is_reconciled=True,
-                            recon_stat=recon_stat,
-                            status="Reconciled"
-                        )
-                    )
-
-                    # === Create reconciliation record ===
-                    reconciliations_to_create.append(
-                        CURBTripReconciliationCreate(
-                            trip_id=trip.id,
-                            recon_stat=recon_stat,
-                            reconciled_by=recon_by,
-                            reconciliation_type="LOCAL"
-                        )
-                    )
-                    reconiled_count += 1
-
-                except Exception as e:
-                    logger.error("Failed to reconcile trip", trip_id=trip.id, error=str(e))
-                    failed_count += 1
-
-            # === Bulk create reconciliation records ===
-            if reconciliations_to_create:
-                await self.repo.bulk_create_reconciliations(reconciliations_to_create)
+            # === Mark trips reconciled batch by batch ===
+            batches = []
+            for batch_number, batch in enumerate(chunked(pending, batch_size), start=1):
+                await self._mark_batch_reconciled(batch, recon_stat, recon_by)
+                batches.append(CURBReconciliationBatchResult(
+                    batch_number=batch_number,
+                    trip_ids=[t.id for t in batch],
+                    success=True,
+                ))
 
             # === Commit transaction ===
             await self.repo.db.commit()
@@ -331,81 +322,86 @@ class CURBService:
             logger.info(
                 "Local reconciliation completed",
                 total=len(trips),
-                reconciled_count=reconciled_count,
+                reconciled_count=len(pending),
                 already_reconciled_count=already_reconciled,
-                failed_count=failed_count,
+                batches=len(batches),
                 recon_stat=recon_stat,
-                message=f"Successfully reconciled {reconciled_count} trips locally"
+            )
+
+            return CURBReconciliationResult(
+                success=True,
+                total_processed=len(trips),
+                reconciled_count=len(pending),
+                already_reconciled_count=already_reconciled,
+                failed_count=0,
+                recon_stat=recon_stat,
+                message=f"Successfully reconciled {len(pending)} trips locally",
+                batches=batches,
             )
 
         except Exception as e:
             logger.error("Local reconciliation failed", error=str(e), exc_info=True)
             await self.repo.db.rollback()
             raise CURBReconciliationException(str(e)) from e
-        
+
     async def reconcile_trips_on_server(
-        self, trip_ids: List[int], recon_stat: int, recon_by: str = "SYSTEM"
+        self,
+        trip_ids: List[int],
+        recon_stat: int,
+        recon_by: str = "SYSTEM",
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ) -> CURBReconciliationResult:
         """
         Reconcile trips on CURB server via SOAP API.
         For production: calls CURB API to mark trips as reconciled.
+
+        Record IDs are sent in batches of batch_size with at most `concurrency`
+        SOAP calls in flight. Only batches the server accepted are marked
+        reconciled locally; failed batches are reported in `batches` with
+        their trip IDs so they can be retried.
         """
-        logger.info("Starting server reconciliation", trip_ids=trip_ids, recon_stat=recon_stat)
+        batch_size = batch_size or settings.curb_reconcile_batch_size
+        concurrency = concurrency or settings.curb_reconcile_concurrency
+        logger.info("Starting server reconciliation", trip_count=len(trip_ids), recon_stat=recon_stat)
 
         try:
             # === Get trips ===
-            trips = []
-            for trip_id in trip_ids:
-                trip = await self.repo.get_trip_by_id(trip_id)
-                if trip:
-                    trips.append(trip)
+            trips = await self._get_recon_candidates(trip_ids, batch_size)
 
             if not trips:
                 raise CURBReconciliationException("No valid trips found")
-            
-            # === Extract record IDs ===
-            record_ids = [trip.record_id for trip in trips]
-
-            # === Call CURB API to reconcile on server ===
-            try:
-                reconcile_trips_on_server(record_ids, recon_stat)
-                logger.info("Server reconciliation API call succeeded")
-            except Exception as e:
-                logger.error("Server reconciliation API call failed", error=str(e))
-                raise CURBReconciliationException(f"CURB API call failed: {str(e)}") from e
-            
-            # === Update trips locally after successful API call ===
-            reconciled_count = 0
-            failed_count = 0
-            reconciliations_to_create = []
 
-            for trip in trips:
-                try:
-                    await self.repo.update_trip(
-                        trip.id,
-                        CURBTripUpdate(
-                            is_reconciled=True,
-                            recon_stat=recon_stat,
-                            status="Reconciled"
-                        )
-                    )
+            pending = [t for t in trips if not t.is_reconciled]
+            already_reconciled = len(trips) - len(pending)
+            trip_batches = list(chunked(pending, batch_size))
 
-                    reconciliations_to_create.append(
-                        CURBTripReconciliationCreate(
-                            trip_id=trip.id,
-                            recon_stat=recon_stat,
-                            reconciled_by=recon_by,
-                            reconciliation_type="REMOTE"
-                        )
-                    )
-                    reconciled_count += 1
-                except Exception as e:
-                    logger.error("Failed to update trip after reconciliation", trip_id=trip.id, error=str(e))
-                    failed_count += 1
+            # === Call CURB API to reconcile on server, batch by batch ===
+            errors = await self._reconcile_batches_on_server(trip_batches, recon_stat, concurrency)
 
-            # === Bulk create reconciliation records ===
-            if reconciliations_to_create:
-                await self.repo.bulk_create_reconciliations(reconciliations_to_create)
+            # === Update trips locally for every accepted batch ===
+            reconciled_count = 0
+            failed_count = 0
+            batches = []
+
+            for batch_number, (batch, error) in enumerate(zip(trip_batches, errors), start=1):
+                if error is None:
+                    await self._mark_batch_reconciled(batch, recon_stat, recon_by)
+                    reconciled_count += len(batch)
+                else:
+                    failed_count += len(batch)
+
+                batches.append(CURBReconciliationBatchResult(
+                    batch_number=batch_number,
+                    trip_ids=[t.id for t in batch],
+                    success=error is None,
+                    error=error,
+                ))
+
+            if trip_batches and not reconciled_count:
+                raise CURBReconciliationException(
+                    f"CURB API call failed for all {len(trip_batches)} batches: {errors[0]}"
+                )
 
             # === Commit transaction ===
             await self.repo.db.commit()
@@ -413,19 +409,25 @@ class CURBService:
             logger.info(
                 "Server reconciliation completed",
                 reconciled=reconciled_count,
-                failed=failed_count
+                failed=failed_count,
+                batches=len(batches),
             )
 
             return CURBReconciliationResult(
-                success=True,
+                success=failed_count == 0,
                 total_processed=len(trips),
                 reconciled_count=reconciled_count,
-                already_reconciled_count=0,
+                already_reconciled_count=already_reconciled,
                 failed_count=failed_count,
                 recon_stat=recon_stat,
-                message=f"Successfully reconciled {reconciled_count} trips on server"
+                message=(
+                    f"Successfully reconciled {reconciled_count} trips on server"
+                    if not failed_count else
+                    f"Reconciled {reconciled_count} trips on server, {failed_count} trips in failed batches"
+                ),
+                batches=batches,
             )
-        
+
         except Exception as e:
             logger.error("Server reconciliation failed", error=str(e), exc_info=True)
             await self.repo.db.rollback()
@@ -433,23 +435,120 @@ class CURBService:
                 raise
             raise CURBReconciliationException(str(e)) from e
 
+    async def _get_recon_candidates(
+        self, trip_ids: Optional[List[int]], batch_size: int
+    ) -> List[Row]:
+        """Load (id, record_id, is_reconciled) rows for trip_ids, or all unreconciled trips"""
+        if not trip_ids:
+            return await self.repo.get_unreconciled_trip_keys()
+
+        trips = []
+        for ids in chunked(list(dict.fromkeys(trip_ids)), batch_size):
+            trips.extend(await self.repo.get_trip_recon_keys(ids))
+        return trips
+
+    async def _mark_batch_reconciled(
+        self, batch: List[Row], recon_stat: int, recon_by: str
+    ) -> None:
+        """Mark one batch reconciled with a single UPDATE and a single multi-row INSERT"""
+        batch_ids = [t.id for t in batch]
+
+        await self.repo.update_trips_by_ids(
+            batch_ids,
+            {"is_reconciled": True, "recon_stat": recon_stat, "status": "Reconciled"},
+        )
+
+        reconciled_at = datetime.now(timezone.utc)
+        await self.repo.bulk_insert_reconciliations([
+            {
+                "trip_id": trip_id,
+                "recon_stat": recon_stat,
+                "reconciled_by": recon_by,
+                "reconciled_at": reconciled_at,
+            }
+            for trip_id in batch_ids
+        ])
+
+    async def _reconcile_batches_on_server(
+        self, trip_batches: List[List[Row]], recon_stat: int, concurrency: int
+    ) -> List[Optional[str]]:
+        """
+        Send each batch's record IDs to CURB with bounded concurrency.
+
+        Returns:
+            One entry per batch: None on success, the error message on failure
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def reconcile_batch(
+            client: httpx.AsyncClient, batch_number: int, batch: List[Row]
+        ) -> Optional[str]:
+            async with semaphore:
+                try:
+                    await reconcile_trips_on_server(
+                        [t.record_id for t in batch], recon_stat, client=client
+                    )
+                    logger.info("Server reconciliation batch succeeded", batch=batch_number, size=len(batch))
+                    return None
+                except Exception as e:
+                    logger.error(
+                        "Server reconciliation batch failed",
+                        batch=batch_number, size=len(batch), error=str(e)
+                    )
+                    return str(e)
+
+        async with create_soap_client(max_connections=concurrency) as client:
+            return list(await asyncio.gather(
+                *(reconcile_batch(client, n, b) for n, b in enumerate(trip_batches, start=1))
+            ))
+
     # === Association and Posting Operations ===
 
     async def associate_and_post_trips(
         self,
-        posted_by: str = "SYSTEM"
+        posted_by: str = "SYSTEM",
+        batch_size: Optional[int] = None,
     ) -> CURBPostingResult:
         """
         Associate trips with leases and post to ledger.
         Processes reconciled but unposted trips.
+
+        Trips are walked in id-ordered batches. For each batch every candidate
+        lease is loaded in one query, all trips are resolved in memory through
+        a LeaseIntervalIndex, earnings postings are created with one
+        multi-row INSERT, and results are written with one UPDATE per
+        outcome group (posted, skipped, failed).
         """
-        logger.info("Starting trip association and posting")
+        batch_size = batch_size or settings.curb_association_batch_size
+        logger.info("Starting trip association and posting", batch_size=batch_size)
 
         try:
-            # === Get reconciled but unposted trips ===
-            trips = await self.repo.get_reconciled_unposted_trips()
+            total_processed = 0
+            posted_count = 0
+            failed_count = 0
+            skipped_count = 0
+            details = []
+            last_id = 0
 
-            if not trips:
+            while True:
+                # === Get next batch of reconciled but unposted trips ===
+                trips = await self.repo.get_reconciled_unposted_trip_keys(
+                    after_id=last_id, limit=batch_size
+                )
+                if not trips:
+                    break
+
+                last_id = trips[-1].id
+                total_processed += len(trips)
+
+                posted, skipped, failed = await self._associate_trip_batch(trips)
+                posted_count += posted
+                skipped_count += len(skipped)
+                failed_count += len(failed)
+                details.extend(skipped)
+                details.extend(failed)
+
+            if not total_processed:
                 logger.info("No trips to post")
                 return CURBPostingResult(
                     success=True,
@@ -459,76 +558,13 @@ class CURBService:
                     skipped_count=0,
                     message="No trips to post"
                 )
-            
-            posted_count = 0
-            failed_count = 0
-            skipped_count = 0
-            details = []
-
-            for trip in trips:
-                try:
-                    # === Find active lease for the driver and medallion on trip date ===
-                    lease = await self.find_active_lease_for_trip(trip)
-                    if not lease:
-                        skipped_count += 1
-                        details.append(f"Trip {trip.id} skipped: No active lease found")
-                        logger.debug("No active lease found for trip", trip_id=trip.id)
-                        continue
-
-                    # === Create ledger entry ===
-                    # TODO: Implement actual ledger posting logic here
-                    # ledger_entry = LedgerEntry(
-                    #     lease_id=lease.id,
-                    #     vehicle_id=lease.vehicle_id,
-                    #     medallion_id=lease.medallion_id,
-                    #     entry_date=trip.start_date,
-                    #     amount=trip.total_amount,
-                    #     description=f"CURB Trip {trip.trip_number} on {trip.start_date}",
-                    #     source_type=LedgerSourceType.CURB,
-                    #     source_id=trip.id,
-                    #     created_by=posted_by
-                    # )
-                    # self.repo.db.add(ledger_entry)
-                    # await self.repo.db.flush()
-                    # posted_count += 1
-                    # details.append(f"Trip {trip.id} posted successfully")
-                    # logger.debug("Trip posted successfully", trip_id=trip.id, ledger_id=ledger_entry.id)
-
-                    # === Update trip status ===
-                    await self.repo.update_trip(
-                        trip.id,
-                        CURBTripUpdate(
-                            is_posted=True,
-                            status="Posted"
-                        )
-                    )
-
-                    posted_count += 1
-
-                except Exception as e:
-                    logger.error("Failed to post trip", trip_id=trip.id, error=str(e))
-
-                    await self.repo.update_trip(
-                        trip.id,
-                        CURBTripUpdate(
-                            status="Failed",
-                            post_failed_reason=str(e)
-                        )
-                    )
-
-                    failed_count += 1
-                    details.append({
-                        "trip_id": trip.id,
-                        "record_id": trip.record_id,
-                        "error": str(e)
-                    })
 
             # === Commit transaction ===
             await self.repo.db.commit()
 
             logger.info(
                 "Posting completed",
-                total=len(trips),
+                total=total_processed,
                 posted=posted_count,
                 failed=failed_count,
                 skipped=skipped_count,
@@ -536,19 +572,116 @@ class CURBService:
 
             return CURBPostingResult(
                 success=True,
-                total_processed=len(trips),
+                total_processed=total_processed,
                 posted_count=posted_count,
                 failed_count=failed_count,
                 skipped_count=skipped_count,
                 message=f"Successfully posted {posted_count} trips to ledger",
                 details=details if details else None
             )
-        
+
         except Exception as e:
             logger.error("Posting failed", error=str(e), exc_info=True)
             await self.repo.db.rollback()
             raise CURBPostingException(str(e)) from e
 
+    async def _associate_trip_batch(
+        self, trips: List[Row]
+    ) -> Tuple[int, List[dict], List[dict]]:
+        """
+        Resolve lease associations for one batch of trip key rows, credit
+        each posted trip's total_amount to the driver as Earnings, and write
+        the trip updates.
+
+        Returns:
+            Tuple of (posted count, skipped details, failed details)
+        """
+        resolvable = [t for t in trips if t.driver_id and t.cab_number and t.start_date]
+        invalid = [t for t in trips if not (t.driver_id and t.cab_number and t.start_date)]
+
+        # === Load every candidate lease for the batch in one query ===
+        index = LeaseIntervalIndex([])
+        if resolvable:
+            leases = await self.repo.get_candidate_leases(
+                cab_numbers=(t.cab_number for t in resolvable),
+                driver_ids=(t.driver_id for t in resolvable),
+                date_from=min(t.start_date for t in resolvable),
+                date_to=max(t.start_date for t in resolvable),
+            )
+            index = LeaseIntervalIndex(leases)
+            logger.debug("Built lease interval index", trips=len(resolvable), leases=len(index))
+
+        # === Resolve all trips in memory ===
+        posted_rows = []
+        earnings = []
+        skipped = []
+        for trip in resolvable:
+            lease = index.resolve(trip.driver_id, trip.cab_number, trip.start_date)
+            if not lease:
+                skipped.append({
+                    "trip_id": trip.id,
+                    "record_id": trip.record_id,
+                    "reason": "No active lease found",
+                })
+                continue
+
+            if trip.total_amount and trip.total_amount > 0:
+                earnings.append({
+                    "reference_id": str(trip.id),
+                    "amount": trip.total_amount,
+                    "driver_id": lease.driver_pk,
+                    "vehicle_id": lease.vehicle_id,
+                    "medallion_id": lease.medallion_id,
+                    "lease_id": lease.lease_id,
+                    "transaction_date": trip.start_date,
+                    "description": f"CURB Trip {trip.trip_number} on {trip.start_date}",
+                })
+            posted_rows.append({
+                "id": trip.id,
+                "is_posted": True,
+                "status": "Posted",
+                "driver_fk": lease.driver_pk,
+                "medallion_fk": lease.medallion_id,
+                "vehicle_fk": lease.vehicle_id,
+                "associate_failed_reason": None,
+            })
+
+        failed = [
+            {
+                "trip_id": trip.id,
+                "record_id": trip.record_id,
+                "error": "Trip is missing driver ID, cab number or start date",
+            }
+            for trip in invalid
+        ]
+
+        # === Post the batch's earnings with one multi-row INSERT ===
+        # Trips posted by an earlier, interrupted run are skipped by the
+        # ledger; the trip updates below land in the same transaction.
+        await LedgerService(self.repo.db).create_earnings_postings_batch(
+            CURB_TRIP_REFERENCE_TYPE, earnings
+        )
+
+        # === Write one UPDATE per outcome group ===
+        await self.repo.bulk_update_trips(posted_rows)
+        await self.repo.update_trips_by_ids(
+            [d["trip_id"] for d in skipped],
+            {"associate_failed_reason": "No active lease found"},
+        )
+        await self.repo.update_trips_by_ids(
+            [d["trip_id"] for d in failed],
+            {"status": "Failed", "post_failed_reason": "Trip is missing driver ID, cab number or start date"},
+        )
+
+        logger.info(
+            "Associated trip batch",
+            size=len(trips),
+            posted=len(posted_rows),
+            skipped=len(skipped),
+            failed=len(failed),
+        )
+        return len(posted_rows), skipped, failed
+
     # === Import logs operation ===
 
     async def get_import_log_by_id(self, log_id: int) -> CURBImportLog:
@@ -575,23 +708,16 @@ class CURBService:
 
     # === Helper Functions ===
 
-    async def find_active_lease_for_trip(self,trip: CURBTrip) -> Optional[Lease]:
+    async def find_active_lease_for_trip(self, trip: CURBTrip) -> Optional[Row]:
         """
         Find an active lease for the driver and medallion on the trip date.
         """
-        stmt = select(Lease).where(
-            and_(
-                Lease.driver_id == trip.driver_id,
-                Lease.medallion.has(Medallion.medallion_number == trip.cab_number),
-                Lease.start_date <= trip.start_date,
-                or_(Lease.end_date == None, Lease.end_date >= trip.start_date),
-                Lease.lease_status == "Active"
-            )
-        ).order_by(Lease.start_date.desc())
-
-        result = await self.repo.db.execute(stmt)
-        lease = result.scalars().first()
-        return lease
-
-                
-
+        leases = await self.repo.get_candidate_leases(
+            cab_numbers=[trip.cab_number],
+            driver_ids=[trip.driver_id],
+            date_from=trip.start_date,
+            date_to=trip.start_date,
+        )
+        return LeaseIntervalIndex(leases).resolve(
+            trip.driver_id, trip.cab_number, trip.start_date
+        )
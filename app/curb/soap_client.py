@@ -6,6 +6,8 @@ Async SOAP Client for CURB API
 This module provides async SOAP client functions for interacting with the CURB Taxi Fleet API.
 """
 
+from typing import Optional
+
 import httpx
 from lxml import etree
 
@@ -19,12 +21,50 @@ logger = get_logger(__name__)
 SOAP_TIMEOUT = 30.0
 
 
+def create_soap_client(max_connections: int = 10) -> httpx.AsyncClient:
+    """
+    Create a keep-alive HTTP client to share across many SOAP calls.
+
+    Pass the returned client to the fetch/reconcile functions so concurrent
+    calls reuse pooled connections instead of opening a new one per call.
+    The caller owns the client and must close it (use `async with`).
+
+    Args:
+        max_connections: Upper bound on pooled connections to the CURB host
+
+    Returns:
+        httpx.AsyncClient configured for the CURB API
+    """
+    return httpx.AsyncClient(
+        timeout=SOAP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
+async def _post_soap(
+    headers: dict, body: str, client: Optional[httpx.AsyncClient] = None
+) -> httpx.Response:
+    """POST a SOAP envelope, using the shared client when one is given"""
+    if client is not None:
+        response = await client.post(settings.curb_url, headers=headers, content=body)
+    else:
+        async with httpx.AsyncClient(timeout=SOAP_TIMEOUT) as one_off_client:
+            response = await one_off_client.post(settings.curb_url, headers=headers, content=body)
+
+    response.raise_for_status()
+    return response
+
+
 async def fetch_trips_log10(
     from_date: str,
     to_date: str,
     recon_stat: int = -1,
     cab_number: str = "",
-    driver_id: str = ""
+    driver_id: str = "",
+    client: Optional[httpx.AsyncClient] = None,
 ) -> str:
     """
     Fetch trips from CURB API using GET_TRIPS_LOG10 method.
@@ -35,6 +75,7 @@ async def fetch_trips_log10(
         recon_stat: Reconciliation status filter (-1=all, 0=unreconciled, >0=specific)
         cab_number: Optional cab number filter
         driver_id: Optional driver ID filter
+        client: Optional shared client from create_soap_client
         
     Returns:
         XML string containing trip data
@@ -73,13 +114,7 @@ async def fetch_trips_log10(
     </soap:Envelope>"""
 
     try:
-        async with httpx.AsyncClient(timeout=SOAP_TIMEOUT) as client:
-            response = await client.post(
-                settings.curb_url,
-                headers=headers,
-                content=body
-            )
-            response.raise_for_status()
+        response = await _post_soap(headers, body, client)
 
         tree = etree.fromstring(response.content)
         result = tree.find('.//{https://www.taxitronic.org/VTS_SERVICE/}GET_TRIPS_LOG10Result')
@@ -104,7 +139,8 @@ async def fetch_trans_by_date_cab12(
     from_datetime: str,
     to_datetime: str,
     cab_number: str = "",
-    tran_type: str = "ALL"
+    tran_type: str = "ALL",
+    client: Optional[httpx.AsyncClient] = None,
 ) -> str:
     """
     Fetch card transactions using Get_Trans_By_Date_Cab12 method.
@@ -114,6 +150,7 @@ async def fetch_trans_by_date_cab12(
         to_datetime: End datetime in MM/DD/YYYY format
         cab_number: Optional cab number filter
         tran_type: Transaction type (AP=Approved, DC=Declined, ALL=All)
+        client: Optional shared client from create_soap_client
         
     Returns:
         XML string containing transaction data
@@ -151,13 +188,7 @@ async def fetch_trans_by_date_cab12(
     </soap:Envelope>"""
 
     try:
-        async with httpx.AsyncClient(timeout=SOAP_TIMEOUT) as client:
-            response = await client.post(
-                settings.curb_url,
-                headers=headers,
-                content=body
-            )
-            response.raise_for_status()
+        response = await _post_soap(headers, body, client)
 
         tree = etree.fromstring(response.content)
         result_node = tree.find('.//{https://www.taxitronic.org/VTS_SERVICE/}Get_Trans_By_Date_Cab12Result')
@@ -180,7 +211,8 @@ async def fetch_trans_by_date_cab12(
 
 async def reconcile_trips_on_server(
     record_ids: list[str],
-    recon_stat: int
+    recon_stat: int,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> bool:
     """
     Reconcile trips on CURB server using Reconciliation_TRIP_LOG method.
@@ -188,6 +220,7 @@ async def reconcile_trips_on_server(
     Args:
         record_ids: List of trip record IDs to reconcile
         recon_stat: Reconciliation receipt number (must be positive)
+        client: Optional shared client from create_soap_client
         
     Returns:
         True if successful
@@ -229,13 +262,7 @@ async def reconcile_trips_on_server(
     </soap:Envelope>"""
 
     try:
-        async with httpx.AsyncClient(timeout=SOAP_TIMEOUT) as client:
-            response = await client.post(
-                settings.curb_url,
-                headers=headers,
-                content=body
-            )
-            response.raise_for_status()
+        response = await _post_soap(headers, body, client)
 
         logger.info("Trips reconciled on server successfully", count=len(record_ids))
         return True
@@ -7,6 +7,7 @@ This module contains all Celery tasks for automated CURB trip processing.
 Tasks are scheduled via Celery Beat and can also be triggered manually.
 """
 
+import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -15,9 +16,10 @@ from celery import shared_task
 from app.utils.logger import get_logger
 from app.core.db import get_async_db
 from app.core.config import settings
-from app.curb.soap_client import fetch_trips_log10, fetch_trans_by_date_cab12
+from app.curb.fetcher import CURBFetchOrchestrator, build_fetch_shards
 from app.curb.services import CURBService
 from app.curb.repository import CURBRepository
+from app.curb.schemas import CURBFetchResult
 
 logger = get_logger(__name__)
 
@@ -28,9 +30,8 @@ def fetch_and_import_curb_trips(self):
     Fetch and import CURB trips from the API for the last 24 hours.
     
     This task runs every 24 hours and:
-    1. Fetches card transactions from the last 24 hours
-    2. Fetches cash trips from the last 24 hours
-    3. Imports new trips into the database
+    1. Fetches card transactions and cash trips concurrently
+    2. Imports new trips into the database as soon as they arrive
     
     Note: This task only imports trips. Reconciliation and posting are separate tasks.
     """
@@ -39,51 +40,23 @@ def fetch_and_import_curb_trips(self):
 
     try:
         # Calculate date range (last 24 hours)
-        to_date = datetime.now(timezone.utc)
+        to_date = datetime.now(timezone.utc).date()
         from_date = to_date - timedelta(days=1)
 
-        from_date_str = from_date.strftime('%m/%d/%Y')
-        to_date_str = to_date.strftime('%m/%d/%Y')
-
         logger.info(
             "[Task ID: %s] Fetching trips from %s to %s",
-            task_id, from_date_str, to_date_str
+            task_id, from_date, to_date
+        )
+
+        shards = build_fetch_shards(from_date, to_date)
+        fetch_result = asyncio.run(
+            CURBFetchOrchestrator(import_source="SOAP", import_by="SYSTEM").run(shards)
         )
 
-        # Fetch card transactions
-        try:
-            card_xml = fetch_trans_by_date_cab12(
-                from_datetime=from_date_str,
-                to_datetime=to_date_str,
-                cab_number="",
-                tran_type="ALL"
-            )
-            logger.info("[Task ID: %s] Card transactions fetched", task_id)
-        except Exception as e:
-            logger.error(
-                "[Task ID: %s] Failed to fetch card transactions: %s",
-                task_id, str(e), exc_info=True
-            )
-            card_xml = ""
-
-        # Fetch cash trips
-        try:
-            cash_xml = fetch_trips_log10(
-                from_date=from_date_str,
-                to_date=to_date_str,
-                recon_stat=-1,  # Get all trips
-                cab_number="",
-                driver_id=""
-            )
-            logger.info("[Task ID: %s] Cash trips fetched", task_id)
-        except Exception as e:
-            logger.error(
-                "[Task ID: %s] Failed to fetch cash trips: %s",
-                task_id, str(e), exc_info=True
-            )
-            cash_xml = ""
-
-        if not card_xml and not cash_xml:
+        if fetch_result.failed_shards == fetch_result.total_shards:
+            raise RuntimeError(f"CURB fetch failed: {fetch_result.message}")
+
+        if not fetch_result.total_records and not fetch_result.skipped_shards:
             logger.warning("[Task ID: %s] No trip data retrieved", task_id)
             return {
                 "status": "no_data",
@@ -91,46 +64,18 @@ def fetch_and_import_curb_trips(self):
                 "message": "No trip data available for the specified period"
             }
 
-        # Import trips using async service
-        import asyncio
-        
-        async def import_trips_async():
-            async for db in get_async_db():
-                try:
-                    repo = CURBRepository(db)
-                    service = CURBService(repo)
-                    
-                    result = await service.import_trips(
-                        xml_data=card_xml,
-                        cash_xml_data=cash_xml,
-                        import_source="SOAP",
-                        import_by="SYSTEM"
-                    )
-                    
-                    return result
-                finally:
-                    await db.close()
-
-        import_result = asyncio.run(import_trips_async())
-
         logger.info(
             "[Task ID: %s] Import completed: %d total, %d imported, %d duplicates",
             task_id,
-            import_result.total_records,
-            import_result.success_count,
-            import_result.duplicate_count
+            fetch_result.total_records,
+            fetch_result.success_count,
+            fetch_result.duplicate_count
         )
 
         return {
             "status": "success",
             "task_id": task_id,
-            "import_result": {
-                "log_id": import_result.log_id,
-                "total_records": import_result.total_records,
-                "success_count": import_result.success_count,
-                "duplicate_count": import_result.duplicate_count,
-                "failure_count": import_result.failure_count,
-            },
+            "import_result": _fetch_result_summary(fetch_result),
             "processed_at": datetime.now(timezone.utc).isoformat()
         }
 
@@ -177,7 +122,7 @@ def reconcile_curb_trips(self, recon_stat: Optional[int] = None):
                     
                     if is_production:
                         # Production: Get unreconciled trips and reconcile on server
-                        trips = await repo.get_unreconciled_trips(limit=1000)
+                        trips = await repo.get_unreconciled_trip_keys(limit=1000)
                         
                         if not trips:
                             logger.info("[Task ID: %s] No trips to reconcile", task_id)
@@ -226,6 +171,10 @@ def reconcile_curb_trips(self, recon_stat: Optional[int] = None):
                 "already_reconciled_count": reconcile_result.already_reconciled_count,
                 "failed_count": reconcile_result.failed_count,
                 "recon_stat": reconcile_result.recon_stat,
+                "failed_batches": [
+                    batch.trip_ids for batch in (reconcile_result.batches or [])
+                    if not batch.success
+                ],
             },
             "processed_at": datetime.now(timezone.utc).isoformat()
         }
@@ -365,7 +314,8 @@ def manual_fetch_curb_trips(
     to_date: str,
     driver_id: Optional[str] = None,
     cab_number: Optional[str] = None,
-    import_by: str = "MANUAL"
+    import_by: str = "MANUAL",
+    resume: bool = False,
 ):
     """
     Manually fetch and import CURB trips for a specific date range.
@@ -374,6 +324,10 @@ def manual_fetch_curb_trips(
     - Backfilling historical data
     - Reprocessing specific date ranges
     - Testing with specific drivers or vehicles
+
+    The range is fetched as concurrent one-day shards. Every day is fetched
+    again by default; pass resume=True to skip days that already finished
+    importing.
     
     Args:
         from_date: Start date in MM/DD/YYYY format
@@ -381,6 +335,7 @@ def manual_fetch_curb_trips(
         driver_id: Optional driver ID filter
         cab_number: Optional cab number filter
         import_by: User or system performing import
+        resume: Skip shards with a finished import instead of re-fetching them
     """
     task_id = self.request.id
     logger.info(
@@ -389,63 +344,35 @@ def manual_fetch_curb_trips(
     )
 
     try:
-        # Fetch card transactions
-        card_xml = fetch_trans_by_date_cab12(
-            from_datetime=from_date,
-            to_datetime=to_date,
-            cab_number=cab_number or ""
+        start = datetime.strptime(from_date, "%m/%d/%Y").date()
+        end = datetime.strptime(to_date, "%m/%d/%Y").date()
+
+        shards = build_fetch_shards(
+            start,
+            max(end, start + timedelta(days=1)),
+            cab_numbers=[cab_number] if cab_number else None,
+            driver_id=driver_id or "",
         )
-
-        # Fetch cash trips
-        cash_xml = fetch_trips_log10(
-            from_date=from_date,
-            to_date=to_date,
-            recon_stat=-1,
-            cab_number=cab_number or "",
-            driver_id=driver_id or ""
+        fetch_result = asyncio.run(
+            CURBFetchOrchestrator(
+                import_source="Manual", import_by=import_by, resume=resume
+            ).run(shards)
         )
 
-        if not card_xml and not cash_xml:
+        if not fetch_result.total_records and not fetch_result.skipped_shards:
             raise ValueError("No trip data found for the specified date range")
 
-        # Import trips
-        import asyncio
-        
-        async def import_trips_async():
-            async for db in get_async_db():
-                try:
-                    repo = CURBRepository(db)
-                    service = CURBService(repo)
-                    
-                    result = await service.import_trips(
-                        xml_data=card_xml,
-                        cash_xml_data=cash_xml,
-                        import_source="Manual",
-                        import_by=import_by
-                    )
-                    
-                    return result
-                finally:
-                    await db.close()
-
-        import_result = asyncio.run(import_trips_async())
-
         logger.info(
             "[Task ID: %s] Manual import completed: %d imported",
-            task_id, import_result.success_count
+            task_id, fetch_result.success_count
         )
 
         return {
-            "status": "success",
+            "status": "success" if fetch_result.success else "partial",
             "task_id": task_id,
             "from_date": from_date,
             "to_date": to_date,
-            "import_result": {
-                "log_id": import_result.log_id,
-                "total_records": import_result.total_records,
-                "success_count": import_result.success_count,
-                "duplicate_count": import_result.duplicate_count,
-            },
+            "import_result": _fetch_result_summary(fetch_result),
             "processed_at": datetime.now(timezone.utc).isoformat()
         }
 
@@ -454,4 +381,91 @@ def manual_fetch_curb_trips(
             "[Task ID: %s] Error in manual fetch: %s",
             task_id, str(e), exc_info=True
         )
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task(bind=True, name='app.curb.tasks.backfill_curb_trips')
+def backfill_curb_trips(
+    self,
+    from_date: str,
+    to_date: str,
+    shard_by: str = "day",
+    cab_numbers: Optional[list] = None,
+    concurrency: Optional[int] = None,
+    import_by: str = "BACKFILL",
+    resume: bool = True,
+):
+    """
+    Resumable backfill of CURB trips over a long date range.
+
+    The range [from_date, to_date) is split into day or cab-number shards
+    that are fetched concurrently and imported as they arrive. Completed
+    shards are recorded on their import logs, so running the task again for
+    the same range only fetches the shards whose import did not finish.
+
+    Args:
+        from_date: First day in MM/DD/YYYY format
+        to_date: Day after the last day in MM/DD/YYYY format
+        shard_by: "day" or "cab"
+        cab_numbers: Optional cab numbers to shard by
+        concurrency: Optional override of settings.curb_fetch_concurrency
+        import_by: User or system performing import
+        resume: Skip shards with a finished import (False re-fetches all)
+    """
+    task_id = self.request.id
+    logger.info(
+        "[Task ID: %s] CURB backfill requested: %s to %s by %s",
+        task_id, from_date, to_date, shard_by
+    )
+
+    try:
+        shards = build_fetch_shards(
+            datetime.strptime(from_date, "%m/%d/%Y").date(),
+            datetime.strptime(to_date, "%m/%d/%Y").date(),
+            shard_by=shard_by,
+            cab_numbers=cab_numbers,
+        )
+        fetch_result = asyncio.run(
+            CURBFetchOrchestrator(
+                concurrency=concurrency, import_source="Backfill", import_by=import_by,
+                resume=resume,
+            ).run(shards)
+        )
+
+        logger.info(
+            "[Task ID: %s] CURB backfill finished: %s",
+            task_id, fetch_result.message
+        )
+
+        return {
+            "status": "success" if fetch_result.success else "partial",
+            "task_id": task_id,
+            "from_date": from_date,
+            "to_date": to_date,
+            "import_result": _fetch_result_summary(fetch_result),
+            "failed_shards": [
+                shard.shard_key for shard in fetch_result.shards if shard.status == "Failed"
+            ],
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    except Exception as e:
+        logger.error(
+            "[Task ID: %s] Error in CURB backfill: %s",
+            task_id, str(e), exc_info=True
+        )
+        raise
+
+
+def _fetch_result_summary(fetch_result: CURBFetchResult) -> dict:
+    """Serializable summary of a sharded fetch for task results"""
+    return {
+        "total_shards": fetch_result.total_shards,
+        "imported_shards": fetch_result.imported_shards,
+        "skipped_shards": fetch_result.skipped_shards,
+        "failed_shards": fetch_result.failed_shards,
+        "log_ids": [shard.log_id for shard in fetch_result.shards if shard.log_id],
+        "total_records": fetch_result.total_records,
+        "success_count": fetch_result.success_count,
+        "duplicate_count": fetch_result.duplicate_count,
+    }
@@ -0,0 +1,239 @@
+# app/curb/transform.py
+
+"""
+Columnar validation and transformation of parsed CURB trips
+
+Raw XML attribute/child-text records are loaded into a DataFrame per import
+chunk; renaming, numeric coercion, date/time splitting, default filling and
+validation all run as vectorized column operations. The resulting rows feed
+the bulk insert directly, without a Pydantic model per trip.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# GET_TRIPS_LOG10 RECORD attribute -> curb_trips column
+TRIP_LOG_COLUMNS = {
+    "ID": "record_id",
+    "PERIOD": "period",
+    "CABNUMBER": "cab_number",
+    "DRIVER": "driver_id",
+    "NUM_SERVICE": "trip_number",
+    "TRIP": "trip_amount",
+    "TIPS": "tips",
+    "EXTRAS": "extras",
+    "TOLLS": "tolls",
+    "TAX": "tax",
+    "IMPTAX": "imp_tax",
+    "TOTAL_AMOUNT": "total_amount",
+    "GPS_START_LA": "gps_start_lat",
+    "GPS_START_LO": "gps_start_lon",
+    "GPS_END_LA": "gps_end_lat",
+    "GPS_END_LO": "gps_end_lon",
+    "FROM_ADDRESS": "from_address",
+    "TO_ADDRESS": "to_address",
+    "T": "payment_type",
+    "CCNUMBER": "cc_number",
+    "AUTHCODE": "auth_code",
+    "AUTHAMT": "auth_amount",
+    "EHAILFEE": "ehail_fee",
+    "HEALTHFEE": "health_fee",
+    "PASSENGER_NUM": "passengers",
+    "DIST_SERVCE": "distance_service",
+    "DIST_BS": "distance_bs",
+    "RESNUM": "reservation_number",
+    "CONGFEE": "congestion_fee",
+    "airportFee": "airport_fee",
+    "cbdt": "cbdt_fee",
+}
+
+# Get_Trans_By_Date_Cab12 tran child element -> curb_trips column
+CARD_TRANSACTION_COLUMNS = {
+    "ROWID": "record_id",
+    "CABNUMBER": "cab_number",
+    "TRIPDRIVERID": "driver_id",
+    "NUM_SERVICE": "trip_number",
+    "TRIPFARE": "trip_amount",
+    "TRIPTIPS": "tips",
+    "TRIPEXTRAS": "extras",
+    "TRIPTOLL": "tolls",
+    "TAX": "tax",
+    "IMPTAX": "imp_tax",
+    "AMOUNT": "total_amount",
+    "FromLa": "gps_start_lat",
+    "FromLo": "gps_start_lon",
+    "ToLa": "gps_end_lat",
+    "ToLo": "gps_end_lon",
+    "CRNUMBER": "cc_number",
+    "BANK_APPROVAL": "auth_code",
+    "EHAIL_FEE": "ehail_fee",
+    "TRIPDIST": "distance_service",
+    "CongFee": "congestion_fee",
+    "airportFee": "airport_fee",
+    "cbdt": "cbdt_fee",
+}
+
+STRING_COLUMNS = [
+    "record_id", "period", "trip_number", "cab_number", "driver_id",
+    "from_address", "to_address", "payment_type", "cc_number", "auth_code",
+    "reservation_number",
+]
+
+# Amounts and coordinates default to 0.0 when missing or unparseable, like to_float
+FLOAT_COLUMNS = [
+    "trip_amount", "tips", "extras", "tolls", "tax", "imp_tax", "total_amount",
+    "gps_start_lat", "gps_start_lon", "gps_end_lat", "gps_end_lon",
+    "auth_amount", "ehail_fee", "health_fee", "congestion_fee", "airport_fee",
+    "cbdt_fee", "distance_service", "distance_bs",
+]
+
+# Columns that must be present for a trip to be inserted (CURBTripCreate required fields)
+REQUIRED_COLUMNS = ["record_id", "cab_number", "driver_id", "start_date", "end_date", "payment_type"]
+
+TRIP_COLUMNS = STRING_COLUMNS + FLOAT_COLUMNS + [
+    "start_date", "end_date", "start_time", "end_time", "passengers",
+]
+
+
+def trips_log_frame(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Build a normalized trip frame from raw GET_TRIPS_LOG10 RECORD attributes.
+
+    Args:
+        records: Attribute dictionaries of RECORD elements
+
+    Returns:
+        DataFrame with curb_trips column names and coerced types
+    """
+    raw = pd.DataFrame.from_records(records).reindex(
+        columns=list(TRIP_LOG_COLUMNS) + ["START_DATE", "END_DATE"]
+    )
+    frame = raw[list(TRIP_LOG_COLUMNS)].rename(columns=TRIP_LOG_COLUMNS)
+
+    frame["start_date"], frame["start_time"] = _split_datetime(raw["START_DATE"])
+    frame["end_date"], frame["end_time"] = _split_datetime(raw["END_DATE"])
+    frame["payment_type"] = frame["payment_type"].fillna("T")
+    frame["passengers"] = _to_int(frame["passengers"])
+
+    return _coerce(frame)
+
+
+def card_transactions_frame(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Build a normalized trip frame from raw Get_Trans_By_Date_Cab12 tran records.
+
+    Args:
+        records: Child-text dictionaries of tran elements (plus ROWID)
+
+    Returns:
+        DataFrame with curb_trips column names and coerced types
+    """
+    raw = pd.DataFrame.from_records(records).reindex(
+        columns=list(CARD_TRANSACTION_COLUMNS) + ["TRIPDATE", "TRIPTIMESTART", "TRIPTIMEEND"]
+    )
+    frame = raw[list(CARD_TRANSACTION_COLUMNS)].rename(columns=CARD_TRANSACTION_COLUMNS)
+
+    # Card transactions carry no period; "" keeps (record_id, period) unique
+    frame["period"] = ""
+    frame["start_date"] = _to_date(raw["TRIPDATE"])
+    frame["end_date"] = frame["start_date"]
+    frame["start_time"] = _to_time(raw["TRIPTIMESTART"])
+    frame["end_time"] = _to_time(raw["TRIPTIMEEND"])
+    frame["auth_amount"] = frame["total_amount"]
+    frame["payment_type"] = "C"
+    frame["passengers"] = 1
+
+    return _coerce(frame)
+
+
+def validate_trip_frame(
+    frame: pd.DataFrame, import_log_id: int
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split a normalized trip frame into insertable rows and rejected rows.
+
+    Args:
+        frame: Output of trips_log_frame / card_transactions_frame
+        import_log_id: Import log the accepted trips belong to
+
+    Returns:
+        Tuple of (valid frame, error frame). The error frame holds
+        record_id and a semicolon separated `error` for each rejected row.
+    """
+    missing = frame[REQUIRED_COLUMNS].isna()
+    for column in ("record_id", "cab_number", "driver_id", "payment_type"):
+        missing[column] |= frame[column].fillna("").str.strip().eq("")
+
+    rejected = missing.any(axis=1)
+
+    errors = pd.DataFrame({
+        "record_id": frame.loc[rejected, "record_id"],
+        "error": missing[rejected].apply(
+            lambda row: "; ".join(f"missing {column}" for column in row.index[row]), axis=1
+        ) if rejected.any() else pd.Series(dtype=object),
+    })
+
+    valid = frame.loc[~rejected, TRIP_COLUMNS].copy()
+    valid["status"] = "Imported"
+    valid["import_id"] = import_log_id
+
+    return valid, errors
+
+
+def frame_to_rows(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a valid trip frame into insert-ready dictionaries (NaN -> None)"""
+    if frame.empty:
+        return []
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def _coerce(frame: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized numeric coercion and string cleanup shared by both sources"""
+    # Columns a source does not provide come out as None / 0.0
+    frame = frame.reindex(columns=TRIP_COLUMNS)
+
+    for column in FLOAT_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").fillna(0.0).astype(float)
+
+    for column in STRING_COLUMNS:
+        frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+
+    return frame
+
+
+def _to_int(series: pd.Series) -> pd.Series:
+    """Integer coercion returning 0 on missing or invalid values, like to_int"""
+    return pd.to_numeric(series, errors="coerce").fillna(0).astype(np.int64)
+
+
+def _split_datetime(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Split "MM/DD/YYYY HH:MM[:SS]" strings into date and time columns"""
+    parsed = pd.to_datetime(series, format="%m/%d/%Y %H:%M:%S", errors="coerce")
+    parsed = parsed.fillna(pd.to_datetime(series, format="%m/%d/%Y %H:%M", errors="coerce"))
+    return _dates(parsed), _times(parsed)
+
+
+def _to_date(series: pd.Series) -> pd.Series:
+    """Parse "MM/DD/YYYY" strings into date objects (None when invalid)"""
+    return _dates(pd.to_datetime(series, format="%m/%d/%Y", errors="coerce"))
+
+
+def _to_time(series: pd.Series) -> pd.Series:
+    """Parse "HH:MM[:SS]" strings into time objects (None when invalid)"""
+    parsed = pd.to_datetime(series, format="%H:%M:%S", errors="coerce")
+    parsed = parsed.fillna(pd.to_datetime(series, format="%H:%M", errors="coerce"))
+    return _times(parsed)
+
+
+def _dates(parsed: pd.Series) -> pd.Series:
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def _times(parsed: pd.Series) -> pd.Series:
+    return parsed.dt.time.astype(object).where(parsed.notna(), None)
@@ -6,8 +6,10 @@ Utility functions for CURB module
 This module provides XML parsing and data transformation utilities.
 """
 
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import datetime, date, time
-from typing import List, Dict, Any, Optional
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import xml.etree.ElementTree as ET
 
@@ -16,6 +18,12 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Default number of records per chunk yielded by the streaming parsers
+DEFAULT_CHUNK_SIZE = 1000
+
+# Number of characters/bytes fed to the pull parser per read
+READ_BLOCK_SIZE = 64 * 1024
+
 
 def parse_trips_xml(xml_data: str) -> List[Dict[str, Any]]:
     """
@@ -45,53 +53,7 @@ def parse_trips_xml(xml_data: str) -> List[Dict[str, Any]]:
         # Find all RECORD elements
         for record in root.findall(".//RECORD"):
             try:
-                # Parse dates and times
-                start_datetime_str = record.get("START_DATE", "")
-                end_datetime_str = record.get("END_DATE", "")
-
-                start_date, start_time = parse_datetime(start_datetime_str)
-                end_date, end_time = parse_datetime(end_datetime_str)
-
-                trip = {
-                    "record_id": record.get("ID"),
-                    "period": record.get("PERIOD"),
-                    "cab_number": record.get("CABNUMBER"),
-                    "driver_id": record.get("DRIVER"),
-                    "trip_number": record.get("NUM_SERVICE"),
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "trip_amount": to_float(record.get("TRIP")),
-                    "tips": to_float(record.get("TIPS")),
-                    "extras": to_float(record.get("EXTRAS")),
-                    "tolls": to_float(record.get("TOLLS")),
-                    "tax": to_float(record.get("TAX")),
-                    "imp_tax": to_float(record.get("IMPTAX")),
-                    "total_amount": to_float(record.get("TOTAL_AMOUNT")),
-                    "gps_start_lat": to_float(record.get("GPS_START_LA")),
-                    "gps_start_lon": to_float(record.get("GPS_START_LO")),
-                    "gps_end_lat": to_float(record.get("GPS_END_LA")),
-                    "gps_end_lon": to_float(record.get("GPS_END_LO")),
-                    "from_address": record.get("FROM_ADDRESS"),
-                    "to_address": record.get("TO_ADDRESS"),
-                    "payment_type": record.get("T", "T"),  # T=$, C=Card, P=Private
-                    "cc_number": record.get("CCNUMBER"),
-                    "auth_code": record.get("AUTHCODE"),
-                    "auth_amount": to_float(record.get("AUTHAMT")),
-                    "ehail_fee": to_float(record.get("EHAILFEE")),
-                    "health_fee": to_float(record.get("HEALTHFEE")),
-                    "passengers": to_int(record.get("PASSENGER_NUM")),
-                    "distance_service": to_float(record.get("DIST_SERVCE")),
-                    "distance_bs": to_float(record.get("DIST_BS")),
-                    "reservation_number": record.get("RESNUM"),
-                    "congestion_fee": to_float(record.get("CONGFEE")),
-                    "airport_fee": to_float(record.get("airportFee")),
-                    "cbdt_fee": to_float(record.get("cbdt")),
-                }
-                
-                trip_records.append(trip)
-
+                trip_records.append(_trip_record_to_dict(record))
             except Exception as e:
                 logger.error(
                     "Failed to parse trip record",
@@ -136,61 +98,7 @@ def parse_card_transactions_xml(xml_data: str) -> List[Dict[str, Any]]:
         # Find all tran elements
         for record in root.findall(".//tran"):
             try:
-                # Get ROWID attribute
-                record_id = record.get("ROWID")
-
-                # Parse dates and times
-                trip_date_str = record.findtext("TRIPDATE", "")
-                trip_start_time_str = record.findtext("TRIPTIMESTART", "")
-                trip_end_time_str = record.findtext("TRIPTIMEEND", "")
-
-                start_date = parse_date(trip_date_str)
-                start_time = parse_time(trip_start_time_str)
-                end_time = parse_time(trip_end_time_str)
-
-                # End date is usually the same as start date unless trip crosses midnight
-                end_date = start_date
-
-                transaction = {
-                    "record_id": record_id,
-                    "period": None,  # Card transactions don't have period
-                    "cab_number": record.findtext("CABNUMBER"),
-                    "driver_id": record.findtext("TRIPDRIVERID"),
-                    "trip_number": record.findtext("NUM_SERVICE"),
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "trip_amount": to_float(record.findtext("TRIPFARE")),
-                    "tips": to_float(record.findtext("TRIPTIPS")),
-                    "extras": to_float(record.findtext("TRIPEXTRAS")),
-                    "tolls": to_float(record.findtext("TRIPTOLL")),
-                    "tax": to_float(record.findtext("TAX")),
-                    "imp_tax": to_float(record.findtext("IMPTAX")),
-                    "total_amount": to_float(record.findtext("AMOUNT")),
-                    "gps_start_lat": to_float(record.findtext("FromLa")),
-                    "gps_start_lon": to_float(record.findtext("FromLo")),
-                    "gps_end_lat": to_float(record.findtext("ToLa")),
-                    "gps_end_lon": to_float(record.findtext("ToLo")),
-                    "from_address": None,  # Not provided in card transactions
-                    "to_address": None,
-                    "payment_type": "C",  # Card transaction
-                    "cc_number": record.findtext("CRNUMBER"),
-                    "auth_code": record.findtext("BANK_APPROVAL"),
-                    "auth_amount": to_float(record.findtext("AMOUNT")),
-                    "ehail_fee": to_float(record.findtext("EHAIL_FEE")),
-                    "health_fee": 0.0,  # Not in card transactions
-                    "passengers": 1,  # Not provided
-                    "distance_service": to_float(record.findtext("TRIPDIST")),
-                    "distance_bs": 0.0,
-                    "reservation_number": None,
-                    "congestion_fee": to_float(record.findtext("CongFee")),
-                    "airport_fee": to_float(record.findtext("airportFee")),
-                    "cbdt_fee": to_float(record.findtext("cbdt")),
-                }
-
-                transactions.append(transaction)
-
+                transactions.append(_card_transaction_to_dict(record))
             except Exception as e:
                 logger.error(
                     "Failed to parse transaction record",
@@ -210,6 +118,267 @@ def parse_card_transactions_xml(xml_data: str) -> List[Dict[str, Any]]:
         raise CURBXMLParseException(f"Unexpected error parsing card transactions XML: {str(e)}")
 
 
+def iter_trips_xml(
+    xml_source: Union[str, bytes, IO], chunk_size: int = DEFAULT_CHUNK_SIZE, raw: bool = False
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream-parse GET_TRIPS_LOG10 XML and yield trip dictionaries in chunks.
+
+    Unlike parse_trips_xml, the payload is never built into a full tree:
+    RECORD elements are converted as soon as they close and cleared right
+    after, so memory stays bounded by chunk_size regardless of date range.
+
+    Args:
+        xml_source: XML string/bytes or a readable file-like object
+        chunk_size: Maximum number of trip dictionaries per yielded chunk
+        raw: Yield the unconverted RECORD attributes (for transform.trips_log_frame)
+
+    Yields:
+        Lists of at most chunk_size trip dictionaries
+
+    Raises:
+        CURBXMLParseException: If XML parsing fails
+    """
+    # Mirror parse_trips_xml: only bare RECORD fragments need a root wrapper
+    wrap = False
+    if isinstance(xml_source, (str, bytes)):
+        head = xml_source.lstrip()[:1]
+        wrap = bool(head) and head not in ("<", b"<")
+
+    yield from _iter_records(
+        xml_source, "RECORD", _raw_attributes if raw else _trip_record_to_dict, "ID",
+        chunk_size=chunk_size, wrap=wrap, label="trips",
+    )
+
+
+def iter_card_transactions_xml(
+    xml_source: Union[str, bytes, IO], chunk_size: int = DEFAULT_CHUNK_SIZE, raw: bool = False
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream-parse Get_Trans_By_Date_Cab12 XML and yield transactions in chunks.
+
+    Streaming counterpart of parse_card_transactions_xml; each tran element
+    is cleared once converted.
+
+    Args:
+        xml_source: XML string/bytes or a readable file-like object
+        chunk_size: Maximum number of transaction dictionaries per yielded chunk
+        raw: Yield the unconverted child texts (for transform.card_transactions_frame)
+
+    Yields:
+        Lists of at most chunk_size transaction dictionaries
+
+    Raises:
+        CURBXMLParseException: If XML parsing fails
+    """
+    yield from _iter_records(
+        xml_source, "tran", _raw_children if raw else _card_transaction_to_dict, "ROWID",
+        chunk_size=chunk_size, wrap=True, label="card transactions",
+    )
+
+
+def _iter_records(
+    xml_source: Union[str, bytes, IO],
+    tag: str,
+    convert: Callable[[ET.Element], Dict[str, Any]],
+    id_attr: str,
+    chunk_size: int,
+    wrap: bool,
+    label: str,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Incrementally parse xml_source with an iterparse-style pull parser.
+
+    Input is fed in READ_BLOCK_SIZE slices; every closed `tag` element is
+    converted, cleared and detached from its parent so the partially built
+    tree never grows beyond the elements still open.
+    """
+    if not xml_source:
+        logger.warning("Empty XML data provided for streaming parse", label=label)
+        return
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[ET.Element] = []
+    chunk: List[Dict[str, Any]] = []
+    total = 0
+
+    def drain() -> Iterator[List[Dict[str, Any]]]:
+        nonlocal chunk, total
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag != tag:
+                continue
+
+            try:
+                chunk.append(convert(elem))
+            except Exception as e:
+                logger.error(
+                    "Failed to parse streamed record",
+                    label=label,
+                    record_id=elem.get(id_attr),
+                    error=str(e)
+                )
+
+            # Release the element and unlink it from its parent
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+            if len(chunk) >= chunk_size:
+                total += len(chunk)
+                yield chunk
+                chunk = []
+
+    try:
+        if wrap:
+            parser.feed("<root>")
+            yield from drain()
+
+        for block in _read_blocks(xml_source):
+            parser.feed(block)
+            yield from drain()
+
+        if wrap:
+            parser.feed("</root>")
+        parser.close()
+        yield from drain()
+
+        if chunk:
+            total += len(chunk)
+            yield chunk
+
+        logger.info("Stream-parsed XML", label=label, count=total)
+
+    except ET.ParseError as e:
+        logger.error("XML parse error in streaming parse", label=label, error=str(e), exc_info=True)
+        raise CURBXMLParseException(f"Failed to parse {label} XML: {str(e)}") from e
+
+
+def _read_blocks(xml_source: Union[str, bytes, IO]) -> Iterator[Union[str, bytes]]:
+    """Yield successive READ_BLOCK_SIZE slices of a string, bytes or file-like source"""
+    if isinstance(xml_source, (str, bytes)):
+        for offset in range(0, len(xml_source), READ_BLOCK_SIZE):
+            yield xml_source[offset:offset + READ_BLOCK_SIZE]
+        return
+
+    while True:
+        block = xml_source.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        yield block
+
+
+def _raw_attributes(record: ET.Element) -> Dict[str, Any]:
+    """Return the attributes of a RECORD element without conversion"""
+    return dict(record.attrib)
+
+
+def _raw_children(record: ET.Element) -> Dict[str, Any]:
+    """Return the child texts of a tran element, plus its ROWID, without conversion"""
+    values = {child.tag: child.text for child in record}
+    values["ROWID"] = record.get("ROWID")
+    return values
+
+
+def _trip_record_to_dict(record: ET.Element) -> Dict[str, Any]:
+    """Convert a GET_TRIPS_LOG10 RECORD element into a trip dictionary"""
+    start_date, start_time = parse_datetime(record.get("START_DATE", ""))
+    end_date, end_time = parse_datetime(record.get("END_DATE", ""))
+
+    return {
+        "record_id": record.get("ID"),
+        "period": record.get("PERIOD"),
+        "cab_number": record.get("CABNUMBER"),
+        "driver_id": record.get("DRIVER"),
+        "trip_number": record.get("NUM_SERVICE"),
+        "start_date": start_date,
+        "end_date": end_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "trip_amount": to_float(record.get("TRIP")),
+        "tips": to_float(record.get("TIPS")),
+        "extras": to_float(record.get("EXTRAS")),
+        "tolls": to_float(record.get("TOLLS")),
+        "tax": to_float(record.get("TAX")),
+        "imp_tax": to_float(record.get("IMPTAX")),
+        "total_amount": to_float(record.get("TOTAL_AMOUNT")),
+        "gps_start_lat": to_float(record.get("GPS_START_LA")),
+        "gps_start_lon": to_float(record.get("GPS_START_LO")),
+        "gps_end_lat": to_float(record.get("GPS_END_LA")),
+        "gps_end_lon": to_float(record.get("GPS_END_LO")),
+        "from_address": record.get("FROM_ADDRESS"),
+        "to_address": record.get("TO_ADDRESS"),
+        "payment_type": record.get("T", "T"),  # T=$, C=Card, P=Private
+        "cc_number": record.get("CCNUMBER"),
+        "auth_code": record.get("AUTHCODE"),
+        "auth_amount": to_float(record.get("AUTHAMT")),
+        "ehail_fee": to_float(record.get("EHAILFEE")),
+        "health_fee": to_float(record.get("HEALTHFEE")),
+        "passengers": to_int(record.get("PASSENGER_NUM")),
+        "distance_service": to_float(record.get("DIST_SERVCE")),
+        "distance_bs": to_float(record.get("DIST_BS")),
+        "reservation_number": record.get("RESNUM"),
+        "congestion_fee": to_float(record.get("CONGFEE")),
+        "airport_fee": to_float(record.get("airportFee")),
+        "cbdt_fee": to_float(record.get("cbdt")),
+    }
+
+
+def _card_transaction_to_dict(record: ET.Element) -> Dict[str, Any]:
+    """Convert a Get_Trans_By_Date_Cab12 tran element into a trip dictionary"""
+    start_date = parse_date(record.findtext("TRIPDATE", ""))
+    start_time = parse_time(record.findtext("TRIPTIMESTART", ""))
+    end_time = parse_time(record.findtext("TRIPTIMEEND", ""))
+
+    # End date is usually the same as start date unless trip crosses midnight
+    end_date = start_date
+
+    return {
+        "record_id": record.get("ROWID"),
+        "period": "",  # Card transactions don't have period; "" keeps (record_id, period) unique
+        "cab_number": record.findtext("CABNUMBER"),
+        "driver_id": record.findtext("TRIPDRIVERID"),
+        "trip_number": record.findtext("NUM_SERVICE"),
+        "start_date": start_date,
+        "end_date": end_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "trip_amount": to_float(record.findtext("TRIPFARE")),
+        "tips": to_float(record.findtext("TRIPTIPS")),
+        "extras": to_float(record.findtext("TRIPEXTRAS")),
+        "tolls": to_float(record.findtext("TRIPTOLL")),
+        "tax": to_float(record.findtext("TAX")),
+        "imp_tax": to_float(record.findtext("IMPTAX")),
+        "total_amount": to_float(record.findtext("AMOUNT")),
+        "gps_start_lat": to_float(record.findtext("FromLa")),
+        "gps_start_lon": to_float(record.findtext("FromLo")),
+        "gps_end_lat": to_float(record.findtext("ToLa")),
+        "gps_end_lon": to_float(record.findtext("ToLo")),
+        "from_address": None,  # Not provided in card transactions
+        "to_address": None,
+        "payment_type": "C",  # Card transaction
+        "cc_number": record.findtext("CRNUMBER"),
+        "auth_code": record.findtext("BANK_APPROVAL"),
+        "auth_amount": to_float(record.findtext("AMOUNT")),
+        "ehail_fee": to_float(record.findtext("EHAIL_FEE")),
+        "health_fee": 0.0,  # Not in card transactions
+        "passengers": 1,  # Not provided
+        "distance_service": to_float(record.findtext("TRIPDIST")),
+        "distance_bs": 0.0,
+        "reservation_number": None,
+        "congestion_fee": to_float(record.findtext("CongFee")),
+        "airport_fee": to_float(record.findtext("airportFee")),
+        "cbdt_fee": to_float(record.findtext("cbdt")),
+    }
+
+
 def parse_datetime(datetime_str: str) -> tuple[Optional[date], Optional[time]]:
     """
     Parse a datetime string into date and time objects.
@@ -318,6 +487,83 @@ def to_int(value: Optional[str]) -> int:
         return 0
 
 
+class LeaseIntervalIndex:
+    """
+    In-memory index of lease validity intervals keyed by (driver_id, medallion_number).
+
+    Built once per association batch from the rows returned by
+    CURBRepository.get_candidate_leases, then used to resolve every trip
+    without further queries. When several leases cover the same date the
+    one with the latest start date wins, matching the previous
+    per-trip `ORDER BY lease_start_date DESC` lookup.
+    """
+
+    def __init__(self, leases: Iterable[Any]):
+        grouped: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+        for lease in leases:
+            if lease.lease_start_date is None:
+                continue
+            key = (str(lease.driver_id).strip(), str(lease.medallion_number).strip())
+            grouped[key].append(lease)
+
+        self._leases: Dict[Tuple[str, str], List[Any]] = {}
+        self._starts: Dict[Tuple[str, str], List[date]] = {}
+        for key, rows in grouped.items():
+            rows.sort(key=lambda r: r.lease_start_date)
+            self._leases[key] = rows
+            self._starts[key] = [r.lease_start_date for r in rows]
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._leases.values())
+
+    def resolve(self, driver_id: str, medallion_number: str, on_date: date) -> Optional[Any]:
+        """
+        Return the lease row active for the driver and medallion on on_date.
+
+        Args:
+            driver_id: CURB driver ID (matches LeaseDriver.driver_id)
+            medallion_number: Cab number (matches Medallion.medallion_number)
+            on_date: Trip date
+
+        Returns:
+            The matching lease row or None
+        """
+        if not driver_id or not medallion_number or not on_date:
+            return None
+
+        key = (str(driver_id).strip(), str(medallion_number).strip())
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+
+        rows = self._leases[key]
+        idx = bisect_right(starts, on_date) - 1
+        while idx >= 0:
+            lease = rows[idx]
+            if lease.lease_end_date is None or lease.lease_end_date >= on_date:
+                return lease
+            idx -= 1
+        return None
+
+
+def chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Split a list into consecutive chunks of at most `size` items.
+
+    Args:
+        items: List to split
+        size: Maximum chunk length (must be positive)
+
+    Yields:
+        Sub-lists of items
+    """
+    if size <= 0:
+        raise ValueError("size must be a positive integer")
+
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
 def clean_plate_number(plate: str) -> str:
     """
     Clean and normalize plate number.
@@ -119,7 +119,7 @@ class DriverLoanInstallment(Base, AuditMixin):
     outstanding_principal: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False, comment="Outstanding principal before this installment")
     remaining_balance: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False, comment="Remaining principal after this installment")
 
-    status: Mapped[str] = mapped_column(String(16), default="Scheduled", nullable=False, comment="Lifecycle state: Scheduled, Due, Posted, Paid")
+    status: Mapped[str] = mapped_column(String(16), default="Scheduled", nullable=False, comment="Lifecycle state: Scheduled, Due, Posted, Paid, Waived")
     posting_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, comment="DateTime when installment was posted to ledger")
     ledger_posting_ref: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, comment="Ledger Entry ID created when installment is posted")
 
@@ -4,11 +4,12 @@
 Data Access Layer for Driver Loans module using SQLAlchemy 2.x
 """
 
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import date
 from decimal import Decimal
 
-from sqlalchemy import select, func, and_, desc, asc, update
+from sqlalchemy import select, func, and_, desc, asc, update, bindparam
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -175,25 +176,6 @@ class DriverLoanRepository:
         logger.info("Loan Updated", loan_id=loan.loan_id)
         return loan
     
-    async def update_loan_balances(
-        self, loan_id: int, principal_paid: Decimal, interest_paid: Decimal,
-    ) -> None:
-        """Update loan payment totals and outstanding balance."""
-        logger.debug("Updating loan balances", loan_id=loan_id)
-
-        stmt = (
-            update(DriverLoan)
-            .where(DriverLoan.id == loan_id)
-            .values(
-                total_principal_paid=DriverLoan.total_principal_paid + principal_paid,
-                total_interest_paid=DriverLoan.total_interest_paid + interest_paid,
-                outstanding_balance=DriverLoan.outstanding_balance - principal_paid,
-            )
-        )
-
-        await self.db.execute(stmt)
-        await self.db.flush()
-
     async def get_next_loan_number(self, year: int) -> int:
         """Get the next sequential loan number for the year."""
         prefix = f"DLN{year}-"
@@ -306,28 +288,124 @@ class DriverLoanRepository:
 
         return installments, total_items
     
-    async def get_due_installments(self, as_of_date: date) -> List[DriverLoanInstallment]:
-        """Get all installments that are due for posting."""
-        logger.debug("Fetching due installments", as_of_date=as_of_date)
+    async def get_due_installment_rows(
+        self, as_of_date: date, after_id: int = 0, limit: int = 1000
+    ) -> List[Row]:
+        """
+        Get the posting columns of Due installments up to as_of_date with
+        their loan's number, driver, medallion and lease, ordered by id and
+        starting after `after_id`, so callers can walk them in keyset batches.
+        """
+        logger.debug("Fetching due installment rows", as_of_date=as_of_date, after_id=after_id)
+
+        installments = DriverLoanInstallment.__table__
+        loans = DriverLoan.__table__
+        stmt = (
+            select(
+                installments.c.id,
+                installments.c.installment_id,
+                installments.c.loan_id,
+                installments.c.principal_amount,
+                installments.c.interest_amount,
+                installments.c.total_due,
+                loans.c.loan_id.label("loan_number"),
+                loans.c.driver_id,
+                loans.c.medallion_id,
+                loans.c.lease_id,
+            )
+            .join(loans, loans.c.id == installments.c.loan_id)
+            .where(
+                and_(
+                    installments.c.week_start_date <= as_of_date,
+                    installments.c.status == "Due",
+                    installments.c.id > after_id,
+                )
+            )
+            .order_by(installments.c.id)
+            .limit(limit)
+        )
 
+        result = await self.db.execute(stmt)
+        return list(result.all())
+
+    async def bulk_update_installments(self, installment_rows: List[Dict[str, Any]]) -> int:
+        """
+        Update many installments with per-row values in a single executemany
+        UPDATE. Each dict must contain the installment `id` plus the columns
+        to set; all dicts in one call should carry the same keys.
+        """
+        if not installment_rows:
+            return 0
+
+        logger.debug("Bulk updating installments", count=len(installment_rows))
+
+        installments = DriverLoanInstallment.__table__
+        stmt = update(installments).where(installments.c.id == bindparam("b_id"))
+        await self.db.execute(stmt, [
+            {"b_id": row["id"], **{key: value for key, value in row.items() if key != "id"}}
+            for row in installment_rows
+        ])
+        return len(installment_rows)
+
+    async def apply_loan_payments(self, payments: Dict[int, Tuple[Decimal, Decimal]]) -> None:
+        """
+        Add posted principal and interest to many loans with one executemany
+        UPDATE. `payments` maps loan id -> (principal, interest).
+        """
+        if not payments:
+            return
+
+        logger.debug("Applying loan payments", loans=len(payments))
+
+        loans = DriverLoan.__table__
         stmt = (
-            select(DriverLoanInstallment)
-            .options(
-                selectinload(DriverLoanInstallment.loan)
-                .selectinload(DriverLoan.driver)
+            update(loans)
+            .where(loans.c.id == bindparam("b_loan_id"))
+            .values(
+                total_principal_paid=loans.c.total_principal_paid + bindparam("b_principal"),
+                total_interest_paid=loans.c.total_interest_paid + bindparam("b_interest"),
+                outstanding_balance=loans.c.outstanding_balance - bindparam("b_principal"),
             )
+        )
+        await self.db.execute(stmt, [
+            {"b_loan_id": loan_id, "b_principal": principal, "b_interest": interest}
+            for loan_id, (principal, interest) in payments.items()
+        ])
+
+    async def close_completed_loans(self) -> int:
+        """
+        Close every Open loan with no outstanding balance and no installment
+        left Scheduled or Due, in one UPDATE.
+
+        Returns: Number of loans closed
+        """
+        loans = DriverLoan.__table__
+        installments = DriverLoanInstallment.__table__
+        pending = (
+            select(installments.c.id)
             .where(
                 and_(
-                    DriverLoanInstallment.week_start_date <= as_of_date,
-                    DriverLoanInstallment.status == "Scheduled",
+                    installments.c.loan_id == loans.c.id,
+                    installments.c.status.in_(["Scheduled", "Due"]),
                 )
             )
-            .order_by(DriverLoanInstallment.week_start_date)
+        )
+        stmt = (
+            update(loans)
+            .where(
+                and_(
+                    loans.c.status == "Open",
+                    loans.c.outstanding_balance <= 0,
+                    ~pending.exists(),
+                )
+            )
+            .values(status="Closed")
         )
 
         result = await self.db.execute(stmt)
-        return result.scalars().all()
-    
+        logger.info("Completed loans closed", count=result.rowcount)
+        return result.rowcount
+
     async def update_installment(
         self,
         installment: DriverLoanInstallment,
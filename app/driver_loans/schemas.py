@@ -29,6 +29,7 @@ class InstallmentStatus(str, Enum):
     DUE = "Due"
     POSTED = "Posted"
     PAID = "Paid"
+    WAIVED = "Waived"
 
 
 class StartWeekOption(str, Enum):
@@ -242,7 +243,7 @@ class PaginatedInstallmentResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
-    statuses: List[str] = ["Scheduled", "Due", "Posted", "Paid"]
+    statuses: List[str] = ["Scheduled", "Due", "Posted", "Paid", "Waived"]
 
 
 # === Operation Result Schemas ===
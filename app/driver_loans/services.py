@@ -6,6 +6,7 @@ Implements loan creation, payment schedule generation, interest calculation,
 and posting logic according to the Loan Repayment Matrix.
 """
 
+from collections import defaultdict
 from datetime import datetime, timezone, date, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from typing import List, Tuple, Optional, Dict, Any
@@ -13,6 +14,7 @@ from typing import List, Tuple, Optional, Dict, Any
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.db import get_async_db
 from app.driver_loans.repository import DriverLoanRepository
 from app.driver_loans.schemas import (
@@ -33,6 +35,10 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Ledger reference_type of loan installments; reference_id is the installment_id
+LOAN_INSTALLMENT_REFERENCE_TYPE = "LOAN_INSTALLMENT"
+
+
 def get_loan_repository(db: AsyncSession = Depends(get_async_db)) -> DriverLoanRepository:
     """Dependency to get DriverLoanRepository instance."""
     return DriverLoanRepository(db)
@@ -456,79 +462,151 @@ class DriverLoanService:
         return await self.repo.get_installments(filters)
     
     async def process_due_installments(
-        self, as_of_date: Optional[date] = None,
+        self, as_of_date: Optional[date] = None, batch_size: Optional[int] = None,
     ) -> LoanPostingResult:
         """
         Process all due installments for posting to ledger.
         This would typically be called by a scheduled task every Sunday at 5:00 AM.
+
+        Installments are posted in id-ordered batches of LOAN_POSTING_BATCH_SIZE.
+        Each batch creates its ledger obligations with multi-row INSERTs, marks
+        its installments Posted with one executemany UPDATE, adds the paid
+        principal and interest to each loan with one executemany UPDATE, and
+        is committed on its own. Installment status is the checkpoint: a
+        failed run keeps the committed batches and a rerun picks up the rest.
+        Installments with nothing to collect are marked Waived without a
+        ledger posting, so they no longer keep their loan from closing.
         """
         if not as_of_date:
             as_of_date = date.today()
+        batch_size = batch_size or settings.loan_posting_batch_size
 
-        logger.info("Processing due installments", as_of_date=str(as_of_date))
+        logger.info("Processing due installments", as_of_date=str(as_of_date), batch_size=batch_size)
+
+        ledger_service = LedgerService(self.repo.db)
+        posted_count = 0
+        waived_count = 0
+        details = []
+        last_id = 0
 
         try:
             # === Mark scheduled installments as due ===
             marked_count = await self.repo.mark_installments_due(as_of_date)
+            await self.repo.commit()
+            logger.info("Installments marked as due", count=marked_count)
 
-            # === Get all due installments ===
-            due_installments = await self.repo.get_due_installments(as_of_date)
-
-            posted_count = 0
-            failed_count = 0
-            details = []
-
-            for installment in due_installments:
-                try:
-                    # === Post to ledger (Simplified) ===
-                    await self._post_installment_to_ledger(installment)
-
-                    # === Update installment status ===
-                    await self.repo.update_installment(
-                        installment,
-                        DriverLoanInstallmentUpdate(
-                            status=InstallmentStatus.POSTED,
-                            posting_date=datetime.now(timezone.utc),
-                            ledger_posting_ref=f"LED-{installment.installment_id}"
-                        )
-                    )
+            while True:
+                installments = await self.repo.get_due_installment_rows(
+                    as_of_date, after_id=last_id, limit=batch_size
+                )
+                if not installments:
+                    break
+                last_id = installments[-1].id
+
+                obligations = []
+                postable = []
+                waived = []
+                for installment in installments:
+                    if installment.total_due <= 0:
+                        waived.append(installment)
+                        continue
+
+                    postable.append(installment)
+                    obligations.append({
+                        "reference_id": installment.installment_id,
+                        "amount": installment.total_due,
+                        "driver_id": installment.driver_id,
+                        "medallion_id": installment.medallion_id,
+                        "lease_id": installment.lease_id,
+                        "transaction_date": as_of_date,
+                        "description": (
+                            f"Loan installment for {installment.loan_number} "
+                            f"(Principal: {installment.principal_amount}, Interest: {installment.interest_amount})"
+                        ),
+                    })
 
-                    # === Update loan balances ===
-                    await self.repo.update_loan_balances(
-                        installment.loan_id,
-                        installment.principal_amount,
-                        installment.interest_amount,
+                # === Post to ledger ===
+                # Installments posted by an earlier, interrupted run are
+                # skipped by the ledger and only need their status updated.
+                posting_ids = await ledger_service.create_obligation_postings_batch(
+                    LedgerCategory.LOAN, LOAN_INSTALLMENT_REFERENCE_TYPE, obligations
+                )
+                already_posted = [
+                    installment.installment_id for installment in postable
+                    if installment.installment_id not in posting_ids
+                ]
+                if already_posted:
+                    posting_ids.update(await ledger_service.repo.get_debit_posting_ids_by_reference(
+                        already_posted, LOAN_INSTALLMENT_REFERENCE_TYPE
+                    ))
+
+                # === Update installment statuses and loan balances ===
+                posting_date = datetime.now(timezone.utc)
+                await self.repo.bulk_update_installments([
+                    {
+                        "id": installment.id,
+                        "status": InstallmentStatus.POSTED.value,
+                        "posting_date": posting_date,
+                        "ledger_posting_ref": posting_ids.get(installment.installment_id),
+                    }
+                    for installment in postable
+                ] + [
+                    {
+                        "id": installment.id,
+                        "status": InstallmentStatus.WAIVED.value,
+                        "posting_date": posting_date,
+                        "ledger_posting_ref": None,
+                    }
+                    for installment in waived
+                ])
+
+                payments: Dict[int, Tuple[Decimal, Decimal]] = defaultdict(
+                    lambda: (Decimal("0.00"), Decimal("0.00"))
+                )
+                for installment in postable + waived:
+                    principal, interest = payments[installment.loan_id]
+                    payments[installment.loan_id] = (
+                        principal + installment.principal_amount,
+                        interest + installment.interest_amount,
                     )
+                await self.repo.apply_loan_payments(dict(payments))
 
-                    posted_count += 1
-                    details.append({
+                await self.repo.commit()
+
+                posted_count += len(postable)
+                waived_count += len(waived)
+                details.extend(
+                    {
                         "installment_id": installment.installment_id,
                         "status": "Posted",
                         "amount": str(installment.total_due),
-                    })
-
-                except Exception as e:
-                    failed_count += 1
-                    details.append({
+                    }
+                    for installment in postable
+                )
+                details.extend(
+                    {
                         "installment_id": installment.installment_id,
-                        "status": "Failed",
-                        "error": str(e),
-                    })
-                    logger.error(
-                        "Failed to post installment", installment_id=installment.installment_id, error=str(e)
-                    )
+                        "status": "Waived",
+                        "amount": str(installment.total_due),
+                    }
+                    for installment in waived
+                )
+                logger.info(
+                    "Installment batch posted",
+                    posted=len(postable), waived=len(waived), loans=len(payments), after_id=last_id,
+                )
 
-            # === Check for loans that should be closed ===
-            await self._check_and_close_completed_loans()
+            # === Close loans that are fully repaid ===
+            closed_count = await self.repo.close_completed_loans()
 
             # === Create log entry ===
             await self.repo.create_log(
                 DriverLoanLogCreate(
                     log_date=datetime.now(timezone.utc),
                     log_type="Post",
-                    records_impacted=posted_count + failed_count,
-                    status="Success" if failed_count == 0 else "Partial",
-                    details=f"Posted {posted_count}, Failed {failed_count}"
+                    records_impacted=posted_count + waived_count,
+                    status="Success",
+                    details=f"Posted {posted_count}, Waived {waived_count}, Closed {closed_count}",
                 )
             )
 
@@ -536,53 +614,14 @@ class DriverLoanService:
 
             return LoanPostingResult(
                 success=True,
-                total_processed=len(due_installments),
+                total_processed=posted_count + waived_count,
                 posted_count=posted_count,
-                failed_count=failed_count,
+                failed_count=0,
                 message=f"Successfully posted {posted_count} installments",
                 details=details,
             )
         
         except Exception as e:
             await self.repo.rollback()
-            logger.error("Failed to process due installments", error=str(e))
+            logger.error("Failed to process due installments", error=str(e), after_id=last_id)
             raise DriverLoanPostingException(f"Failed to process installments: {str(e)}") from e
-        
-    async def _post_installment_to_ledger(
-        self, installment: DriverLoanInstallment
-    ) -> None:
-        """
-        Post an installment to the ledger system.
-        This is a simplified version - actual implementation would integrate with ledger service.
-        """
-        logger.debug(
-            "Posting installment to ledger",
-            installment_id=installment.installment_id,
-        )
-        ledger_service = LedgerService(self.repo.db)
-
-        _, _ = await ledger_service.create_obligation_posting(
-            category=LedgerCategory.LOAN,
-            reference_id=installment.installment_id,
-            reference_type="LOAN_INSTALLMENT",
-            amount=installment.total_due,
-            driver_id=installment.loan.driver_id,
-            medallion_id=installment.loan.medallion_id,
-            transaction_date=datetime.now(timezone.utc),
-            description=f"Loan installment for {installment.loan.loan_id} (Principal: {installment.principal_amount}, Interest: {installment.interest_amount})",
-            created_by=None  # System posting
-        )
-
-    async def _check_and_close_completed_loans(self) -> None:
-        """Check for loans with all installments paid and close them."""
-        # TODO: Implement logic to check and close loans
-        # This would check for loans where:
-        # 1. All installments are in "Posted" or "Paid" status
-        # 2. Outstanding balance is 0
-        # Then update loan status to "Closed"
-        pass
-
-    
-    
-
-
@@ -168,7 +168,7 @@ async def docusign_webhooks(
 
 
 @router.get("/envelope/{envelope_id}/status")
-async def get_envelope_status(envelope_id: str, db: Session = Depends(get_db)):
+def get_envelope_status(envelope_id: str, db: Session = Depends(get_db)):
     """Manually check the status of an envelope being tracked by the system."""
     envelope = (
         db.query(ESignEnvelope).filter(ESignEnvelope.envelope_id == envelope_id).first()
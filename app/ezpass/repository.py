@@ -4,9 +4,10 @@
 Data Access Layer for EZPass module using async SQLAlchemy 2.x
 """
 
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import select, func, and_, desc, asc
+from sqlalchemy import select, insert, update, func, and_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.ezpass.models import EZPassTransaction, EZPassLog
@@ -15,6 +16,7 @@ from app.ezpass.schemas import (
     EZPassLogCreate, EZPassTransactionFilters, EZPassLogFilters,
 )
 from app.utils.logger import get_logger
+from app.utils.pagination import count_rows, keyset_order, paginate, to_page
 
 logger = get_logger(__name__)
 
@@ -98,23 +100,16 @@ class EZPassRepository:
         count_stmt = select(func.count()).select_from(EZPassTransaction)
         if conditions:
             count_stmt = count_stmt.where(and_(*conditions))
-        total_count_result = await self.db.execute(count_stmt)
-        total_count = total_count_result.scalar()
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
-        # === Apply sorting ===
+        # === Apply sorting and pagination ===
         sort_column = getattr(EZPassTransaction, filters.sort_by, EZPassTransaction.updated_on)
-        if filters.sort_order == "desc":
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(asc(sort_column))
-
-        # === Apply pagination ===
-        offset = (filters.page - 1) * filters.per_page
-        query = query.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order == "desc", EZPassTransaction.id)
+        query = paginate(query, order, filters.per_page, filters.page, filters.cursor)
 
         # === Execute query ===
         result = await self.db.execute(query)
-        transactions = result.scalars().all()
+        transactions = to_page(result.scalars().all(), order, filters.per_page)
 
         logger.info(
             "Transactions fetched successfully",
@@ -123,7 +118,7 @@ class EZPassRepository:
             page=filters.page,
         )
 
-        return list(transactions), total_count
+        return transactions, total_count
     
     async def create_transaction(
         self,
@@ -179,32 +174,115 @@ class EZPassRepository:
         logger.info("Bulk transactions created successfully", count=len(transactions))
         return transactions
     
-    async def get_unassociated_transactions(self) -> List[EZPassTransaction]:
-        """Get all transactions with status 'Imported'"""
-        logger.debug("Fetching unassociated transactions")
+    async def insert_transaction_rows(self, transaction_rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert transactions with one multi-row INSERT, without loading them
+        into the session. Rows are column -> value dictionaries.
+        """
+        if not transaction_rows:
+            return 0
+
+        await self.db.execute(insert(EZPassTransaction).values(transaction_rows))
+        logger.debug("Inserted transaction rows", count=len(transaction_rows))
+        return len(transaction_rows)
+
+    async def get_unassociated_transaction_keys(
+        self, after_id: int = 0, limit: int = 5000
+    ) -> List[Row]:
+        """
+        Get the association keys (id, plate_no, transaction_date) of
+        transactions with status 'Imported', ordered by id and starting after
+        `after_id`, so callers can walk the backlog in keyset batches.
+        """
+        logger.debug("Fetching unassociated transaction keys", after_id=after_id, limit=limit)
+
+        stmt = select(
+            EZPassTransaction.id,
+            EZPassTransaction.plate_no,
+            EZPassTransaction.transaction_date,
+        ).where(
+            and_(
+                EZPassTransaction.status == "Imported",
+                EZPassTransaction.id > after_id,
+            )
+        ).order_by(EZPassTransaction.id).limit(limit)
 
-        stmt = select(EZPassTransaction).where(
-            EZPassTransaction.status == "Imported"
-        )
         result = await self.db.execute(stmt)
-        transactions = result.scalars().all()
+        rows = result.all()
 
-        logger.info("Unassociated transactions fetched", count=len(transactions))
-        return list(transactions)
-    
-    async def get_unposted_transactions(self) -> List[EZPassTransaction]:
-        """Get all transactions with status 'Associated'"""
-        logger.debug("Fetching unposted transactions")
+        logger.info("Unassociated transaction keys fetched", count=len(rows))
+        return list(rows)
+
+    async def get_unposted_transaction_rows(
+        self, after_id: int = 0, limit: int = 5000
+    ) -> List[Row]:
+        """
+        Get the columns needed for posting of transactions with status
+        'Associated', ordered by id and starting after `after_id`.
+        """
+        logger.debug("Fetching unposted transaction rows", after_id=after_id, limit=limit)
+
+        stmt = select(
+            EZPassTransaction.id,
+            EZPassTransaction.transaction_id,
+            EZPassTransaction.transaction_date,
+            EZPassTransaction.amount,
+            EZPassTransaction.driver_id,
+            EZPassTransaction.vehicle_id,
+            EZPassTransaction.plate_no,
+            EZPassTransaction.agency,
+            EZPassTransaction.entry_plaza,
+            EZPassTransaction.exit_plaza,
+        ).where(
+            and_(
+                EZPassTransaction.status == "Associated",
+                EZPassTransaction.id > after_id,
+            )
+        ).order_by(EZPassTransaction.id).limit(limit)
+
+        result = await self.db.execute(stmt)
+        rows = result.all()
 
-        stmt = select(EZPassTransaction).where(
-            EZPassTransaction.status == "Associated"
+        logger.info("Unposted transaction rows fetched", count=len(rows))
+        return list(rows)
+
+    async def bulk_update_transactions(self, transaction_rows: List[Dict[str, Any]]) -> int:
+        """
+        Update many transactions with per-row values in a single executemany UPDATE.
+
+        Each dict must contain the transaction `id` plus the columns to set;
+        all dicts in one call should carry the same keys.
+        """
+        if not transaction_rows:
+            return 0
+
+        logger.debug("Bulk updating transactions", count=len(transaction_rows))
+
+        await self.db.execute(update(EZPassTransaction), transaction_rows)
+
+        logger.info("Transactions bulk updated", count=len(transaction_rows))
+        return len(transaction_rows)
+
+    async def update_transactions_by_ids(
+        self, transaction_ids: List[int], values: Dict[str, Any]
+    ) -> int:
+        """Apply the same column values to every transaction in transaction_ids with one UPDATE"""
+        if not transaction_ids:
+            return 0
+
+        logger.debug("Updating transactions by IDs", count=len(transaction_ids), fields=list(values))
+
+        stmt = (
+            update(EZPassTransaction)
+            .where(EZPassTransaction.id.in_(transaction_ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
         )
         result = await self.db.execute(stmt)
-        transactions = result.scalars().all()
 
-        logger.info("Unposted transactions fetched", count=len(transactions))
-        return list(transactions)
-    
+        logger.info("Transactions updated by IDs", count=result.rowcount)
+        return result.rowcount
+
     # ======== Log Operations ========
 
     async def get_log_by_id(self, log_id: int) -> Optional[EZPassLog]:
@@ -271,23 +349,16 @@ class EZPassRepository:
         count_stmt = select(func.count()).select_from(EZPassLog)
         if conditions:
             count_stmt = count_stmt.where(and_(*conditions))
-        total_count_result = await self.db.execute(count_stmt)
-        total_count = total_count_result.scalar()
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
-        # === Apply sorting ===
+        # === Apply sorting and pagination ===
         sort_column = getattr(EZPassLog, filters.sort_by, EZPassLog.log_date)
-        if filters.sort_order == "desc":
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(asc(sort_column))
-
-        # === Apply pagination ===
-        offset = (filters.page - 1) * filters.per_page
-        query = query.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order == "desc", EZPassLog.id)
+        query = paginate(query, order, filters.per_page, filters.page, filters.cursor)
 
         # === Execute query ===
         result = await self.db.execute(query)
-        logs = result.scalars().all()
+        logs = to_page(result.scalars().all(), order, filters.per_page)
 
         logger.info(
             "Logs fetched successfully",
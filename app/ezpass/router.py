@@ -20,17 +20,21 @@ from app.ezpass.schemas import (
     EZPassTransactionResponse, PaginatedEZPassTransactionResponse,
     EZPassLogResponse, PaginatedEZPassLogResponse,
     EZPassTransactionUpdate, EZPassTransactionFilters, EZPassLogFilters,
-    EZPassImportResult, EZPassAssociationResult, EZPassPostingResult,
+    EZPassImportResult, EZPassImportTaskResponse, EZPassImportTaskStatus,
+    EZPassAssociationResult, EZPassPostingResult,
 )
 from app.ezpass.exceptions import (
     EZPassBaseException, convert_to_http_exception,
     EZPassFileValidationException, EZPassExportException,
 )
-from app.ezpass.utils import validate_ezpass_file
+from app.core.concurrency import run_sync
 from app.users.models import User
 from app.users.utils import get_current_user
 from app.utils.logger import get_logger
 from app.utils.exporter_utils import ExporterFactory
+from app.utils.ingestion import (
+    dispatch_task, get_task_progress, is_supported_file, remove_spooled, spool_upload,
+)
 
 logger = get_logger(__name__)
 router = APIRouter(tags=["EZPass"], prefix="/ezpass")
@@ -48,6 +52,7 @@ async def import_ezpass(
     Import EZPass data from an uploaded file.
 
     The file should be in CSV or Excel format with the required columns.
+    It is streamed in chunks; use /import/async for large files.
     """
     logger.info(
         "EZPass import request received",
@@ -55,13 +60,16 @@ async def import_ezpass(
         user_id=current_user.id
     )
 
+    path = None
     try:
-        # === Validate and parse file ===
-        rows = validate_ezpass_file(file)
-        logger.info("File validated successfully", row_count=len(rows))
+        if not is_supported_file(file.filename):
+            raise EZPassFileValidationException(
+                "Invalid file format. Only CSV and Excel files are supported."
+            )
 
-        # === Process data ===
-        result = await ezpass_service.process_ezpass_data(rows)
+        # === Spool and import in chunks ===
+        path = await run_sync(spool_upload, file, "ezpass-")
+        result = await ezpass_service.import_ezpass_file(path, file.filename)
 
         logger.info(
             "EZPass import completed",
@@ -83,6 +91,63 @@ async def import_ezpass(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to import EZPass data: {str(e)}"
         ) from e
+    finally:
+        remove_spooled(path)
+
+
+@router.post("/import/async", response_model=EZPassImportTaskResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_ezpass_async(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Queue an import of EZPass data from an uploaded file.
+
+    The file is spooled and imported by a background worker; poll
+    /import/status/{task_id} for progress and the import result.
+    """
+    logger.info(
+        "EZPass async import request received",
+        filename=file.filename,
+        user_id=current_user.id
+    )
+
+    if not is_supported_file(file.filename):
+        raise convert_to_http_exception(EZPassFileValidationException(
+            "Invalid file format. Only CSV and Excel files are supported."
+        ))
+
+    path = await run_sync(spool_upload, file, "ezpass-")
+    try:
+        task_id = await run_sync(
+            dispatch_task, "app.ezpass.tasks.import_ezpass_file", path, file.filename
+        )
+    except Exception as e:
+        remove_spooled(path)
+        logger.error("Failed to queue EZPass import", error=str(e), exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to queue EZPass import: {str(e)}"
+        ) from e
+
+    logger.info("EZPass import queued", task_id=task_id, filename=file.filename)
+    return EZPassImportTaskResponse(
+        task_id=task_id,
+        filename=file.filename,
+        message="Import queued",
+    )
+
+
+@router.get("/import/status/{task_id}", response_model=EZPassImportTaskStatus)
+async def get_import_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the state of a queued import: PENDING, STARTED, PROGRESS (rows read
+    so far), SUCCESS (with the import result) or FAILURE (with the error).
+    """
+    return await run_sync(get_task_progress, task_id)
 
 
 # ===================== Transaction Operations =====================
@@ -100,6 +165,7 @@ async def list_transactions(
     transaction_status: Optional[str] = Query(None, description="Comma-separated statuses"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("updated_on", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     ezpass_service: EZPassService = Depends(),
@@ -123,6 +189,7 @@ async def list_transactions(
             transaction_status=transaction_status,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order
         )
@@ -138,7 +205,8 @@ async def list_transactions(
             total_items=total_count,
             page=page,
             per_page=per_page,
-            total_pages=math.ceil(total_count / per_page)
+            total_pages=math.ceil(total_count / per_page),
+            next_cursor=transactions.next_cursor
         )
         
         logger.info("Transactions listed successfully", count=len(transactions_data))
@@ -342,6 +410,7 @@ async def list_logs(
     unidentified_count: Optional[int] = Query(None, description="Unidentified count"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("log_date", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     ezpass_service: EZPassService = Depends(),
@@ -364,6 +433,7 @@ async def list_logs(
             unidentified_count=unidentified_count,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order
         )
@@ -377,7 +447,8 @@ async def list_logs(
             total_items=total_count,
             page=page,
             per_page=per_page,
-            total_pages=math.ceil(total_count / per_page)
+            total_pages=math.ceil(total_count / per_page),
+            next_cursor=logs.next_cursor
         )
         
         logger.info("Logs listed successfully", count=len(logs_data))
@@ -6,7 +6,7 @@ Enhanced to match CSV format
 """
 
 from datetime import datetime, date, time
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -81,6 +81,7 @@ class PaginatedEZPassTransactionResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["Imported", "Associated", "Posted", "Failed"]
 
 
@@ -119,6 +120,7 @@ class PaginatedEZPassLogResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["Success", "Failure", "Partial"]
     types: List[str] = ["Import", "Associate", "Post"]
 
@@ -135,6 +137,22 @@ class EZPassImportResult(BaseModel):
     message: str
 
 
+class EZPassImportTaskResponse(BaseModel):
+    """Schema for a background import that was queued."""
+    task_id: str
+    filename: Optional[str] = None
+    message: str
+
+
+class EZPassImportTaskStatus(BaseModel):
+    """Schema for the state of a background import."""
+    task_id: str
+    status: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[EZPassImportResult] = None
+    error: Optional[str] = None
+
+
 class EZPassAssociationResult(BaseModel):
     """Schema for association operation result."""
     success: bool
@@ -170,6 +188,7 @@ class EZPassTransactionFilters(BaseModel):
     transaction_status: Optional[str] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
     sort_by: str = "updated_on"
     sort_order: str = "desc"
 
@@ -186,6 +205,7 @@ class EZPassLogFilters(BaseModel):
     unidentified_count: Optional[int] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
     sort_by: str = "log_date"
     sort_order: str = "desc"
 
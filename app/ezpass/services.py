@@ -4,14 +4,15 @@
 Enhanced business logic layer for EZPass operations with complete association and posting logic.
 """
 
+from collections import defaultdict
 from datetime import datetime, timezone, date
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Callable, List, Tuple, Optional, Dict, Any
 
 from fastapi import Depends
-from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from app.core.concurrency import run_sync
+from app.core.config import settings
 from app.core.db import get_async_db
 from app.ezpass.repository import EZPassRepository
 from app.ezpass.schemas import (
@@ -23,19 +24,21 @@ from app.ezpass.models import EZPassTransaction, EZPassLog
 from app.ezpass.exceptions import (
     EZPassTransactionNotFoundException, EZPassLogNotFoundException,
     EZPassImportException, EZPassAssociationException, EZPassPostingException,
-    EZPassUpdateException,
+    EZPassUpdateException, EZPassFileValidationException,
 )
-from app.ezpass.utils import clean_plate_number
+from app.ezpass.utils import iter_ezpass_file
 
-from app.leases.models import Lease
-from app.vehicles.models import Vehicle, VehicleRegistration
-from app.medallions.models import Medallion
-from app.ledger.models import LedgerEntry, LedgerSourceType
+from app.vehicles.plate_index import plate_resolver
+from app.ledger.schemas import LedgerCategory
+from app.ledger.services import LedgerService
 
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Ledger reference_type of EZPass obligations; reference_id is the transaction id
+EZPASS_REFERENCE_TYPE = "EZPASS_TRANSACTION"
+
 
 def get_ezpass_repository(db: AsyncSession = Depends(get_async_db)) -> EZPassRepository:
     """Dependency to get EZPassRepository instance."""
@@ -125,549 +128,365 @@ class EZPassService:
             )
             raise EZPassUpdateException(transaction_id, str(e)) from e
         
-    async def process_ezpass_data(
+    async def import_ezpass_file(
         self,
-        rows: List[dict],
-        log_type: str = "Import"
+        path: str,
+        filename: Optional[str] = None,
+        progress: Optional[Callable[[int], None]] = None,
+        log_type: str = "Import",
     ) -> EZPassImportResult:
         """
-        Process and Import EZPass data from file.
-        """
-        logger.info("Processing EZPass data", rows_count=len(rows), log_type=log_type)
+        Import a spooled EZPass upload chunk by chunk.
 
+        Each chunk of INGESTION_CHUNK_SIZE rows is validated with column
+        operations, written with one multi-row INSERT and committed together
+        with the log counts, so memory stays flat however large the file is.
+        `progress`, when given, is called with the number of rows read so far
+        after every chunk.
+        """
+        logger.info("Importing EZPass file", path=path, filename=filename, log_type=log_type)
+
+        log = await self.repo.create_log(EZPassLogCreate(
+            log_date=datetime.now(timezone.utc),
+            log_type=log_type,
+            records_impacted=0,
+            success_count=0,
+            unidentified_count=0,
+            status="Processing",
+        ))
+        await self.repo.db.commit()
+        logger.info("Import log created", log_id=log.id)
+
+        records_impacted = success_count = unidentified_count = 0
         try:
-            # Create log entry
-            log_data = EZPassLogCreate(
-                log_date=datetime.now(timezone.utc),
-                log_type=log_type,
-                records_impacted=len(rows),
-                success_count=0,
-                unidentified_count=0,
-                status="Processing",
-            )
-            log = await self.repo.create_log(log_data)
-            logger.info("Import log created", log_id=log.id)
-
-            # === Process transactions ===
-            transactions_data = []
-            success_count = 0
-            unidentified_count = 0
-
-            for row in rows:
-                try:
-                    # === Clean and prepare data ===
-                    transaction_data = EZPassTransactionCreate(
-                        transaction_id=str(row.get("transaction_id", "")),
-                        transaction_date=row.get("transaction_date"),
-                        transaction_time=row.get("transaction_time"),
-                        plate_no=row.get("plate_no"),
-                        tag_or_plate=row.get("tag_or_plate") or row.get("plate_no", ""),
-                        agency=row.get("agency"),
-                        entry_plaza=row.get("entry_plaza"),
-                        exit_plaza=row.get("exit_plaza"),
-                        amount=float(row.get("amount", 0)),
-                        status="Imported",
-                        log_id=log.id,
-                    )
-                    transactions_data.append(transaction_data)
-                    success_count += 1
-                except Exception as e:
-                    logger.warning("Failed to process row", row=row, error=str(e))
-                    unidentified_count += 1
-
-            # === Bulk create transactions ===
-            if transactions_data:
-                await self.repo.bulk_create_transactions(transactions_data)
-                logger.info("Transactions imported successfully", count=len(transactions_data))
-
-            # === Update log ===
+            chunks = iter_ezpass_file(path)
+            while (chunk := await run_sync(next, chunks, None)) is not None:
+                rows, errors = chunk
+                for row in rows:
+                    row.update(status="Imported", log_id=log.id)
+                await self.repo.insert_transaction_rows(rows)
+
+                records_impacted += len(rows) + len(errors)
+                success_count += len(rows)
+                unidentified_count += len(errors)
+                await self.repo.update_log(
+                    log,
+                    records_impacted=records_impacted,
+                    success_count=success_count,
+                    unidentified_count=unidentified_count,
+                )
+                await self.repo.db.commit()
+                if progress:
+                    progress(records_impacted)
+
+            if not success_count:
+                await self.repo.update_log(log, status="Failure")
+                await self.repo.db.commit()
+                raise EZPassFileValidationException(
+                    "No valid rows found in file" if records_impacted else "File is empty"
+                )
+
             await self.repo.update_log(
-                log,
-                success_count=success_count,
-                unidentified_count=unidentified_count,
-                status="Success" if unidentified_count == 0 else "Partial"
+                log, status="Success" if unidentified_count == 0 else "Partial"
             )
+            await self.repo.db.commit()
 
             result = EZPassImportResult(
                 success=True,
                 log_id=log.id,
-                records_impacted=len(rows),
+                records_impacted=records_impacted,
                 success_count=success_count,
                 unidentified_count=unidentified_count,
                 message=f"Successfully imported {success_count} records, {unidentified_count} failed"
             )
-
-            logger.info("EZPass data processing completed", result=result.model_dump())
+            logger.info("EZPass file import completed", result=result.model_dump())
             return result
 
+        except EZPassFileValidationException:
+            if log.status == "Processing":
+                await self._fail_log(log)
+            raise
         except Exception as e:
-            logger.error("Error processing EZPass data", error=str(e), exc_info=True)
+            logger.error("Error importing EZPass file", path=path, error=str(e), exc_info=True)
+            await self._fail_log(log)
             raise EZPassImportException(str(e)) from e
-        
-    async def associate_transactions(self) -> EZPassAssociationResult:
+
+    async def associate_transactions(
+        self, batch_size: Optional[int] = None
+    ) -> EZPassAssociationResult:
         """
         Associate imported transactions with vehicles, drivers, and medallions.
 
         Logic:
-        1. Get all unassociated transactions (status='Imported')
-        2. For each transaction, find active lease by plate number
-        3. Get vehicle, driver, and medallion from the lease
-        4. Update transaction with associations
-        5. Mark as 'Associated' or 'Failed'
+        1. Walk transactions with status='Imported' in id-ordered batches
+        2. Resolve each batch's plate/date pairs to lease, driver, vehicle and
+           medallion through the shared plate index (app.vehicles.plate_index)
+        3. Write associations with one executemany UPDATE and failures with
+           one UPDATE per batch
+        4. Commit every batch together with the run's log counts
+
+        A batch's status change is its checkpoint: if the run fails, earlier
+        batches stay committed and a rerun only picks up what is still
+        'Imported'.
         """
-        logger.info("Starting transaction association process")
+        batch_size = batch_size or settings.ezpass_batch_size
+        logger.info("Starting transaction association process", batch_size=batch_size)
+
+        db = self.repo.db
+        log = await self.repo.create_log(EZPassLogCreate(
+            log_date=datetime.now(timezone.utc),
+            log_type="Associate",
+            records_impacted=0,
+            success_count=0,
+            unidentified_count=0,
+            status="Processing"
+        ))
+        await db.commit()
+
+        associated_count = 0
+        failed_count = 0
+        last_id = 0
 
         try:
-            # === Get unassociated transactions ===
-            transactions = await self.repo.get_unassociated_transactions()
-            logger.info("Found unassociated transactions", count=len(transactions))
-
-            if not transactions:
-                return EZPassAssociationResult(
-                    success=True,
-                    total_transactions=0,
-                    associated_count=0,
-                    failed_count=0,
-                    message="No unassociated transactions found"
+            while True:
+                transactions = await self.repo.get_unassociated_transaction_keys(
+                    after_id=last_id, limit=batch_size
                 )
-            
-            associated_count = 0
-            failed_count = 0
-            db = self.repo.db
-
-            for transaction in transactions:
-                try:
-                    logger.debug(
-                        "Processing transaction for association",
-                        transaction_id=transaction.id,
-                        plate_no=transaction.plate_no
-                    )
+                if not transactions:
+                    break
+                last_id = transactions[-1].id
 
-                    # === Find active lease by plate number ===
-                    lease_data = await self._find_active_lease_by_plate(
-                        db, transaction.plate_no, transaction.transaction_date
-                    )
+                # === Resolve every plate/date pair of the batch in one pass ===
+                resolutions = await plate_resolver.resolve(
+                    db, ((t.plate_no, t.transaction_date) for t in transactions if t.plate_no)
+                )
 
-                    if not lease_data:
-                        logger.warning(
-                            "No active lease found for transaction",
-                            transaction_id=transaction.id,
-                            plate_no=transaction.plate_no
-                        )
-
-                        update_data = EZPassTransactionUpdate(
-                            status="Failed",
-                            associate_failed_reason=f"No active lease found for plate: {transaction.plate_no}"
-                        )
-                        await self.repo.update_transaction(transaction, update_data)
-                        failed_count += 1
+                associated_rows = []
+                failed_by_reason: Dict[str, List[int]] = defaultdict(list)
+                for transaction in transactions:
+                    resolution = resolutions.get((transaction.plate_no, transaction.transaction_date))
+                    if not resolution or not resolution.has_lease:
+                        failed_by_reason[
+                            f"No active lease found for plate: {transaction.plate_no}"
+                        ].append(transaction.id)
                         continue
 
-                    # === Update transaction with associations ===
-                    update_data = EZPassTransactionUpdate(
-                        status="Associated",
-                        driver_id=lease_data.get("driver_id"),
-                        vehicle_id=lease_data.get("vehicle_id"),
-                        medallion_no=lease_data.get("medallion_no"),
-                        associate_failed_reason=None
-                    ),
-
-                    await self.repo.update_transaction(transaction, update_data)
-                    associated_count += 1
-
-                    logger.info(
-                        "Transaction associated successfully",
-                        transaction_id=transaction.id,
-                        lease_id=lease_data.get("lease_id"),
-                        driver_id=lease_data.get("driver_id"),
-                        vehicle_id=lease_data.get("vehicle_id")
-                    )
-                except Exception as e:
-                    logger.error(
-                        "Failed to associate transaction",
-                        transaction_id=transaction.id,
-                        error=str(e),
-                        exc_info=True
+                    associated_rows.append({
+                        "id": transaction.id,
+                        "status": "Associated",
+                        "driver_id": resolution.driver_id,
+                        "vehicle_id": resolution.vehicle_id,
+                        "medallion_no": resolution.medallion_no,
+                        "associate_failed_reason": None,
+                    })
+
+                # === Write the batch grouped by outcome ===
+                await self.repo.bulk_update_transactions(associated_rows)
+                for reason, ids in failed_by_reason.items():
+                    await self.repo.update_transactions_by_ids(
+                        ids, {"status": "Failed", "associate_failed_reason": reason}
                     )
-                    update_data = EZPassTransactionUpdate(
-                        status="Failed",
-                        associate_failed_reason=f"Association error: {str(e)}"
-                    )
-                    await self.repo.update_transaction(transaction, update_data)
-                    failed_count += 1
-
-            # === Create association log ===
-            log_data = EZPassLogCreate(
-                log_date=datetime.now(timezone.utc),
-                log_type="Associate",
-                records_impacted=len(transactions),
-                success_count=associated_count,
-                unidentified_count=failed_count,
-                status="Success" if failed_count == 0 else "Partial"
+
+                associated_count += len(associated_rows)
+                failed_count += sum(len(ids) for ids in failed_by_reason.values())
+                await self.repo.update_log(
+                    log,
+                    records_impacted=associated_count + failed_count,
+                    success_count=associated_count,
+                    unidentified_count=failed_count,
+                )
+                await db.commit()
+
+                logger.info(
+                    "Association batch committed",
+                    last_id=last_id,
+                    associated=len(associated_rows),
+                    failed=len(transactions) - len(associated_rows),
+                )
+
+            await self.repo.update_log(
+                log, status="Success" if failed_count == 0 else "Partial"
             )
-            await self.repo.create_log(log_data)
+            await db.commit()
 
+            total_processed = associated_count + failed_count
             result = EZPassAssociationResult(
                 success=True,
-                total_processed=len(transactions),
+                total_processed=total_processed,
                 associated_count=associated_count,
                 failed_count=failed_count,
-                message=f"Associated {associated_count} transactions, {failed_count} failed"
+                message=(
+                    f"Associated {associated_count} transactions, {failed_count} failed"
+                    if total_processed else "No unassociated transactions found"
+                )
             )
 
             logger.info("Transaction association completed", result=result.model_dump())
             return result
 
         except Exception as e:
-            logger.error("Error associating transactions", error=str(e), exc_info=True)
+            logger.error(
+                "Error associating transactions",
+                error=str(e), after_id=last_id, exc_info=True
+            )
+            await self._fail_log(log)
             raise EZPassAssociationException(str(e)) from e
-        
-    async def post_transactions_to_ledger(self) -> EZPassPostingResult:
+
+    async def post_transactions_to_ledger(
+        self, batch_size: Optional[int] = None
+    ) -> EZPassPostingResult:
         """
         Post associated transactions to the central ledger.
-        
+
         Logic:
-        1. Get all unposted transactions (status='Associated')
-        2. For each transaction, create ledger entry
-        3. Mark transaction as 'Posted' with posting_date
-        4. Handle errors and mark as 'Failed' if posting fails
+        1. Walk transactions with status='Associated' in id-ordered batches
+        2. Look up the active lease of every (vehicle, date) pair in one query
+        3. Create the batch's EZPass obligations with multi-row ledger
+           posting and balance INSERTs
+        4. Mark posted and failed transactions with one UPDATE per outcome
+        5. Commit every batch, so a rerun resumes after the last committed one
         """
-        logger.info("Starting transaction posting to ledger")
+        batch_size = batch_size or settings.ezpass_batch_size
+        logger.info("Starting transaction posting to ledger", batch_size=batch_size)
+
+        db = self.repo.db
+        ledger_service = LedgerService(db)
+        log = await self.repo.create_log(EZPassLogCreate(
+            log_date=datetime.now(timezone.utc),
+            log_type="Post",
+            records_impacted=0,
+            success_count=0,
+            unidentified_count=0,
+            status="Processing"
+        ))
+        await db.commit()
+
+        posted_count = 0
+        failed_count = 0
+        last_id = 0
 
         try:
-            # === Get unposted transactions ===
-            transactions = await self.repo.get_unposted_transactions()
-            logger.info("Found unposted transactions", count=len(transactions))
-
-            if not transactions:
-                return EZPassPostingResult(
-                    success=True,
-                    total_processed=0,
-                    posted_count=0,
-                    failed_count=0,
-                    message="No transactions to post"
+            while True:
+                transactions = await self.repo.get_unposted_transaction_rows(
+                    after_id=last_id, limit=batch_size
                 )
-            
-            posted_count = 0
-            failed_count = 0
-            db = self.repo.db
-
-            for transaction in transactions:
-                try:
-                    logger.debug(
-                        "Processing transaction for posting",
-                        transaction_id=transaction.id,
-                        driver_id=transaction.driver_id,
-                        vehicle_id=transaction.vehicle_id
-                    )
+                if not transactions:
+                    break
+                last_id = transactions[-1].id
 
-                    # === Get full lease details for posting ===
-                    lease_data = await self._get_lease_for_transaction(db, transaction)
-
-                    if not lease_data:
-                        logger.warning(
-                            "No lease data found for posting",
-                            transaction_id=transaction.id
-                        )
-                        update_data = EZPassTransactionUpdate(
-                            status="Failed",
-                            post_failed_reason="No lease data found for posting"
-                        )
-                        await self.repo.update_transaction(transaction, update_data)
-                        failed_count += 1
+                # === Active lease of every transaction in one query ===
+                leases = await plate_resolver.leases_on(
+                    db, ((t.vehicle_id, t.transaction_date) for t in transactions)
+                )
+
+                obligations = []
+                failed_by_reason: Dict[str, List[int]] = defaultdict(list)
+                for transaction in transactions:
+                    lease = leases.get((transaction.vehicle_id, transaction.transaction_date))
+                    if not lease:
+                        failed_by_reason["No lease data found for posting"].append(transaction.id)
+                        continue
+                    if not transaction.driver_id:
+                        failed_by_reason["No driver associated with transaction"].append(transaction.id)
+                        continue
+                    if not transaction.amount or transaction.amount <= 0:
+                        failed_by_reason["Amount must be positive"].append(transaction.id)
                         continue
 
-                    # === Create ledger entry ===
-                    ledger_entry = await self._create_ledger_entry(
-                        db, transaction, lease_data
-                    )
+                    obligations.append({
+                        "reference_id": str(transaction.id),
+                        "amount": transaction.amount,
+                        "driver_id": transaction.driver_id,
+                        "vehicle_id": transaction.vehicle_id,
+                        "plate": transaction.plate_no,
+                        "medallion_id": lease.medallion_id,
+                        "lease_id": lease.lease_id,
+                        "transaction_date": transaction.transaction_date,
+                        "description": (
+                            f"EZPass - {transaction.agency or 'Toll'} - {transaction.plate_no} "
+                            f"(Entry: {transaction.entry_plaza}, Exit: {transaction.exit_plaza})"
+                        ),
+                    })
+
+                # === Multi-row ledger insert for the batch ===
+                # References posted by an earlier, interrupted run are skipped
+                # by the ledger and only need their status brought up to date.
+                await ledger_service.create_obligation_postings_batch(
+                    LedgerCategory.EZPASS, EZPASS_REFERENCE_TYPE, obligations
+                )
 
-                    if ledger_entry:
-                        # === Update transaction as posted ===
-                        update_data = EZPassTransactionUpdate(
-                            status="Posted",
-                            posting_date=datetime.now(timezone.utc).date(),
-                            post_failed_reason=None
-                        )
-                        await self.repo.update_transaction(transaction, update_data)
-                        posted_count += 1
-
-                        logger.info(
-                            "Transaction posted successfully",
-                            transaction_id=transaction.id,
-                            ledger_id=ledger_entry.id
-                        )
-                    else:
-                        update_data = EZPassTransactionUpdate(
-                            status="Failed",
-                            post_failed_reason="Failed to create ledger entry"
-                        )
-                        await self.repo.update_transaction(transaction, update_data)
-                        failed_count += 1
-
-                except Exception as e:
-                    logger.error(
-                        "Failed to post transaction",
-                        transaction_id=transaction.id,
-                        error=str(e),
-                        exc_info=True
-                    )
-                    update_data = EZPassTransactionUpdate(
-                        status="Failed",
-                        post_failed_reason=f"Posting error: {str(e)}"
+                await self.repo.update_transactions_by_ids(
+                    [int(o["reference_id"]) for o in obligations],
+                    {
+                        "status": "Posted",
+                        "posting_date": datetime.now(timezone.utc).date(),
+                        "post_failed_reason": None,
+                    },
+                )
+                for reason, ids in failed_by_reason.items():
+                    await self.repo.update_transactions_by_ids(
+                        ids, {"status": "Failed", "post_failed_reason": reason}
                     )
-                    await self.repo.update_transaction(transaction, update_data)
-                    failed_count += 1
-
-            # === Create posting log ===
-            log_data = EZPassLogCreate(
-                log_date=datetime.now(timezone.utc),
-                log_type="Post",
-                records_impacted=len(transactions),
-                success_count=posted_count,
-                unidentified_count=failed_count,
-                status="Success" if failed_count == 0 else "Partial"
+
+                posted_count += len(obligations)
+                failed_count += sum(len(ids) for ids in failed_by_reason.values())
+                await self.repo.update_log(
+                    log,
+                    records_impacted=posted_count + failed_count,
+                    success_count=posted_count,
+                    unidentified_count=failed_count,
+                )
+                await db.commit()
+
+                logger.info(
+                    "Posting batch committed",
+                    last_id=last_id,
+                    posted=len(obligations),
+                    failed=len(transactions) - len(obligations),
+                )
+
+            await self.repo.update_log(
+                log, status="Success" if failed_count == 0 else "Partial"
             )
-            await self.repo.create_log(log_data)
+            await db.commit()
 
+            total_processed = posted_count + failed_count
             result = EZPassPostingResult(
                 success=True,
-                total_processed=len(transactions),
+                total_processed=total_processed,
                 posted_count=posted_count,
                 failed_count=failed_count,
-                message=f"Posted {posted_count} transactions, {failed_count} failed"
-            )
-
-            logger.info("Transaction posting completed", result=result.model_dump())
-            return result
-
-        except Exception as e:
-            logger.error("Error posting transactions to ledger", error=str(e), exc_info=True)
-            raise EZPassPostingException(str(e)) from e
-        
-    # === Helper Methods ===
-
-    async def _find_active_lease_by_plate(
-        self,
-        db: AsyncSession,
-        plate_no: str,
-        transaction_date: date
-    ) -> Optional[Dict[str, Any]]:
-        """
-        Find active lease for a vehicle by plate number on the transaction date.
-
-        Returns dictionary with lease_id, driver_id, vehicle_id, medallion_no
-        """
-        if not plate_no:
-            return None
-        
-        # === Clean plate number for matching ===
-        cleaned_plate = clean_plate_number(plate_no)
-
-        logger.debug(
-            "Searching for active lease",
-            plate_no=plate_no,
-            cleaned_plate=cleaned_plate,
-            transaction_date=transaction_date
-        )
-
-        try:
-            # === Query to find vehicle by plate number (current or historical registration) ===
-            vehicle_stmt = select(Vehicle).join(
-                VehicleRegistration,
-                Vehicle.id == VehicleRegistration.vehicle_id
-            ).where(
-                or_(
-                    VehicleRegistration.plate_number.like(f"{plate_no}%"),
-                    VehicleRegistration.plate_number.like(f"{cleaned_plate}%")
+                message=(
+                    f"Posted {posted_count} transactions, {failed_count} failed"
+                    if total_processed else "No transactions to post"
                 )
             )
 
-            vehicle_result = await db.execute(vehicle_stmt)
-            vehicle = vehicle_result.scalar_one_or_none()
-            
-
-            if not vehicle:
-                logger.info("No vehicle found for plate number", plate_no=plate_no, cleaned_plate=cleaned_plate)
-                return None
-            
-            logger.info("Vehicle found", vehicle_id=vehicle.id, plate_no=plate_no)
-
-            # === Find active lease for this vehicle on the transaction date ===
-            lease_stmt = select(Lease).options(
-                selectinload(Lease.lease_driver)
-            ).where(
-                and_(
-                    Lease.vehicle_id == vehicle.id,
-                    Lease.lease_start_date <= transaction_date,
-                    or_(
-                        Lease.lease_end_date >= transaction_date,
-                        Lease.lease_end_date.is_(None)
-                    ),
-                    Lease.lease_status == "Active"
-                )
-            ).order_by(Lease.lease_start_date.desc())
-            logger.info("***** Finding lease stmt ****", stmt=lease_stmt)
-
-            lease_result = await db.execute(lease_stmt)
-            lease = lease_result.scalar_one_or_none()
-
-            if not lease:
-                logger.debug(
-                    "No active lease found for vehicle",
-                    vehicle_id=vehicle.id,
-                    transaction_date=transaction_date,
-                )
-                return None
-
-            # === Get primary driver from lease ===
-            driver_id = None
-            if lease.lease_driver:
-                # === Get the primary driver or the first driver ===
-                primary_driver = next(
-                    (ld for ld in lease.lease_driver if ld.col_lease_seq == 1),
-                    lease.lease_driver[0] if lease.lease_driver else None
-                )
-                if primary_driver:
-                    driver_id = primary_driver.driver_id
-
-            # === Get medallion number ===
-            medallion_no = None
-            if lease.medallion_id:
-                medallion_stmt = select(Medallion.medallion_number).where(
-                    Medallion.id == lease.medallion_id
-                )
-                medallion_result = await db.execute(medallion_stmt)
-                medallion_no = medallion_result.scalar_one_or_none()
-
-            result = {
-                "lease_id": lease.id,
-                "driver_id": driver_id,
-                "vehicle_id": vehicle.id,
-                "medallion_no": medallion_no,
-                "medallion_id": lease.medallion_id,
-            }
-
-            logger.info(
-                "Active lease found",
-                lease_id=lease.id,
-                vehicle_id=vehicle.id,
-                driver_id=driver_id,
-                medallion_no=medallion_no
-            )
+            logger.info("Transaction posting completed", result=result.model_dump())
             return result
 
         except Exception as e:
             logger.error(
-                "Error finding active lease",
-                plate_no=plate_no,
-                error=str(e),
-                exc_info=True
+                "Error posting transactions to ledger",
+                error=str(e), after_id=last_id, exc_info=True
             )
-            return None
-        
-    async def _get_lease_for_transaction(
-        self,
-        db: AsyncSession,
-        transaction: EZPassTransaction
-    ) -> Optional[Dict[str, Any]]:
-        """Get full lease details for a transaction."""
-        if not transaction.vehicle_id:
-            return None
+            await self._fail_log(log)
+            raise EZPassPostingException(str(e)) from e
 
-        try:
-            # === Get lease with all related data ===
-            lease_stmt = select(Lease).options(
-                selectinload(Lease.lease_driver),
-                selectinload(Lease.vehicle),
-                selectinload(Lease.medallion)
-            ).where(
-                and_(
-                    Lease.vehicle_id == transaction.vehicle_id,
-                    Lease.lease_start_date <= transaction.transaction_date,
-                    or_(
-                        Lease.lease_end_date >= transaction.transaction_date,
-                        Lease.lease_end_date.is_(None)
-                    ),
-                    Lease.lease_status == "Active"
-                )
-            ).order_by(Lease.lease_start_date.desc())
-
-            lease_result = await db.execute(lease_stmt)
-            lease = lease_result.scalar_one_or_none()
-
-            if not lease:
-                return None
-            
-            return {
-                "lease_id": lease.id,
-                "driver_id": transaction.driver_id,
-                "vehicle_id": lease.vehicle_id,
-                "medallion_id": lease.medallion_id,
-                "medallion_no": transaction.medallion_no,
-                "lease": lease,
-            }
-        
-        except Exception as e:
-            logger.error(
-                "Error getting lease for transaction",
-                transaction_id=transaction.id,
-                error=str(e)
-            )
-            return None
-        
-    async def _create_ledger_entry(
-        self,
-        db: AsyncSession,
-        transaction: EZPassTransaction,
-        lease_data: Dict[str, Any],
-    ) -> Optional[LedgerEntry]:
-        """
-        Create ledger entry for EZPass transaction
+    # === Helper Methods ===
 
-        This creates a debit entry for the driver/lease.
-        """
+    async def _fail_log(self, log: EZPassLog) -> None:
+        """Roll back the failed batch and mark the run's log as failed, keeping committed counts"""
+        db = self.repo.db
+        await db.rollback()
         try:
-            # === Create ledger entry ===
-            ledger_entry = LedgerEntry(
-                transaction_date=transaction.transaction_date,
-                posting_date=datetime.now(timezone.utc).date(),
-                amount=transaction.amount,
-                transaction_type="Debit",
-                description=f"EZPass - {transaction.agency or 'Toll'} - {transaction.plate_no}",
-                reference_number=transaction.transaction_id,
-                source_type=LedgerSourceType.EZPASS,
-                source_id=transaction.id,
-                driver_id=transaction.driver_id,
-                vehicle_id=transaction.vehicle_id,
-                lease_id=lease_data.get("lease_id"),
-                medallion_id=lease_data.get("medallion_id"),
-                status="Posted",
-                notes=f"Entry: {transaction.entry_plaza}, Exit: {transaction.exit_plaza}",
-            )
-
-            db.add(ledger_entry)
-            await db.flush()
-            await db.refresh(ledger_entry)
-
-            logger.info(
-                "Ledger entry created",
-                ledger_id=ledger_entry.id,
-                transaction_id=transaction.id,
-                amount=transaction.amount
-            )
-
-            return ledger_entry
-
+            await db.refresh(log)
+            await self.repo.update_log(log, status="Failure")
+            await db.commit()
         except Exception as e:
-            logger.error(
-                "Error creating ledger entry",
-                transaction_id=transaction.id,
-                error=str(e),
-                exc_info=True
-            )
-            return None
-        
+            await db.rollback()
+            logger.error("Failed to update run log", log_id=log.id, error=str(e))
+
     # === Log operations ===
 
     async def get_log_by_id(self, log_id: int) -> EZPassLog:
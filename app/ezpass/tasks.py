@@ -0,0 +1,62 @@
+# app/ezpass/tasks.py
+
+"""
+Celery tasks for EZPass operations
+
+Imports of uploaded EZPass files run here so the upload request returns as
+soon as the file is spooled; the router polls progress by task id.
+"""
+
+import asyncio
+
+from celery import shared_task
+
+from app.utils.logger import get_logger
+from app.core.db import get_async_db
+from app.ezpass.repository import EZPassRepository
+from app.ezpass.services import EZPassService
+from app.utils.ingestion import remove_spooled
+
+logger = get_logger(__name__)
+
+
+@shared_task(bind=True, name='app.ezpass.tasks.import_ezpass_file')
+def import_ezpass_file(self, path: str, filename: str = None):
+    """
+    Import a spooled EZPass upload and delete it afterwards.
+
+    Reports the rows read so far as PROGRESS state after every chunk.
+    """
+    task_id = self.request.id
+    logger.info("[Task ID: %s] Starting EZPass import of %s", task_id, filename)
+
+    def report(processed_rows: int) -> None:
+        self.update_state(
+            state="PROGRESS",
+            meta={"filename": filename, "processed_rows": processed_rows},
+        )
+
+    async def import_async():
+        async for db in get_async_db():
+            try:
+                service = EZPassService(EZPassRepository(db))
+                return await service.import_ezpass_file(path, filename, progress=report)
+            finally:
+                await db.close()
+
+    try:
+        result = asyncio.run(import_async())
+        logger.info(
+            "[Task ID: %s] EZPass import completed: %d imported, %d failed",
+            task_id, result.success_count, result.unidentified_count
+        )
+        return result.model_dump()
+
+    except Exception as e:
+        logger.error(
+            "[Task ID: %s] Error in EZPass import: %s",
+            task_id, str(e), exc_info=True
+        )
+        raise
+    finally:
+        remove_spooled(path)
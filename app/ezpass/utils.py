@@ -4,25 +4,58 @@
 Enhanced utility functions for EZPass module with real CSV format support
 """
 
-import csv
 import re
 from datetime import datetime, date, time
-from typing import List, Dict, Any
-from io import StringIO
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from decimal import Decimal
 
-from fastapi import UploadFile
 import pandas as pd
 
 from app.ezpass.exceptions import EZPassFileValidationException
+from app.utils.ingestion import iter_frames
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def validate_ezpass_file(file: UploadFile) -> List[Dict[str, Any]]:
+# Required columns (normalized names) and the aliases each output field is read from
+REQUIRED_FIELDS = ["date", "amount", "tag_plate"]
+FIELD_ALIASES = {
+    "transaction_id": ["lane_txn_id", "lane_transaction_id", "transaction_id", "txn_id"],
+    "transaction_date": ["date", "transaction_date", "txn_date"],
+    "transaction_time": ["exit_time", "time", "transaction_time"],
+    "plate_no": ["tag_plate", "tag_plate_number", "plate_no", "plate_number", "license_plate", "plate"],
+    "tag_or_plate": ["tag_plate", "tag_plate_number", "tag"],
+    "agency": ["agency", "agency_name", "toll_agency"],
+    "entry_plaza": ["entry_plaza", "entry", "entry_location"],
+    "exit_plaza": ["exit_plaza", "exit", "exit_location"],
+    "vehicle_class": ["class", "vehicle_class", "veh_class"],
+    "amount": ["amount", "toll_amount", "fee"],
+}
+DATE_FORMATS = [
+    '%Y-%m-%d',      # 2025-10-11
+    '%m/%d/%Y',      # 10/11/2025
+    '%d/%m/%Y',      # 11/10/2025
+    '%Y/%m/%d',      # 2025/10/11
+    '%m-%d-%Y',      # 10-11-2025
+    '%d-%m-%Y',      # 11-10-2025
+    '%m.%d.%Y',      # 10.11.2025
+    '%d.%m.%Y',      # 11.10.2025
+    '%Y%m%d',        # 20251011
+]
+TIME_FORMATS = [
+    '%H:%M:%S',      # 14:30:00
+    '%H:%M',         # 14:30
+    '%I:%M:%S %p',   # 2:30:00 PM
+    '%I:%M %p',      # 2:30 PM
+]
+
+
+def iter_ezpass_file(
+    path: str, chunk_size: Optional[int] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], List[str]]]:
     """
-    Validate and parse EZPass file (CSV or Excel) matching client format.
+    Stream a spooled EZPass file (CSV or Excel) matching client format.
 
     Expected columns from client CSV:
     - Lane Txn ID: Transaction identifier
@@ -36,317 +69,180 @@ def validate_ezpass_file(file: UploadFile) -> List[Dict[str, Any]]:
     - Amount: Transaction amount
 
     Args:
-        file: Uploaded file object
+        path: Spooled upload (see app.utils.ingestion.spool_upload)
+        chunk_size: Rows per chunk, INGESTION_CHUNK_SIZE by default
 
-    Returns:
-        List of dictionaries containing parsed transaction data
+    Yields:
+        (valid rows, row error messages) per chunk
 
     Raises:
-        EZPassFileValidationException: If file format is invalid or required columns are missing
+        EZPassFileValidationException: If the file cannot be read
     """
-    logger.info("Validating EZPass file", filename=file.filename)
+    logger.info("Streaming EZPass file", path=path)
 
+    first_row = 1
     try:
-        # === Check the file extension ===
-        filename = file.filename.lower()
-
-        if filename.endswith(".csv"):
-            rows = _parse_csv_file(file)
-        elif filename.endswith((".xls", ".xlsx")):
-            rows = _parse_excel_file(file)
-        else:
-            raise EZPassFileValidationException(
-                "Invalid file format. Only CSV and Excel files are supported."
-            )
-        
-        # === Validate parsed data ===
-        validated_rows = _validate_rows(rows)
-
-        logger.info(
-            "File validation successful",
-            filename=file.filename,
-            rows_count=len(validated_rows),
-        )
-
-        return validated_rows
-    
+        for frame in iter_frames(path, chunk_size):
+            yield validate_ezpass_frame(frame, first_row)
+            first_row += len(frame)
     except EZPassFileValidationException:
         raise
     except Exception as e:
-        logger.error("Error validating file", filename=file.filename, error=str(e))
-        raise EZPassFileValidationException(f"File validation error: {str(e)}")
-    
+        logger.error("Error reading file", path=path, error=str(e))
+        raise EZPassFileValidationException(f"File validation error: {str(e)}") from e
 
-def _parse_csv_file(file: UploadFile) -> List[Dict[str, Any]]:
-    """Parse CSV file"""
-    try:
-        content = file.file.read().decode("utf-8")
-
-        # === Hanlde BOM if present ===
-        if content.startswith('\ufeff'):
-            content = content[1:]
-
-        csv_reader = csv.DictReader(StringIO(content))
-        rows = list(csv_reader)
-
-        logger.debug("CSV file parsed", rows_count=len(rows))
-        return rows
-    
-    except Exception as e:
-        logger.error("Error parsing CSV file", error=str(e))
-        raise EZPassFileValidationException(f"CSV parsing error: {str(e)}")
-    
 
-def _parse_excel_file(file: UploadFile) -> List[Dict[str, Any]]:
-    """Parse Excel file"""
-    try:
-        df = pd.read_excel(file.file)
-        # === Drop completely empty rows ===
-        df = df.dropna(how="all")
-        rows = df.to_dict("records")
+def validate_ezpass_frame(
+    frame: pd.DataFrame, first_row: int = 1
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Validate and normalize one chunk of rows with column operations.
 
-        logger.debug("Excel file parsed", rows_count=len(rows))
-        return rows
-    
-    except Exception as e:
-        logger.error("Error parsing excel file", error=str(e))
-        raise EZPassFileValidationException(f"Excel parsing error: {str(e)}")
-    
+    Rows missing a required field (Date, Amount, Tag/Plate #) or with an
+    unparseable date or amount are rejected with a "Row N validation
+    failed" message; unparseable times become None.
 
-def _validate_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """
-    Validate and normalize row data matching client CSV format.
-
-    Expected columns:
-    - Lane Txn ID: Transaction ID (required)
-    - Tag/Plate #: Plate number (required)
-    - Agency: Agency name (optional)
-    - Entry Plaza: Entry location (optional)
-    - Exit Plaza: Exit location (optional)
-    - Class: Vehicle class (optional)
-    - Date: Transaction date (required)
-    - Exit Time: Transaction time (optional)
-    - Amount: Transaction amount (required)
+    Returns:
+        (valid rows as dictionaries, error messages of rejected rows)
     """
-    if not rows:
-        raise EZPassFileValidationException("File is empty")
-    
-    required_fields = ["date", "amount", "tag_plate"]
-    validated_rows = []
-    errors = []
-
-    for idx, row in enumerate(rows, start=1):
-        try:
-            # === Normalize column names (case-insensitive matching) ===
-            normalized_row = _normalize_column_names(row)
-
-            # === Skip empty rows ===
-            if not any(normalized_row.values()):
-                continue
-
-            # === Validate required fields ===
-            for field in required_fields:
-                if field not in normalized_row or not normalized_row[field]:
-                    raise ValueError(f"Missing required field: {field}")
-                
-            # === Parse and validate data types ===
-            validated_row = {
-                "transaction_id": _get_value(
-                    normalized_row,
-                    "lane_txn_id", "lane_transaction_id", "transaction_id", "txn_id"
-                ),
-                "transaction_date": _parse_date(
-                    _get_value(normalized_row, "date", "transaction_date", "txn_date")
-                ),
-                "transaction_time": _parse_time(
-                    _get_value(normalized_row, "exit_time", "time", "transaction_time")
-                ),
-                "plate_no": _get_value(
-                    normalized_row, "tag_plate", "tag_plate_number", "plate_no", "plate_number",
-                    "license_plate", "plate",
-                ),
-                "tag_or_plate": _get_value(
-                    normalized_row, "tag_plate", "tag_plate_number", "tag", default="",
-                ),
-                "agency": _get_value(
-                    normalized_row, "agency", "agency_name", "toll_agency",
-                ),
-                "entry_plaza": _get_value(
-                    normalized_row, "entry_plaza", "entry", "entry_location",
-                ),
-                "exit_plaza": _get_value(
-                    normalized_row, "exit_plaza", "exit", "exit_location",
-                ),
-                "vehicle_class": _get_value(
-                    normalized_row, "class", "vehicle_class", "veh_class",
-                ),
-                "amount": _parse_amount(
-                    _get_value(normalized_row, "amount", "toll_amount", "fee"),
-                )
-            }
-
-            validated_rows.append(validated_row)
-
-        except Exception as e:
-            error_msg = f"Row {idx} validation failed: {str(e)}"
-            logger.warning(error_msg, row=row)
-            errors.append(error_msg)
-            # === Continue processing other rows instead of failing completely ===
-            continue
-
-    if not validated_rows:
-        error_summary = "\n".join(errors[:10]) # === Show first 10 errors ===
-        raise EZPassFileValidationException(f"All rows failed validation:\n{error_summary}")
-    
-    logger.info(
-        "Rows validated",
-        total_rows=len(rows),
-        valid_rows=len(validated_rows),
-        invalid_rows=len(errors)
-    )
-
-    if errors:
+    frame = frame.rename(columns=_normalize_column_name)
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    frame = frame.astype(object).where(frame.notna() & ~frame.isin(["", "nan", "NaN"]), None)
+    frame = frame[frame.notna().any(axis=1)]
+    row_numbers = frame.index.to_series() + first_row
+
+    def column(field: str) -> pd.Series:
+        values = pd.Series(None, index=frame.index, dtype=object)
+        for alias in FIELD_ALIASES[field]:
+            if alias in frame.columns:
+                values = values.where(values.notna(), frame[alias])
+        return values
+
+    errors = pd.Series(None, index=frame.index, dtype=object)
+    for field in REQUIRED_FIELDS:
+        present = frame[field].notna() if field in frame.columns else pd.Series(False, index=frame.index)
+        errors = errors.where(errors.notna() | present, f"Missing required field: {field}")
+
+    raw_dates, raw_amounts = column("transaction_date"), column("amount")
+    dates = _parse_dates(raw_dates)
+    amounts = _parse_amounts(raw_amounts)
+    errors = errors.where(errors.notna() | dates.notna(), "Invalid date format: " + raw_dates.astype(str))
+    errors = errors.where(errors.notna() | amounts.notna(), "Invalid amount format: " + raw_amounts.astype(str))
+
+    valid = errors.isna()
+    transaction_ids = column("transaction_id")
+    validated = pd.DataFrame({
+        "transaction_id": transaction_ids.where(transaction_ids.isna(), transaction_ids.astype(str)),
+        "transaction_date": dates,
+        "transaction_time": _parse_times(column("transaction_time")),
+        "plate_no": column("plate_no"),
+        "tag_or_plate": column("tag_or_plate").fillna(""),
+        "agency": column("agency"),
+        "entry_plaza": column("entry_plaza"),
+        "exit_plaza": column("exit_plaza"),
+        "vehicle_class": column("vehicle_class"),
+        "amount": amounts,
+    })[valid]
+    rows = validated.astype(object).where(validated.notna(), None).to_dict("records")
+
+    messages = [
+        f"Row {number} validation failed: {error}"
+        for number, error in zip(row_numbers[~valid], errors[~valid])
+    ]
+    if messages:
         logger.warning(
             "Some rows failed validation",
-            failed_count=len(errors),
-            sample_errors=errors[:5]
+            failed_count=len(messages),
+            sample_errors=messages[:5]
         )
+    logger.debug("Chunk validated", valid_rows=len(rows), invalid_rows=len(messages))
+    return rows, messages
 
-    return validated_rows
-
-
-def _normalize_column_names(row: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Normalize column names to lowercase with underscores.
-    Handles special characters, spaces, and common variations.
-    """
-    normalized = {}
-    for key, value in row.items():
-        if key is None or (isinstance(key, float) and pd.isna(key)):
-            continue
-
-        # === Convert to String and lowercase ===
-        key_str = str(key).lower()
 
-        # === Replace special characters and spaces with underscores ===
-        normalized_key = re.sub(r'[^a-z0-9]+', '_', key_str).strip("_")
+def _normalize_column_name(name: Any) -> str:
+    """Lowercase a column name and collapse special characters to underscores"""
+    return re.sub(r'[^a-z0-9]+', '_', str(name).lower()).strip("_")
 
-        # === Handle empty values ===
-        if pd.isna(value) or value == "" or value == "nan":
-            value = None
 
-        normalized[normalized_key] = value
-
-    return normalized
-
-
-def _get_value(row: Dict[str, Any], *keys, default=None) -> Any:
-    """Get value from row using multiple possible key names"""
-    for key in keys:
-        if key in row and row[key] not in (None, '', 'nan', 'NaN'):
-            return row[key]
-    return default
-
-
-def _parse_date(value: Any) -> date:
+def _parse_dates(values: pd.Series) -> pd.Series:
     """
-    Parse date from various formats.
+    Parse a column of dates from various formats.
 
     Supports:
-    - ISO format: 2025-10-11
-    - US format: 10/11/2025
-    - EU format: 11/10/2025
-    - Excel serial date: 45215
-    - Datetime objects
+    - Date / datetime cells
+    - Excel serial dates: 45215
+    - Strings in any of DATE_FORMATS, tried in order
+    Unparseable values become None.
     """
-    if isinstance(value, date):
-        return value
-    
-    if isinstance(value, datetime):
-        return value.date()
-    
-    if isinstance(value, (int, float)):
-        # === Handle Excel Serial Date ===
-        try:
-            return pd.to_datetime(value, unit="D", origin="1899-12-30").date()
-        except:
-            pass
-
-    if isinstance(value, str):
-        value = value.strip()
+    is_temporal = values.map(lambda v: isinstance(v, (datetime, date)))
+    is_number = values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    is_text = values.map(lambda v: isinstance(v, str))
+
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    if is_temporal.any():
+        parsed[is_temporal] = pd.to_datetime(values[is_temporal], errors="coerce")
+    if is_number.any():
+        parsed[is_number] = pd.to_datetime(
+            values[is_number].astype(float), unit="D", origin="1899-12-30", errors="coerce"
+        )
+    if is_text.any():
+        text = values[is_text].str.strip()
+        for fmt in DATE_FORMATS:
+            pending = parsed[is_text].isna()
+            if not pending.any():
+                break
+            parsed.loc[pending[pending].index] = pd.to_datetime(
+                text[pending], format=fmt, errors="coerce"
+            )
 
-        # === Try common date formats ===
-        formats = [
-            '%Y-%m-%d',      # 2025-10-11
-            '%m/%d/%Y',      # 10/11/2025
-            '%d/%m/%Y',      # 11/10/2025
-            '%Y/%m/%d',      # 2025/10/11
-            '%m-%d-%Y',      # 10-11-2025
-            '%d-%m-%Y',      # 11-10-2025
-            '%m.%d.%Y',      # 10.11.2025
-            '%d.%m.%Y',      # 11.10.2025
-            '%Y%m%d',        # 20251011
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(value, fmt).date()
-            except ValueError:
-                continue
-    
-    raise ValueError(f"Invalid date format: {value}")
+    return parsed.map(lambda v: v.date() if pd.notna(v) else None).astype(object)
 
 
-def _parse_time(value: Any) -> time:
+def _parse_times(values: pd.Series) -> pd.Series:
     """
-    Parse time from various formats.
-    
+    Parse a column of times from various formats.
+
     Supports:
-    - 24-hour format: 14:30:00, 14:30
-    - 12-hour format: 2:30:00 PM, 2:30 PM
-    - Excel time: 0.604166667
-    - Datetime objects
+    - Time / datetime cells
+    - Excel time: 0.604166667 (fraction of a day)
+    - Strings in any of TIME_FORMATS (24-hour and 12-hour)
+    Unparseable values become None instead of failing the row.
     """
-    if value is None or value == '':
-        return None
-    
-    if isinstance(value, time):
-        return value
-    
-    if isinstance(value, datetime):
-        return value.time()
-    
-    if isinstance(value, float):
-        # Handle Excel time (fraction of day)
-        try:
-            total_seconds = value * 86400  # 24 * 60 * 60
-            hours = int(total_seconds // 3600)
-            minutes = int((total_seconds % 3600) // 60)
-            seconds = int(total_seconds % 60)
-            return time(hours, minutes, seconds)
-        except:
-            return None
-    
-    if isinstance(value, str):
-        value = value.strip()
-        
-        # Try common time formats
-        formats = [
-            '%H:%M:%S',      # 14:30:00
-            '%H:%M',         # 14:30
-            '%I:%M:%S %p',   # 2:30:00 PM
-            '%I:%M %p',      # 2:30 PM
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(value, fmt).time()
-            except ValueError:
-                continue
-    
-    # If parsing fails, return None instead of raising exception
-    logger.warning("Could not parse time, returning None", value=value)
-    return None
+    parsed = values.map(
+        lambda v: v if isinstance(v, time)
+        else v.time() if isinstance(v, datetime)
+        else None
+    ).astype(object)
+
+    is_fraction = values.map(lambda v: isinstance(v, float) and 0 <= v < 1)
+    if is_fraction.any():
+        seconds = (values[is_fraction].astype(float) * 86400).astype(int)
+        parsed[is_fraction] = [time(s // 3600, (s % 3600) // 60, s % 60) for s in seconds]
+
+    is_text = values.map(lambda v: isinstance(v, str))
+    if is_text.any():
+        text = values[is_text].str.strip()
+        for fmt in TIME_FORMATS:
+            pending = parsed[is_text].isna()
+            if not pending.any():
+                break
+            times = pd.to_datetime(text[pending], format=fmt, errors="coerce")
+            parsed.loc[pending[pending].index] = times.map(lambda v: v.time() if pd.notna(v) else None)
+
+    return parsed
+
+
+def _parse_amounts(values: pd.Series) -> pd.Series:
+    """
+    Parse a column of amounts; see _parse_amount for the accepted formats.
+    Unparseable values become NaN.
+    """
+    text = values.astype(str).str.strip()
+    # Negative values in parentheses: ($5.50) -> -5.50
+    text = text.str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+    cleaned = text.str.replace(r'[^\d.-]', '', regex=True)
+    numbers = values.map(lambda v: isinstance(v, (int, float, Decimal)) and not isinstance(v, bool))
+    return pd.to_numeric(cleaned.where(~numbers, values.astype(str)), errors="coerce").where(values.notna())
 
 
 def _parse_amount(value: Any) -> float:
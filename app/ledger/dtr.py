@@ -0,0 +1,311 @@
+### app/ledger/dtr.py
+
+"""
+Weekly Driver Transaction Receipt (DTR) pipeline.
+
+The week's CURB trips, EZPass tolls, PVB tickets, ledger postings, ledger
+balances, leases, medallions and vehicles are prefetched for a whole chunk of
+drivers with one grouped query per source. Per-driver DTR payloads are then
+built in memory (assemble_dtr_data, summarize_ledger_entries) and rendered with generate_dtr_pdf_doc /
+generate_dtr_excel_doc_styled. app.ledger.tasks fans the chunks out as a
+Celery chord, so rendering runs in parallel across workers.
+"""
+
+# Standard library imports
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+# Third party imports
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+# Local imports
+from app.curb.models import CURBTrip
+from app.drivers.models import Driver
+from app.ezpass.models import EZPassTransaction
+from app.leases.models import Lease, LeaseDriver
+from app.ledger.models import (
+    BalanceStatus, LedgerBalance, LedgerBalanceSummary, LedgerPosting, LedgerStatus,
+)
+from app.ledger.utils import (
+    generate_dtr_excel_doc_styled, generate_dtr_pdf_doc, summarize_ledger_entries,
+)
+from app.medallions.models import Medallion
+from app.pvb.models import PVBViolation
+from app.utils.logger import get_logger
+from app.vehicles.models import Vehicle
+
+logger = get_logger(__name__)
+
+
+def get_active_dtr_driver_ids(db: Session, from_date: date, to_date: date) -> List[int]:
+    """Drivers (drivers.id) with associated CURB trips in the period"""
+    stmt = select(CURBTrip.driver_fk).where(
+        CURBTrip.driver_fk.is_not(None),
+        CURBTrip.start_date.between(from_date, to_date),
+    ).distinct()
+    return sorted(row[0] for row in db.execute(stmt).all())
+
+
+def prefetch_dtr_data(
+    db: Session, driver_ids: List[int], from_date: date, to_date: date
+) -> Dict[int, dict]:
+    """
+    Load everything the DTRs of driver_ids need with one query per source and
+    build the per-driver template payloads.
+
+    Returns:
+        Dict of drivers.id -> DTR data dict (see build_dtr_data)
+    """
+    if not driver_ids:
+        return {}
+
+    drivers = db.execute(
+        select(Driver)
+        .where(Driver.id.in_(driver_ids))
+        .options(selectinload(Driver.tlc_license), selectinload(Driver.dmv_license))
+    ).scalars().all()
+
+    trips = db.execute(
+        select(CURBTrip)
+        .where(CURBTrip.driver_fk.in_(driver_ids), CURBTrip.start_date.between(from_date, to_date))
+        .order_by(CURBTrip.start_date, CURBTrip.start_time)
+    ).scalars().all()
+
+    tolls = db.execute(
+        select(EZPassTransaction)
+        .where(
+            EZPassTransaction.driver_id.in_(driver_ids),
+            EZPassTransaction.transaction_date.between(from_date, to_date),
+        )
+        .order_by(EZPassTransaction.transaction_date, EZPassTransaction.transaction_time)
+    ).scalars().all()
+
+    tickets = db.execute(
+        select(PVBViolation)
+        .where(PVBViolation.driver_id.in_(driver_ids), PVBViolation.issue_date.between(from_date, to_date))
+        .order_by(PVBViolation.issue_date)
+    ).scalars().all()
+
+    postings = db.execute(
+        select(LedgerPosting)
+        .where(
+            LedgerPosting.driver_id.in_(driver_ids),
+            LedgerPosting.status == LedgerStatus.POSTED.value,
+            LedgerPosting.transaction_date.between(from_date, to_date),
+        )
+        .order_by(LedgerPosting.transaction_date, LedgerPosting.id)
+    ).scalars().all()
+
+    # Outstanding balance carried into the period
+    previous_balances = dict(db.execute(
+        select(LedgerBalance.driver_id, func.sum(LedgerBalance.balance))
+        .where(
+            LedgerBalance.driver_id.in_(driver_ids),
+            LedgerBalance.status == BalanceStatus.OPEN.value,
+            LedgerBalance.obligation_date < from_date,
+        )
+        .group_by(LedgerBalance.driver_id)
+    ).all())
+
+    # Outstanding balance now, from the materialized per-category totals
+    current_balances = dict(db.execute(
+        select(LedgerBalanceSummary.driver_id, func.sum(LedgerBalanceSummary.total_due))
+        .where(LedgerBalanceSummary.driver_id.in_(driver_ids))
+        .group_by(LedgerBalanceSummary.driver_id)
+    ).all())
+
+    # Leases overlapping the period, oldest first
+    lease_rows = db.execute(
+        select(Driver.id, Lease)
+        .join(LeaseDriver, LeaseDriver.driver_id == Driver.driver_id)
+        .join(Lease, Lease.id == LeaseDriver.lease_id)
+        .where(
+            Driver.id.in_(driver_ids),
+            Lease.lease_start_date <= to_date,
+            or_(Lease.lease_end_date.is_(None), Lease.lease_end_date >= from_date),
+        )
+        .order_by(Lease.lease_start_date)
+    ).all()
+    leases = _latest_lease_by_driver(lease_rows)
+
+    medallion_ids = {lease.medallion_id for lease in leases.values() if lease.medallion_id}
+    vehicle_ids = {lease.vehicle_id for lease in leases.values() if lease.vehicle_id}
+
+    medallions = {
+        m.id: m for m in db.execute(
+            select(Medallion).where(Medallion.id.in_(medallion_ids))
+        ).scalars().all()
+    } if medallion_ids else {}
+
+    vehicles = {
+        v.id: v for v in db.execute(
+            select(Vehicle)
+            .where(Vehicle.id.in_(vehicle_ids))
+            .options(selectinload(Vehicle.registrations), selectinload(Vehicle.inspections))
+        ).scalars().all()
+    } if vehicle_ids else {}
+
+    data = assemble_dtr_data(
+        drivers, from_date, to_date,
+        trips=trips,
+        tolls=tolls,
+        tickets=tickets,
+        postings=postings,
+        previous_balances=previous_balances,
+        current_balances=current_balances,
+        lease_rows=lease_rows,
+        medallions=medallions,
+        vehicles=vehicles,
+    )
+
+    logger.info(f"Prefetched DTR data for {len(data)} drivers")
+    return data
+
+
+def assemble_dtr_data(
+    drivers: List[Driver],
+    from_date: date,
+    to_date: date,
+    trips: List[CURBTrip],
+    tolls: List[EZPassTransaction],
+    tickets: List[PVBViolation],
+    postings: List[LedgerPosting],
+    previous_balances: Dict[int, Decimal],
+    current_balances: Dict[int, Decimal],
+    lease_rows: List[tuple],
+    medallions: Dict[int, Medallion],
+    vehicles: Dict[int, Vehicle],
+) -> Dict[int, dict]:
+    """
+    Split the chunk-wide rows of prefetch_dtr_data per driver and build each
+    driver's DTR payload.
+
+    Returns:
+        Dict of drivers.id -> DTR data dict (see build_dtr_data)
+    """
+    trips_by_driver = _group_by(trips, "driver_fk")
+    tolls_by_driver = _group_by(tolls, "driver_id")
+    tickets_by_driver = _group_by(tickets, "driver_id")
+    postings_by_driver = _group_by(postings, "driver_id")
+    leases = _latest_lease_by_driver(lease_rows)
+
+    data = {}
+    for driver in drivers:
+        lease = leases.get(driver.id)
+        data[driver.id] = build_dtr_data(
+            driver=driver,
+            from_date=from_date,
+            to_date=to_date,
+            trips=trips_by_driver.get(driver.id, []),
+            tolls=tolls_by_driver.get(driver.id, []),
+            tickets=tickets_by_driver.get(driver.id, []),
+            postings=postings_by_driver.get(driver.id, []),
+            previous_balance=float(previous_balances.get(driver.id) or 0),
+            current_balance=float(current_balances.get(driver.id) or 0),
+            lease=lease,
+            medallion=medallions.get(lease.medallion_id) if lease else None,
+            vehicle=vehicles.get(lease.vehicle_id) if lease else None,
+        )
+    return data
+
+
+def build_dtr_data(
+    driver: Driver,
+    from_date: date,
+    to_date: date,
+    trips: List[CURBTrip],
+    tolls: List[EZPassTransaction],
+    tickets: List[PVBViolation],
+    postings: List[LedgerPosting],
+    previous_balance: float,
+    current_balance: float,
+    lease: Optional[Lease],
+    medallion: Optional[Medallion],
+    vehicle: Optional[Vehicle],
+) -> dict:
+    """
+    Assemble the DTR template payload for one driver from prefetched rows.
+
+    The balance is the driver's outstanding ledger balance (the sum of their
+    ledger_balance_summaries), so tolls, tickets, lease charges and every
+    payment, cash included, count exactly as the ledger applied them.
+    """
+    summary = summarize_ledger_entries(postings)
+
+    card_trips = [t for t in trips if t.payment_type == "C"]
+    surcharges = {
+        "mta_tax": sum(float(t.tax or 0) for t in card_trips),
+        "imp_surcharge": sum(float(t.imp_tax or 0) for t in card_trips),
+        "cong_surcharge": sum(float(t.congestion_fee or 0) for t in card_trips),
+        "airport_fee": sum(float(t.airport_fee or 0) for t in card_trips),
+        "cbdt": sum(float(t.cbdt_fee or 0) for t in card_trips),
+    }
+    total_surcharges = sum(surcharges.values())
+    cc_earnings = sum(float(t.total_amount or 0) for t in card_trips)
+    total_due = previous_balance + summary["total_dues"]
+
+    account_balance = {
+        "cc_earnings": cc_earnings,
+        "total_surcharges": total_surcharges,
+        "ezpass_tolls": sum(float(t.amount or 0) for t in tolls),
+        "tickets": sum(float(t.amount_due or 0) for t in tickets),
+        "leasing_charges": summary["lease_due"],
+        "payment": summary["payments"] + summary["cash_paid"],
+        "previous_balance": previous_balance,
+        "total_due": total_due,
+        "balance": current_balance,
+    }
+
+    receipt = SimpleNamespace(
+        receipt_number=f"DTR-{driver.id}-{from_date:%Y%m%d}",
+        period_start=from_date,
+        period_end=to_date,
+        created_on=datetime.now(timezone.utc),
+        balance=account_balance["balance"],
+    )
+
+    return {
+        "driver": driver,
+        "lease": lease,
+        "medallion": medallion,
+        "vehicle": vehicle,
+        "period_start": from_date,
+        "period_end": to_date,
+        "receipt": receipt,
+        "summary": summary,
+        "account_balance": account_balance,
+        "surcharges_detail": surcharges,
+        "curb_trips": trips,
+        "trips": trips,
+        "ezpass_details": tolls,
+        "tickets_details": tickets,
+        "ledgers": postings,
+    }
+
+
+def render_dtr_documents(data: dict) -> Dict[str, str]:
+    """Render and upload the PDF and Excel DTR of one driver; returns their S3 keys"""
+    return {
+        "pdf": generate_dtr_pdf_doc(data),
+        "excel": generate_dtr_excel_doc_styled(data),
+    }
+
+
+def _latest_lease_by_driver(lease_rows: List[tuple]) -> Dict[int, Lease]:
+    """Last lease per driver of (drivers.id, Lease) rows ordered by lease start"""
+    leases: Dict[int, Lease] = {}
+    for driver_pk, lease in lease_rows:
+        leases[driver_pk] = lease
+    return leases
+
+
+def _group_by(rows: list, attr: str) -> Dict[int, list]:
+    """Group ORM rows by an attribute, preserving query order"""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, attr)].append(row)
+    return grouped
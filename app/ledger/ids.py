@@ -0,0 +1,257 @@
+# app/ledger/ids.py
+
+"""
+Time-ordered, collision-free ID generation for ledger postings and balances.
+
+IDs are 63-bit integers laid out like a snowflake:
+
+    | 41 bits: ms since LEDGER_ID_EPOCH | 10 bits: worker id | 12 bits: sequence |
+
+and rendered as fixed-width decimal strings (e.g. POST-0738541623471038465),
+so lexicographic order equals creation order and new rows always land at the
+right edge of the posting_id / balance_id unique indexes. Minting does no
+I/O; the worker id comes from configuration:
+
+- With settings.ledger_worker_id_base set, a Celery prefork child takes
+  base + pool child index.
+- Every other process (API workers, solo Celery workers, scripts) hashes
+  hostname:pid into the 10-bit worker id space.
+
+With settings.ledger_worker_id_redis enabled, a hashing process reserves its
+hashed id (or the next free one) in Redis instead, so hashed ids of
+concurrent processes cannot collide. Redis is only consulted once, when the
+worker id is first needed; if it cannot be reached the hashed id is used.
+
+A millisecond whose 4096 sequence numbers are used up is never borrowed from
+the future: minting waits for the clock to reach the next millisecond, so a
+restarted process with the same worker id starts after every ID its
+predecessor issued.
+"""
+
+import hashlib
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import redis
+from celery.signals import worker_process_init
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 2025-01-01T00:00:00Z
+LEDGER_ID_EPOCH_MS = 1735689600000
+
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Width of the decimal rendering of a 63-bit ID
+ID_WIDTH = 19
+
+WORKER_ID_KEY = "ledger:worker-id:{}"
+
+
+def _redis_client() -> redis.Redis:
+    return redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        username=settings.redis_username,
+        password=settings.redis_password,
+        decode_responses=True,
+    )
+
+
+def hashed_worker_id(process_key: Optional[str] = None) -> int:
+    """Worker id derived from hostname:pid (or process_key)"""
+    process_key = process_key or f"{socket.gethostname()}:{os.getpid()}"
+    digest = hashlib.blake2b(process_key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & MAX_WORKER_ID
+
+
+def configured_worker_id(child_index: int) -> Optional[int]:
+    """base + child_index from settings, or None when no base is configured"""
+    base = settings.ledger_worker_id_base
+    if base is None:
+        return None
+    worker_id = base + child_index
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ValueError(
+            f"Ledger worker id {worker_id} (base {base} + child {child_index}) "
+            f"is outside 0..{MAX_WORKER_ID}"
+        )
+    return worker_id
+
+
+def reserve_worker_id(
+    preferred: int, client_factory: Callable[[], redis.Redis] = _redis_client
+) -> int:
+    """
+    Reserve preferred, or the next free worker id after it, in Redis for
+    settings.ledger_worker_id_lease_seconds. Falls back to preferred when
+    Redis is unreachable or every id is taken.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    try:
+        client = client_factory()
+        for offset in range(MAX_WORKER_ID + 1):
+            worker_id = (preferred + offset) & MAX_WORKER_ID
+            if client.set(
+                WORKER_ID_KEY.format(worker_id), owner,
+                nx=True, ex=settings.ledger_worker_id_lease_seconds,
+            ):
+                return worker_id
+        logger.warning("Every ledger worker id is reserved, using the hashed one", worker_id=preferred)
+    except redis.RedisError as e:
+        logger.warning("Could not reserve a ledger worker id, using the hashed one", worker_id=preferred, error=str(e))
+    return preferred
+
+
+def default_worker_id() -> int:
+    """Worker id of a process that was not assigned one explicitly"""
+    worker_id = hashed_worker_id()
+    if settings.ledger_worker_id_redis:
+        worker_id = reserve_worker_id(worker_id)
+    return worker_id
+
+
+class LedgerIdGenerator:
+    """
+    Thread-safe generator of sortable ledger IDs.
+
+    The clock component never goes backwards. When more than 4096 IDs are
+    requested within one millisecond, minting waits for the next one. If
+    the system clock steps back, generation continues from the last issued
+    millisecond rather than stalling until the clock catches up.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[int] = None,
+        epoch_ms: int = LEDGER_ID_EPOCH_MS,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self._fixed_worker_id = worker_id
+        self.worker_id: Optional[int] = worker_id
+        self.epoch_ms = epoch_ms
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def reset_after_fork(self) -> None:
+        """
+        Forget the parent's worker id in a forked child, which picks its own
+        on first mint (or from its pool index at worker_process_init).
+        """
+        self._lock = threading.Lock()
+        self.worker_id = self._fixed_worker_id
+        self._last_ms = -1
+        self._sequence = 0
+
+    def assign_pool_worker_id(self, child_index: int) -> None:
+        """Take base + child_index as the worker id of a prefork pool child"""
+        if self._fixed_worker_id is not None:
+            return
+        worker_id = configured_worker_id(child_index)
+        if worker_id is not None:
+            with self._lock:
+                self.worker_id = worker_id
+
+    def _now_ms(self) -> int:
+        return int(self._clock() * 1000) - self.epoch_ms
+
+    def _next_ms(self) -> int:
+        """First millisecond after the last issued one, waiting for the clock to reach it"""
+        now_ms = self._now_ms()
+        if now_ms < self._last_ms:
+            # The clock stepped back: stay ahead of every issued ID
+            return self._last_ms + 1
+        while now_ms <= self._last_ms:
+            self._sleep(0.0001)
+            now_ms = self._now_ms()
+        return now_ms
+
+    def next_int(self) -> int:
+        """Mint a single integer ID"""
+        return self.next_ints(1)[0]
+
+    def next_ints(self, count: int) -> List[int]:
+        """
+        Mint `count` strictly increasing integer IDs under a single lock
+        acquisition, for batch writers.
+        """
+        if count <= 0:
+            return []
+
+        ids = []
+        with self._lock:
+            if self.worker_id is None:
+                self.worker_id = default_worker_id()
+                logger.info("Assigned ledger worker id", worker_id=self.worker_id)
+            worker_bits = self.worker_id << SEQUENCE_BITS
+
+            now_ms = self._now_ms()
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = -1
+
+            for _ in range(count):
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms = self._next_ms()
+                    self._sequence = 0
+                ids.append((self._last_ms << (WORKER_ID_BITS + SEQUENCE_BITS)) | worker_bits | self._sequence)
+
+        return ids
+
+    def posting_id(self, prefix: str = "POST") -> str:
+        """Mint one posting ID, e.g. POST-0738541623471038465"""
+        return self.posting_ids(1, prefix)[0]
+
+    def posting_ids(self, count: int, prefix: str = "POST") -> List[str]:
+        """Mint `count` posting IDs in one call"""
+        return [f"{prefix}-{value:0{ID_WIDTH}d}" for value in self.next_ints(count)]
+
+    def balance_id(self, category: str) -> str:
+        """Mint one balance ID, e.g. BAL-0738541623471038465-LEA"""
+        return self.balance_ids(category, 1)[0]
+
+    def balance_ids(self, category: str, count: int) -> List[str]:
+        """
+        Mint `count` balance IDs in one call. The category code is a suffix
+        so IDs of all categories share one increasing key range.
+        """
+        category_code = category[:3].upper()
+        return [f"BAL-{value:0{ID_WIDTH}d}-{category_code}" for value in self.next_ints(count)]
+
+
+ledger_ids = LedgerIdGenerator()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ledger_ids.reset_after_fork)
+
+
+@worker_process_init.connect
+def assign_celery_child_worker_id(**_kwargs) -> None:
+    """
+    Give each prefork pool child base + its pool index as worker id. Pool
+    indexes are reused when children are replaced, so ids stay within
+    base .. base + concurrency - 1. Without a configured base the child
+    hashes (or reserves) its own id on first mint.
+    """
+    from billiard.process import current_process
+
+    child_index = getattr(current_process(), "index", None)
+    if child_index is not None:
+        ledger_ids.assign_pool_worker_id(child_index)
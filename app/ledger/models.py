@@ -6,6 +6,9 @@ Centralized ledger models - SQLAlchemy 2.x
 Implements the dual-table ledger system:
 - Ledger_Postings: Immutable audit trail of all transactions.
 - Ledger_Balances: Rolling outstanding balances per obligation.
+
+plus Ledger_Balance_Summaries, a materialized per-driver/category rollup of
+the open balances kept in step by LedgerService.
 """
 
 from datetime import datetime
@@ -15,7 +18,7 @@ from enum import Enum as PyEnum
 
 from sqlalchemy import (
     String, Numeric, DateTime, Date, Index, ForeignKey,
-    Enum as SQLEnum, Text
+    Enum as SQLEnum, Text, Integer, UniqueConstraint
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -362,4 +365,61 @@ class LedgerBalance(Base, AuditMixin):
         Index("idx_balance_reference", "reference_type", "reference_id"),
         Index("idx_balance_status_date", "status", "obligation_date"),
         Index("idx_balance_driver_category_status", "driver_id", "category", "status"),
-    )
\ No newline at end of file
+    )
+
+
+# === Ledger_Balance_Summaries Model ===
+
+class LedgerBalanceSummary(Base):
+    """
+    Materialized open-balance totals per (driver, category)
+
+    Core Principles:
+    - Derived data: Total_Due / Open_Count equal SUM(balance) / COUNT(*) of
+      the driver's OPEN Ledger_Balances in that category
+    - Adjusted by LedgerService in the same transaction as every obligation,
+      payment and void, so driver summaries and dashboards never aggregate
+      Ledger_Balances on read
+    - Rebuilt / verified with `python -m app.ledger.rebuild_balance_summary`
+    """
+    __tablename__ = "ledger_balance_summaries"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+
+    driver_id: Mapped[int] = mapped_column(
+        ForeignKey("drivers.id", ondelete="CASCADE"),
+        nullable=False, comment="Driver reference"
+    )
+
+    category: Mapped[str] = mapped_column(
+        SQLEnum(
+            "Lease", "Repair", "Loan", "EZPass", "PVB", "TLC",
+            "Taxes", "Misc", "Deposit", name="balance_summary_category_enum"
+        ),
+        nullable=False, index=True, comment="Obligation type"
+    )
+
+    total_due: Mapped[Decimal] = mapped_column(
+        Numeric(14, 2), default=Decimal("0.00"), nullable=False,
+        comment="Sum of open balances"
+    )
+
+    open_count: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False,
+        comment="Number of open balances"
+    )
+
+    updated_on: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False,
+        comment="Timestamp of last adjustment"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<LedgerBalanceSummary(driver_id={self.driver_id}, category='{self.category}', "
+            f"total_due={self.total_due}, open_count={self.open_count})>"
+        )
+
+    __table_args__ = (
+        UniqueConstraint("driver_id", "category", name="uq_balance_summary_driver_category"),
+    )
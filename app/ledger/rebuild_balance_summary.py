@@ -0,0 +1,53 @@
+### app/ledger/rebuild_balance_summary.py
+
+"""
+Rebuild or verify the materialized ledger_balance_summaries table.
+
+Usage:
+    python -m app.ledger.rebuild_balance_summary            # verify, rebuild on mismatch
+    python -m app.ledger.rebuild_balance_summary --verify   # report mismatches only
+    python -m app.ledger.rebuild_balance_summary --force    # rebuild unconditionally
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import sys
+
+# Local imports
+from app.core.db import AsyncSessionLocal
+from app.ledger.services import LedgerService
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run(verify_only: bool = False, force: bool = False) -> int:
+    """Verify the summary table against ledger_balances and rebuild it if needed"""
+    async with AsyncSessionLocal() as db:
+        service = LedgerService(db)
+
+        mismatches = [] if force else await service.verify_balance_summary()
+        for mismatch in mismatches[:50]:
+            logger.warning("Balance summary mismatch", **{k: str(v) for k, v in mismatch.items()})
+
+        if verify_only:
+            logger.info(f"Balance summary verification found {len(mismatches)} mismatches")
+            return 1 if mismatches else 0
+
+        if force or mismatches:
+            rows = await service.rebuild_balance_summary()
+            logger.info(f"Balance summary rebuilt with {rows} rows")
+        else:
+            logger.info("Balance summary is consistent, nothing to rebuild")
+
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify ledger_balance_summaries")
+    parser.add_argument("--verify", action="store_true", help="only report mismatches")
+    parser.add_argument("--force", action="store_true", help="rebuild without verifying first")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(verify_only=args.verify, force=args.force)))
@@ -7,13 +7,16 @@ Handles all database operations for ledger_postings and ledger_balances.
 
 from datetime import datetime, date, timezone
 from decimal import Decimal
-from typing import Optional, List, Tuple
+from typing import Any, Dict, Iterable, Optional, List, Tuple
 
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import select, insert, update, delete, func, and_, desc
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.utils.logger import get_logger
-from app.ledger.models import LedgerPosting, LedgerBalance
+from app.utils.pagination import SortKey, count_rows, keyset_order, paginate, to_page
+from app.ledger.models import LedgerEntryType, LedgerPosting, LedgerBalance, LedgerBalanceSummary
 from app.ledger.schemas import (
     PostingFilterParams, BalanceFilterParams
 )
@@ -99,20 +102,18 @@ class LedgerRepository:
         
         # Get total count
         count_stmt = select(func.count()).select_from(stmt.subquery())
-        total_result = await self.db.execute(count_stmt)
-        total_items = total_result.scalar()
+        total_items = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
         
         # Apply sorting and pagination
-        stmt = stmt.order_by(desc(LedgerPosting.posted_on))
-        stmt = stmt.offset((filters.page - 1) * filters.per_page)
-        stmt = stmt.limit(filters.per_page)
+        order = keyset_order(LedgerPosting.posted_on, True, LedgerPosting.id)
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
         
         # Execute query
         result = await self.db.execute(stmt)
-        postings = result.scalars().all()
+        postings = to_page(result.scalars().all(), order, filters.per_page)
         
         logger.debug(f"Retrieved {len(postings)} postings (total: {total_items})")
-        return list(postings), total_items
+        return postings, total_items
     
     async def get_postings_by_reference(
         self, reference_id: str, reference_type: Optional[str] = None
@@ -238,20 +239,22 @@ class LedgerRepository:
         
         # Get total count
         count_stmt = select(func.count()).select_from(stmt.subquery())
-        total_result = await self.db.execute(count_stmt)
-        total_items = total_result.scalar()
+        total_items = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
         
         # Apply sorting and pagination
-        stmt = stmt.order_by(LedgerBalance.obligation_date, LedgerBalance.category)
-        stmt = stmt.offset((filters.page - 1) * filters.per_page)
-        stmt = stmt.limit(filters.per_page)
+        order = [
+            SortKey(LedgerBalance.obligation_date),
+            SortKey(LedgerBalance.category),
+            SortKey(LedgerBalance.id),
+        ]
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
         
         # Execute query
         result = await self.db.execute(stmt)
-        balances = result.scalars().all()
+        balances = to_page(result.scalars().all(), order, filters.per_page)
         
         logger.debug(f"Retrieved {len(balances)} balances (total: {total_items})")
-        return list(balances), total_items
+        return balances, total_items
     
     async def get_open_balances_by_driver(
         self, driver_id: int, category: Optional[str] = None 
@@ -271,6 +274,134 @@ class LedgerRepository:
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
     
+    async def get_open_balances_for_drivers(
+        self, driver_ids: Iterable[int], categories: Iterable[str]
+    ) -> List[Row]:
+        """
+        Load every open balance of the given drivers and categories in one query.
+
+        Rows are locked for update and ordered by driver, then oldest
+        obligation first, so callers can run the payment waterfall in memory.
+        Only the columns needed to build payment postings are selected.
+        """
+        driver_ids = list(driver_ids)
+        if not driver_ids:
+            return []
+
+        stmt = (
+            select(
+                LedgerBalance.id,
+                LedgerBalance.balance_id,
+                LedgerBalance.category,
+                LedgerBalance.driver_id,
+                LedgerBalance.vehicle_id,
+                LedgerBalance.vin,
+                LedgerBalance.plate,
+                LedgerBalance.medallion_id,
+                LedgerBalance.lease_id,
+                LedgerBalance.reference_id,
+                LedgerBalance.reference_type,
+                LedgerBalance.payment,
+                LedgerBalance.balance,
+                LedgerBalance.applied_payment_refs,
+            )
+            .where(
+                LedgerBalance.driver_id.in_(driver_ids),
+                LedgerBalance.status == "Open",
+                LedgerBalance.category.in_(list(categories)),
+            )
+            .order_by(LedgerBalance.driver_id, LedgerBalance.obligation_date, LedgerBalance.id)
+            .with_for_update()
+        )
+
+        result = await self.db.execute(stmt)
+        rows = list(result.all())
+        logger.debug(f"Loaded {len(rows)} open balances for {len(driver_ids)} drivers")
+        return rows
+
+    async def bulk_insert_postings(self, posting_rows: List[Dict[str, Any]]) -> int:
+        """Insert many postings with a single multi-row core INSERT (no ORM objects)"""
+        if not posting_rows:
+            return 0
+
+        await self.db.execute(insert(LedgerPosting).values(posting_rows))
+        logger.info(f"Bulk inserted {len(posting_rows)} postings")
+        return len(posting_rows)
+
+    async def bulk_insert_balances(self, balance_rows: List[Dict[str, Any]]) -> int:
+        """Insert many balances with a single multi-row core INSERT (no ORM objects)"""
+        if not balance_rows:
+            return 0
+
+        await self.db.execute(insert(LedgerBalance).values(balance_rows))
+        logger.info(f"Bulk inserted {len(balance_rows)} balances")
+        return len(balance_rows)
+
+    async def get_existing_balance_references(
+        self, reference_ids: Iterable[str], reference_type: str
+    ) -> set:
+        """Those of reference_ids that already have a balance of reference_type"""
+        reference_ids = list(set(reference_ids))
+        if not reference_ids:
+            return set()
+
+        stmt = select(LedgerBalance.reference_id).where(
+            LedgerBalance.reference_type == reference_type,
+            LedgerBalance.reference_id.in_(reference_ids),
+        )
+        result = await self.db.execute(stmt)
+        return set(result.scalars().all())
+
+    async def get_existing_posting_references(
+        self, reference_ids: Iterable[str], reference_type: str
+    ) -> set:
+        """Those of reference_ids that already have a posting of reference_type"""
+        reference_ids = list(set(reference_ids))
+        if not reference_ids:
+            return set()
+
+        stmt = select(LedgerPosting.reference_id).where(
+            LedgerPosting.reference_type == reference_type,
+            LedgerPosting.reference_id.in_(reference_ids),
+        )
+        result = await self.db.execute(stmt)
+        return set(result.scalars().all())
+
+    async def get_debit_posting_ids_by_reference(
+        self, reference_ids: Iterable[str], reference_type: str
+    ) -> Dict[str, str]:
+        """posting_id of the original DEBIT posting of each of reference_ids"""
+        reference_ids = list(set(reference_ids))
+        if not reference_ids:
+            return {}
+
+        stmt = (
+            select(LedgerPosting.reference_id, LedgerPosting.posting_id)
+            .where(
+                LedgerPosting.reference_type == reference_type,
+                LedgerPosting.reference_id.in_(reference_ids),
+                LedgerPosting.entry_type == LedgerEntryType.DEBIT.value,
+            )
+            .order_by(LedgerPosting.id.desc())
+        )
+        result = await self.db.execute(stmt)
+        # Ordered newest first so the oldest posting of a reference wins
+        return {reference_id: posting_id for reference_id, posting_id in result.all()}
+
+    async def bulk_update_balances(self, balance_rows: List[Dict[str, Any]]) -> int:
+        """
+        Update many balances with per-row values in a single executemany UPDATE.
+
+        Each dict must contain the balance primary key `id` plus the columns
+        to set; all dicts in one call should carry the same keys.
+        """
+        if not balance_rows:
+            return 0
+
+        await self.db.execute(update(LedgerBalance), balance_rows)
+        logger.info(f"Bulk updated {len(balance_rows)} balances")
+        return len(balance_rows)
+
     async def update_balance(self, balance: LedgerBalance) -> LedgerBalance:
         """Update a balance record"""
         logger.debug(f"Updating balance: {balance.balance_id}")
@@ -295,24 +426,23 @@ class LedgerRepository:
     async def get_driver_balance_summary(
         self, driver_id: int, as_of_date: Optional[date] = None
     ) -> dict:
-        """Get summary of driver's blanaces by category"""
-        conditions = [
-            LedgerBalance.driver_id == driver_id,
-            LedgerBalance.status == "Open"
-        ]
+        """
+        Get summary of driver's blanaces by category
 
+        Reads the materialized ledger_balance_summaries rows. An as_of_date
+        cut-off depends on obligation dates, so that case still aggregates
+        ledger_balances directly.
+        """
         if as_of_date:
-            conditions.append(LedgerBalance.obligation_date <= as_of_date)
-
-        stmt = select(
-            LedgerBalance.category,
-            func.sum(LedgerBalance.balance).label("total_due"),
-            func.count(LedgerBalance.id).label("count")
-        ).where(and_(*conditions))
-        stmt = stmt.group_by(LedgerBalance.category)
-
-        result = await self.db.execute(stmt)
-        rows = result.all()
+            rows = await self.aggregate_open_balances([driver_id], as_of_date)
+        else:
+            stmt = select(
+                LedgerBalanceSummary.category,
+                LedgerBalanceSummary.total_due,
+                LedgerBalanceSummary.open_count.label("count")
+            ).where(LedgerBalanceSummary.driver_id == driver_id)
+            result = await self.db.execute(stmt)
+            rows = result.all()
 
         summary = {
             "Lease": Decimal("0.00"),
@@ -337,6 +467,148 @@ class LedgerRepository:
         
         return summary
 
+    async def aggregate_open_balances(
+        self, driver_ids: Optional[List[int]] = None, as_of_date: Optional[date] = None
+    ) -> List[Row]:
+        """
+        Aggregate open ledger_balances per (driver_id, category).
+
+        This is the raw source of truth behind ledger_balance_summaries;
+        rows carry driver_id, category, total_due and count.
+        """
+        conditions = [LedgerBalance.status == "Open"]
+
+        if driver_ids is not None:
+            conditions.append(LedgerBalance.driver_id.in_(driver_ids))
+
+        if as_of_date:
+            conditions.append(LedgerBalance.obligation_date <= as_of_date)
+
+        stmt = select(
+            LedgerBalance.driver_id,
+            LedgerBalance.category,
+            func.sum(LedgerBalance.balance).label("total_due"),
+            func.count(LedgerBalance.id).label("count")
+        ).where(and_(*conditions))
+        stmt = stmt.group_by(LedgerBalance.driver_id, LedgerBalance.category)
+
+        result = await self.db.execute(stmt)
+        return list(result.all())
+
+    # === Ledger Balance Summary Operations ===
+
+    async def apply_balance_summary_deltas(
+        self, deltas: Dict[Tuple[int, str], Tuple[Decimal, int]]
+    ) -> int:
+        """
+        Adjust ledger_balance_summaries by (total_due, open_count) deltas
+        keyed by (driver_id, category), creating missing rows.
+
+        Runs on the caller's transaction so the summary commits or rolls back
+        together with the postings and balances that caused the change. On
+        MySQL all keys go out as one INSERT ... ON DUPLICATE KEY UPDATE.
+        """
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "driver_id": driver_id,
+                "category": category,
+                "total_due": amount,
+                "open_count": count,
+                "updated_on": now,
+            }
+            for (driver_id, category), (amount, count) in sorted(
+                (key, delta) for key, delta in deltas.items() if key[0] is not None
+            )
+            if amount or count
+        ]
+        if not rows:
+            return 0
+
+        if self.db.get_bind().dialect.name == "mysql":
+            stmt = mysql_insert(LedgerBalanceSummary).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                total_due=LedgerBalanceSummary.total_due + stmt.inserted.total_due,
+                open_count=LedgerBalanceSummary.open_count + stmt.inserted.open_count,
+                updated_on=stmt.inserted.updated_on,
+            )
+            await self.db.execute(stmt)
+        else:
+            for row in rows:
+                result = await self.db.execute(
+                    update(LedgerBalanceSummary)
+                    .where(
+                        LedgerBalanceSummary.driver_id == row["driver_id"],
+                        LedgerBalanceSummary.category == row["category"],
+                    )
+                    .values(
+                        total_due=LedgerBalanceSummary.total_due + row["total_due"],
+                        open_count=LedgerBalanceSummary.open_count + row["open_count"],
+                        updated_on=row["updated_on"],
+                    )
+                )
+                if not result.rowcount:
+                    await self.db.execute(insert(LedgerBalanceSummary).values(row))
+
+        logger.debug(f"Applied {len(rows)} balance summary deltas")
+        return len(rows)
+
+    async def get_balance_summary_rows(
+        self, driver_ids: Optional[List[int]] = None
+    ) -> List[LedgerBalanceSummary]:
+        """Get materialized summary rows, optionally for specific drivers"""
+        stmt = select(LedgerBalanceSummary)
+        if driver_ids is not None:
+            stmt = stmt.where(LedgerBalanceSummary.driver_id.in_(driver_ids))
+
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def get_outstanding_by_category(self) -> List[Row]:
+        """System-wide outstanding totals per category from the summary table"""
+        stmt = select(
+            LedgerBalanceSummary.category,
+            func.sum(LedgerBalanceSummary.total_due).label("total_outstanding"),
+            func.sum(LedgerBalanceSummary.open_count).label("count")
+        ).where(LedgerBalanceSummary.open_count > 0)
+        stmt = stmt.group_by(LedgerBalanceSummary.category)
+
+        result = await self.db.execute(stmt)
+        return list(result.all())
+
+    async def rebuild_balance_summary(self, driver_ids: Optional[List[int]] = None) -> int:
+        """
+        Recompute ledger_balance_summaries from ledger_balances with one
+        DELETE and one INSERT ... SELECT (all drivers unless driver_ids given).
+
+        Returns:
+            Number of summary rows written
+        """
+        delete_stmt = delete(LedgerBalanceSummary)
+        if driver_ids is not None:
+            delete_stmt = delete_stmt.where(LedgerBalanceSummary.driver_id.in_(driver_ids))
+        await self.db.execute(delete_stmt)
+
+        conditions = [LedgerBalance.status == "Open"]
+        if driver_ids is not None:
+            conditions.append(LedgerBalance.driver_id.in_(driver_ids))
+
+        aggregate = select(
+            LedgerBalance.driver_id,
+            LedgerBalance.category,
+            func.sum(LedgerBalance.balance),
+            func.count(LedgerBalance.id),
+            func.now(),
+        ).where(and_(*conditions)).group_by(LedgerBalance.driver_id, LedgerBalance.category)
+
+        result = await self.db.execute(
+            insert(LedgerBalanceSummary).from_select(
+                ["driver_id", "category", "total_due", "open_count", "updated_on"], aggregate
+            )
+        )
+        logger.info(f"Rebuilt balance summary: {result.rowcount} rows")
+        return result.rowcount
+
     # === Transaction Management ===
 
     async def commit(self):
@@ -43,6 +43,7 @@ async def list_postings(
     date_to: Optional[date] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db)
 ):
@@ -74,7 +75,8 @@ async def list_postings(
         date_from=date_from,
         date_to=date_to,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        cursor=cursor
     )
     
     postings, total_items = await service.repo.get_postings_filtered(filters)
@@ -86,7 +88,8 @@ async def list_postings(
         total_items=total_items,
         page=page,
         per_page=per_page,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=postings.next_cursor
     )
 
 
@@ -158,6 +161,7 @@ async def list_balances(
     min_balance: Optional[float] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db)
 ):
@@ -188,7 +192,8 @@ async def list_balances(
         reference_id=reference_id,
         min_balance=min_balance,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        cursor=cursor
     )
     
     balances, total_items = await service.repo.get_balances_filtered(filters)
@@ -200,7 +205,8 @@ async def list_balances(
         total_items=total_items,
         page=page,
         per_page=per_page,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=balances.next_cursor
     )
 
 
@@ -339,29 +345,7 @@ async def get_outstanding_statistics(
     """
     logger.info("Getting outstanding statistics")
     
-    from sqlalchemy import select, func
-    from app.ledger.models import LedgerBalance, BalanceStatus
-    
-    stmt = select(
-        LedgerBalance.category,
-        func.sum(LedgerBalance.balance).label("total_outstanding"),
-        func.count(LedgerBalance.id).label("count")
-    ).where(LedgerBalance.status == BalanceStatus.OPEN.value)
-    stmt = stmt.group_by(LedgerBalance.category)
-    
-    result = await db.execute(stmt)
-    rows = result.all()
-    
-    statistics = {
-        "by_category": {
-            row.category: {
-                "total_outstanding": float(row.total_outstanding or 0),
-                "count": row.count
-            }
-            for row in rows
-        },
-        "grand_total": sum(float(row.total_outstanding or 0) for row in rows),
-        "total_open_balances": sum(row.count for row in rows)
-    }
+    service = LedgerService(db)
+    statistics = await service.get_outstanding_statistics()
     
     return statistics
\ No newline at end of file
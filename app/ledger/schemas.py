@@ -142,6 +142,7 @@ class PostingFilterParams(BaseModel):
     date_to: Optional[date] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=50, ge=1, le=1000)
+    cursor: Optional[str] = None
 
 
 class BalanceFilterParams(BaseModel):
@@ -156,6 +157,7 @@ class BalanceFilterParams(BaseModel):
     min_balance: Optional[Decimal] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=50, ge=1, le=1000)
+    cursor: Optional[str] = None
 
 
 # === Pagination Schemas ===
@@ -167,6 +169,7 @@ class PaginatedPostingResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 
 class PaginatedBalanceResponse(BaseModel):
@@ -176,6 +179,7 @@ class PaginatedBalanceResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 
 # === Driver Ledger View Schemas ===
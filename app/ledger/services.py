@@ -5,15 +5,17 @@ Service layer for Centralized Ledger Module.
 Implements all business logic for ledger operations.
 """
 
+from collections import defaultdict
 from datetime import datetime, date, timezone
 from decimal import Decimal
-from typing import Optional, List, Dict, Tuple
-import uuid
+from typing import Iterator, Optional, List, Dict, Tuple
 import json
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.utils.logger import get_logger
+from app.ledger.ids import ledger_ids
 from app.ledger.repository import LedgerRepository
 from app.ledger.models import LedgerPosting, LedgerBalance
 from app.ledger.schemas import (
@@ -45,6 +47,9 @@ PAYMENT_HIERARCHY = [
     LedgerCategory.MISC
 ]
 
+# Waterfall rank of each category (lower is paid first)
+CATEGORY_PRIORITY = {category.value: rank for rank, category in enumerate(PAYMENT_HIERARCHY)}
+
 
 class LedgerService:
     """
@@ -153,6 +158,10 @@ class LedgerService:
 
             balance = await self.repo.create_balance(balance)
 
+            await self.repo.apply_balance_summary_deltas(
+                {(driver_id, category.value): (amount, 1)}
+            )
+
             await self.repo.commit()
 
             logger.info(
@@ -167,6 +176,161 @@ class LedgerService:
             logger.error(f"Failed to create obligation posting: {str(e)}")
             raise
 
+    async def create_obligation_postings_batch(
+        self, category: LedgerCategory, reference_type: str,
+        obligations: List[Dict], created_by: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Create DEBIT postings and open balances for many obligations of one
+        category with one multi-row INSERT each.
+
+        Every obligation is a dict with reference_id, amount and driver_id,
+        plus optional vehicle_id, vin, plate, medallion_id, lease_id,
+        transaction_date and description. References that already have a
+        balance of reference_type are skipped rather than raising.
+
+        Unlike create_obligation_posting this does not commit: the caller
+        commits once its own rows for the batch are written, so postings and
+        source updates land together.
+
+        Returns: Dict of reference_id -> posting_id for the postings created
+        """
+        if category == LedgerCategory.EARNINGS:
+            raise InvalidLedgerEntryException("Cannot create obligation with Earnings category")
+        for obligation in obligations:
+            if obligation["amount"] <= 0:
+                raise InvalidLedgerEntryException(
+                    f"Amount must be positive for {obligation['reference_id']}"
+                )
+
+        existing = await self.repo.get_existing_balance_references(
+            (o["reference_id"] for o in obligations), reference_type
+        )
+        new_obligations = [o for o in obligations if o["reference_id"] not in existing]
+        logger.info(
+            f"Creating obligation postings batch",
+            category=category.value,
+            count=len(new_obligations),
+            duplicates=len(obligations) - len(new_obligations)
+        )
+        if not new_obligations:
+            return {}
+
+        now = datetime.now(timezone.utc)
+        posting_ids = ledger_ids.posting_ids(len(new_obligations))
+        balance_ids = ledger_ids.balance_ids(category.value, len(new_obligations))
+
+        posting_rows: List[Dict] = []
+        balance_rows: List[Dict] = []
+        summary_deltas: Dict[Tuple[int, str], Tuple[Decimal, int]] = defaultdict(lambda: (Decimal("0.00"), 0))
+        for obligation, posting_id, balance_id in zip(new_obligations, posting_ids, balance_ids):
+            amount = Decimal(str(obligation["amount"]))
+            transaction_date = obligation.get("transaction_date") or date.today()
+            linkage = {
+                "category": category.value,
+                "driver_id": obligation["driver_id"],
+                "vehicle_id": obligation.get("vehicle_id"),
+                "vin": obligation.get("vin"),
+                "plate": obligation.get("plate"),
+                "medallion_id": obligation.get("medallion_id"),
+                "lease_id": obligation.get("lease_id"),
+                "reference_id": obligation["reference_id"],
+                "reference_type": reference_type,
+                "description": obligation.get("description"),
+                "created_by": created_by,
+                "modified_by": created_by,
+            }
+            posting_rows.append({
+                **linkage,
+                "posting_id": posting_id,
+                "entry_type": LedgerEntryType.DEBIT.value,
+                "amount": amount,
+                "status": LedgerStatus.POSTED.value,
+                "posted_on": now,
+                "transaction_date": transaction_date,
+            })
+            balance_rows.append({
+                **linkage,
+                "balance_id": balance_id,
+                "original_amount": amount,
+                "prior_balance": Decimal("0.00"),
+                "payment": Decimal("0.00"),
+                "balance": amount,
+                "status": BalanceStatus.OPEN.value,
+                "obligation_date": transaction_date,
+                "updated_on": now,
+            })
+            total, count = summary_deltas[(obligation["driver_id"], category.value)]
+            summary_deltas[(obligation["driver_id"], category.value)] = (total + amount, count + 1)
+
+        await self.repo.bulk_insert_postings(posting_rows)
+        await self.repo.bulk_insert_balances(balance_rows)
+        await self.repo.apply_balance_summary_deltas(dict(summary_deltas))
+
+        return {row["reference_id"]: row["posting_id"] for row in posting_rows}
+
+    async def create_earnings_postings_batch(
+        self, reference_type: str, earnings: List[Dict], created_by: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Create Earnings CREDIT postings for many source records (e.g. CURB
+        trips) with one multi-row INSERT.
+
+        Every entry is a dict with reference_id, amount and driver_id, plus
+        optional vehicle_id, medallion_id, lease_id, transaction_date and
+        description. Earnings open no balance; they are applied to obligations
+        at settlement by apply_earnings_batch. References that already have a
+        posting of reference_type are skipped, so reruns do not double post.
+
+        Like create_obligation_postings_batch this does not commit.
+
+        Returns: Dict of reference_id -> posting_id for the postings created
+        """
+        for entry in earnings:
+            if entry["amount"] <= 0:
+                raise InvalidLedgerEntryException(
+                    f"Amount must be positive for {entry['reference_id']}"
+                )
+
+        existing = await self.repo.get_existing_posting_references(
+            (e["reference_id"] for e in earnings), reference_type
+        )
+        new_earnings = [e for e in earnings if e["reference_id"] not in existing]
+        logger.info(
+            f"Creating earnings postings batch",
+            reference_type=reference_type,
+            count=len(new_earnings),
+            duplicates=len(earnings) - len(new_earnings)
+        )
+        if not new_earnings:
+            return {}
+
+        now = datetime.now(timezone.utc)
+        posting_rows = [
+            {
+                "posting_id": posting_id,
+                "category": LedgerCategory.EARNINGS.value,
+                "entry_type": LedgerEntryType.CREDIT.value,
+                "amount": Decimal(str(entry["amount"])),
+                "driver_id": entry["driver_id"],
+                "vehicle_id": entry.get("vehicle_id"),
+                "medallion_id": entry.get("medallion_id"),
+                "lease_id": entry.get("lease_id"),
+                "reference_id": entry["reference_id"],
+                "reference_type": reference_type,
+                "status": LedgerStatus.POSTED.value,
+                "posted_on": now,
+                "transaction_date": entry.get("transaction_date") or date.today(),
+                "description": entry.get("description"),
+                "created_by": created_by,
+                "modified_by": created_by,
+            }
+            for entry, posting_id in zip(new_earnings, ledger_ids.posting_ids(len(new_earnings)))
+        ]
+        await self.repo.bulk_insert_postings(posting_rows)
+
+        return {row["reference_id"]: row["posting_id"] for row in posting_rows}
+
     async def apply_payment_to_balance(
         self, balance_id: str, payment_amount: Decimal, payment_source: str,
         payment_source_id: str, created_by: Optional[int] = None
@@ -207,6 +371,8 @@ class LedgerService:
             )
         
         try:
+            before = self._open_position(balance)
+
             # === Generate Posting ID ===
             posting_id = self._generate_posting_id()
 
@@ -260,6 +426,10 @@ class LedgerService:
                 balance = await self.repo.close_balance(balance)
             else:
                 balance = await self.repo.update_balance(balance)
+
+            await self.repo.apply_balance_summary_deltas(
+                self._summary_delta(balance, before)
+            )
             
             await self.repo.commit()
             
@@ -302,89 +472,224 @@ class LedgerService:
         
         Returns: Dict with allocation details and net earnings
         """
-        logger.info(
-            f"Applying earnings to obligations",
-            driver_id=driver_id,
-            earnings=str(earnings_amount),
-            batch_id=earnings_batch_id
-        )
-        
         if earnings_amount <= 0:
             raise InvalidLedgerEntryException("Earnings amount must be positive")
-        
+
+        results = await self.apply_earnings_batch(
+            {driver_id: earnings_amount},
+            earnings_batch_id=earnings_batch_id,
+            transaction_date=transaction_date,
+            created_by=created_by,
+        )
+        return results[driver_id]
+
+    async def apply_earnings_batch(
+        self,
+        earnings_by_driver: Dict[int, Decimal],
+        earnings_batch_id: str,
+        transaction_date: Optional[date] = None,
+        created_by: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict[int, Dict]:
+        """
+        Apply earnings for many drivers (e.g. the whole fleet at weekly
+        settlement) in a single transaction.
+
+        Open balances are loaded for batch_size drivers at a time in one
+        ordered query, the category-then-FIFO waterfall runs in memory, and
+        each batch writes all payment postings with one multi-row INSERT and
+        all balance changes with one executemany UPDATE.
+
+        Returns: Dict of driver_id -> allocation details (same shape as
+        apply_earnings_to_obligations)
+        """
+        batch_size = batch_size or settings.ledger_settlement_batch_size
+        driver_ids = [d for d, amount in earnings_by_driver.items() if amount > 0]
+        categories = [category.value for category in PAYMENT_HIERARCHY]
+
+        logger.info(
+            f"Applying earnings batch",
+            batch_id=earnings_batch_id,
+            drivers=len(driver_ids),
+            batch_size=batch_size
+        )
+
         try:
-            remaining_earnings = earnings_amount
-            allocations = []
-            
-            # Apply earnings following hierarchy
-            for category in PAYMENT_HIERARCHY:
-                if remaining_earnings <= Decimal("0.01"):
-                    break
-                
-                # Get open balances for this category (oldest first)
-                balances = await self.repo.get_open_balances_by_driver(driver_id, category.value)
-                
+            results = {}
+            for start in range(0, len(driver_ids), batch_size):
+                chunk = driver_ids[start:start + batch_size]
+
+                balances = await self.repo.get_open_balances_for_drivers(chunk, categories)
+                balances_by_driver: Dict[int, List] = defaultdict(list)
                 for balance in balances:
-                    if remaining_earnings <= Decimal("0.01"):
-                        break
-                    
-                    # Determine payment amount
-                    payment_amount = min(remaining_earnings, balance.balance)
-                    
-                    # Apply payment
-                    posting, updated_balance = await self.apply_payment_to_balance(
-                        balance_id=balance.balance_id,
-                        payment_amount=payment_amount,
-                        payment_source="CURB_EARNINGS",
-                        payment_source_id=earnings_batch_id,
-                        created_by=created_by
-                    )
-                    
-                    allocations.append({
-                        "category": category.value,
-                        "reference_id": balance.reference_id,
-                        "reference_type": balance.reference_type,
-                        "amount_applied": str(payment_amount),
-                        "balance_before": str(balance.balance + payment_amount),
-                        "balance_after": str(updated_balance.balance),
-                        "posting_id": posting.posting_id,
-                        "balance_id": updated_balance.balance_id
-                    })
-                    
-                    remaining_earnings -= payment_amount
-                    
-                    logger.debug(
-                        f"Applied {payment_amount} to {category.value} {balance.reference_id}"
+                    balances_by_driver[balance.driver_id].append(balance)
+
+                # At most one payment posting per open balance; unused IDs are just gaps
+                posting_ids = iter(ledger_ids.posting_ids(len(balances)))
+
+                posting_rows: List[Dict] = []
+                balance_rows: List[Dict] = []
+                summary_deltas: Dict[Tuple[int, str], Tuple[Decimal, int]] = {}
+                for driver_id in chunk:
+                    results[driver_id] = self._allocate_earnings(
+                        driver_id=driver_id,
+                        earnings_amount=earnings_by_driver[driver_id],
+                        balances=balances_by_driver.get(driver_id, []),
+                        earnings_batch_id=earnings_batch_id,
+                        transaction_date=transaction_date or date.today(),
+                        created_by=created_by,
+                        posting_ids=posting_ids,
+                        posting_rows=posting_rows,
+                        balance_rows=balance_rows,
+                        summary_deltas=summary_deltas,
                     )
-            
+
+                await self.repo.bulk_insert_postings(posting_rows)
+                await self.repo.bulk_update_balances(balance_rows)
+                await self.repo.apply_balance_summary_deltas(summary_deltas)
+
             await self.repo.commit()
-            
-            net_earnings = remaining_earnings
-            total_allocated = earnings_amount - net_earnings
-            
+
             logger.info(
-                f"Earnings allocation complete",
-                driver_id=driver_id,
-                total_earnings=str(earnings_amount),
-                total_allocated=str(total_allocated),
-                net_earnings=str(net_earnings),
-                allocations_count=len(allocations)
+                f"Earnings batch applied",
+                batch_id=earnings_batch_id,
+                drivers=len(results),
+                allocations=sum(len(r["allocations"]) for r in results.values())
             )
-            
-            return {
-                "success": True,
-                "driver_id": driver_id,
-                "earnings_batch_id": earnings_batch_id,
-                "total_earnings": earnings_amount,
-                "total_allocated": total_allocated,
-                "net_earnings": net_earnings,
-                "allocations": allocations
-            }
-            
+            return results
+
         except Exception as e:
             await self.repo.rollback()
             logger.error(f"Failed to apply earnings: {str(e)}")
             raise
+
+    def _allocate_earnings(
+        self,
+        driver_id: int,
+        earnings_amount: Decimal,
+        balances: List,
+        earnings_batch_id: str,
+        transaction_date: date,
+        created_by: Optional[int],
+        posting_ids: Iterator[str],
+        posting_rows: List[Dict],
+        balance_rows: List[Dict],
+        summary_deltas: Dict[Tuple[int, str], Tuple[Decimal, int]],
+    ) -> Dict:
+        """
+        Run the payment waterfall for one driver in memory.
+
+        balances must be the driver's open balances oldest first; they are
+        re-ordered by PAYMENT_HIERARCHY (stable, so FIFO holds within a
+        category). Payment postings take their IDs from posting_ids, which
+        the caller mints in bulk. Posting and balance rows to write are appended to
+        posting_rows / balance_rows, and summary changes are accumulated in
+        summary_deltas.
+        """
+        now = datetime.now(timezone.utc)
+        remaining_earnings = earnings_amount
+        allocations = []
+
+        for balance in sorted(balances, key=lambda b: CATEGORY_PRIORITY[b.category]):
+            if remaining_earnings <= Decimal("0.01"):
+                break
+
+            # Determine payment amount
+            payment_amount = min(remaining_earnings, balance.balance)
+            if payment_amount <= 0:
+                continue
+
+            posting_id = next(posting_ids)
+            posting_rows.append({
+                "posting_id": posting_id,
+                "category": balance.category,
+                "entry_type": LedgerEntryType.CREDIT.value,
+                "amount": payment_amount,
+                "driver_id": balance.driver_id,
+                "vehicle_id": balance.vehicle_id,
+                "vin": balance.vin,
+                "plate": balance.plate,
+                "medallion_id": balance.medallion_id,
+                "lease_id": balance.lease_id,
+                "reference_id": balance.reference_id,
+                "reference_type": f"CURB_EARNINGS-{earnings_batch_id}",
+                "status": LedgerStatus.POSTED.value,
+                "posted_on": now,
+                "transaction_date": transaction_date,
+                "description": "Payment from CURB_EARNINGS",
+                "created_by": created_by,
+                "modified_by": created_by,
+            })
+
+            # Update payment references
+            payment_refs = []
+            if balance.applied_payment_refs:
+                try:
+                    payment_refs = json.loads(balance.applied_payment_refs)
+                except ValueError:
+                    payment_refs = []
+
+            payment_refs.append({
+                "source": "CURB_EARNINGS",
+                "source_id": earnings_batch_id,
+                "amount": str(payment_amount),
+                "posted_at": now.isoformat()
+            })
+
+            # Close balance if fully paid (account for rounding)
+            new_balance = balance.balance - payment_amount
+            closed = new_balance <= Decimal("0.01")
+            balance_rows.append({
+                "id": balance.id,
+                "payment": balance.payment + payment_amount,
+                "balance": Decimal("0.00") if closed else new_balance,
+                "applied_payment_refs": json.dumps(payment_refs),
+                "status": BalanceStatus.CLOSED.value if closed else BalanceStatus.OPEN.value,
+                "closed_on": now if closed else None,
+                "updated_on": now,
+                "modified_by": created_by,
+            })
+
+            key = (balance.driver_id, balance.category)
+            amount_delta, count_delta = summary_deltas.get(key, (Decimal("0.00"), 0))
+            summary_deltas[key] = (
+                amount_delta - balance.balance + (Decimal("0.00") if closed else new_balance),
+                count_delta - (1 if closed else 0),
+            )
+
+            allocations.append({
+                "category": balance.category,
+                "reference_id": balance.reference_id,
+                "reference_type": balance.reference_type,
+                "amount_applied": str(payment_amount),
+                "balance_before": str(balance.balance),
+                "balance_after": str(Decimal("0.00") if closed else new_balance),
+                "posting_id": posting_id,
+                "balance_id": balance.balance_id
+            })
+
+            remaining_earnings -= payment_amount
+
+        net_earnings = remaining_earnings
+        total_allocated = earnings_amount - net_earnings
+
+        logger.debug(
+            f"Earnings allocated",
+            driver_id=driver_id,
+            total_allocated=str(total_allocated),
+            net_earnings=str(net_earnings),
+            allocations_count=len(allocations)
+        )
+
+        return {
+            "success": True,
+            "driver_id": driver_id,
+            "earnings_batch_id": earnings_batch_id,
+            "total_earnings": earnings_amount,
+            "total_allocated": total_allocated,
+            "net_earnings": net_earnings,
+            "allocations": allocations
+        }
     
     # === Reversal Operations ===
     
@@ -448,6 +753,7 @@ class LedgerService:
             )
             
             if balance:
+                before = self._open_position(balance)
                 if posting.entry_type == LedgerEntryType.DEBIT.value:
                     # Voiding a debit (obligation) - reduce balance
                     balance.balance -= posting.amount
@@ -461,6 +767,10 @@ class LedgerService:
                     balance.payment -= posting.amount
                     balance.status = BalanceStatus.OPEN.value
                     balance = await self.repo.update_balance(balance)
+
+                await self.repo.apply_balance_summary_deltas(
+                    self._summary_delta(balance, before)
+                )
             
             await self.repo.commit()
             
@@ -547,6 +857,68 @@ class LedgerService:
             open_balances_count=balance_summary.get("open_count", 0)
         )
     
+    async def get_outstanding_statistics(self) -> Dict:
+        """System-wide outstanding balances by category, read from the summary table"""
+        rows = await self.repo.get_outstanding_by_category()
+
+        return {
+            "by_category": {
+                row.category: {
+                    "total_outstanding": float(row.total_outstanding or 0),
+                    "count": int(row.count or 0)
+                }
+                for row in rows
+            },
+            "grand_total": sum(float(row.total_outstanding or 0) for row in rows),
+            "total_open_balances": sum(int(row.count or 0) for row in rows)
+        }
+
+    # === Balance Summary Maintenance ===
+
+    async def rebuild_balance_summary(self, driver_ids: Optional[List[int]] = None) -> int:
+        """Recompute ledger_balance_summaries from ledger_balances and commit"""
+        try:
+            rows = await self.repo.rebuild_balance_summary(driver_ids)
+            await self.repo.commit()
+            return rows
+        except Exception as e:
+            await self.repo.rollback()
+            logger.error(f"Failed to rebuild balance summary: {str(e)}")
+            raise
+
+    async def verify_balance_summary(self, driver_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Compare ledger_balance_summaries with the raw ledger_balances aggregate.
+
+        Returns: One dict per (driver_id, category) that disagrees; empty when
+        the summary is consistent.
+        """
+        expected = {
+            (row.driver_id, row.category): (row.total_due or Decimal("0.00"), row.count or 0)
+            for row in await self.repo.aggregate_open_balances(driver_ids)
+        }
+        actual = {
+            (row.driver_id, row.category): (row.total_due, row.open_count)
+            for row in await self.repo.get_balance_summary_rows(driver_ids)
+        }
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            expected_total, expected_count = expected.get(key, (Decimal("0.00"), 0))
+            actual_total, actual_count = actual.get(key, (Decimal("0.00"), 0))
+            if expected_total != actual_total or expected_count != actual_count:
+                mismatches.append({
+                    "driver_id": key[0],
+                    "category": key[1],
+                    "expected_total": expected_total,
+                    "actual_total": actual_total,
+                    "expected_count": expected_count,
+                    "actual_count": actual_count,
+                })
+
+        logger.info(f"Verified balance summary: {len(mismatches)} mismatches")
+        return mismatches
+
     async def get_outstanding_balance(
         self, reference_id: str, reference_type: Optional[str] = None
     ) -> Optional[Decimal]:
@@ -559,19 +931,28 @@ class LedgerService:
         return balance.balance if balance.status == BalanceStatus.OPEN.value else Decimal("0.00")
     
     # === Helper Methods ===
+
+    @staticmethod
+    def _open_position(balance: LedgerBalance) -> Tuple[Decimal, int]:
+        """A balance's contribution to the summary table: (amount, open count)"""
+        if balance.status == BalanceStatus.OPEN.value:
+            return balance.balance, 1
+        return Decimal("0.00"), 0
+
+    def _summary_delta(
+        self, balance: LedgerBalance, before: Tuple[Decimal, int]
+    ) -> Dict[Tuple[int, str], Tuple[Decimal, int]]:
+        """Summary delta for a balance that moved from `before` to its current state"""
+        after = self._open_position(balance)
+        return {(balance.driver_id, balance.category): (after[0] - before[0], after[1] - before[1])}
     
     def _generate_posting_id(self, prefix: str = "POST") -> str:
-        """Generate unique posting ID"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        unique_suffix = str(uuid.uuid4().hex)[:6].upper()
-        return f"{prefix}-{timestamp}-{unique_suffix}"
+        """Generate unique, time-ordered posting ID (see app.ledger.ids)"""
+        return ledger_ids.posting_id(prefix)
     
     def _generate_balance_id(self, category: str) -> str:
-        """Generate unique balance ID"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        unique_suffix = str(uuid.uuid4().hex)[:6].upper()
-        category_prefix = category[:3].upper()
-        return f"BAL-{category_prefix}-{timestamp}-{unique_suffix}"
+        """Generate unique, time-ordered balance ID (see app.ledger.ids)"""
+        return ledger_ids.balance_id(category)
 
 
 
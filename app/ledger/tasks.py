@@ -1,72 +1,100 @@
 ### app/ledger/tasks.py
 
 # Standard library imports
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 # Third party imports
-from celery import shared_task
+from celery import chord, shared_task
 
 # Local imports
 from app.utils.logger import get_logger
-from app.core.db import get_db
-from app.ledger.services import ledger_service
-from app.drivers.services import driver_service
-from app.leases.services import lease_service
-from app.vehicles.services import vehicle_service
-from app.medallions.services import medallion_service
-from app.ledger.utils import generate_dtr_html_doc, generate_dtr_pdf_doc, generate_dtr_excel_doc_styled
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.ledger.dtr import get_active_dtr_driver_ids, prefetch_dtr_data, render_dtr_documents
 
 logger = get_logger(__name__)
 
+
+def _last_week_period(today: date) -> tuple:
+    """Previous Sunday-to-Saturday week relative to `today`"""
+    start_of_this_week = today - timedelta(days=(today.weekday() + 1) % 7)
+    from_date = start_of_this_week - timedelta(days=7)
+    return from_date, from_date + timedelta(days=6)
+
+
 @shared_task(bind=True, name='app.ledger.tasks.generate_weekly_dtrs')
 def generate_weekly_dtrs(self):
     """
     Generate weekly Driver Transaction Receipts (DTRs) for all active drivers.
     This task runs every Sunday and covers the previous week from Sunday to Saturday.
-    """
-    from app.curb.models import CURBTrip
-    from app.ezpass.models import EZPassTransaction
-    from app.pvb.models import PVBViolation
 
+    Active drivers are resolved with a single query and split into chunks;
+    each chunk is prefetched and rendered by render_dtr_chunk in parallel,
+    and summarize_dtr_run reports the totals once every chunk finished.
+    """
     task_id = self.request.id
     logger.info(f"[Task ID: {task_id}] Starting weekly DTR generation process")
-    db = next(get_db())
+
+    from_date, to_date = _last_week_period(datetime.now(timezone.utc).date())
+    logger.info(f"Generating DTRs for period: {from_date} to {to_date}")
+
+    db = SessionLocal()
     try:
-        # Determine the date range for the last week (Sun 12:00 AM to Sat 11:59 PM)
-        today = datetime.now(timezone.utc)
-        start_of_this_week = today - timedelta(days=today.weekday() + 1) # Last Sunday
-        end_of_last_week = start_of_this_week - timedelta(seconds=1)
-        start_of_last_week = end_of_last_week - timedelta(days=6)
+        driver_ids = get_active_dtr_driver_ids(db, from_date, to_date)
+    finally:
+        db.close()
 
-        from_date = start_of_last_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        to_date = end_of_last_week.replace(hour=23, minute=59, second=59, microsecond=999999)
+    logger.info(f"Found {len(driver_ids)} active drivers for the period.")
+    if not driver_ids:
+        return {"drivers": 0, "chunks": 0}
 
-        logger.info(f"Generating DTRs for period: {from_date} to {to_date}")
+    chunk_size = settings.dtr_render_chunk_size
+    chunks = [driver_ids[i:i + chunk_size] for i in range(0, len(driver_ids), chunk_size)]
 
-        # Find all drivers who had activity in this period (e.g., had CURB trips)
-        active_driver_ids = db.query(CURBTrip.driver_id).filter(
-            CURBTrip.start_date.between(from_date.date(), to_date.date())
-        ).distinct().all()
+    chord(
+        render_dtr_chunk.s(chunk, from_date.isoformat(), to_date.isoformat())
+        for chunk in chunks
+    )(summarize_dtr_run.s(task_id))
 
-        driver_ids_to_process = [d[0] for d in active_driver_ids]
-        logger.info(f"Found {len(driver_ids_to_process)} active drivers for the period.")
+    logger.info(f"[Task ID: {task_id}] Dispatched {len(chunks)} DTR chunks")
+    return {"drivers": len(driver_ids), "chunks": len(chunks)}
 
-        for driver_id in driver_ids_to_process:
+
+@shared_task(name='app.ledger.tasks.render_dtr_chunk')
+def render_dtr_chunk(driver_ids, from_date: str, to_date: str):
+    """
+    Prefetch and render the DTRs of one chunk of drivers.
+
+    Returns:
+        Dict with the generated document keys per driver and per-driver errors
+    """
+    period_start = date.fromisoformat(from_date)
+    period_end = date.fromisoformat(to_date)
+
+    generated, errors = {}, {}
+    db = SessionLocal()
+    try:
+        dtr_data = prefetch_dtr_data(db, driver_ids, period_start, period_end)
+        for driver_id, data in dtr_data.items():
             try:
-                # Find the internal integer ID for the driver
-                driver = driver_service.get_drivers(db, driver_id=driver_id)
-                if not driver:
-                    logger.warning(f"Could not find driver for CURB driver_id {driver_id}. Skipping.")
-                    continue
-                
-                logger.info(f"Generating DTR for driver: {driver.full_name} (ID: {driver.id})")
-                ledger_service.create_and_generate_dtr_files(db, driver.id, from_date, to_date)
+                generated[driver_id] = render_dtr_documents(data)
             except Exception as e:
                 logger.error(f"Failed to generate DTR for driver ID {driver_id}: {e}", exc_info=True)
-
-        logger.info(f"[Task ID: {task_id}] Weekly DTR generation completed successfully.")
-    except Exception as e:
-        logger.error(f"[Task ID: {task_id}] A critical error occurred during DTR generation: {e}", exc_info=True)
-        raise
+                errors[driver_id] = str(e)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+    return {"generated": generated, "errors": errors}
+
+
+@shared_task(name='app.ledger.tasks.summarize_dtr_run')
+def summarize_dtr_run(chunk_results, task_id: str):
+    """Chord callback logging the outcome of a weekly DTR run"""
+    generated = sum(len(result["generated"]) for result in chunk_results)
+    failed = sum(len(result["errors"]) for result in chunk_results)
+
+    logger.info(
+        f"[Task ID: {task_id}] Weekly DTR generation completed: "
+        f"{generated} generated, {failed} failed across {len(chunk_results)} chunks"
+    )
+    return {"generated": generated, "failed": failed}
@@ -15,8 +15,7 @@ from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 
 # Local imports
 from app.utils.logger import get_logger
-from app.ledger.models import LedgerEntry
-from app.ledger.schemas import LedgerSourceType
+from app.ledger.models import LedgerPosting, LedgerCategory, LedgerEntryType
 from app.utils.s3_utils import s3_utils
 from app.utils.exporter.pdf_exporter import PDFExporter
 
@@ -43,46 +42,43 @@ def get_pay_window(pay_day: str, reference_date: date) -> tuple[datetime, dateti
         logger.error("Error getting pay window: %s", e, exc_info=True)
         raise e
     
-def summarize_ledger_entries(entries: list[LedgerEntry]) -> dict:
-    """Summarize ledger entries"""
+# Debit (obligation) categories -> DTR summary key
+DEBIT_SUMMARY_KEYS = {
+    LedgerCategory.LEASE.value: "lease_due",
+    LedgerCategory.EZPASS.value: "ezpass_due",
+    LedgerCategory.PVB.value: "pvb_due",
+    LedgerCategory.TLC.value: "tlc_due",
+    LedgerCategory.TAXES.value: "taxes_due",
+    LedgerCategory.REPAIR.value: "repairs_due",
+    LedgerCategory.LOAN.value: "loans_due",
+    LedgerCategory.MISC.value: "misc_due",
+    LedgerCategory.DEPOSIT.value: "deposit_due",
+}
+
+def summarize_ledger_entries(entries: list[LedgerPosting]) -> dict:
+    """
+    Summarize a driver's ledger postings for a DTR period in one pass.
+
+    Debits are totalled per obligation category; credits are split into
+    earnings, interim (cash) payments and payments applied to obligations.
+    """
     try:
         summary = defaultdict(float)
 
         for e in entries:
-            if e.debit:
-                if "lease" in e.description.lower():
-                    summary["lease_due"]  += float(e.amount)
-                elif e.source_type == LedgerSourceType.EZPASS:
-                    summary["ezpass_due"] += float(e.amount)
-                elif e.source_type == LedgerSourceType.PVB:
-                    summary["pvb_due"] += float(e.amount)
-                elif e.source_type == LedgerSourceType.MANUAL_FEE:
-                    summary["manual_fee"] += float(e.amount)
-                elif "mta" in e.description.lower():
-                    summary["mta"] += float(e.amount)
-                elif "tif" in e.description.lower():
-                    summary["tif"] += float(e.amount)
-                elif "cps" in e.description.lower():
-                    summary["cps"] += float(e.amount)
-                elif "aaf" in e.description.lower():
-                    summary["aaf"] += float(e.amount)
+            amount = float(e.amount)
+            if e.entry_type == LedgerEntryType.DEBIT.value:
+                summary[DEBIT_SUMMARY_KEYS.get(e.category, "misc_due")] += amount
+            elif e.category == LedgerCategory.EARNINGS.value:
+                summary["earnings"] += amount
+            elif e.category == LedgerCategory.INTERIM_PAYMENT.value:
+                summary["cash_paid"] += amount
             else:
-                if "trip fare (card)" in e.description.lower():
-                    summary["cc_earnings"] += float(e.amount)
-                elif "trip fare (cash)" in e.description.lower():
-                    summary["cash_earnings"] += float(e.amount)
-                elif "trip" in e.description.lower():
-                    summary["trips"] += float(e.amount)
-                elif "cash payment" in e.description.lower():
-                    summary["cash_paid"] += float(e.amount)
+                summary["payments"] += amount
 
-            summary["total_dues"] = {
-                summary["lease_due"] + summary["ezpass_due"] + summary["pvb_due"] +
-                summary["manual_fee"] + summary["mta"] + summary["tif"] + summary["cps"] +
-                summary["aaf"]
-            }
+        summary["total_dues"] = sum(summary[key] for key in set(DEBIT_SUMMARY_KEYS.values()))
 
-            return summary
+        return summary
     except Exception as e:
         logger.error("Error summarizing ledger entries: %s", e, exc_info=True)
         raise e
@@ -226,7 +222,7 @@ def generate_dtr_excel_doc_styled(data: dict):
             cell.border = border
             cell.alignment = center_alignment
         
-        logger.info(f"Generating Excel with {data}")
+        logger.debug("Generating DTR Excel", driver_id=data['driver'].id)
         # Trip data
         for trip in data['curb_trips']:
             row += 1
@@ -259,7 +255,7 @@ def generate_dtr_excel_doc_styled(data: dict):
         
         row += 1
         # Ledger headers
-        ledger_headers = ['ID', 'Date', 'Category', 'Amount', 'Type', 'Reference']
+        ledger_headers = ['Posting ID', 'Date', 'Category', 'Amount', 'Type', 'Reference']
         for col, header in enumerate(ledger_headers, 1):
             cell = ws.cell(row=row, column=col, value=header)
             cell.font = table_header_font
@@ -271,12 +267,12 @@ def generate_dtr_excel_doc_styled(data: dict):
         for entry in data['ledgers']:
             row += 1
             ledger_data = [
-                entry.id,
-                str(entry.created_on),
-                entry.source_type.value if hasattr(entry.source_type, 'value') else str(entry.source_type),
+                entry.posting_id,
+                str(entry.transaction_date),
+                entry.category,
                 float(entry.amount),
-                "Debit" if entry.debit else "Credit",
-                entry.source_id
+                entry.entry_type,
+                entry.reference_id
             ]
             
             for col, value in enumerate(ledger_data, 1):
@@ -295,8 +291,8 @@ def generate_dtr_excel_doc_styled(data: dict):
         total_transactions = len(data['ledgers'])
         total_trip_amount = sum(float(trip.trip_amount) if trip.trip_amount else 0 for trip in data['trips'])
         total_tips = sum(float(trip.tips) if trip.tips else 0 for trip in data['trips'])
-        total_credits = sum(float(entry.amount) for entry in data['ledgers'] if not entry.debit)
-        total_debits = sum(float(entry.amount) for entry in data['ledgers'] if entry.debit)
+        total_credits = sum(float(entry.amount) for entry in data['ledgers'] if entry.entry_type == LedgerEntryType.CREDIT.value)
+        total_debits = sum(float(entry.amount) for entry in data['ledgers'] if entry.entry_type == LedgerEntryType.DEBIT.value)
         
         # Summary Section
         row += 3
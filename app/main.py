@@ -1,13 +1,17 @@
 # app/main.py
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.concurrency import EventLoopBlockMiddleware, EventLoopBlockMonitor
 from app.core.config import settings
 from app.utils.logger import setup_app_logging, get_logger
 from app.bpm.step_info import STEP_REGISTRY, import_bpm_flows
+from app.bpm.schema_registry import schema_registry
+from app.core.db import SessionLocal
 # Local application imports - Routes
 from app.users.router import router as user_routes
 from app.uploads.router import router as upload_routes
@@ -35,11 +39,33 @@ from app.interim_payments.router import router as interim_payment_routes
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Method for importing all the bpm flows
+    Method for importing all the bpm flows and warming up their step schemas
     """
     import_bpm_flows()
+    await asyncio.to_thread(warm_up_step_schemas)
+
+    loop_monitor = None
+    if settings.event_loop_block_threshold_ms:
+        loop_monitor = EventLoopBlockMonitor(settings.event_loop_block_threshold_ms)
+        await loop_monitor.start()
+        app.state.event_loop_monitor = loop_monitor
+
     yield
 
+    if loop_monitor:
+        await loop_monitor.stop()
+
+
+def warm_up_step_schemas():
+    """Compile every configured step schema before serving requests"""
+    db = SessionLocal()
+    try:
+        schema_registry.warm_up(db)
+    except Exception as e:
+        logger.warning("BPM step schema warm-up failed", error=str(e))
+    finally:
+        db.close()
+
 
 # Create the FastAPI app
 bat_app = FastAPI(
@@ -80,6 +106,10 @@ bat_app.add_middleware(
     allow_headers=["*"],
 )
 
+# Label request tasks so event loop blocks are reported per route
+if settings.event_loop_block_threshold_ms:
+    bat_app.add_middleware(EventLoopBlockMiddleware)
+
 # Include routers
 bat_app.include_router(user_routes)
 bat_app.include_router(bpm_routes)
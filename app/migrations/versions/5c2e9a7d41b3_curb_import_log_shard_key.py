@@ -0,0 +1,30 @@
+"""curb import log shard key
+
+Revision ID: 5c2e9a7d41b3
+Revises: 40b428cad5f1
+Create Date: 2025-10-27 10:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e9a7d41b3'
+down_revision: Union[str, Sequence[str], None] = '40b428cad5f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('curb_import_logs', sa.Column('shard_key', sa.String(length=128), nullable=True))
+    op.create_index(op.f('ix_curb_import_logs_shard_key'), 'curb_import_logs', ['shard_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_curb_import_logs_shard_key'), table_name='curb_import_logs')
+    op.drop_column('curb_import_logs', 'shard_key')
@@ -0,0 +1,87 @@
+"""curb trip record period unique
+
+Revision ID: 8a1f6c3e2d90
+Revises: 5c2e9a7d41b3
+Create Date: 2025-10-28 09:41:17.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1f6c3e2d90'
+down_revision: Union[str, Sequence[str], None] = '5c2e9a7d41b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Card transactions carry no period; NULLs never collide in a unique key
+    op.execute("UPDATE curb_trips SET period = '' WHERE period IS NULL")
+
+    # Copies of a (record_id, period) imported twice by overlapping imports
+    # are moved to archive tables before the unique key is added. The copy
+    # that got furthest (posted, reconciled, associated) is kept, the oldest
+    # one among equals; kept_trip_id records which trip replaced an archived copy.
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('curb_trips_dedupe_archive'):
+        op.execute("CREATE TABLE curb_trips_dedupe_archive LIKE curb_trips")
+        op.execute("ALTER TABLE curb_trips_dedupe_archive ADD COLUMN kept_trip_id INT NULL")
+    if not inspector.has_table('curb_trip_reconciliation_dedupe_archive'):
+        op.execute("CREATE TABLE curb_trip_reconciliation_dedupe_archive LIKE curb_trip_reconciliation")
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE curb_trip_duplicates AS
+        SELECT id, kept_id FROM (
+            SELECT t.id,
+                   FIRST_VALUE(t.id) OVER w AS kept_id,
+                   ROW_NUMBER() OVER w AS copy_rank
+            FROM curb_trips t
+            LEFT JOIN curb_trip_reconciliation r ON r.trip_id = t.id
+            WINDOW w AS (
+                PARTITION BY t.record_id, t.period
+                ORDER BY t.is_posted DESC,
+                         t.is_reconciled DESC,
+                         r.id IS NOT NULL DESC,
+                         (t.driver_fk IS NOT NULL OR t.medallion_fk IS NOT NULL
+                          OR t.vehicle_fk IS NOT NULL) DESC,
+                         t.id
+            )
+        ) ranked
+        WHERE copy_rank > 1
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO curb_trips_dedupe_archive
+        SELECT t.*, d.kept_id FROM curb_trips t JOIN curb_trip_duplicates d ON d.id = t.id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO curb_trip_reconciliation_dedupe_archive
+        SELECT r.* FROM curb_trip_reconciliation r JOIN curb_trip_duplicates d ON d.id = r.trip_id
+        """
+    )
+    # Their reconciliation rows cascade
+    op.execute("DELETE t FROM curb_trips t JOIN curb_trip_duplicates d ON d.id = t.id")
+    op.execute("DROP TEMPORARY TABLE curb_trip_duplicates")
+
+    op.drop_index('idx_curb_trip_record_period', table_name='curb_trips')
+    op.create_unique_constraint('uq_curb_trip_record_period', 'curb_trips', ['record_id', 'period'])
+
+
+def downgrade() -> None:
+    """
+    Downgrade schema.
+
+    Lossy: the duplicate trips removed by upgrade are not put back, and
+    periods normalized from NULL to '' stay ''. The archive tables are left
+    in place so archived rows can still be inspected or restored by hand.
+    """
+    op.drop_constraint('uq_curb_trip_record_period', 'curb_trips', type_='unique')
+    op.create_index('idx_curb_trip_record_period', 'curb_trips', ['record_id', 'period'], unique=False)
@@ -0,0 +1,53 @@
+"""ledger balance summaries
+
+Revision ID: b7d3e5f18a42
+Revises: 8a1f6c3e2d90
+Create Date: 2025-10-29 11:06:52.913470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e5f18a42'
+down_revision: Union[str, Sequence[str], None] = '8a1f6c3e2d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ledger_balance_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('driver_id', sa.Integer(), nullable=False, comment='Driver reference'),
+    sa.Column('category', sa.Enum('Lease', 'Repair', 'Loan', 'EZPass', 'PVB', 'TLC', 'Taxes', 'Misc', 'Deposit', name='balance_summary_category_enum'), nullable=False, comment='Obligation type'),
+    sa.Column('total_due', sa.Numeric(precision=14, scale=2), nullable=False, comment='Sum of open balances'),
+    sa.Column('open_count', sa.Integer(), nullable=False, comment='Number of open balances'),
+    sa.Column('updated_on', sa.DateTime(), nullable=False, comment='Timestamp of last adjustment'),
+    sa.ForeignKeyConstraint(['driver_id'], ['drivers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('driver_id', 'category', name='uq_balance_summary_driver_category')
+    )
+    op.create_index(op.f('ix_ledger_balance_summaries_category'), 'ledger_balance_summaries', ['category'], unique=False)
+    op.create_index(op.f('ix_ledger_balance_summaries_id'), 'ledger_balance_summaries', ['id'], unique=False)
+
+    # Seed from the existing open balances
+    op.execute(
+        """
+        INSERT INTO ledger_balance_summaries (driver_id, category, total_due, open_count, updated_on)
+        SELECT driver_id, category, SUM(balance), COUNT(id), NOW()
+        FROM ledger_balances
+        WHERE status = 'Open'
+        GROUP BY driver_id, category
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ledger_balance_summaries_id'), table_name='ledger_balance_summaries')
+    op.drop_index(op.f('ix_ledger_balance_summaries_category'), table_name='ledger_balance_summaries')
+    op.drop_table('ledger_balance_summaries')
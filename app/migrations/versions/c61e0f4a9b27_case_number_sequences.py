@@ -0,0 +1,53 @@
+"""case number sequences
+
+Revision ID: c61e0f4a9b27
+Revises: b7d3e5f18a42
+Create Date: 2025-11-03 10:14:27.512804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61e0f4a9b27'
+down_revision: Union[str, Sequence[str], None] = 'b7d3e5f18a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('case_number_sequences',
+    sa.Column('prefix', sa.String(length=255), nullable=False, comment='Case type prefix'),
+    sa.Column('last_value', sa.Integer(), nullable=False, comment='Last allocated case number'),
+    sa.Column('created_by', sa.Integer(), nullable=True, comment='User who created this record'),
+    sa.Column('modified_by', sa.Integer(), nullable=True, comment='User who last modified this record'),
+    sa.Column('created_on', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='Timestamp when this record was created'),
+    sa.Column('updated_on', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='Timestamp when this record was last updated'),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], onupdate='CASCADE', ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['modified_by'], ['users.id'], onupdate='CASCADE', ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('prefix')
+    )
+
+    # Continue every prefix from the highest case number already issued.
+    # The seed is MySQL-only (CAST ... AS UNSIGNED, CHAR_LENGTH); elsewhere
+    # allocate_case_numbers seeds each prefix on first use instead.
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute(
+            """
+            INSERT INTO case_number_sequences (prefix, last_value)
+            SELECT ct.prefix, MAX(CAST(SUBSTRING(c.case_no, CHAR_LENGTH(ct.prefix) + 1) AS UNSIGNED))
+            FROM cases c
+            JOIN case_types ct ON ct.id = c.case_type_id
+            WHERE c.case_no LIKE CONCAT(ct.prefix, '%')
+            GROUP BY ct.prefix
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('case_number_sequences')
@@ -0,0 +1,54 @@
+"""case sla due queue
+
+Revision ID: d5a8b2e7c013
+Revises: c61e0f4a9b27
+Create Date: 2025-11-04 09:32:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8b2e7c013'
+down_revision: Union[str, Sequence[str], None] = 'c61e0f4a9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cases', sa.Column('sla_due_at', sa.DateTime(timezone=True), nullable=True, comment='Deadline of the running SLA, cleared once escalated or moved on'))
+    op.create_index(op.f('ix_cases_sla_due_at'), 'cases', ['sla_due_at'], unique=False)
+    op.create_index(op.f('ix_cases_case_no'), 'cases', ['case_no'], unique=False)
+
+    # Enqueue the running SLA of the current row of every open case.
+    # created_on is written by the server's NOW() in the session time zone,
+    # while the scheduler writes and compares sla_due_at in UTC, so convert
+    # it first. CONVERT_TZ returns NULL for named zones when the time zone
+    # tables are not loaded; fall back to the session's current UTC offset.
+    op.execute(
+        """
+        UPDATE cases c
+        JOIN (SELECT case_no, MAX(id) AS id FROM cases GROUP BY case_no) latest ON latest.id = c.id
+        JOIN slas s ON s.id = c.sla_id
+        JOIN case_statuses cs ON cs.id = c.case_status_id
+        SET c.sla_due_at = DATE_ADD(
+            COALESCE(
+                CONVERT_TZ(c.created_on, @@session.time_zone, '+00:00'),
+                DATE_SUB(c.created_on, INTERVAL TIMESTAMPDIFF(SECOND, UTC_TIMESTAMP(), NOW()) SECOND)
+            ),
+            INTERVAL s.time_limit MINUTE
+        )
+        WHERE cs.name IN ('Open', 'In Progress') AND s.is_active = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cases_case_no'), table_name='cases')
+    op.drop_index(op.f('ix_cases_sla_due_at'), table_name='cases')
+    op.drop_column('cases', 'sla_due_at')
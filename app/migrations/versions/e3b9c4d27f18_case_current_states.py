@@ -0,0 +1,77 @@
+"""case current states
+
+Revision ID: e3b9c4d27f18
+Revises: d5a8b2e7c013
+Create Date: 2025-11-05 11:07:52.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b9c4d27f18'
+down_revision: Union[str, Sequence[str], None] = 'd5a8b2e7c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('case_current_states',
+    sa.Column('case_no', sa.String(length=255), nullable=False, comment='Case number'),
+    sa.Column('case_id', sa.Integer(), nullable=False, comment='Latest case row of the case'),
+    sa.Column('case_type_id', sa.Integer(), nullable=False),
+    sa.Column('case_status_id', sa.Integer(), nullable=False),
+    sa.Column('case_step_config_id', sa.Integer(), nullable=True),
+    sa.Column('sla_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('role_id', sa.Integer(), nullable=True),
+    sa.Column('is_open', sa.Boolean(), nullable=False, comment='Flag to indicate if the case is Open or In Progress'),
+    sa.Column('opened_on', sa.DateTime(timezone=True), nullable=True, comment='Creation time of the case'),
+    sa.Column('opened_by_user_id', sa.Integer(), nullable=True, comment='User the case was first assigned to'),
+    sa.Column('last_updated_on', sa.DateTime(timezone=True), nullable=True, comment='Creation time of the latest case row'),
+    sa.Column('created_by', sa.Integer(), nullable=True, comment='User who created this record'),
+    sa.Column('modified_by', sa.Integer(), nullable=True, comment='User who last modified this record'),
+    sa.Column('created_on', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='Timestamp when this record was created'),
+    sa.Column('updated_on', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='Timestamp when this record was last updated'),
+    sa.ForeignKeyConstraint(['case_id'], ['cases.id'], ),
+    sa.ForeignKeyConstraint(['case_status_id'], ['case_statuses.id'], ),
+    sa.ForeignKeyConstraint(['case_step_config_id'], ['case_step_configs.id'], ),
+    sa.ForeignKeyConstraint(['case_type_id'], ['case_types.id'], ),
+    sa.ForeignKeyConstraint(['opened_by_user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ),
+    sa.ForeignKeyConstraint(['sla_id'], ['slas.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], onupdate='CASCADE', ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['modified_by'], ['users.id'], onupdate='CASCADE', ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('case_no')
+    )
+    op.create_index('ix_case_current_states_user_queue', 'case_current_states', ['is_open', 'user_id', 'last_updated_on', 'case_no'], unique=False)
+    op.create_index('ix_case_current_states_role_queue', 'case_current_states', ['is_open', 'role_id', 'last_updated_on', 'case_no'], unique=False)
+
+    # Seed one row per case from its first and latest history rows
+    op.execute(
+        """
+        INSERT INTO case_current_states (
+            case_no, case_id, case_type_id, case_status_id, case_step_config_id,
+            sla_id, user_id, role_id, is_open, opened_on, opened_by_user_id, last_updated_on
+        )
+        SELECT c.case_no, c.id, c.case_type_id, c.case_status_id, c.case_step_config_id,
+               c.sla_id, c.user_id, c.role_id, cs.name IN ('Open', 'In Progress'),
+               f.created_on, f.user_id, c.created_on
+        FROM (SELECT case_no, MIN(id) AS first_id, MAX(id) AS latest_id FROM cases GROUP BY case_no) h
+        JOIN cases c ON c.id = h.latest_id
+        JOIN cases f ON f.id = h.first_id
+        JOIN case_statuses cs ON cs.id = c.case_status_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_case_current_states_role_queue', table_name='case_current_states')
+    op.drop_index('ix_case_current_states_user_queue', table_name='case_current_states')
+    op.drop_table('case_current_states')
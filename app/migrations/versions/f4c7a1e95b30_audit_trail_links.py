@@ -0,0 +1,66 @@
+"""audit trail links
+
+Revision ID: f4c7a1e95b30
+Revises: e3b9c4d27f18
+Create Date: 2025-11-06 14:21:09.318472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c7a1e95b30'
+down_revision: Union[str, Sequence[str], None] = 'e3b9c4d27f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RELATED_ENTITY_KEYS = (
+    'medallion_id',
+    'driver_id',
+    'vehicle_id',
+    'lease_id',
+    'medallion_owner_id',
+    'vehicle_owner_id',
+    'ledger_id',
+    'pvb_id',
+    'correspondence_id',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('audit_trail_links',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('audit_trail_id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=32), nullable=False, comment='meta_data key, e.g. driver_id'),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('audit_timestamp', sa.DateTime(), nullable=False, comment='Copy of audit_trail.timestamp for ordering'),
+    sa.ForeignKeyConstraint(['audit_trail_id'], ['audit_trail.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('audit_trail_id', 'entity_type', name='uq_audit_trail_links_entry_type')
+    )
+    op.create_index(op.f('ix_audit_trail_links_id'), 'audit_trail_links', ['id'], unique=False)
+    op.create_index('ix_audit_trail_links_entity', 'audit_trail_links', ['entity_type', 'entity_id', 'audit_timestamp', 'audit_trail_id'], unique=False)
+
+    # Backfill one link per entity reference in existing meta_data: values
+    # whose JSON text is all digits (12 or "12"), as related_entity_ids
+    # links them when entries are written
+    for key in RELATED_ENTITY_KEYS:
+        op.execute(
+            f"""
+            INSERT INTO audit_trail_links (audit_trail_id, entity_type, entity_id, audit_timestamp)
+            SELECT id, '{key}', CAST(JSON_UNQUOTE(JSON_EXTRACT(meta_data, '$.{key}')) AS UNSIGNED), timestamp
+            FROM audit_trail
+            WHERE JSON_UNQUOTE(JSON_EXTRACT(meta_data, '$.{key}')) REGEXP '^[0-9]+$'
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_trail_links_entity', table_name='audit_trail_links')
+    op.drop_index(op.f('ix_audit_trail_links_id'), table_name='audit_trail_links')
+    op.drop_table('audit_trail_links')
@@ -4,9 +4,9 @@
 Data Access Layer for PVB module using async SQLAlchemy 2.x
 """
 
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import select, func, or_, desc, asc
+from sqlalchemy import select, insert, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.pvb.models import PVBViolation, PVBLog
@@ -15,6 +15,7 @@ from app.pvb.schemas import (
     PVBLogCreate, PVBLogUpdate, PVBLogFilters,
 )
 from app.utils.logger import get_logger
+from app.utils.pagination import count_rows, keyset_order, paginate, to_page
 
 logger = get_logger(__name__)
 
@@ -145,26 +146,19 @@ class PVBRepository:
             count_stmt = count_stmt.where(PVBViolation.issue_time <= filters.issue_time_to)
 
         # === Get total count ===
-        count_result = await self.db.execute(count_stmt)
-        total_count = count_result.scalar()
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
-        # === Apply sorting ===
+        # === Apply sorting and pagination ===
         sort_column = getattr(PVBViolation, filters.sort_by, PVBViolation.updated_on)
-        if filters.sort_order.lower() == "asc":
-            stmt = stmt.order_by(asc(sort_column))
-        else:
-            stmt = stmt.order_by(desc(sort_column))
-
-        # === Apply pagination ===
-        offset = (filters.page - 1) * filters.per_page
-        stmt = stmt.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order.lower() != "asc", PVBViolation.id)
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
 
         # === Execute query ===
         result = await self.db.execute(stmt)
-        violations = result.scalars().all()
+        violations = to_page(result.scalars().all(), order, filters.per_page)
 
         logger.info("Violations fetched", count=len(violations), total=total_count)
-        return list(violations), total_count
+        return violations, total_count
     
     async def create_violation(self, violation_data: PVBViolationCreate) -> PVBViolation:
         """Create a new violation"""
@@ -178,6 +172,43 @@ class PVBRepository:
         logger.info("Violation created", violation_id=violation.id)
         return violation
     
+    async def get_existing_summons(
+        self, summons_numbers: Iterable[str], log_id: Optional[int] = None
+    ) -> Set[str]:
+        """
+        Which of summons_numbers are already stored, with one IN query on the
+        unique summons index. With log_id, only those imported by that log.
+        """
+        summons_numbers = list({s for s in summons_numbers if s})
+        if not summons_numbers:
+            return set()
+
+        stmt = select(PVBViolation.summons_number).where(
+            PVBViolation.summons_number.in_(summons_numbers)
+        )
+        if log_id is not None:
+            stmt = stmt.where(PVBViolation.log_id == log_id)
+        return set((await self.db.execute(stmt)).scalars().all())
+
+    async def insert_violation_rows(self, violation_rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert violations with one multi-row INSERT, without loading them into
+        the session. On MySQL rows whose summons number already exists are
+        skipped (INSERT IGNORE on the unique summons index).
+
+        Returns: Number of rows inserted
+        """
+        if not violation_rows:
+            return 0
+
+        stmt = insert(PVBViolation).values(violation_rows)
+        if self.db.get_bind().dialect.name == "mysql":
+            stmt = stmt.prefix_with("IGNORE")
+        result = await self.db.execute(stmt)
+
+        logger.debug("Inserted violation rows", count=result.rowcount)
+        return result.rowcount
+
     async def update_violation(
         self,
         violation: PVBViolation,
@@ -274,26 +305,19 @@ class PVBRepository:
             count_stmt = count_stmt.where(PVBLog.unidentified_count == filters.unidentified_count)
 
         # === Get total count ===
-        count_result = await self.db.execute(count_stmt)
-        total_count = count_result.scalar()
+        total_count = await count_rows(self.db, count_stmt, cached=bool(filters.cursor))
 
-        # === Apply sorting ===
+        # === Apply sorting and pagination ===
         sort_column = getattr(PVBLog, filters.sort_by, PVBLog.log_date)
-        if filters.sort_order.lower() == "asc":
-            stmt = stmt.order_by(asc(sort_column))
-        else:
-            stmt = stmt.order_by(desc(sort_column))
-
-        # === Apply Pagination ===
-        offset = (filters.page - 1) * filters.per_page
-        stmt = stmt.offset(offset).limit(filters.per_page)
+        order = keyset_order(sort_column, filters.sort_order.lower() != "asc", PVBLog.id)
+        stmt = paginate(stmt, order, filters.per_page, filters.page, filters.cursor)
 
         # === Execute query ===
         result = await self.db.execute(stmt)
-        logs = result.scalars().all()
+        logs = to_page(result.scalars().all(), order, filters.per_page)
 
         logger.info("Logs fetched", count=len(logs), total=total_count)
-        return list(logs), total_count
+        return logs, total_count
     
     async def create_log(self, log_data: PVBLogCreate) -> PVBLog:
         """Create a new log"""
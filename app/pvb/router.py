@@ -20,17 +20,21 @@ from app.pvb.schemas import (
     PVBViolationResponse, PaginatedPVBViolationResponse,
     PVBLogResponse, PaginatedPVBLogResponse,
     PVBViolationUpdate, PVBViolationFilters, PVBLogFilters,
-    PVBImportResult, PVBAssociationResult, PVBPostingResult,
+    PVBImportResult, PVBImportTaskResponse, PVBImportTaskStatus,
+    PVBAssociationResult, PVBPostingResult,
 )
 from app.pvb.exceptions import (
     PVBBaseException, convert_to_http_exception,
     PVBFileValidationException
 )
-from app.pvb.utils import validate_pvb_file
+from app.core.concurrency import run_sync
 from app.users.models import User
 from app.users.utils import get_current_user
 from app.utils.logger import get_logger
 from app.utils.exporter_utils import ExporterFactory
+from app.utils.ingestion import (
+    dispatch_task, get_task_progress, is_supported_file, remove_spooled, spool_upload,
+)
 
 logger = get_logger(__name__)
 router = APIRouter(tags=["PVB"], prefix="/pvb")
@@ -48,7 +52,8 @@ async def import_pvb(
     Import PVB violations from an uploaded file.
 
     The file should be in CSV or Excel format with the required columns matching
-    the PVB data structure.
+    the PVB data structure. It is streamed in chunks; use /import/async for
+    large files.
     """
     logger.info(
         "PVB import request received",
@@ -56,13 +61,16 @@ async def import_pvb(
         user_id=current_user.id
     )
 
+    path = None
     try:
-        # Validate and parse file
-        rows = validate_pvb_file(file)
-        logger.info("File validated successfully", row_count=len(rows))
+        if not is_supported_file(file.filename):
+            raise PVBFileValidationException(
+                "Unsupported file format. Only CSV and Excel files are supported."
+            )
 
-        # Process data
-        result = await pvb_service.import_violations(rows)
+        # Spool and import in chunks
+        path = await run_sync(spool_upload, file, "pvb-")
+        result = await pvb_service.import_violations_file(path, file.filename)
 
         logger.info(
             "PVB import completed",
@@ -84,6 +92,63 @@ async def import_pvb(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to import PVB data: {str(e)}"
         ) from e
+    finally:
+        remove_spooled(path)
+
+
+@router.post("/import/async", response_model=PVBImportTaskResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_pvb_async(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Queue an import of PVB violations from an uploaded file.
+
+    The file is spooled and imported by a background worker; poll
+    /import/status/{task_id} for progress and the import result.
+    """
+    logger.info(
+        "PVB async import request received",
+        filename=file.filename,
+        user_id=current_user.id
+    )
+
+    if not is_supported_file(file.filename):
+        raise convert_to_http_exception(PVBFileValidationException(
+            "Unsupported file format. Only CSV and Excel files are supported."
+        ))
+
+    path = await run_sync(spool_upload, file, "pvb-")
+    try:
+        task_id = await run_sync(
+            dispatch_task, "app.pvb.tasks.import_pvb_file", path, file.filename
+        )
+    except Exception as e:
+        remove_spooled(path)
+        logger.error("Failed to queue PVB import", error=str(e), exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to queue PVB import: {str(e)}"
+        ) from e
+
+    logger.info("PVB import queued", task_id=task_id, filename=file.filename)
+    return PVBImportTaskResponse(
+        task_id=task_id,
+        filename=file.filename,
+        message="Import queued",
+    )
+
+
+@router.get("/import/status/{task_id}", response_model=PVBImportTaskStatus)
+async def get_import_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the state of a queued import: PENDING, STARTED, PROGRESS (rows read
+    so far), SUCCESS (with the import result) or FAILURE (with the error).
+    """
+    return await run_sync(get_task_progress, task_id)
 
 
 # ===================== Violation Operations =====================
@@ -105,6 +170,7 @@ async def list_violations(
     issue_time_to: Optional[str] = Query(None, description="Issue time to"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("updated_on", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     pvb_service: PVBService = Depends(),
@@ -132,6 +198,7 @@ async def list_violations(
             issue_time_to=issue_time_to,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order
         )
@@ -147,7 +214,8 @@ async def list_violations(
             total_items=total_count,
             page=page,
             per_page=per_page,
-            total_pages=math.ceil(total_count / per_page)
+            total_pages=math.ceil(total_count / per_page),
+            next_cursor=violations.next_cursor
         )
 
         logger.info("Violations listed successfully", count=len(violations_data))
@@ -421,6 +489,7 @@ async def list_logs(
     unidentified_count: Optional[int] = Query(None, description="Unidentified count"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page"),
     sort_by: str = Query("log_date", description="Sort by field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     pvb_service: PVBService = Depends(),
@@ -443,6 +512,7 @@ async def list_logs(
             unidentified_count=unidentified_count,
             page=page,
             per_page=per_page,
+            cursor=cursor,
             sort_by=sort_by,
             sort_order=sort_order
         )
@@ -456,7 +526,8 @@ async def list_logs(
             total_items=total_count,
             page=page,
             per_page=per_page,
-            total_pages=math.ceil(total_count / per_page)
+            total_pages=math.ceil(total_count / per_page),
+            next_cursor=logs.next_cursor
         )
 
         logger.info("Logs listed successfully", count=len(logs_data))
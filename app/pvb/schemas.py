@@ -5,7 +5,7 @@ Pydantic schemas for PVB (Parking Violations Bureau) module
 """
 
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -77,6 +77,7 @@ class PaginatedPVBViolationResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["Imported", "Associated", "Posted", "Failed", "Pending"]
 
 
@@ -126,6 +127,7 @@ class PaginatedPVBLogResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
     statuses: List[str] = ["Pending", "Success", "Failure", "Partial"]
     types: List[str] = ["Import", "Associate", "Post"]
 
@@ -143,6 +145,22 @@ class PVBImportResult(BaseModel):
     failed_rows: Optional[dict] = None
 
 
+class PVBImportTaskResponse(BaseModel):
+    """Schema for a background import that was queued."""
+    task_id: str
+    filename: Optional[str] = None
+    message: str
+
+
+class PVBImportTaskStatus(BaseModel):
+    """Schema for the state of a background import."""
+    task_id: str
+    status: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[PVBImportResult] = None
+    error: Optional[str] = None
+
+
 class PVBAssociationResult(BaseModel):
     """Schema for association operation result."""
     success: bool
@@ -182,6 +200,7 @@ class PVBViolationFilters(BaseModel):
     issue_time_to: Optional[str] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=10000)
+    cursor: Optional[str] = None
     sort_by: str = "updated_on"
     sort_order: str = "desc"
 
@@ -198,5 +217,6 @@ class PVBLogFilters(BaseModel):
     unidentified_count: Optional[int] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
     sort_by: str = "log_date"
     sort_order: str = "desc"
\ No newline at end of file
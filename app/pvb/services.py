@@ -6,12 +6,12 @@ Implements complete import, association, and posting logic.
 """
 
 from datetime import datetime, timezone, date
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Callable, List, Tuple, Optional, Dict, Any
 
 from fastapi import Depends
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.concurrency import run_sync
 from app.core.db import get_async_db
 from app.pvb.repository import PVBRepository
 from app.pvb.schemas import (
@@ -24,13 +24,20 @@ from app.pvb.exceptions import (
     PVBViolationNotFoundException, PVBLogNotFoundException,
     PVBImportException, PVBAssociationException, PVBPostingException,
     PVBUpdateException, PVBDateParseException, PVBDuplicateSummonsException,
+    PVBFileValidationException,
 )
-from app.vehicles.models import Vehicle, VehicleRegistration
-from app.ledger.models import LedgerEntry, LedgerSourceType
+from app.pvb.utils import iter_pvb_file
+from app.vehicles.plate_index import plate_resolver
+from app.ledger.schemas import LedgerCategory
+from app.ledger.services import LedgerService
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Ledger reference_type of PVB obligations; reference_id is the violation id
+PVB_REFERENCE_TYPE = "PVB_VIOLATION"
+
+
 def get_pvb_repository(db: AsyncSession = Depends(get_async_db)) -> PVBRepository:
     """Dependency to get PVBRepository instance."""
     return PVBRepository(db)
@@ -195,54 +202,160 @@ class PVBService:
         """
         logger.info("Starting PVB import", row_count=len(rows))
 
-        imported, failed = 0, 0
-        failed_rows = {}
+        log = await self._create_import_log(len(rows))
+        failed_rows: Dict[str, str] = {}
+        imported, failed = await self._import_violation_rows(rows, log.id, failed_rows)
+        return await self._finish_import(log, len(rows), imported, failed, failed_rows)
+
+    async def import_violations_file(
+        self,
+        path: str,
+        filename: Optional[str] = None,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PVBImportResult:
+        """
+        Import PVB violations from a spooled upload chunk by chunk.
+
+        Each chunk of INGESTION_CHUNK_SIZE rows is imported and committed
+        together with the log counts before the next one is read. `progress`,
+        when given, is called with the number of rows read so far after
+        every chunk.
+
+        Raises:
+            PVBFileValidationException: If the file is unreadable, lacks a
+                required column or has no usable rows
+        """
+        logger.info("Starting PVB file import", path=path, filename=filename)
 
-        # === Create import log ===
+        log = await self._create_import_log(0)
+        failed_rows: Dict[str, str] = {}
+        records_impacted = imported = failed = 0
+        try:
+            chunks = iter_pvb_file(path)
+            while (chunk := await run_sync(next, chunks, None)) is not None:
+                rows, rejected = chunk
+                failed_rows.update(rejected)
+                chunk_imported, chunk_failed = await self._import_violation_rows(rows, log.id, failed_rows)
+                imported += chunk_imported
+                failed += chunk_failed + len(rejected)
+                records_impacted += len(rows) + len(rejected)
+
+                await self.repo.update_log(log, PVBLogUpdate(
+                    records_impacted=records_impacted,
+                    success_count=imported,
+                    unidentified_count=failed,
+                ))
+                await self.repo.db.commit()
+                if progress:
+                    progress(records_impacted)
+        except Exception as e:
+            await self.repo.db.rollback()
+            try:
+                await self.repo.db.refresh(log)
+                await self.repo.update_log(log, PVBLogUpdate(status="Failure"))
+                await self.repo.db.commit()
+            except Exception as log_error:
+                await self.repo.db.rollback()
+                logger.error("Failed to update log", error=str(log_error))
+            if isinstance(e, PVBFileValidationException):
+                raise
+            logger.error("Error importing PVB file", path=path, error=str(e), exc_info=True)
+            raise PVBImportException(str(e)) from e
+
+        return await self._finish_import(log, records_impacted, imported, failed, failed_rows)
+
+    async def _create_import_log(self, records_impacted: int) -> PVBLog:
+        """Create the Pending log of an import run"""
         log_data = PVBLogCreate(
             log_date=datetime.now(timezone.utc),
             log_type="Import",
-            records_impacted=len(rows),
+            records_impacted=records_impacted,
             status="Pending"
         )
 
         try:
-            log = await self.create_log(log_data)
+            return await self.create_log(log_data)
         except Exception as e:
             logger.error("Failed to create import log", error=str(e))
             raise PVBImportException(f"Failed to create import log: {str(e)}") from e
-        
-        # === Process each row ===
+
+    async def _import_violation_rows(
+        self,
+        rows: List[Dict[str, Any]],
+        log_id: int,
+        failed_rows: Dict[str, str],
+    ) -> Tuple[int, int]:
+        """
+        Create violations for one batch of rows, recording rejected rows in
+        failed_rows (summons or row key -> reason). Does not commit.
+
+        Rows are parsed and validated in memory, existing summons numbers of
+        the batch are found with one IN query and the new violations are
+        written with one multi-row INSERT.
+
+        Returns:
+            (violations created, rows rejected)
+        """
+        keys = [row.get("SUMMONS", f"row_{idx}") for idx, row in enumerate(rows)]
+        rejected: Dict[int, str] = {}
+        parsed: List[Tuple[int, Dict[str, Any]]] = []
         for idx, row in enumerate(rows):
             try:
                 # === Parse and validate data ===
-                violation_data = await self._parse_violation_data(row, log.id)
-
-                # === Check for duplicates ===
-                if violation_data.get("summons_number"):
-                    existing = await self.repo.get_violation_by_summons(violation_data["summons_number"])
-                    if existing:
-                        logger.debug("Skipping duplicate summons", summons=violation_data["summons_number"])
-                        failed += 1
-                        failed_rows[row.get("SUMMONS", f"row_{idx}")] = "Duplicate summons number"
-                        continue
-
-                # Create violation
-                violation_create = PVBViolationCreate(**violation_data)
-                await self.repo.create_violation(violation_create)
-                imported += 1
+                violation_data = await self._parse_violation_data(row, log_id)
+                parsed.append((idx, PVBViolationCreate(**violation_data).model_dump()))
 
             except PVBDateParseException as e:
-                failed += 1
-                failed_rows[row.get("SUMMONS", f"row_{idx}")] = str(e.message)
+                rejected[idx] = str(e.message)
                 logger.warning("Date parsing error", row=idx, error=str(e))
             except Exception as e:
-                failed += 1
-                failed_rows[row.get("SUMMONS", f"row_{idx}")] = str(e)
+                rejected[idx] = str(e)
                 logger.warning("Error importing row", row=idx, error=str(e))
 
-        # Update log with results
+        # === Check for duplicates, in the database and within the batch ===
+        existing = await self.repo.get_existing_summons(
+            data["summons_number"] for _, data in parsed
+        )
+        new_rows: List[Dict[str, Any]] = []
+        new_summons: Dict[str, int] = {}
+        for idx, data in parsed:
+            summons = data["summons_number"]
+            if summons and (summons in existing or summons in new_summons):
+                logger.debug("Skipping duplicate summons", summons=summons)
+                rejected[idx] = "Duplicate summons number"
+                continue
+            if summons:
+                new_summons[summons] = idx
+            new_rows.append(data)
+
+        # === Create violations ===
+        imported = await self.repo.insert_violation_rows(new_rows)
+
+        # Summons inserted by a concurrent import in the meantime were skipped
+        if imported < len(new_rows):
+            ours = await self.repo.get_existing_summons(new_summons, log_id=log_id)
+            for summons in new_summons.keys() - ours:
+                rejected[new_summons[summons]] = "Duplicate summons number"
+
+        # Record reasons in row order, so a key shared by several rows keeps
+        # the reason of its last row as the per-row import did
+        for idx in sorted(rejected):
+            failed_rows[keys[idx]] = rejected[idx]
+
+        failed = len(rejected)
+        return imported, failed
+
+    async def _finish_import(
+        self,
+        log: PVBLog,
+        records_impacted: int,
+        imported: int,
+        failed: int,
+        failed_rows: Dict[str, str],
+    ) -> PVBImportResult:
+        """Write the final counts and status of an import run to its log"""
         log_update = PVBLogUpdate(
+            records_impacted=records_impacted,
             success_count=imported,
             unidentified_count=failed,
             status="Success" if failed == 0 else ("Partial" if imported > 0 else "Failure")
@@ -263,9 +376,9 @@ class PVBService:
         )
 
         return PVBImportResult(
-            success=failed < len(rows),
+            success=failed < records_impacted,
             log_id=log.id,
-            records_impacted=len(rows),
+            records_impacted=records_impacted,
             success_count=imported,
             unidentified_count=failed,
             message=f"Imported {imported} violations, {failed} failed",
@@ -308,6 +421,11 @@ class PVBService:
         
         if not date_str:
             return datetime.now(timezone.utc).date()
+        # Excel cells arrive as dates already
+        if isinstance(date_str, datetime):
+            return date_str.date()
+        if isinstance(date_str, date):
+            return date_str
 
         date_str = str(date_str).strip()
         formats = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d"]
@@ -370,16 +488,20 @@ class PVBService:
         failed_count = 0
         details = []
 
+        # Resolve every plate/issue date pair in one pass
+        resolutions = await plate_resolver.resolve(
+            self.repo.db, ((v.plate_number, v.issue_date) for v in violations)
+        )
+
         for violation in violations:
             try:
-                # Attempt to associate with vehicle registration
-                associations = await self._find_associations(violation)
+                resolution = resolutions.get((violation.plate_number, violation.issue_date))
 
-                if associations:
+                if resolution:
                     update_data = PVBViolationUpdate(
-                        driver_id=associations.get("driver_id"),
-                        medallion_id=associations.get("medallion_id"),
-                        vehicle_id=associations.get("vehicle_id"),
+                        driver_id=resolution.driver_id,
+                        medallion_id=resolution.medallion_id,
+                        vehicle_id=resolution.vehicle_id,
                         status="Associated"
                     )
                     await self.repo.update_violation(violation, update_data)
@@ -435,38 +557,6 @@ class PVBService:
             details=details if details else None
         )
 
-    async def _find_associations(self, violation: PVBViolation) -> Optional[Dict[str, int]]:
-        """Find driver, medallion, and vehicle associations for a violation."""
-        
-        # Find vehicle registration by plate number
-        stmt = (
-            select(VehicleRegistration)
-            .where(VehicleRegistration.plate_number == violation.plate_number)
-            .where(VehicleRegistration.is_active == True)
-        )
-        result = await self.repo.db.execute(stmt)
-        registration = result.scalar_one_or_none()
-
-        if not registration:
-            return None
-
-        # Get vehicle
-        vehicle_stmt = select(Vehicle).where(Vehicle.id == registration.vehicle_id)
-        vehicle_result = await self.repo.db.execute(vehicle_stmt)
-        vehicle = vehicle_result.scalar_one_or_none()
-
-        if not vehicle:
-            return None
-
-        # Get medallion and driver from vehicle
-        associations = {
-            "vehicle_id": vehicle.id,
-            "medallion_id": vehicle.medallion_id,
-            "driver_id": vehicle.driver_id
-        }
-
-        return associations
-
     # === Posting Operations ===
 
     async def post_violations(self) -> PVBPostingResult:
@@ -494,45 +584,56 @@ class PVBService:
         posted_count = 0
         failed_count = 0
         details = []
+        obligations = []
+        postable = []
 
         for violation in violations:
-            try:
-                # Create ledger entry
-                ledger_entry = LedgerEntry(
-                    source_type=LedgerSourceType.PVB,
-                    source_id=violation.id,
-                    driver_id=violation.driver_id,
-                    medallion_id=violation.medallion_id,
-                    vehicle_id=violation.vehicle_id,
-                    amount=violation.amount_due,
-                    transaction_date=violation.issue_date,
-                    description=f"PVB Violation - Summons: {violation.summons_number}",
-                    status="Pending"
-                )
-
-                self.repo.db.add(ledger_entry)
-                await self.repo.db.flush()
-
-                # Update violation status
-                update_data = PVBViolationUpdate(status="Posted")
-                await self.repo.update_violation(violation, update_data)
-                posted_count += 1
-
-            except Exception as e:
-                failed_count += 1
-                logger.error("Error posting violation", violation_id=violation.id, error=str(e))
-                
-                # Update violation with failure reason
-                update_data = PVBViolationUpdate(
-                    status="Failed",
-                    post_failed_reason=str(e)
-                )
-                await self.repo.update_violation(violation, update_data)
-                
-                details.append({
-                    "violation_id": violation.id,
-                    "error": str(e)
+            if not violation.driver_id:
+                reason = "No driver associated with violation"
+            elif not violation.amount_due or violation.amount_due <= 0:
+                reason = "Amount must be positive"
+            else:
+                postable.append(violation)
+                obligations.append({
+                    "reference_id": str(violation.id),
+                    "amount": violation.amount_due,
+                    "driver_id": violation.driver_id,
+                    "vehicle_id": violation.vehicle_id,
+                    "plate": violation.plate_number,
+                    "medallion_id": violation.medallion_id,
+                    "transaction_date": violation.issue_date,
+                    "description": f"PVB Violation - Summons: {violation.summons_number}",
                 })
+                continue
+
+            failed_count += 1
+            logger.error("Error posting violation", violation_id=violation.id, error=reason)
+
+            # Update violation with failure reason
+            update_data = PVBViolationUpdate(
+                status="Failed",
+                post_failed_reason=reason
+            )
+            await self.repo.update_violation(violation, update_data)
+
+            details.append({
+                "violation_id": violation.id,
+                "error": reason
+            })
+
+        # Create ledger postings for all postable violations at once; ones
+        # posted by an earlier, interrupted run are skipped by the ledger
+        try:
+            await LedgerService(self.repo.db).create_obligation_postings_batch(
+                LedgerCategory.PVB, PVB_REFERENCE_TYPE, obligations
+            )
+            for violation in postable:
+                await self.repo.update_violation(violation, PVBViolationUpdate(status="Posted"))
+            posted_count = len(postable)
+        except Exception as e:
+            await self.repo.db.rollback()
+            logger.error("Error posting violations", error=str(e), exc_info=True)
+            raise PVBPostingException(str(e)) from e
 
         # Update log
         log_update = PVBLogUpdate(
@@ -0,0 +1,62 @@
+# app/pvb/tasks.py
+
+"""
+Celery tasks for PVB operations
+
+Imports of uploaded PVB files run here so the upload request returns as
+soon as the file is spooled; the router polls progress by task id.
+"""
+
+import asyncio
+
+from celery import shared_task
+
+from app.utils.logger import get_logger
+from app.core.db import get_async_db
+from app.pvb.repository import PVBRepository
+from app.pvb.services import PVBService
+from app.utils.ingestion import remove_spooled
+
+logger = get_logger(__name__)
+
+
+@shared_task(bind=True, name='app.pvb.tasks.import_pvb_file')
+def import_pvb_file(self, path: str, filename: str = None):
+    """
+    Import a spooled PVB upload and delete it afterwards.
+
+    Reports the rows read so far as PROGRESS state after every chunk.
+    """
+    task_id = self.request.id
+    logger.info("[Task ID: %s] Starting PVB import of %s", task_id, filename)
+
+    def report(processed_rows: int) -> None:
+        self.update_state(
+            state="PROGRESS",
+            meta={"filename": filename, "processed_rows": processed_rows},
+        )
+
+    async def import_async():
+        async for db in get_async_db():
+            try:
+                service = PVBService(PVBRepository(db))
+                return await service.import_violations_file(path, filename, progress=report)
+            finally:
+                await db.close()
+
+    try:
+        result = asyncio.run(import_async())
+        logger.info(
+            "[Task ID: %s] PVB import completed: %d imported, %d failed",
+            task_id, result.success_count, result.unidentified_count
+        )
+        return result.model_dump()
+
+    except Exception as e:
+        logger.error(
+            "[Task ID: %s] Error in PVB import: %s",
+            task_id, str(e), exc_info=True
+        )
+        raise
+    finally:
+        remove_spooled(path)
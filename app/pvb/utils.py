@@ -4,14 +4,12 @@
 Utility functions for PVB module
 """
 
-import csv
-from io import StringIO
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 
 import pandas as pd
-from fastapi import UploadFile
 
 from app.pvb.exceptions import PVBFileValidationException
+from app.utils.ingestion import iter_frames
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -56,136 +54,81 @@ OPTIONAL_COLUMNS = [
 ]
 
 
-def validate_pvb_file(file: UploadFile) -> List[Dict[str, Any]]:
+def iter_pvb_file(
+    path: str, chunk_size: Optional[int] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, str]]]:
     """
-    Validate and parse a PVB file (CSV or Excel).
-    
-    Args:
-        file: Uploaded file to validate
-        
-    Returns:
-        List of dictionaries containing validated row data
-        
-    Raises:
-        PVBFileValidationException: If file validation fails
-    """
-    try:
-        logger.info("Validating PVB file", filename=file.filename)
-
-        # Determine file type and parse
-        if file.filename.endswith('.csv'):
-            rows = _parse_csv_file(file)
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            rows = _parse_excel_file(file)
-        else:
-            raise PVBFileValidationException(
-                "Unsupported file format. Only CSV and Excel files are supported."
-            )
+    Stream a spooled PVB file (CSV or Excel) in chunks.
 
-        # Validate parsed data
-        validated_rows = _validate_rows(rows)
+    Args:
+        path: Spooled upload (see app.utils.ingestion.spool_upload)
+        chunk_size: Rows per chunk, INGESTION_CHUNK_SIZE by default
 
-        logger.info(
-            "File validation successful",
-            filename=file.filename,
-            rows_count=len(validated_rows),
-        )
+    Yields:
+        (rows with stripped column names, failed rows) per chunk; rows
+        without a PLATE or SUMMONS value are reported as failed, keyed by
+        summons or row number
 
-        return validated_rows
+    Raises:
+        PVBFileValidationException: If the file cannot be read, lacks a
+            required column or has no row with both PLATE and SUMMONS
+    """
+    logger.info("Streaming PVB file", path=path)
 
+    first_row, valid_row_count = 1, 0
+    try:
+        for frame in iter_frames(path, chunk_size):
+            rows, failed_rows = _validate_frame(frame, first_row)
+            first_row += len(frame)
+            valid_row_count += len(rows)
+            yield rows, failed_rows
     except PVBFileValidationException:
         raise
     except Exception as e:
-        logger.error("Error validating file", filename=file.filename, error=str(e))
-        raise PVBFileValidationException(f"File validation error: {str(e)}")
-
-
-def _parse_csv_file(file: UploadFile) -> List[Dict[str, Any]]:
-    """Parse CSV file"""
-    try:
-        content = file.file.read().decode("utf-8")
-
-        # Handle BOM if present
-        if content.startswith('\ufeff'):
-            content = content[1:]
-
-        csv_reader = csv.DictReader(StringIO(content))
-        rows = list(csv_reader)
-
-        logger.debug("CSV file parsed", rows_count=len(rows))
-        return rows
-
-    except Exception as e:
-        logger.error("Error parsing CSV file", error=str(e))
-        raise PVBFileValidationException(f"CSV parsing error: {str(e)}")
-
-
-def _parse_excel_file(file: UploadFile) -> List[Dict[str, Any]]:
-    """Parse Excel file"""
-    try:
-        df = pd.read_excel(file.file)
-        # Drop completely empty rows
-        df = df.dropna(how="all")
-        rows = df.to_dict("records")
+        logger.error("Error reading file", path=path, error=str(e))
+        raise PVBFileValidationException(f"File validation error: {str(e)}") from e
 
-        logger.debug("Excel file parsed", rows_count=len(rows))
-        return rows
-
-    except Exception as e:
-        logger.error("Error parsing Excel file", error=str(e))
-        raise PVBFileValidationException(f"Excel parsing error: {str(e)}")
+    if first_row == 1:
+        raise PVBFileValidationException("File is empty or contains no data rows")
+    if valid_row_count == 0:
+        raise PVBFileValidationException(
+            "No valid data rows found. Ensure PLATE and SUMMONS columns have values."
+        )
+    logger.debug("Row validation successful", valid_rows=valid_row_count)
 
 
-def _validate_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _validate_frame(
+    frame: pd.DataFrame, first_row: int = 1
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
     """
-    Validate row data and ensure required columns are present.
-    
-    Args:
-        rows: List of dictionaries from parsed file
-        
+    Validate one chunk of rows and ensure required columns are present.
+
     Returns:
-        List of validated dictionaries
-        
+        (rows with PLATE and SUMMONS as dictionaries, failed rows)
+
     Raises:
-        PVBFileValidationException: If validation fails
+        PVBFileValidationException: If a required column is missing
     """
-    if not rows:
-        raise PVBFileValidationException("File is empty or contains no data rows")
-
     # Strip whitespace from all column names
-    normalized_rows = []
-    for row in rows:
-        normalized_row = {k.strip(): v for k, v in row.items() if k is not None}
-        normalized_rows.append(normalized_row)
-
-    # Get column names from first row
-    first_row_keys = set(normalized_rows[0].keys())
-
-    # Check for required columns
-    missing_columns = []
-    for required_col in REQUIRED_COLUMNS:
-        if required_col not in first_row_keys:
-            missing_columns.append(required_col)
+    frame = frame.rename(columns=lambda name: str(name).strip())
 
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in frame.columns]
     if missing_columns:
         raise PVBFileValidationException(
             f"Missing required columns: {', '.join(missing_columns)}"
         )
 
-    # Validate that at least one row has data in required columns
-    valid_row_count = 0
-    for row in normalized_rows:
-        # Check if row has values for critical fields
-        if row.get("PLATE") and row.get("SUMMONS"):
-            valid_row_count += 1
-
-    if valid_row_count == 0:
-        raise PVBFileValidationException(
-            "No valid data rows found. Ensure PLATE and SUMMONS columns have values."
-        )
+    frame = frame.astype(object).where(frame.notna(), None)
+    has_values = frame["PLATE"].ne("") & frame["PLATE"].notna() \
+        & frame["SUMMONS"].ne("") & frame["SUMMONS"].notna()
 
-    logger.debug("Row validation successful", valid_rows=valid_row_count)
-    return normalized_rows
+    rejected = frame.loc[~has_values, "SUMMONS"]
+    failed_rows = {
+        str(summons) if summons not in (None, "") else f"row_{first_row + idx}":
+            "Missing PLATE or SUMMONS"
+        for idx, summons in rejected.items()
+    }
+    return frame[has_values].to_dict("records"), failed_rows
 
 
 def clean_plate_number(plate: str) -> str:
@@ -0,0 +1,155 @@
+### app/utils/ingestion.py
+
+"""
+Streaming ingestion of uploaded CSV and Excel files.
+
+spool_upload copies an upload to a temp file in fixed-size blocks, so the
+file is never held in memory as a whole and can be handed to a worker.
+iter_frames reads a spooled file back as DataFrames of chunk_size rows: CSV
+through pandas' chunked reader and .xlsx through openpyxl in read-only mode.
+Modules validate each frame with column operations and write it before the
+next one is read.
+
+Spooled files live in INGESTION_SPOOL_DIR (the system temp directory by
+default), which must be shared with the Celery workers when imports run in
+the background.
+"""
+
+# Standard library imports
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+# Third party imports
+import pandas as pd
+from fastapi import UploadFile
+from openpyxl import load_workbook
+
+# Local imports
+from app.core.config import settings
+from app.utils.logger import get_logger
+from app.worker.app import app as celery_app
+
+logger = get_logger(__name__)
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+CSV_EXTENSIONS = (".csv",)
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+
+def is_supported_file(filename: Optional[str]) -> bool:
+    """Whether filename has a CSV or Excel extension"""
+    return bool(filename) and filename.lower().endswith(CSV_EXTENSIONS + EXCEL_EXTENSIONS)
+
+
+def spool_upload(file: UploadFile, prefix: str = "upload-") -> str:
+    """
+    Copy an upload to a temp file block by block and return its path.
+
+    The file keeps the upload's extension so iter_frames can pick a reader.
+    Blocking; call it through run_sync from async code.
+    """
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    file.file.seek(0)
+    with tempfile.NamedTemporaryFile(
+        prefix=prefix, suffix=suffix, dir=settings.ingestion_spool_dir, delete=False
+    ) as spooled:
+        shutil.copyfileobj(file.file, spooled, SPOOL_BLOCK_SIZE)
+        path = spooled.name
+
+    logger.info("Upload spooled", filename=file.filename, path=path, size=os.path.getsize(path))
+    return path
+
+
+def remove_spooled(path: Optional[str]) -> None:
+    """Delete a spooled upload, ignoring files that are already gone"""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def iter_frames(path: str, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows of a spooled CSV / Excel file as DataFrames of at most
+    chunk_size rows, with the header row's names as columns.
+
+    CSV values are strings with empty cells as "". Excel values keep their
+    cell types, with empty cells as None. Completely empty rows are dropped.
+    """
+    chunk_size = chunk_size or settings.ingestion_chunk_size
+    lowered = path.lower()
+    if lowered.endswith(CSV_EXTENSIONS):
+        yield from _iter_csv_frames(path, chunk_size)
+    elif lowered.endswith(".xlsx"):
+        yield from _iter_xlsx_frames(path, chunk_size)
+    elif lowered.endswith(".xls"):
+        # Legacy .xls has no streaming reader; read it whole and slice it
+        frame = pd.read_excel(path).dropna(how="all")
+        frame = frame.astype(object).where(frame.notna(), None)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size].reset_index(drop=True)
+    else:
+        raise ValueError("Invalid file format. Only CSV and Excel files are supported.")
+
+
+def _iter_csv_frames(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8-sig",
+        skip_blank_lines=True,
+    ) as reader:
+        for frame in reader:
+            frame = frame[frame.ne("").any(axis=1)]
+            if len(frame):
+                yield frame.reset_index(drop=True)
+
+
+def _iter_xlsx_frames(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next((row for row in rows if any(cell is not None for cell in row)), None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"column_{i}" for i, name in enumerate(header)]
+
+        batch: List[tuple] = []
+        for row in rows:
+            if not any(cell is not None and cell != "" for cell in row):
+                continue
+            batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def get_task_progress(task_id: str) -> Dict[str, Any]:
+    """
+    State of a background import task: status, progress meta while it runs,
+    its result once successful and the error if it failed.
+    """
+    result = celery_app.AsyncResult(task_id)
+    state: Dict[str, Any] = {"task_id": task_id, "status": result.status}
+    if result.status == "PROGRESS":
+        state["progress"] = result.info
+    elif result.successful():
+        state["result"] = result.result
+    elif result.failed():
+        state["error"] = str(result.result)
+    return state
+
+
+def dispatch_task(task_name: str, *args: Any) -> str:
+    """Send a task to the worker queue by name and return its id"""
+    return celery_app.send_task(task_name, args=list(args)).id
@@ -0,0 +1,259 @@
+### app/utils/pagination.py
+
+"""
+Keyset (cursor) pagination.
+
+A list endpoint hands out an opaque cursor with every page: the sort key
+values of the last row, with the id as tie-breaker. The next page is the
+rows strictly after that key in the same order, so each page is a range
+read on the sort index however deep the client scrolls. Plain page numbers
+still work through an offset.
+
+Totals are the other O(N) part of a list call; `count_rows` /
+`count_query` can serve them from a short-lived per-process cache keyed by
+the filtered statement, so scrolling does not recount the same set on every
+page.
+"""
+
+# Standard library imports
+import base64
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from datetime import time as dt_time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Third party imports
+from sqlalchemy import and_, false, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Local imports
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """One ORDER BY term; `key` is the row attribute holding its value"""
+    column: Any
+    descending: bool = False
+    key: Optional[str] = None
+
+    @property
+    def attribute(self) -> str:
+        return self.key or self.column.key
+
+
+class CursorPage(list):
+    """Items of one page plus the cursor of the page after it (None on the last page)"""
+
+    def __init__(self, items: Iterable = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def keyset_order(sort_column, descending: bool, id_column) -> List[SortKey]:
+    """Sort on sort_column with id_column as the unique tie-breaker"""
+    if sort_column is id_column:
+        return [SortKey(id_column, descending)]
+    return [SortKey(sort_column, descending), SortKey(id_column, descending)]
+
+
+def paginate(
+    stmt,
+    order: Sequence[SortKey],
+    per_page: int,
+    page: int = 1,
+    cursor: Optional[str] = None,
+):
+    """
+    Order stmt and select one page of it, after cursor when given or at the
+    page offset otherwise. One extra row is fetched so `to_page` can tell
+    whether another page follows.
+
+    Works for 2.0 `select()` statements and legacy `Query` objects alike.
+    """
+    stmt = stmt.order_by(
+        *(sort.column.desc() if sort.descending else sort.column.asc() for sort in order)
+    )
+    if cursor:
+        values = _coerce_cursor_values(order, decode_cursor(cursor, len(order)))
+        stmt = stmt.where(_after(order, values))
+    else:
+        stmt = stmt.offset((page - 1) * per_page)
+    return stmt.limit(per_page + 1)
+
+
+def to_page(rows: Iterable, order: Sequence[SortKey], per_page: int) -> CursorPage:
+    """Trim the lookahead row of a paginated result and attach next_cursor"""
+    rows = list(rows)
+    if len(rows) <= per_page:
+        return CursorPage(rows)
+    rows = rows[:per_page]
+    return CursorPage(
+        rows,
+        encode_cursor([getattr(rows[-1], sort.attribute) for sort in order]),
+    )
+
+
+def _after(order: Sequence[SortKey], values: Sequence[Any]):
+    """
+    Rows strictly after `values` in `order`. NULLs sort first ascending and
+    last descending, as MySQL orders them.
+    """
+    alternatives = []
+    for position, (sort, value) in enumerate(zip(order, values)):
+        equal_prefix = [
+            prior.column.is_(None) if prior_value is None else prior.column == prior_value
+            for prior, prior_value in zip(order[:position], values[:position])
+        ]
+        if value is None:
+            beyond = sort.column.is_not(None) if not sort.descending else None
+        elif sort.descending:
+            beyond = or_(sort.column < value, sort.column.is_(None))
+        else:
+            beyond = sort.column > value
+        if beyond is not None:
+            alternatives.append(and_(*equal_prefix, beyond))
+    return or_(*alternatives) if alternatives else false()
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque, URL-safe token for a row's sort key values"""
+    payload = [_encode_value(value) for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: Optional[int] = None) -> List[Any]:
+    """Inverse of encode_cursor; raises ValueError on malformed or foreign cursors"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = [_decode_value(item) for item in payload]
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise ValueError("Invalid cursor") from e
+    if size is not None and len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _coerce_cursor_values(order: Sequence[SortKey], values: Sequence[Any]) -> List[Any]:
+    """
+    Match decoded cursor values to their sort columns. Values of enum-typed
+    columns become members again (cursors carry Enum.value); a cursor whose
+    values cannot belong to the columns, e.g. one issued by an endpoint or
+    sort order with different keys, raises ValueError.
+    """
+    coerced = []
+    for sort, value in zip(order, values):
+        try:
+            expected = sort.column.type.python_type
+        except (AttributeError, NotImplementedError):
+            expected = None
+        if value is None or expected is None:
+            coerced.append(value)
+            continue
+
+        if isinstance(expected, type) and issubclass(expected, Enum):
+            member = next((m for m in expected if m.value == value or m.name == value), None)
+            if member is None:
+                raise ValueError("Invalid cursor")
+            coerced.append(member)
+            continue
+
+        if expected is float or expected is Decimal:
+            valid = isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+        elif expected is int:
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif expected is date:
+            valid = isinstance(value, date) and not isinstance(value, datetime)
+        else:
+            valid = isinstance(value, expected)
+        if not valid:
+            raise ValueError("Invalid cursor")
+        coerced.append(value)
+    return coerced
+
+
+def _encode_value(value: Any) -> list:
+    if isinstance(value, Enum):
+        value = value.value
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return ["v", value]
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, dt_time):
+        return ["t", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["n", str(value)]
+    raise ValueError(f"Unsupported cursor value type: {type(value).__name__}")
+
+
+def _decode_value(item: list) -> Any:
+    tag, raw = item
+    if tag == "v":
+        return raw
+    return {
+        "dt": datetime.fromisoformat,
+        "d": date.fromisoformat,
+        "t": dt_time.fromisoformat,
+        "n": Decimal,
+    }[tag](raw)
+
+
+# === Totals ===
+
+_COUNT_CACHE_MAX_ENTRIES = 1024
+_count_cache: Dict[tuple, Tuple[float, int]] = {}
+_count_lock = threading.Lock()
+
+
+def _count_cache_key(stmt) -> tuple:
+    compiled = stmt.compile()
+    return str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items()))
+
+
+def _cached_total(key: tuple) -> Optional[int]:
+    entry = _count_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _store_total(key: tuple, total: int) -> None:
+    with _count_lock:
+        if len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.clear()
+        _count_cache[key] = (time.monotonic() + settings.pagination_count_cache_seconds, total)
+
+
+async def count_rows(db: AsyncSession, count_stmt, cached: bool = False) -> int:
+    """
+    Execute a COUNT statement. With cached=True a total counted within the
+    last PAGINATION_COUNT_CACHE_SECONDS for the same statement is reused.
+    """
+    key = _count_cache_key(count_stmt) if cached and settings.pagination_count_cache_seconds else None
+    if key and (total := _cached_total(key)) is not None:
+        return total
+
+    total = (await db.execute(count_stmt)).scalar() or 0
+    if key:
+        _store_total(key, total)
+    return total
+
+
+def count_query(query, cached: bool = False) -> int:
+    """Sync counterpart of count_rows for legacy Query objects"""
+    query = query.order_by(None)
+    key = _count_cache_key(query.statement) if cached and settings.pagination_count_cache_seconds else None
+    if key and (total := _cached_total(key)) is not None:
+        return total
+
+    total = query.count()
+    if key:
+        _store_total(key, total)
+    return total
@@ -84,6 +84,35 @@ class S3Utils:
             print(f"Error downloading file from S3: {e}")
             return None
 
+    def head_file(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the version information of an S3 object without downloading it
+
+        Args:
+            key: S3 key (path) of the file
+
+        Returns:
+            dict: etag and last_modified if the object exists, None when it does not
+
+        Raises:
+            ClientError: for any failure other than a missing object (throttling,
+                access denied, server errors), so callers can tell them apart
+        """
+        try:
+            response = self.s3_client.head_object(
+                Bucket=self.bucket_name,
+                Key=key
+            )
+            return {
+                "etag": response.get("ETag"),
+                "last_modified": response.get("LastModified"),
+            }
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            logger.error(f"Error reading S3 object head for key {key}: {e}")
+            raise
+
     def generate_presigned_url(self, key: str, expiration: int = 3600) -> Optional[str]:
         """
         Generate a presigned URL for temporary access to an S3 object
@@ -0,0 +1,295 @@
+### app/vehicles/plate_index.py
+
+"""
+Plate number resolution for toll and violation association.
+
+Every vehicle registration, current and historical, is loaded once into a
+PlateIndex of normalized plate (clean_plate_number) -> registration
+intervals. A batch of (plate, date) pairs is then resolved to vehicle,
+lease, driver and medallion with two queries: the registration signature
+check and one candidate-lease load for all matched vehicles.
+
+The index is cached per process and rebuilt when the registration
+signature (row count, highest id, last update) changes, so edits made by
+other workers are picked up; writes through this process invalidate it
+directly via mapper events.
+"""
+
+# Standard library imports
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Third party imports
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Local imports
+from app.drivers.models import Driver
+from app.ezpass.utils import clean_plate_number
+from app.leases.models import Lease, LeaseDriver
+from app.medallions.models import Medallion
+from app.utils.logger import get_logger
+from app.vehicles.models import Vehicle, VehicleRegistration
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class PlateRegistration:
+    """One registration period of a plate"""
+    vehicle_id: int
+    medallion_id: Optional[int]
+    registration_date: Optional[date]
+    registration_expiry_date: Optional[date]
+
+
+@dataclass(frozen=True)
+class PlateResolution:
+    """Vehicle a plate belonged to on a date, plus the lease active on it"""
+    vehicle_id: int
+    medallion_id: Optional[int] = None
+    medallion_no: Optional[str] = None
+    lease_id: Optional[int] = None
+    driver_id: Optional[int] = None
+
+    @property
+    def has_lease(self) -> bool:
+        return self.lease_id is not None
+
+
+class PlateIndex:
+    """
+    Registrations grouped by normalized plate.
+
+    A plate resolves to the registration covering the date, the latest one
+    started before it when none covers it, and otherwise the latest one
+    overall. Plates without an exact match fall back to registrations whose
+    plate starts with it, as the old `plate_number LIKE 'X%'` lookup did.
+    """
+
+    def __init__(self, registrations: Iterable[Any]):
+        grouped: Dict[str, List[PlateRegistration]] = defaultdict(list)
+        for row in registrations:
+            plate = clean_plate_number(row.plate_number)
+            if not plate:
+                continue
+            grouped[plate].append(PlateRegistration(
+                vehicle_id=row.vehicle_id,
+                medallion_id=row.medallion_id,
+                registration_date=row.registration_date,
+                registration_expiry_date=row.registration_expiry_date,
+            ))
+
+        for rows in grouped.values():
+            rows.sort(key=lambda r: (r.registration_date or date.min))
+        self._registrations: Dict[str, List[PlateRegistration]] = dict(grouped)
+        self._plates: List[str] = sorted(grouped)
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def registration_for(self, plate_no: str, on_date: Optional[date]) -> Optional[PlateRegistration]:
+        """Registration that carried plate_no on on_date, if any"""
+        plate = clean_plate_number(plate_no)
+        if not plate:
+            return None
+
+        rows = self._registrations.get(plate) or self._prefix_matches(plate)
+        if not rows:
+            return None
+        if on_date is None:
+            return rows[-1]
+
+        started = [r for r in rows if r.registration_date is None or r.registration_date <= on_date]
+        for row in reversed(started):
+            if row.registration_expiry_date is None or row.registration_expiry_date >= on_date:
+                return row
+        return started[-1] if started else rows[-1]
+
+    def _prefix_matches(self, plate: str) -> List[PlateRegistration]:
+        start = bisect_left(self._plates, plate)
+        end = bisect_right(self._plates, plate + "\x7f")
+        rows = [r for key in self._plates[start:end] for r in self._registrations[key]]
+        rows.sort(key=lambda r: (r.registration_date or date.min))
+        return rows
+
+
+class PlateResolver:
+    """Process-wide cached PlateIndex plus batch resolution against leases"""
+
+    def __init__(self):
+        self._index: Optional[Tuple[tuple, PlateIndex]] = None
+        self._lock = threading.Lock()
+
+    async def get_index(self, db: AsyncSession) -> PlateIndex:
+        """Return the plate index, rebuilding it if registrations changed"""
+        signature = await self._signature(db)
+        cached = self._index
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        rows = (await db.execute(
+            select(
+                VehicleRegistration.plate_number,
+                VehicleRegistration.vehicle_id,
+                VehicleRegistration.registration_date,
+                VehicleRegistration.registration_expiry_date,
+                Vehicle.medallion_id,
+            )
+            .join(Vehicle, Vehicle.id == VehicleRegistration.vehicle_id)
+            .where(VehicleRegistration.plate_number.is_not(None))
+        )).all()
+        index = PlateIndex(rows)
+        with self._lock:
+            self._index = (signature, index)
+        logger.info("Built plate index", registrations=len(rows), plates=len(index))
+        return index
+
+    def invalidate(self) -> None:
+        """Drop the cached index"""
+        with self._lock:
+            self._index = None
+
+    async def resolve(
+        self, db: AsyncSession, pairs: Iterable[Tuple[str, Optional[date]]]
+    ) -> Dict[Tuple[str, Optional[date]], Optional[PlateResolution]]:
+        """
+        Resolve (plate, date) pairs in one pass.
+
+        Unknown plates map to None. Known plates map to a PlateResolution
+        with the vehicle's medallion; when an active lease of the vehicle
+        covers the date its lease, primary driver and medallion are filled
+        in, the latest-starting lease winning.
+        """
+        pairs = set(pairs)
+        index = await self.get_index(db)
+        registrations = {pair: index.registration_for(*pair) for pair in pairs}
+
+        vehicle_ids = {r.vehicle_id for r in registrations.values() if r}
+        dates = [on_date for (_, on_date), r in registrations.items() if r and on_date]
+        leases = await self._candidate_leases(db, vehicle_ids, dates)
+
+        medallion_ids = {r.medallion_id for r in registrations.values() if r and r.medallion_id}
+        medallion_ids -= {lease.medallion_id for rows in leases.values() for lease in rows}
+        medallion_numbers = {lease.medallion_id: lease.medallion_number for rows in leases.values() for lease in rows}
+        if medallion_ids:
+            medallion_numbers.update((await db.execute(
+                select(Medallion.id, Medallion.medallion_number).where(Medallion.id.in_(medallion_ids))
+            )).all())
+
+        resolved: Dict[Tuple[str, Optional[date]], Optional[PlateResolution]] = {}
+        for (plate_no, on_date), registration in registrations.items():
+            if not registration:
+                resolved[(plate_no, on_date)] = None
+                continue
+            lease = self._lease_on(leases.get(registration.vehicle_id, []), on_date)
+            medallion_id = lease.medallion_id if lease and lease.medallion_id else registration.medallion_id
+            resolved[(plate_no, on_date)] = PlateResolution(
+                vehicle_id=registration.vehicle_id,
+                medallion_id=medallion_id,
+                medallion_no=medallion_numbers.get(medallion_id),
+                lease_id=lease.lease_id if lease else None,
+                driver_id=lease.driver_pk if lease else None,
+            )
+        return resolved
+
+    async def leases_on(
+        self, db: AsyncSession, pairs: Iterable[Tuple[int, date]]
+    ) -> Dict[Tuple[int, date], Any]:
+        """
+        Active lease of each (vehicle_id, date) pair with one query. Rows
+        carry lease_id, vehicle_id, medallion_id, medallion_number and
+        driver_pk; pairs without a lease are left out.
+        """
+        pairs = {(vehicle_id, on_date) for vehicle_id, on_date in pairs if vehicle_id and on_date}
+        leases = await self._candidate_leases(
+            db, {vehicle_id for vehicle_id, _ in pairs}, [on_date for _, on_date in pairs]
+        )
+        found = {pair: self._lease_on(leases.get(pair[0], []), pair[1]) for pair in pairs}
+        return {pair: lease for pair, lease in found.items() if lease}
+
+    @staticmethod
+    async def _candidate_leases(
+        db: AsyncSession, vehicle_ids: set, dates: List[date]
+    ) -> Dict[int, List[Any]]:
+        """Active leases of vehicle_ids overlapping dates, one row per lease with its primary driver"""
+        if not vehicle_ids or not dates:
+            return {}
+
+        rows = (await db.execute(
+            select(
+                Lease.id.label("lease_id"),
+                Lease.vehicle_id,
+                Lease.medallion_id,
+                Lease.lease_start_date,
+                Lease.lease_end_date,
+                Medallion.medallion_number,
+                LeaseDriver.co_lease_seq,
+                Driver.id.label("driver_pk"),
+            )
+            .outerjoin(Medallion, Medallion.id == Lease.medallion_id)
+            .outerjoin(LeaseDriver, LeaseDriver.lease_id == Lease.id)
+            .outerjoin(Driver, Driver.driver_id == LeaseDriver.driver_id)
+            .where(
+                and_(
+                    Lease.vehicle_id.in_(vehicle_ids),
+                    Lease.lease_status == "Active",
+                    Lease.lease_start_date <= max(dates),
+                    or_(Lease.lease_end_date.is_(None), Lease.lease_end_date >= min(dates)),
+                )
+            )
+            .order_by(Lease.id, LeaseDriver.id)
+        )).all()
+
+        # Keep the primary lessee of each lease, else its first driver
+        primary: Dict[int, Any] = {}
+        for row in rows:
+            if row.lease_id not in primary or (
+                row.co_lease_seq == "1" and primary[row.lease_id].co_lease_seq != "1"
+            ):
+                primary[row.lease_id] = row
+
+        by_vehicle: Dict[int, List[Any]] = defaultdict(list)
+        for row in primary.values():
+            by_vehicle[row.vehicle_id].append(row)
+        for leases in by_vehicle.values():
+            leases.sort(key=lambda r: r.lease_start_date, reverse=True)
+        return by_vehicle
+
+    @staticmethod
+    def _lease_on(leases: List[Any], on_date: Optional[date]) -> Optional[Any]:
+        if not on_date:
+            return None
+        return next(
+            (
+                lease for lease in leases
+                if lease.lease_start_date <= on_date
+                and (lease.lease_end_date is None or lease.lease_end_date >= on_date)
+            ),
+            None,
+        )
+
+    @staticmethod
+    async def _signature(db: AsyncSession) -> tuple:
+        """Cheap fingerprint of vehicle_registration"""
+        return tuple((await db.execute(
+            select(
+                func.count(VehicleRegistration.id),
+                func.max(VehicleRegistration.id),
+                func.max(VehicleRegistration.updated_on),
+            )
+        )).one())
+
+
+plate_resolver = PlateResolver()
+
+
+@event.listens_for(VehicleRegistration, "after_insert")
+@event.listens_for(VehicleRegistration, "after_update")
+@event.listens_for(VehicleRegistration, "after_delete")
+def _invalidate_plate_index(mapper, connection, target) -> None:
+    plate_resolver.invalidate()
@@ -14,6 +14,7 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.audit_trail.services import audit_trail_service
+from app.bpm.case_state import order_newest_first
 from app.bpm.services import bpm_service
 
 # Local imports
@@ -1359,22 +1360,9 @@ def get_hackup_process(
     - AND none of the processes in 'open'
     """
     try:
-        logged_in_user_role_ids = [role.id for role in logged_in_user.roles]
-
-        closed_cases = bpm_service.get_cases(
-            db, case_status="Closed", multiple=True, unique=True
-        )
-        closed_case_nos = [case.case_no for case in closed_cases]
-        all_cases = bpm_service.get_cases_info(db, closed_case_nos, from_date, to_date)
-
-        filtered_cases = [
-            case
-            for case in all_cases
-            if (
-                (case.current_user_id and case.current_user_id == logged_in_user.id)
-                or (case.role_id and case.role_id in logged_in_user_role_ids)
-            )
-        ]
+        filtered_cases = order_newest_first(
+            bpm_service.get_cases_info(db, logged_in_user, from_date, to_date)
+        ).all()
 
         total_count = 0
         results = []
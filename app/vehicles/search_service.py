@@ -7,7 +7,7 @@ from datetime import date
 from sqlalchemy.orm import Session, aliased, joinedload
 from sqlalchemy.sql import and_, exists, func, or_
 
-from app.audit_trail.models import AuditTrail
+from app.audit_trail.models import AuditTrailLink
 from app.bpm.services import bpm_service
 
 # Local imports
@@ -488,8 +488,11 @@ def format_vehicle_response(vehicle: Vehicle, db: Session):
         .first()
     )
     has_trail = (
-        db.query(AuditTrail)
-        .filter(AuditTrail.meta_data.contains({"vehicle_id": vehicle.id}))
+        db.query(AuditTrailLink)
+        .filter(
+            AuditTrailLink.entity_type == "vehicle_id",
+            AuditTrailLink.entity_id == vehicle.id,
+        )
         .count()
     )
 
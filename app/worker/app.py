@@ -22,6 +22,9 @@ app.autodiscover_tasks([
     "app.worker",
     "app.curb",
     "app.ledger",
+    "app.bpm.sla",
+    "app.ezpass",
+    "app.pvb",
 ])
 
 if __name__ == "__main__":
@@ -65,6 +65,11 @@ beat_schedule = {
             "timezone": "America/New_York"
         }
     },
+    # Escalate cases whose SLA deadline has passed
+    "bpm-sla-escalation": {
+        "task": "app.bpm.sla.tasks.process_case_sla",
+        "schedule": crontab(minute="*/1"),  # Every minute
+    },
     "generate-weekly-dtrs": {
         "task": "app.ledger.tasks.generate_weekly_dtrs",
         "schedule": crontab(hour=5, minute=0, day_of_week="sun"), # Run every Sunday at 5 AM UTC
@@ -0,0 +1,255 @@
+import importlib.util
+import json
+import os
+import random
+import re
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session, registry, relationship
+
+from app.audit_trail import services as audit_services
+from app.audit_trail.models import RELATED_ENTITY_KEYS, AuditTrail, AuditTrailLink, related_entity_ids
+from app.audit_trail.services import AuditTrailService
+from app.bpm.models import Case  # noqa: F401  audit_trail.case_id references cases
+from app.core.db import Base
+from app.users.models import User
+
+AUDITS, LINKS, USERS = AuditTrail.__table__, AuditTrailLink.__table__, User.__table__
+MIGRATION = os.path.join(
+    os.path.dirname(__file__), "..", "app", "migrations", "versions", "f4c7a1e95b30_audit_trail_links.py"
+)
+META_VALUES = [7, 12, "12", "0042", 0, -3, 12.5, True, None, "abc", "", " 12", [12], {"id": 12}]
+
+
+# The app-wide mappers cannot all be configured in this tree, so the service
+# runs against the same tables mapped in a registry of their own
+class AuditUser:
+    pass
+
+
+class AuditEntry:
+    pass
+
+
+class AuditLink:
+    pass
+
+
+audit_registry = registry()
+audit_registry.map_imperatively(AuditUser, USERS)
+audit_registry.map_imperatively(AuditLink, LINKS)
+audit_registry.map_imperatively(AuditEntry, AuditTrail.__table__, properties={
+    "user": relationship(AuditUser, foreign_keys=[AUDITS.c.done_by]),
+    "links": relationship(AuditLink, cascade="all, delete", passive_deletes=True),
+})
+
+
+def register_mysql_json_functions(dbapi_connection, _record):
+    """MySQL's JSON_EXTRACT / JSON_UNQUOTE and REGEXP, with MySQL semantics"""
+    def json_extract(document, path):
+        data = json.loads(document) if document is not None else None
+        key = path[len("$."):]
+        if not isinstance(data, dict) or key not in data:
+            return None
+        return json.dumps(data[key])
+
+    def json_unquote(text):
+        if text is None:
+            return None
+        value = json.loads(text)
+        return value if isinstance(value, str) else text
+
+    dbapi_connection.create_function("json_extract", 2, json_extract)
+    dbapi_connection.create_function("json_unquote", 1, json_unquote)
+    dbapi_connection.create_function(
+        "regexp", 2, lambda pattern, value: value is not None and re.search(pattern, value) is not None
+    )
+
+
+class AuditTrailTestCase(unittest.TestCase):
+    tables = [USERS, AUDITS, LINKS]
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        event.listen(self.engine, "connect", register_mysql_json_functions)
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine, tables=self.tables)
+        self.db = Session(self.engine)
+        self.addCleanup(self.db.close)
+
+        for name, stand_in in (("AuditTrail", AuditEntry), ("AuditTrailLink", AuditLink)):
+            patcher = mock.patch.object(audit_services, name, stand_in)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stored_links(self):
+        return sorted(self.db.execute(
+            select(LINKS.c.audit_trail_id, LINKS.c.entity_type, LINKS.c.entity_id, LINKS.c.audit_timestamp)
+        ).all())
+
+
+class TestRelatedEntityIds(unittest.TestCase):
+    def test_only_digit_values_link(self):
+        meta_data = {
+            "driver_id": 12, "vehicle_id": "0042", "lease_id": 0, "medallion_id": -3, "pvb_id": 12.5,
+            "ledger_id": True, "correspondence_id": "abc", "medallion_owner_id": " 12", "vehicle_owner_id": None,
+            "case_no": 99,
+        }
+
+        self.assertEqual(related_entity_ids(meta_data), {"driver_id": 12, "vehicle_id": 42, "lease_id": 0})
+        self.assertEqual(related_entity_ids(None), {})
+
+
+class TestAuditLinkWrites(AuditTrailTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = AuditTrailService()
+        self.case = SimpleNamespace(id=1, case_type=SimpleNamespace(name="Driver Lease"), case_step_config=None)
+        self.user = SimpleNamespace(id=3, roles=[SimpleNamespace(name="Clerk")])
+
+    def test_create_writes_a_link_per_entity_reference(self):
+        audit = self.service.create_audit_trail(
+            self.db, self.case, "Lease signed", self.user,
+            meta_data={"driver_id": 12, "vehicle_id": "7", "lease_id": "pending", "note": 5},
+        )
+
+        self.assertEqual(self.stored_links(), [
+            (audit.id, "driver_id", 12, audit.timestamp), (audit.id, "vehicle_id", 7, audit.timestamp),
+        ])
+
+    def test_update_rewrites_links(self):
+        audit = self.service.create_audit_trail(
+            self.db, self.case, "Lease signed", self.user, meta_data={"driver_id": 12, "vehicle_id": 7},
+        )
+
+        moved = datetime(2025, 3, 1, 9, 30)
+        self.service.update_audit_trail(
+            self.db, audit.id, {"meta_data": {"driver_id": 13, "lease_id": 4}, "timestamp": moved},
+        )
+
+        self.assertEqual(self.stored_links(), [(audit.id, "driver_id", 13, moved), (audit.id, "lease_id", 4, moved)])
+
+    def test_update_without_references_keeps_links(self):
+        audit = self.service.create_audit_trail(
+            self.db, self.case, "Lease signed", self.user, meta_data={"driver_id": 12},
+        )
+        links = self.stored_links()
+
+        self.service.update_audit_trail(self.db, audit.id, {"description": "Lease countersigned"})
+
+        self.assertEqual(self.stored_links(), links)
+
+    def test_clearing_meta_data_removes_links(self):
+        audit = self.service.create_audit_trail(
+            self.db, self.case, "Lease signed", self.user, meta_data={"driver_id": 12},
+        )
+
+        self.service.update_audit_trail(self.db, audit.id, {"meta_data": None})
+
+        self.assertEqual(self.stored_links(), [])
+
+
+class TestLinkBackfillMigration(AuditTrailTestCase):
+    tables = [USERS, AUDITS]
+
+    @staticmethod
+    def run_upgrade(connection):
+        spec = importlib.util.spec_from_file_location("audit_trail_links_migration", MIGRATION)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+    def test_backfill_links_what_the_write_path_links(self):
+        rng = random.Random(19)
+        audits = []
+        for audit_id in range(1, 120):
+            keys = rng.sample(RELATED_ENTITY_KEYS + ("case_no", "amount"), rng.randrange(0, 5))
+            audits.append({
+                "id": audit_id, "case_id": 1, "case_type": "Driver", "audit_trail_type": "AUTOMATED",
+                "timestamp": datetime(2025, 3, 1) + timedelta(minutes=audit_id),
+                "meta_data": rng.choice([None, {}, {key: rng.choice(META_VALUES) for key in keys}]),
+            })
+        with self.engine.begin() as connection:
+            connection.execute(AUDITS.insert(), audits)
+            self.run_upgrade(connection)
+
+        self.assertEqual(self.stored_links(), sorted(
+            (audit["id"], key, entity_id, audit["timestamp"])
+            for audit in audits
+            for key, entity_id in related_entity_ids(audit["meta_data"]).items()
+        ))
+
+
+class TestRelatedAuditTrailLookup(AuditTrailTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = AuditTrailService()
+        rng = random.Random(190)
+        self.db.execute(USERS.insert(), [{"id": 1, "first_name": "Ana", "last_name": "Diaz", "email_address": "ana@x.io"}])
+        base = datetime(2025, 3, 1)
+        self.audits = [
+            {
+                "id": audit_id, "case_id": 1, "case_type": "Driver", "audit_trail_type": "AUTOMATED", "done_by": 1,
+                # Repeated timestamps, so the id tie-breaker matters
+                "timestamp": base + timedelta(minutes=rng.randrange(20)),
+                "meta_data": {"driver_id": rng.choice([5, 6]), "vehicle_id": rng.choice([7, 8])},
+            }
+            for audit_id in range(1, 60)
+        ]
+        self.db.execute(AUDITS.insert(), self.audits)
+        self.db.execute(LINKS.insert(), [
+            {"audit_trail_id": audit["id"], "entity_type": key, "entity_id": entity_id,
+             "audit_timestamp": audit["timestamp"]}
+            for audit in self.audits
+            for key, entity_id in related_entity_ids(audit["meta_data"]).items()
+        ])
+        self.db.commit()
+
+    def expected_ids(self, **filters):
+        matching = [a for a in self.audits if all(a["meta_data"][k] == v for k, v in filters.items())]
+        return [a["id"] for a in sorted(matching, key=lambda a: (a["timestamp"], a["id"]), reverse=True)]
+
+    def cursor_pages(self, per_page, **filters):
+        ids, totals, cursor = [], set(), None
+        while True:
+            total, page = self.service.get_related_audit_trail(
+                self.db, page=1, per_page=per_page, cursor=cursor, **filters
+            )
+            totals.add(total)
+            ids += [row["id"] for row in page]
+            cursor = page.next_cursor
+            if cursor is None:
+                return ids, totals
+
+    def test_cursor_pages_walk_the_entity_newest_first(self):
+        for filters in ({"driver_id": 5}, {"vehicle_id": 8}, {"driver_id": 6, "vehicle_id": 7}):
+            with self.subTest(filters=filters):
+                ids, totals = self.cursor_pages(4, **filters)
+
+                self.assertEqual(ids, self.expected_ids(**filters))
+                self.assertEqual(totals, {len(ids)})
+
+    def test_offset_pages_match_cursor_pages(self):
+        expected = self.expected_ids(driver_id=5)
+        offset_ids = []
+        for page in range(1, len(expected) // 4 + 2):
+            _, rows = self.service.get_related_audit_trail(self.db, driver_id=5, page=page, per_page=4)
+            offset_ids += [row["id"] for row in rows]
+
+        self.assertEqual(offset_ids, expected)
+
+    def test_unpaginated_lookup(self):
+        rows = self.service.get_related_audit_trail(self.db, driver_id=6)
+
+        self.assertEqual([row["id"] for row in rows], self.expected_ids(driver_id=6))
+        self.assertEqual(rows[0]["user"], {"id": 1, "first_name": "Ana", "last_name": "Diaz", "email": "ana@x.io"})
+
+    def test_entity_without_links(self):
+        self.assertEqual(self.service.get_related_audit_trail(self.db, driver_id=99), [])
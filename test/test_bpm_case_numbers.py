@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.bpm import case_numbers
+from app.bpm.case_numbers import allocate_case_numbers, format_case_number
+from app.bpm.models import Case, CaseNumberSequence
+from app.core.db import Base
+
+CASES = Case.__table__
+SEQUENCES = CaseNumberSequence.__table__
+
+
+class TestAllocateCaseNumbers(unittest.TestCase):
+    def setUp(self):
+        # A file database, so the allocator and a "concurrent" writer use separate connections
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.engine = create_engine(f"sqlite:///{os.path.join(directory, 'cases.db')}")
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine, tables=[CASES, SEQUENCES])
+
+        self.db = Session(self.engine)
+        self.addCleanup(self.db.close)
+
+    def add_cases(self, *case_nos):
+        with self.engine.begin() as connection:
+            connection.execute(CASES.insert(), [
+                {"case_no": case_no, "case_type_id": 1, "case_status_id": 1} for case_no in case_nos
+            ])
+
+    def stored_sequences(self):
+        with self.engine.connect() as connection:
+            return dict(connection.execute(select(SEQUENCES.c.prefix, SEQUENCES.c.last_value)).all())
+
+    def test_first_use_continues_from_the_highest_case_number(self):
+        self.add_cases("DRVLEA000041", "DRVLEA000007", "DRVLEA000040", "MEDALL000900")
+
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA"), [42])
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA"), [43])
+        self.assertEqual(allocate_case_numbers(self.db, "MEDALL"), [901])
+        self.assertEqual(allocate_case_numbers(self.db, "NEWDRV"), [1])
+        self.assertEqual(self.stored_sequences(), {"DRVLEA": 43, "MEDALL": 901, "NEWDRV": 1})
+
+    def test_seed_reads_cases_only_once(self):
+        self.add_cases("DRVLEA000041")
+        allocate_case_numbers(self.db, "DRVLEA")
+
+        # Cases created without the sequence no longer move it
+        self.add_cases("DRVLEA000500")
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA"), [43])
+
+    def test_unparseable_case_numbers_seed_from_zero(self):
+        self.add_cases("DRVLEA-legacy")
+
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA"), [1])
+
+    def test_range_reservation(self):
+        self.add_cases("DRVLEA000010")
+
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA", count=3), [11, 12, 13])
+        self.assertEqual(allocate_case_numbers(self.db, "DRVLEA", count=2), [14, 15])
+        self.assertEqual(allocate_case_numbers(self.db, "NEWDRV", count=4), [1, 2, 3, 4])
+        self.assertEqual(self.stored_sequences(), {"DRVLEA": 15, "NEWDRV": 4})
+
+    def test_count_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            allocate_case_numbers(self.db, "DRVLEA", count=0)
+
+    def test_sequence_created_concurrently_is_retried(self):
+        self.add_cases("DRVLEA000041")
+        last_used_number = case_numbers._last_used_number
+
+        def seed_raced_by_another_request(allocator, prefix):
+            # Another request creates the row between our lookup and our INSERT
+            if not self.stored_sequences():
+                with self.engine.begin() as connection:
+                    connection.execute(SEQUENCES.insert().values(prefix=prefix, last_value=50))
+            return last_used_number(allocator, prefix)
+
+        with mock.patch.object(case_numbers, "_last_used_number", side_effect=seed_raced_by_another_request) as seed:
+            self.assertEqual(allocate_case_numbers(self.db, "DRVLEA", count=2), [51, 52])
+
+        self.assertEqual(seed.call_count, 1)
+        self.assertEqual(self.stored_sequences(), {"DRVLEA": 52})
+
+    def test_gives_up_after_repeated_conflicts(self):
+        conflict = IntegrityError("INSERT INTO case_number_sequences", {}, Exception("Duplicate entry 'DRVLEA'"))
+
+        with mock.patch.object(case_numbers, "_last_used_number", side_effect=conflict) as seed:
+            with self.assertRaisesRegex(RuntimeError, "DRVLEA"):
+                allocate_case_numbers(self.db, "DRVLEA")
+
+        self.assertEqual(seed.call_count, 3)
+
+    def test_format_case_number(self):
+        self.assertEqual(format_case_number("DRVLEA", 42), "DRVLEA000042")
+        self.assertEqual(format_case_number("DRVLEA", 1234567), "DRVLEA1234567")
@@ -0,0 +1,232 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from app.bpm import case_state
+from app.bpm.services import BPMService
+
+OPENED = datetime(2025, 3, 1, 8, 15, 0)
+
+
+def person(name):
+    return SimpleNamespace(name=name)
+
+
+def history_row(minutes, user=None, role=None):
+    return SimpleNamespace(created_on=OPENED + timedelta(minutes=minutes), users=user, role=role)
+
+
+def per_case_details(history, sla_time_limit):
+    """The fields get_case_details used to read from the first and latest cases rows"""
+    first, latest = history[0], history[-1]
+    last_updated_by = latest.users.name if latest.users else ""
+    if not last_updated_by:
+        last_updated_by = latest.role.name
+    target_date = latest.created_on + timedelta(minutes=sla_time_limit) if sla_time_limit else None
+    return {
+        "created_by": first.users.name if first.users else "Unknown",
+        "created_on": first.created_on.strftime("%Y-%m-%d %H:%M:%S"),
+        "target_date": target_date.strftime("%Y-%m-%d %H:%M:%S") if target_date else "-",
+        "updated_date": latest.created_on,
+        "last_updated_by": last_updated_by,
+        "last_updated_on": latest.created_on,
+    }
+
+
+def workbasket_row(history, sla_time_limit, **fields):
+    """A workbasket_query row for the case whose history is given"""
+    first, latest = history[0], history[-1]
+    return SimpleNamespace(
+        id=7,
+        case_no="TST000001",
+        case_status="In Progress",
+        step_name="Review",
+        case_step_id=3,
+        case_type="Test",
+        current_step_assignee=latest.users.name if latest.users else None,
+        current_user_id=None,
+        opened_on=first.created_on,
+        latest_created_on=latest.created_on,
+        role_name=latest.role.name if latest.role else None,
+        sla_time_limit=sla_time_limit,
+        assignee=latest.users,
+        opener=first.users,
+        **fields,
+    )
+
+
+class TestGetCaseDetails(unittest.TestCase):
+    def setUp(self):
+        self.service = BPMService()
+
+    def test_matches_first_and_latest_history_rows(self):
+        clerk, manager = person("Clerk One"), person("Manager Two")
+        histories = [
+            [history_row(0, user=clerk)],
+            [history_row(0, user=clerk), history_row(45, user=manager)],
+            [history_row(0, user=clerk), history_row(90, role=person("Review Team"))],
+            [history_row(0, role=person("Intake")), history_row(5, user=manager)],
+        ]
+        for case, history in enumerate(histories):
+            for sla_time_limit in (None, 0, 120):
+                with self.subTest(case=case, sla_time_limit=sla_time_limit):
+                    details = self.service.get_case_details(None, workbasket_row(history, sla_time_limit))
+                    expected = per_case_details(history, sla_time_limit)
+
+                    self.assertEqual({key: details[key] for key in expected}, expected)
+
+    def test_row_fields_are_passed_through(self):
+        history = [history_row(0, user=person("Clerk One"))]
+
+        details = self.service.get_case_details(None, workbasket_row(history, None))
+
+        self.assertEqual(
+            {key: details[key] for key in ("case_id", "case_no", "case_status", "status", "case_step", "case_step_id", "case_type")},
+            {
+                "case_id": 7,
+                "case_no": "TST000001",
+                "case_status": "In Progress",
+                "status": "In Progress",
+                "case_step": "Review",
+                "case_step_id": 3,
+                "case_type": "Test",
+            },
+        )
+
+    def test_missing_people_and_dates(self):
+        row = workbasket_row([history_row(0)], None)
+        row.opened_on = row.latest_created_on = None
+
+        details = self.service.get_case_details(None, row)
+
+        self.assertEqual(details["created_by"], "Unknown")
+        self.assertEqual(details["last_updated_by"], "Unknown")
+        self.assertEqual((details["created_on"], details["target_date"], details["last_updated_on"]), ("-", "-", "-"))
+
+
+class CapturingConnection:
+    def __init__(self, dialect_name, rowcount=1, status_names=None):
+        self.dialect = SimpleNamespace(name=dialect_name)
+        self.rowcount = rowcount
+        self.status_names = status_names or {}
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=self.rowcount, scalar=lambda: self.status_names.get(statement.status_id))
+
+
+class StatementBuilder:
+    """Stands in for insert/update/select so statements can be inspected without compiling"""
+
+    def __init__(self, kind, *args):
+        self.kind, self.args = kind, args
+        self.values_kwargs = self.duplicate_kwargs = None
+        self.status_id = None
+        self.inserted = {}
+
+    def values(self, **kwargs):
+        self.values_kwargs = kwargs
+        self.inserted = {key: f"VALUES({key})" for key in kwargs}
+        return self
+
+    def where(self, clause):
+        self.status_id = getattr(clause, "status_id", None)
+        return self
+
+    def on_duplicate_key_update(self, **kwargs):
+        self.duplicate_kwargs = kwargs
+        return self
+
+    def scalar_subquery(self):
+        return "created_on"
+
+
+class StatusIdClause:
+    def __init__(self, status_id):
+        self.status_id = status_id
+
+
+def case_row(**fields):
+    values = dict(
+        id=11, case_no="TST000001", case_type_id=1, case_status_id=2, case_step_config_id=3,
+        sla_id=None, user_id=5, role_id=None,
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+class TestSyncCaseState(unittest.TestCase):
+    FIRST_ONLY = {"case_no", "opened_on", "opened_by_user_id"}
+
+    def setUp(self):
+        case_state._open_by_status_id.clear()
+        self.addCleanup(case_state._open_by_status_id.clear)
+        case_state._open_by_status_id.update({2: True, 4: False})
+        for name in ("insert", "update", "select", "mysql_insert"):
+            patcher = mock.patch.object(
+                case_state, name, side_effect=lambda *args, kind=name: StatementBuilder(kind, *args)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_mysql_upserts_without_overwriting_first_values(self):
+        connection = CapturingConnection("mysql")
+
+        case_state.sync_case_state(connection, case_row())
+
+        (statement,) = connection.statements
+        self.assertEqual(statement.kind, "mysql_insert")
+        self.assertEqual(statement.values_kwargs["is_open"], True)
+        self.assertEqual(statement.values_kwargs["opened_by_user_id"], 5)
+        self.assertTrue(self.FIRST_ONLY <= set(statement.values_kwargs))
+        self.assertEqual(set(statement.duplicate_kwargs), set(statement.values_kwargs) - self.FIRST_ONLY)
+        self.assertEqual(statement.duplicate_kwargs["case_id"], "VALUES(case_id)")
+
+    def test_updates_the_existing_row(self):
+        connection = CapturingConnection("sqlite", rowcount=1)
+
+        case_state.sync_case_state(connection, case_row(case_status_id=4, user_id=None, role_id=9))
+
+        (statement,) = connection.statements
+        self.assertEqual(statement.kind, "update")
+        self.assertEqual(
+            statement.values_kwargs,
+            {
+                "case_id": 11, "case_type_id": 1, "case_status_id": 4, "case_step_config_id": 3,
+                "sla_id": None, "user_id": None, "role_id": 9, "is_open": False,
+                "last_updated_on": "created_on",
+            },
+        )
+
+    def test_inserts_the_first_row_of_a_case(self):
+        connection = CapturingConnection("sqlite", rowcount=0)
+
+        case_state.sync_case_state(connection, case_row())
+
+        self.assertEqual([s.kind for s in connection.statements], ["update", "insert"])
+        inserted = connection.statements[1].values_kwargs
+        self.assertEqual(
+            {key: inserted[key] for key in self.FIRST_ONLY},
+            {"case_no": "TST000001", "opened_on": "created_on", "opened_by_user_id": 5},
+        )
+
+
+class TestIsOpenStatus(unittest.TestCase):
+    def setUp(self):
+        case_state._open_by_status_id.clear()
+        self.addCleanup(case_state._open_by_status_id.clear)
+
+    def test_looks_up_each_status_once(self):
+        status_column = mock.Mock(__eq__=lambda self, status_id: StatusIdClause(status_id))
+        connection = CapturingConnection(
+            "mysql", status_names={1: "Open", 2: "In Progress", 3: "Closed", 4: "Cancelled"}
+        )
+        with mock.patch.object(case_state, "select", side_effect=lambda *args: StatementBuilder("select")), \
+                mock.patch.object(case_state, "CaseStatus", SimpleNamespace(id=status_column, name="name")):
+            answers = [case_state._is_open_status(connection, status_id) for status_id in (1, 2, 3, 4, 1, 3, 99)]
+
+        self.assertEqual(answers, [True, True, False, False, True, False, False])
+        self.assertEqual(len(connection.statements), 5)
+        self.assertEqual(case_state._open_by_status_id, {1: True, 2: True, 3: False, 4: False, 99: False})
@@ -0,0 +1,206 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import jsonschema
+import redis
+from botocore.exceptions import ClientError
+
+from app.bpm import schema_registry as registry_module
+from app.bpm.schema_registry import REDIS_KEY_PREFIX, SchemaStoreUnavailableError, StepSchemaRegistry
+
+PATH = "driver/step_1.json"
+REVALIDATE = 60
+
+
+def schema(required):
+    return json.dumps({"type": "object", "required": [required]})
+
+
+class FakeS3:
+    """Schema objects by key with per-call counters"""
+
+    def __init__(self):
+        self.objects = {}
+        self.heads = 0
+        self.downloads = 0
+        self.unreachable = False
+
+    def put(self, key, text, etag, last_modified="2025-03-01"):
+        self.objects[key] = (text, etag, last_modified)
+
+    def head_file(self, key):
+        self.heads += 1
+        if self.unreachable:
+            raise ClientError({"Error": {"Code": "503", "Message": "Slow Down"}}, "HeadObject")
+        if key not in self.objects:
+            return None
+        _, etag, last_modified = self.objects[key]
+        return {"etag": etag, "last_modified": last_modified}
+
+    def download_file(self, key):
+        self.downloads += 1
+        return self.objects[key][0].encode("utf-8")
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.values = {}
+        self.fail = fail
+
+    def get(self, key):
+        if self.fail:
+            raise redis.ConnectionError("down")
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.fail:
+            raise redis.ConnectionError("down")
+        self.values[key] = value
+
+
+class SchemaRegistryTestCase(unittest.TestCase):
+    redis_cache = False
+
+    def setUp(self):
+        self.now = 1000.0
+        self.s3 = FakeS3()
+        self.key = registry_module.settings.json_config + "/" + PATH
+        self.s3.put(self.key, schema("name"), '"v1"')
+        for patcher in (
+            mock.patch.object(registry_module, "s3_utils", self.s3),
+            mock.patch.object(registry_module, "time", SimpleNamespace(time=lambda: self.now)),
+            mock.patch.object(registry_module.settings, "bpm_schema_revalidate_seconds", REVALIDATE),
+            mock.patch.object(registry_module.settings, "bpm_schema_redis_cache", self.redis_cache),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def registry(self, shared=None):
+        registry = StepSchemaRegistry()
+        registry._redis = shared
+        return registry
+
+
+class TestSchemaRevalidation(SchemaRegistryTestCase):
+    def test_fresh_entry_is_served_without_s3(self):
+        registry = self.registry()
+        validator = registry.get_validator(PATH)
+
+        self.now += REVALIDATE - 1
+        self.assertIs(registry.get_validator(PATH), validator)
+        self.assertEqual((self.s3.heads, self.s3.downloads), (1, 1))
+
+    def test_unchanged_etag_keeps_the_compiled_validator(self):
+        registry = self.registry()
+        validator = registry.get_validator(PATH)
+
+        self.now += REVALIDATE
+        self.assertIs(registry.get_validator(PATH), validator)
+        self.assertEqual((self.s3.heads, self.s3.downloads), (2, 1))
+
+        # The successful HEAD restarts the interval
+        self.now += REVALIDATE - 1
+        registry.get_validator(PATH)
+        self.assertEqual(self.s3.heads, 2)
+
+    def test_changed_etag_recompiles(self):
+        registry = self.registry()
+        self.assertTrue(registry.validate(PATH, {"name": "x"}))
+
+        self.s3.put(self.key, schema("tlc_license"), '"v2"')
+        self.now += REVALIDATE
+
+        with self.assertRaises(jsonschema.ValidationError):
+            registry.validate(PATH, {"name": "x"})
+        self.assertTrue(registry.validate(PATH, {"tlc_license": "5001234"}))
+        self.assertEqual(self.s3.downloads, 2)
+
+    def test_changed_last_modified_recompiles(self):
+        registry = self.registry()
+        registry.get_validator(PATH)
+
+        self.s3.put(self.key, schema("tlc_license"), '"v1"', last_modified="2025-03-02")
+        self.now += REVALIDATE
+
+        with self.assertRaises(jsonschema.ValidationError):
+            registry.validate(PATH, {"name": "x"})
+
+    def test_missing_schema(self):
+        registry = self.registry()
+
+        self.assertIsNone(registry.get_validator("driver/missing.json"))
+        self.assertFalse(registry.validate("driver/missing.json", {}))
+        self.assertEqual(self.s3.downloads, 0)
+
+    def test_unreachable_s3_serves_the_stale_validator(self):
+        registry = self.registry()
+        validator = registry.get_validator(PATH)
+
+        self.s3.unreachable = True
+        self.now += REVALIDATE
+        self.assertIs(registry.get_validator(PATH), validator)
+
+        # The failure also waits out an interval before retrying
+        self.now += 1
+        registry.get_validator(PATH)
+        self.assertEqual(self.s3.heads, 2)
+
+    def test_unreachable_s3_without_a_compiled_copy(self):
+        self.s3.unreachable = True
+
+        with self.assertRaises(SchemaStoreUnavailableError):
+            self.registry().get_validator(PATH)
+
+    def test_invalidate(self):
+        registry = self.registry()
+        registry.get_validator(PATH)
+
+        registry.invalidate(PATH)
+        registry.get_validator(PATH)
+
+        self.assertEqual(self.s3.downloads, 2)
+
+
+class TestSharedSchemaCache(SchemaRegistryTestCase):
+    redis_cache = True
+
+    def test_second_worker_uses_the_shared_copy(self):
+        shared = FakeRedis()
+        self.registry(shared).get_validator(PATH)
+
+        other = self.registry(shared)
+        self.now += 5
+        self.assertTrue(other.validate(PATH, {"name": "x"}))
+        self.assertEqual((self.s3.heads, self.s3.downloads), (1, 1))
+        self.assertEqual(json.loads(shared.values[REDIS_KEY_PREFIX + PATH])["etag"], '"v1"')
+
+    def test_stale_shared_copy_is_revalidated_without_download(self):
+        shared = FakeRedis()
+        self.registry(shared).get_validator(PATH)
+
+        self.now += REVALIDATE
+        self.registry(shared).get_validator(PATH)
+
+        self.assertEqual((self.s3.heads, self.s3.downloads), (2, 1))
+        self.assertEqual(json.loads(shared.values[REDIS_KEY_PREFIX + PATH])["checked_at"], self.now)
+
+    def test_worker_picks_up_a_schema_changed_by_another(self):
+        shared = FakeRedis()
+        first, second = self.registry(shared), self.registry(shared)
+        first.get_validator(PATH)
+        second.get_validator(PATH)
+
+        self.s3.put(self.key, schema("tlc_license"), '"v2"')
+        self.now += REVALIDATE
+        first.get_validator(PATH)
+        self.assertTrue(second.validate(PATH, {"tlc_license": "5001234"}))
+
+        self.assertEqual((self.s3.heads, self.s3.downloads), (2, 2))
+
+    def test_redis_failures_fall_back_to_s3(self):
+        registry = self.registry(FakeRedis(fail=True))
+
+        self.assertTrue(registry.validate(PATH, {"name": "x"}))
+        self.assertEqual((self.s3.heads, self.s3.downloads), (1, 1))
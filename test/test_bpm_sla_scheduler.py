@@ -0,0 +1,292 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BooleanClauseList, Tuple
+
+from app.bpm import services as bpm_services
+from app.bpm.models import SLA, Case
+from app.bpm.services import BPMService, CaseReassignService
+from app.bpm.sla import scheduler
+from app.bpm.sla.scheduler import compute_due_at, escalate_due_cases, schedule_case_sla
+
+NOW = datetime(2025, 3, 3, 12, 0, tzinfo=timezone.utc)
+
+
+class CaseRow(SimpleNamespace):
+    """Case rows as plain namespaces; class attributes are the cases columns for statements"""
+    locals().update({column.key: column for column in Case.__table__.c})
+    sla = "Case.sla"
+
+    def __init__(self, **fields):
+        super().__init__(**{**dict.fromkeys(Case.__table__.c.keys() + ["sla"]), **fields})
+
+    @classmethod
+    def __clause_element__(cls):
+        return Case.__table__
+
+
+class SLARow(SimpleNamespace):
+    locals().update({column.key: column for column in SLA.__table__.c})
+
+
+def sla(sla_id, config_id, level, time_limit=60, user_id=None, role_id=None, is_active=True):
+    return SLARow(
+        id=sla_id, case_step_config_id=config_id, escalation_level=level, time_limit=time_limit,
+        user_id=user_id, role_id=role_id, is_active=is_active,
+    )
+
+
+def matches(criterion, row):
+    """Evaluate the where clauses the scheduler builds against a row"""
+    if isinstance(criterion, BooleanClauseList):
+        return all(matches(clause, row) for clause in criterion.clauses)
+    if isinstance(criterion.left, Tuple):
+        value = tuple(getattr(row, column.key) for column in criterion.left.clauses)
+    else:
+        value = getattr(row, criterion.left.key, None)
+    if criterion.operator is operators.in_op:
+        return value in criterion.right.value
+    if criterion.operator is operators.eq:
+        return value == criterion.right.value
+    if criterion.operator is operators.is_not:
+        return value is not None
+    if criterion.operator is operators.is_:
+        return value is True
+    raise AssertionError(f"Unexpected criterion {criterion}")
+
+
+class FakeQuery:
+    def __init__(self, session, entity):
+        self.session = session
+        self.entity = entity
+        self.options_used = []
+        self.row_limit = None
+        self.locked = None
+
+    def options(self, *options):
+        self.options_used.extend(options)
+        return self
+
+    def filter(self, *criteria):
+        self.criteria = criteria
+        return self
+
+    def order_by(self, *_):
+        return self
+
+    def limit(self, row_limit):
+        self.row_limit = row_limit
+        return self
+
+    def with_for_update(self, **kwargs):
+        self.locked = kwargs
+        return self
+
+    def all(self):
+        self.session.queries.append(self)
+        if self.entity is SLARow:
+            return [row for row in self.session.slas if all(matches(c, row) for c in self.criteria)]
+        due = sorted(
+            (row for row in self.session.cases if row.sla_due_at is not None and row.sla_due_at <= self.session.now),
+            key=lambda row: row.sla_due_at,
+        )
+        return due[:self.row_limit]
+
+
+class FakeSession:
+    """Case history rows and SLAs, with the statements the scheduler and services issue"""
+
+    def __init__(self, cases=(), slas=(), now=NOW):
+        self.cases = []
+        for row in cases:
+            self.add(row)
+        self.slas = list(slas)
+        self.now = now
+        self.queries = []
+        self.commits = 0
+
+    def query(self, entity):
+        return FakeQuery(self, entity)
+
+    def execute(self, statement):
+        values = {column.key if hasattr(column, "key") else column: bind.value
+                  for column, bind in statement._values.items()}
+        for row in self.cases:
+            if matches(statement.whereclause, row):
+                for key, value in values.items():
+                    setattr(row, key, value)
+
+    def add(self, row):
+        row.id = len(self.cases) + 1
+        self.cases.append(row)
+
+    def add_all(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def commit(self):
+        self.commits += 1
+
+    def flush(self):
+        pass
+
+    def refresh(self, _row):
+        pass
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(scheduler, "Case", CaseRow),
+            mock.patch.object(scheduler, "SLA", SLARow),
+            mock.patch.object(bpm_services, "Case", CaseRow),
+            mock.patch.object(scheduler, "selectinload", side_effect=lambda attribute: ("selectinload", attribute)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def case_row(case_no="DRVLEA000001", config_id=10, current_sla=None, due_at=None, user_id=5, role_id=2):
+        return CaseRow(
+            case_no=case_no, case_type_id=1, case_status_id=2, case_step_config_id=config_id,
+            user_id=user_id, role_id=role_id, sla=current_sla, sla_due_at=due_at,
+        )
+
+
+class TestScheduleCaseSLA(SchedulerTestCase):
+    def test_compute_due_at(self):
+        self.assertEqual(compute_due_at(sla(1, 10, 1, time_limit=90), NOW), NOW + timedelta(minutes=90))
+        self.assertIsNone(compute_due_at(None, NOW))
+        self.assertIsNone(compute_due_at(sla(1, 10, 1, is_active=False), NOW))
+        self.assertIsNone(compute_due_at(sla(1, 10, 1, time_limit=0), NOW))
+
+    def test_entering_a_step_queues_it_and_dequeues_earlier_rows(self):
+        earlier = self.case_row(due_at=NOW + timedelta(minutes=5))
+        other_case = self.case_row(case_no="DRVLEA000002", due_at=NOW + timedelta(minutes=5))
+        db = FakeSession([earlier, other_case])
+        entered = self.case_row(config_id=11)
+        level_one = sla(3, 11, 1, time_limit=120)
+
+        schedule_case_sla(db, entered, level_one, entered_at=NOW)
+
+        self.assertIsNone(earlier.sla_due_at)
+        self.assertEqual(other_case.sla_due_at, NOW + timedelta(minutes=5))
+        self.assertIs(entered.sla, level_one)
+        self.assertEqual(entered.sla_due_at, NOW + timedelta(minutes=120))
+
+
+class TestDequeueOnCaseChanges(SchedulerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = BPMService()
+        self.current = self.case_row(current_sla=sla(1, 10, 1), due_at=NOW + timedelta(minutes=30))
+        self.db = FakeSession([self.current])
+
+    def test_move_to_step_queues_the_new_step(self):
+        step_config = SimpleNamespace(id=11, next_assignee_id=None, roles=[SimpleNamespace(id=4)])
+        next_sla = sla(2, 11, 1, time_limit=240)
+
+        with mock.patch.object(BPMService, "get_cases", return_value=self.current), \
+                mock.patch.object(BPMService, "get_case_step_config", return_value=step_config), \
+                mock.patch.object(BPMService, "get_sla", return_value=next_sla):
+            moved = self.service.move_task_to_step(self.db, self.current.case_no, "S11")["case"]
+
+        self.assertIsNone(self.current.sla_due_at)
+        self.assertIs(moved.sla, next_sla)
+        self.assertIsNotNone(moved.sla_due_at)
+        self.assertEqual([row.case_no for row in self.db.cases if row.sla_due_at], [self.current.case_no])
+
+    def test_close_stops_the_clock(self):
+        self.current.case_status = SimpleNamespace(name="In Progress")
+
+        with mock.patch.object(BPMService, "get_case_status", return_value=SimpleNamespace(id=3)), \
+                mock.patch.object(BPMService, "get_cases", return_value=self.current):
+            closed = self.service.mark_case_as_closed(self.db, self.current.case_no)
+
+        self.assertEqual(closed.case_status_id, 3)
+        self.assertEqual([row.sla_due_at for row in self.db.cases], [None, None])
+
+    def test_reassign_carries_the_running_deadline_over(self):
+        due_at = self.current.sla_due_at
+
+        with mock.patch.object(CaseReassignService, "get_latest_case", return_value=self.current), \
+                mock.patch.object(CaseReassignService, "update_case_reassignments_user"):
+            CaseReassignService.assign_user_to_case(self.db, SimpleNamespace(id=1), self.current.case_no, 2, 9)
+
+        previous, reassigned = self.db.cases
+        self.assertIsNone(previous.sla_due_at)
+        self.assertEqual((reassigned.user_id, reassigned.sla_due_at), (9, due_at))
+        self.assertIs(reassigned.sla, previous.sla)
+
+
+class TestEscalateDueCases(SchedulerTestCase):
+    def test_due_case_moves_to_the_next_level(self):
+        level_one, level_two = sla(1, 10, 1), sla(2, 10, 2, time_limit=30, user_id=None, role_id=7)
+        due = self.case_row(current_sla=level_one, due_at=NOW - timedelta(minutes=1))
+        db = FakeSession([due], [level_one, level_two, sla(3, 11, 2)])
+
+        self.assertEqual(escalate_due_cases(db, now=NOW), {"escalated": 1, "breached": 0})
+
+        _, escalated = db.cases
+        self.assertIsNone(due.sla_due_at)
+        self.assertIs(escalated.sla, level_two)
+        self.assertEqual(escalated.sla_due_at, NOW + timedelta(minutes=30))
+        self.assertEqual((escalated.user_id, escalated.role_id), (5, 7))
+        self.assertEqual((escalated.case_no, escalated.case_step_config_id), (due.case_no, 10))
+
+    def test_due_cases_are_loaded_with_their_sla(self):
+        db = FakeSession([self.case_row(current_sla=sla(1, 10, 1), due_at=NOW)])
+
+        escalate_due_cases(db, now=NOW)
+
+        case_query, sla_query = db.queries[:2]
+        self.assertEqual(case_query.options_used, [("selectinload", CaseRow.sla)])
+        self.assertEqual(case_query.locked, {"skip_locked": True})
+        self.assertIs(sla_query.entity, SLARow)
+
+    def test_next_levels_are_looked_up_once_per_batch(self):
+        slas = [sla(1, 10, 1), sla(2, 10, 2), sla(3, 11, 1), sla(4, 11, 2, is_active=False), sla(5, 12, 1)]
+        cases = [
+            self.case_row("DRVLEA000001", 10, slas[0], NOW - timedelta(minutes=3)),
+            self.case_row("DRVLEA000002", 11, slas[2], NOW - timedelta(minutes=2)),
+            self.case_row("DRVLEA000003", 12, None, NOW - timedelta(minutes=1)),
+        ]
+        db = FakeSession(cases, slas)
+
+        result = escalate_due_cases(db, now=NOW)
+
+        # Level 2 of config 11 is inactive; a case without SLA goes to level 1
+        self.assertEqual(result, {"escalated": 2, "breached": 1})
+        self.assertEqual(len([q for q in db.queries if q.entity is SLARow]), 1)
+        self.assertEqual({row.case_no: row.sla.id for row in db.cases[3:]}, {"DRVLEA000001": 2, "DRVLEA000003": 5})
+
+    def test_final_level_is_breached_and_dequeued(self):
+        last = sla(2, 10, 2)
+        due = self.case_row(current_sla=last, due_at=NOW - timedelta(hours=1))
+        db = FakeSession([due], [sla(1, 10, 1), last])
+
+        with mock.patch.object(scheduler, "logger") as logger:
+            self.assertEqual(escalate_due_cases(db, now=NOW), {"escalated": 0, "breached": 1})
+
+        self.assertEqual(db.cases, [due])
+        self.assertIsNone(due.sla_due_at)
+        logger.warning.assert_called_once_with(
+            "SLA breached at final escalation level", case_no=due.case_no, escalation_level=2,
+        )
+        # Nothing is left to escalate on the next run
+        self.assertEqual(escalate_due_cases(db, now=NOW + timedelta(days=1)), {"escalated": 0, "breached": 0})
+
+    def test_batches_commit_separately_and_skip_cases_not_due(self):
+        slas = [sla(1, 10, 1), sla(2, 10, 2, time_limit=600)]
+        due = [self.case_row(f"DRVLEA00000{n}", 10, slas[0], NOW - timedelta(minutes=n)) for n in range(1, 6)]
+        pending = self.case_row("DRVLEA000009", 10, slas[0], NOW + timedelta(minutes=1))
+        db = FakeSession(due + [pending], slas)
+
+        self.assertEqual(escalate_due_cases(db, now=NOW, batch_size=2), {"escalated": 5, "breached": 0})
+
+        self.assertEqual(db.commits, 3)
+        self.assertEqual(pending.sla_due_at, NOW + timedelta(minutes=1))
+        self.assertTrue(all(row.sla_due_at is None for row in due))
@@ -0,0 +1,318 @@
+import unittest
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app.bpm import services as bpm_services
+from app.bpm import step_graph
+from app.bpm.services import BPMService
+from app.bpm.models import CaseStep, CaseStepConfig, CaseTypeFirstStep, case_step_config_role_table
+from app.bpm.step_graph import CaseStepGraph, StepAccessContext, StepGraphCache, StepNode
+from app.core.db import Base
+from app.users.models import Role
+
+ROLE_NAMES = {1: "Clerk", 2: "Manager", 3: "Auditor"}
+
+
+def node(step_id, next_step_id=None, step_name="Intake", role_ids=(), assignee=None):
+    return StepNode(
+        config_id=int(step_id),
+        step_name=step_name,
+        config_step_name=f"Sub {step_id}",
+        step_id=step_id,
+        next_step_id=next_step_id,
+        order=int(step_id),
+        current_assignee_id=assignee,
+        role_ids=frozenset(str(r) for r in role_ids),
+    )
+
+
+def graph(nodes, first_step_id="100"):
+    return CaseStepGraph(
+        case_type="TST",
+        first_step_id=first_step_id,
+        nodes={n.step_id: n for n in nodes},
+        ordered=list(nodes),
+        role_names=dict(ROLE_NAMES),
+    )
+
+
+def user(user_id, *role_ids):
+    return SimpleNamespace(
+        id=user_id,
+        first_name=f"First{user_id}",
+        middle_name=None,
+        last_name=f"Last{user_id}",
+        name=f"First{user_id} Last{user_id}",
+        roles=[SimpleNamespace(id=r) for r in role_ids],
+    )
+
+
+def reassignment(step_id, user_id=None, role_id=None, original_user_id=None, original_roles=(), creator=None):
+    return SimpleNamespace(
+        step_id=step_id,
+        user_id=user_id,
+        role_id=role_id,
+        user_id_at_assignment=original_user_id,
+        roles_at_assignment=[SimpleNamespace(id=r, name=ROLE_NAMES[r]) for r in original_roles],
+        created_on=datetime(2025, 3, 1, 9, 0),
+        creator=creator,
+    )
+
+
+def summary(u):
+    return {"id": u.id, "first_name": u.first_name, "middle_name": u.middle_name, "last_name": u.last_name}
+
+
+class TestCaseStepGraph(unittest.TestCase):
+    def test_walk_follows_next_step_id(self):
+        steps = graph([node("300"), node("100", "200"), node("200", "300")])
+
+        self.assertEqual([n.step_id for n in steps.walk()], ["100", "200", "300"])
+
+    def test_walk_stops_at_unconfigured_step(self):
+        steps = graph([node("100", "200"), node("200", "999")])
+
+        self.assertEqual([n.step_id for n in steps.walk()], ["100", "200"])
+
+    def test_walk_rejects_cycles(self):
+        steps = graph([node("100", "200"), node("200", "100")])
+
+        with self.assertRaises(ValueError):
+            steps.walk()
+
+    def test_walk_without_first_step_is_empty(self):
+        self.assertEqual(graph([node("100")], first_step_id=None).walk(), [])
+
+
+class TestStepAccessContext(unittest.TestCase):
+    def test_roles_of_orders_by_id_and_drops_unknown(self):
+        context = StepAccessContext(graph=graph([]), reassignments={}, users={}, role_names=dict(ROLE_NAMES))
+
+        self.assertEqual(
+            context.roles_of(["3", 1, "1", "42"]),
+            [{"id": 1, "name": "Clerk"}, {"id": 3, "name": "Auditor"}],
+        )
+
+
+class TestCheckAccess(unittest.TestCase):
+    """Each branch of the per-step query version, now answered from the access context"""
+
+    def setUp(self):
+        self.service = BPMService()
+        self.clerk = user(10, 1)
+        self.assignee = user(20, 2)
+        self.steps = graph([
+            node("100", "200", role_ids=[1, 3]),
+            node("200", "300", role_ids=[2], assignee=20),
+            node("300", None, role_ids=[]),
+        ])
+
+    def check(self, step_id, reassignments=(), logged_in=None):
+        logged_in = logged_in or self.clerk
+        context = StepAccessContext(
+            graph=self.steps,
+            reassignments={r.step_id: r for r in reassignments},
+            users={10: self.clerk, 20: self.assignee},
+            role_names=dict(ROLE_NAMES),
+        )
+        role_ids = {str(role.id) for role in logged_in.roles}
+        return self.service.check_access(context, step_id, logged_in, role_ids)
+
+    def test_reassigned_to_user(self):
+        moved = [reassignment("100", user_id=20, role_id=2)]
+
+        self.assertEqual(self.check("100", moved), (False, summary(self.assignee), [{"id": 2, "name": "Manager"}]))
+        self.assertTrue(self.check("100", moved, logged_in=self.assignee)[0])
+
+    def test_reassigned_to_unknown_user(self):
+        moved = [reassignment("100", user_id=99)]
+
+        self.assertEqual(
+            self.check("100", moved),
+            (False, {"id": None, "first_name": None, "middle_name": None, "last_name": None}, []),
+        )
+
+    def test_reassigned_to_role(self):
+        self.assertEqual(self.check("100", [reassignment("100", role_id=1)]), (True, None, [{"id": 1, "name": "Clerk"}]))
+        self.assertEqual(self.check("100", [reassignment("100", role_id=2)]), (False, None, [{"id": 2, "name": "Manager"}]))
+
+    def test_empty_reassignment_denies(self):
+        self.assertEqual(self.check("100", [reassignment("100")]), (False, None, []))
+
+    def test_configured_assignee(self):
+        expected_roles = [{"id": 2, "name": "Manager"}]
+
+        self.assertEqual(self.check("200"), (False, summary(self.assignee), expected_roles))
+        self.assertEqual(self.check("200", logged_in=self.assignee), (True, summary(self.assignee), expected_roles))
+
+    def test_configured_roles(self):
+        self.assertEqual(
+            self.check("100"),
+            (True, None, [{"id": 1, "name": "Clerk"}, {"id": 3, "name": "Auditor"}]),
+        )
+        self.assertEqual(self.check("300"), (False, None, []))
+
+    def test_unknown_step(self):
+        self.assertEqual(self.check("999"), (False, None, []))
+
+    def test_original_assignee_info(self):
+        creator = SimpleNamespace(name="Supervisor")
+        context = StepAccessContext(
+            graph=self.steps,
+            reassignments={"100": reassignment("100", user_id=20, original_user_id=10, original_roles=[1], creator=creator)},
+            users={10: self.clerk, 20: self.assignee},
+            role_names=dict(ROLE_NAMES),
+        )
+
+        info = self.service.get_original_assignee_info(context, "100")
+
+        self.assertTrue(info["has_reassignment"])
+        self.assertEqual(info["original_user"], dict(summary(self.clerk), name=self.clerk.name))
+        self.assertEqual(info["original_roles"], [{"id": 1, "name": "Clerk"}])
+        self.assertEqual(info["assigned_by_user"], "Supervisor")
+        self.assertEqual(
+            self.service.get_original_assignee_info(context, "200"),
+            {"original_user": None, "original_roles": [], "has_reassignment": False},
+        )
+
+
+class TestCaseStepInformation(unittest.TestCase):
+    def setUp(self):
+        self.service = BPMService()
+        self.clerk = user(10, 1)
+
+    def step_information(self, steps, reassignments=()):
+        context = StepAccessContext(
+            graph=steps, reassignments={r.step_id: r for r in reassignments}, users={10: self.clerk},
+            role_names=dict(ROLE_NAMES),
+        )
+        with mock.patch.object(bpm_services.step_graph_cache, "get", return_value=steps), \
+                mock.patch.object(bpm_services, "load_step_access_context", return_value=context) as load:
+            result = self.service.get_case_step_information(None, "TST", self.clerk, SimpleNamespace(case_no="TST000001"))
+        return result, load
+
+    def test_walk_groups_sub_steps_and_reports_next_assignee(self):
+        steps = graph([
+            node("100", "200", step_name="Intake", role_ids=[1]),
+            node("200", "300", step_name="Intake", role_ids=[2]),
+            node("300", None, step_name="Review", role_ids=[1]),
+        ])
+
+        result, load = self.step_information(steps)
+
+        self.assertEqual(list(result), ["Intake", "Review"])
+        intake = result["Intake"]["sub_steps"]
+        self.assertEqual([s["step_id"] for s in intake], ["100", "200"])
+        self.assertEqual([s["has_access"] for s in intake], [True, False])
+        self.assertEqual(intake[0]["next_assignee_role"], [{"id": 2, "name": "Manager"}])
+        self.assertNotIn("next_assignee_user", result["Review"]["sub_steps"][0])
+        self.assertEqual(sorted(load.call_args.args[3]), ["100", "200", "300"])
+
+    def test_without_first_step_lists_accessible_steps_in_order(self):
+        steps = graph([
+            node("100", step_name="Intake", role_ids=[1]),
+            node("200", step_name="Intake", role_ids=[2]),
+            node("300", step_name="Review", role_ids=[1, 2]),
+        ], first_step_id=None)
+
+        result, load = self.step_information(steps)
+
+        self.assertEqual(
+            {name: [s["step_id"] for s in group["sub_steps"]] for name, group in result.items()},
+            {"Intake": ["100"], "Review": ["300"]},
+        )
+        load.assert_not_called()
+
+
+class TestStepGraphCache(unittest.TestCase):
+    def test_recompiles_only_when_signature_changes(self):
+        cache = StepGraphCache()
+        signature = [(3, None, 4, 81, 1, None, None, None)]
+        with mock.patch.object(StepGraphCache, "_signature", side_effect=lambda db: signature[0]), \
+                mock.patch.object(step_graph, "compile_step_graph", side_effect=lambda db, case_type: graph([])) as compile_graph:
+            first = cache.get(None, "TST")
+            self.assertIs(cache.get(None, "TST"), first)
+            self.assertEqual(compile_graph.call_count, 1)
+
+            signature[0] = (3, None, 4, 82, 1, None, None, None)
+            self.assertIsNot(cache.get(None, "TST"), first)
+            self.assertEqual(compile_graph.call_count, 2)
+
+            cache.get(None, "OTH")
+            cache.invalidate("TST")
+            cache.get(None, "TST")
+            cache.get(None, "OTH")
+            self.assertEqual(compile_graph.call_count, 4)
+
+            cache.invalidate()
+            cache.get(None, "OTH")
+            self.assertEqual(compile_graph.call_count, 5)
+
+
+class TestStepGraphSignature(unittest.TestCase):
+    """The signature query against SQLite, with MySQL's CRC32 and CONCAT registered"""
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+        @event.listens_for(self.engine, "connect")
+        def register_mysql_functions(dbapi_connection, _record):
+            dbapi_connection.create_function("crc32", 1, lambda value: zlib.crc32(str(value).encode()))
+            dbapi_connection.create_function("concat", -1, lambda *values: "".join(str(v) for v in values))
+
+        tables = [
+            Role.__table__, CaseStep.__table__, CaseStepConfig.__table__,
+            case_step_config_role_table, CaseTypeFirstStep.__table__,
+        ]
+        Base.metadata.create_all(self.engine, tables=tables)
+        self.addCleanup(self.engine.dispose)
+
+        self.db = Session(self.engine)
+        self.addCleanup(self.db.close)
+        self.execute(Role.__table__.insert(), [{"id": r, "name": name} for r, name in ROLE_NAMES.items()])
+        self.execute(CaseStep.__table__.insert(), [{"id": 1, "name": "Intake", "case_type_id": 1, "weight": 1}])
+        self.execute(CaseStepConfig.__table__.insert(), [
+            {"id": 100, "step_id": "100", "step_name": "Sub 100", "case_step_id": 1, "case_type_id": 1},
+            {"id": 200, "step_id": "200", "step_name": "Sub 200", "case_step_id": 1, "case_type_id": 1},
+        ])
+        self.execute(case_step_config_role_table.insert(), [
+            {"case_step_config_id": 100, "role_id": 1}, {"case_step_config_id": 200, "role_id": 2},
+        ])
+
+    def execute(self, statement, *params):
+        self.db.execute(statement, *params)
+        self.db.commit()
+
+    def signature(self):
+        return StepGraphCache._signature(self.db)
+
+    def test_role_swap_with_the_same_count_changes_the_signature(self):
+        before = self.signature()
+
+        links = case_step_config_role_table.c
+        self.execute(
+            case_step_config_role_table.update()
+            .where(links.case_step_config_id == 100, links.role_id == 1)
+            .values(role_id=3)
+        )
+
+        after = self.signature()
+        self.assertEqual(after[2], before[2])
+        self.assertNotEqual(after, before)
+
+    def test_unchanged_tables_keep_the_signature(self):
+        self.assertEqual(self.signature(), self.signature())
+
+    def test_step_and_role_updates_change_the_signature(self):
+        for table, row_id in ((CaseStep.__table__, 1), (Role.__table__, 2)):
+            with self.subTest(table=table.name):
+                before = self.signature()
+
+                self.execute(table.update().where(table.c.id == row_id).values(updated_on=datetime(2030, 1, row_id)))
+
+                self.assertNotEqual(self.signature(), before)
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.bpm import step_hydration
+from app.bpm.step_hydration import hydrate_case_steps, hydrate_case_steps_sync, server_timing_header
+
+CASE_NO = "DRVLEA000123"
+
+
+class FakeDB:
+    """Entities written by earlier fetches, and the counts of case rows opened by them"""
+
+    def __init__(self, open_counts):
+        self.entities = {}
+        self.open_counts = dict(open_counts)
+        self.events = []
+
+
+def make_registry(step_ids):
+    """-fetch functions that write on first use and read what earlier steps wrote"""
+    def fetch_for(step_id):
+        def fetch(db, case_no, case_params):
+            db.events.append(("fetch", step_id, threading.get_ident()))
+            db.entities.setdefault(case_no, step_id)
+            if step_id.endswith("1"):
+                db.open_counts[int(step_id[:-1])] = db.open_counts.get(int(step_id[:-1]), 0) + 1
+            return {"step": step_id, "entity": db.entities[case_no], "params": case_params}
+        return fetch
+
+    return {f"{step_id}-fetch": {"function": fetch_for(step_id)} for step_id in step_ids}
+
+
+def grouped(step_layout):
+    return {
+        name: {"step_name": name, "sub_steps": [{"step_id": step_id} for step_id in step_ids]}
+        for name, step_ids in step_layout.items()
+    }
+
+
+def per_sub_step_hydration(db, case_obj, grouped_steps, case_params, registry, configs):
+    """The loop hydrate_case_steps replaced: fetch, config lookup and history query per sub-step"""
+    for step_info in grouped_steps.values():
+        for sub_step in step_info["sub_steps"]:
+            case_step_data = registry[f"{sub_step['step_id']}-fetch"]["function"](db, case_obj.case_no, case_params)
+            config = configs[sub_step["step_id"]]
+            sub_step["step_data"] = case_step_data
+            sub_step["is_current_step"] = case_obj.case_step_config_id == config.id
+            sub_step["has_already_been_used"] = db.open_counts.get(config.id, 0) > 0
+
+
+class HydrationTestCase(unittest.TestCase):
+    def run_hydration(self, db, case_obj, grouped_steps, registry, configs, case_params=None):
+        def count_open(db_arg, case_no):
+            db.events.append(("count", case_no, threading.get_ident()))
+            return dict(db_arg.open_counts)
+
+        with mock.patch.dict(step_hydration.STEP_REGISTRY, registry), \
+                mock.patch.object(step_hydration, "load_step_configs",
+                                  side_effect=lambda db_arg, step_ids: {s: configs[s] for s in step_ids}) as load, \
+                mock.patch.object(step_hydration, "count_open_case_steps", side_effect=count_open):
+            timings = hydrate_case_steps_sync(db, case_obj, grouped_steps, case_params or {})
+        return timings, load
+
+
+class TestHydrateCaseSteps(HydrationTestCase):
+    def test_matches_per_sub_step_hydration(self):
+        rng = random.Random(12)
+        for case in range(40):
+            step_ids = [f"{n}{rng.randrange(2)}" for n in rng.sample(range(100, 140), rng.randrange(1, 8))]
+            layout = {f"group-{g}": rng.sample(step_ids, rng.randrange(1, len(step_ids) + 1)) for g in range(rng.randrange(1, 4))}
+            configs = {step_id: SimpleNamespace(id=int(step_id[:-1])) for step_id in step_ids}
+            open_counts = {config.id: rng.randrange(2) for config in configs.values()}
+            registry = make_registry(step_ids)
+            case_obj = SimpleNamespace(case_no=CASE_NO, case_step_config_id=rng.choice(list(configs.values())).id)
+
+            expected = grouped(layout)
+            per_sub_step_hydration(FakeDB(open_counts), case_obj, expected, {"x": "1"}, registry, configs)
+
+            with self.subTest(case=case):
+                actual = grouped(layout)
+                self.run_hydration(FakeDB(open_counts), case_obj, actual, registry, configs, {"x": "1"})
+
+                self.assertEqual(actual, expected)
+
+    def test_fetches_run_in_step_order_on_the_request_session_before_the_count(self):
+        step_ids = ["1000", "1011", "1020"]
+        db = FakeDB({})
+        case_obj = SimpleNamespace(case_no=CASE_NO, case_step_config_id=102)
+        steps = grouped({"first": ["1000", "1011"], "second": ["1020", "1000"]})
+
+        timings, load = self.run_hydration(
+            db, case_obj, steps, make_registry(step_ids), {s: SimpleNamespace(id=int(s[:-1])) for s in step_ids},
+        )
+
+        self.assertEqual([event[:2] for event in db.events], [
+            ("fetch", "1000"), ("fetch", "1011"), ("fetch", "1020"), ("count", CASE_NO),
+        ])
+        self.assertEqual({event[2] for event in db.events}, {threading.get_ident()})
+        load.assert_called_once_with(db, step_ids)
+        self.assertEqual(list(timings), step_ids)
+
+        first, second = steps["first"]["sub_steps"], steps["second"]["sub_steps"]
+        # Later steps see the entity the first fetch created
+        self.assertEqual({s["step_data"]["entity"] for s in first + second}, {"1000"})
+        # 1011 opened a case row for config 101 during its fetch
+        self.assertTrue(first[1]["has_already_been_used"])
+        self.assertEqual([s["is_current_step"] for s in second], [True, False])
+
+    def test_step_without_config(self):
+        db = FakeDB({})
+        steps = grouped({"only": ["1000"]})
+
+        with mock.patch.dict(step_hydration.STEP_REGISTRY, make_registry(["1000"])), \
+                mock.patch.object(step_hydration, "load_step_configs", return_value={}), \
+                mock.patch.object(step_hydration, "count_open_case_steps", return_value={}):
+            hydrate_case_steps_sync(db, SimpleNamespace(case_no=CASE_NO, case_step_config_id=None), steps, {})
+
+        (sub_step,) = steps["only"]["sub_steps"]
+        self.assertEqual((sub_step["is_current_step"], sub_step["has_already_been_used"]), (False, False))
+
+    def test_async_wrapper_runs_once_off_the_event_loop(self):
+        db = FakeDB({})
+        steps = grouped({"only": ["1000"]})
+
+        async def hydrate():
+            with mock.patch.dict(step_hydration.STEP_REGISTRY, make_registry(["1000"])), \
+                    mock.patch.object(step_hydration, "load_step_configs", return_value={}), \
+                    mock.patch.object(step_hydration, "count_open_case_steps", return_value={}):
+                return await hydrate_case_steps(db, SimpleNamespace(case_no=CASE_NO, case_step_config_id=1), steps, {})
+
+        timings = asyncio.run(hydrate())
+
+        self.assertEqual(list(timings), ["1000"])
+        self.assertNotEqual(db.events[0][2], threading.get_ident())
+
+
+class TestServerTimingHeader(unittest.TestCase):
+    def test_header(self):
+        self.assertEqual(server_timing_header({"101": 3.14159, "102": 12}), "step-101;dur=3.1, step-102;dur=12.0")
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app.core import concurrency
+from app.core.concurrency import EventLoopBlockMiddleware, EventLoopBlockMonitor, run_sync
+
+
+class TestRunSync(unittest.TestCase):
+    def test_runs_on_a_worker_thread_with_arguments(self):
+        async def call():
+            return await run_sync(lambda a, b=0: (threading.get_ident(), a + b), 1, b=2)
+
+        thread_id, result = asyncio.run(call())
+
+        self.assertEqual(result, 3)
+        self.assertNotEqual(thread_id, threading.get_ident())
+
+    def test_exceptions_propagate(self):
+        def fail():
+            raise LookupError("no case")
+
+        with self.assertRaisesRegex(LookupError, "no case"):
+            asyncio.run(run_sync(fail))
+
+    def test_loop_keeps_running_while_the_call_blocks(self):
+        async def call():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(ticker())
+            await run_sync(time.sleep, 0.2)
+            task.cancel()
+            return ticks
+
+        self.assertGreater(len(asyncio.run(call())), 5)
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+class TestEventLoopBlockMonitor(unittest.TestCase):
+    def monitor(self, body):
+        monitor = EventLoopBlockMonitor(threshold_ms=100, interval_ms=20)
+
+        async def run():
+            await monitor.start()
+            try:
+                await body()
+                # Let the ticker wake up late and report
+                await asyncio.sleep(0.1)
+            finally:
+                await monitor.stop()
+
+        with mock.patch.object(concurrency, "logger") as logger:
+            asyncio.run(run())
+        return monitor, logger
+
+    def test_block_is_reported_with_route_and_stack(self):
+        async def request():
+            blocking_handler()
+
+        async def body():
+            await asyncio.create_task(request(), name="GET /case/{case_no}")
+
+        monitor, logger = self.monitor(body)
+
+        self.assertEqual(list(monitor.stats), ["GET /case/{case_no}"])
+        self.assertEqual(monitor.stats["GET /case/{case_no}"]["count"], 1)
+        self.assertGreaterEqual(monitor.stats["GET /case/{case_no}"]["max_ms"], 150)
+        (warning,) = logger.warning.call_args_list
+        self.assertEqual(warning.kwargs["route"], "GET /case/{case_no}")
+        self.assertIn("blocking_handler", warning.kwargs["stack"])
+
+    def test_awaiting_is_not_a_block(self):
+        async def body():
+            await asyncio.sleep(0.3)
+            await run_sync(time.sleep, 0.3)
+
+        monitor, logger = self.monitor(body)
+
+        self.assertEqual(monitor.stats, {})
+        logger.warning.assert_not_called()
+
+    def test_stop_ends_the_watchdog(self):
+        monitor, _ = self.monitor(lambda: asyncio.sleep(0))
+
+        monitor._watchdog.join(timeout=1)
+        self.assertFalse(monitor._watchdog.is_alive())
+        self.assertTrue(monitor._ticker.cancelled())
+
+
+class TestEventLoopBlockMiddleware(unittest.TestCase):
+    def call(self, scope):
+        names = []
+
+        async def app(scope, receive, send):
+            names.append(asyncio.current_task().get_name())
+
+        async def request():
+            task = asyncio.current_task()
+            task.set_name("worker")
+            await EventLoopBlockMiddleware(app)(scope, None, None)
+            names.append(task.get_name())
+
+        asyncio.run(request())
+        return names
+
+    def test_names_the_request_task_and_restores_it(self):
+        self.assertEqual(self.call({"type": "http", "method": "GET", "path": "/case/1"}), ["GET /case/1", "worker"])
+
+    def test_other_scopes_pass_through(self):
+        self.assertEqual(self.call({"type": "lifespan"}), ["worker", "worker"])
@@ -0,0 +1,157 @@
+import asyncio
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from app.curb import fetcher
+from app.curb.fetcher import CURBFetchOrchestrator, CURBFetchShard, build_fetch_shards
+from app.curb.repository import CURBRepository
+from app.curb.services import CURBService
+
+MARCH_1, MARCH_2, MARCH_4 = date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 4)
+
+
+class TestFetchShards(unittest.TestCase):
+    def test_keys(self):
+        self.assertEqual(CURBFetchShard(MARCH_1, MARCH_2).key, "20250301-20250302:ALL")
+        self.assertEqual(CURBFetchShard(MARCH_1, MARCH_2, "5A11").key, "20250301-20250302:5A11")
+        self.assertEqual(CURBFetchShard(MARCH_1, MARCH_2, "5A11", "D1").key, "20250301-20250302:5A11:D1")
+        self.assertEqual(CURBFetchShard(MARCH_1, MARCH_2, driver_id="D1").key, "20250301-20250302:ALL:D1")
+
+    def test_keys_are_stable_across_runs(self):
+        first = [shard.key for shard in build_fetch_shards(MARCH_1, MARCH_4, cab_numbers=["5A11", "5A12"])]
+        second = [shard.key for shard in build_fetch_shards(MARCH_1, MARCH_4, cab_numbers=[" 5A11", "5A12", ""])]
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(set(first)), 6)
+
+    def test_day_shards(self):
+        shards = build_fetch_shards(MARCH_1, MARCH_4)
+
+        self.assertEqual([(s.from_date.day, s.to_date.day, s.cab_number) for s in shards], [(1, 2, ""), (2, 3, ""), (3, 4, "")])
+
+    def test_cab_shards_cover_the_range(self):
+        shards = build_fetch_shards(MARCH_1, MARCH_4, shard_by="cab", cab_numbers=["5A11", "5A12"], driver_id="D1")
+
+        self.assertEqual([s.key for s in shards], ["20250301-20250304:5A11:D1", "20250301-20250304:5A12:D1"])
+
+    def test_invalid_ranges(self):
+        with self.assertRaises(ValueError):
+            build_fetch_shards(MARCH_2, MARCH_2)
+        with self.assertRaises(ValueError):
+            build_fetch_shards(MARCH_1, MARCH_2, shard_by="week")
+
+
+class FakeSessionFactory:
+    def __init__(self):
+        self.opened = 0
+
+    def __call__(self):
+        factory = self
+
+        class Session:
+            async def __aenter__(self):
+                factory.opened += 1
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Session()
+
+
+class TestOrchestratorResume(unittest.TestCase):
+    def run_fetch(self, shards, completed=(), failing=(), resume=True):
+        fetched, completed_lookups = [], []
+
+        async def completed_keys(repo, shard_keys):
+            completed_lookups.append(list(shard_keys))
+            return {key for key in shard_keys if key in completed}
+
+        async def fetch_card(from_datetime, to_datetime, cab_number, tran_type, client):
+            if cab_number in failing:
+                raise RuntimeError("timeout")
+            fetched.append((from_datetime, cab_number))
+            return "<card/>"
+
+        async def fetch_cash(**kwargs):
+            return "<cash/>"
+
+        async def import_trips(service, xml_data, cash_xml_data, import_source, import_by, shard_key):
+            return SimpleNamespace(log_id=len(fetched), total_records=3, success_count=2, duplicate_count=1)
+
+        with mock.patch.object(CURBRepository, "get_completed_shard_keys", autospec=True, side_effect=completed_keys), \
+                mock.patch.object(fetcher, "fetch_trans_by_date_cab12", side_effect=fetch_card), \
+                mock.patch.object(fetcher, "fetch_trips_log10", side_effect=fetch_cash), \
+                mock.patch.object(CURBService, "import_trips", autospec=True, side_effect=import_trips):
+            orchestrator = CURBFetchOrchestrator(concurrency=2, resume=resume, session_factory=FakeSessionFactory())
+            result = asyncio.run(orchestrator.run(shards))
+        return result, fetched, completed_lookups
+
+    def test_resume_skips_completed_shards(self):
+        shards = build_fetch_shards(MARCH_1, MARCH_4, cab_numbers=["5A11", "5A12"])
+        completed = {shards[0].key, shards[3].key}
+
+        result, fetched, lookups = self.run_fetch(shards, completed=completed)
+
+        self.assertEqual(lookups, [[shard.key for shard in shards]])
+        self.assertEqual(len(fetched), 4)
+        self.assertEqual(
+            {r.shard_key: r.status for r in result.shards},
+            {shard.key: "Skipped" if shard.key in completed else "Imported" for shard in shards},
+        )
+        self.assertEqual(
+            (result.total_shards, result.imported_shards, result.skipped_shards, result.failed_shards),
+            (6, 4, 2, 0),
+        )
+        self.assertEqual((result.total_records, result.success_count, result.duplicate_count), (12, 8, 4))
+
+    def test_failed_shards_are_fetched_again_on_the_next_run(self):
+        shards = build_fetch_shards(MARCH_1, MARCH_2, cab_numbers=["5A11", "5A12"])
+
+        result, _, _ = self.run_fetch(shards, failing={"5A12"})
+        self.assertFalse(result.success)
+        failed = [r.shard_key for r in result.shards if r.status == "Failed"]
+        self.assertEqual(failed, [shards[1].key])
+
+        # Only the shard that imported is complete, so the rerun fetches the failed one
+        result, fetched, _ = self.run_fetch(shards, completed={shards[0].key})
+        self.assertEqual(fetched, [(mock.ANY, "5A12")])
+        self.assertTrue(result.success)
+
+    def test_without_resume_every_shard_is_fetched(self):
+        shards = build_fetch_shards(MARCH_1, MARCH_2)
+
+        result, fetched, lookups = self.run_fetch(shards, completed={shards[0].key}, resume=False)
+
+        self.assertEqual(lookups, [])
+        self.assertEqual(len(fetched), 1)
+        self.assertEqual(result.imported_shards, 1)
+
+
+class CapturingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: [("20250301-20250302:ALL",)])
+
+
+class TestCompletedShardKeys(unittest.TestCase):
+    def test_only_finished_imports_count(self):
+        db = CapturingSession()
+
+        completed = asyncio.run(CURBRepository(db).get_completed_shard_keys(["20250301-20250302:ALL", "20250302-20250303:ALL"]))
+
+        self.assertEqual(completed, {"20250301-20250302:ALL"})
+        where = str(db.statements[0].whereclause)
+        self.assertIn("curb_import_logs.shard_key IN", where)
+        self.assertIn("curb_import_logs.import_end IS NOT NULL", where)
+
+    def test_no_keys_no_query(self):
+        db = CapturingSession()
+
+        self.assertEqual(asyncio.run(CURBRepository(db).get_completed_shard_keys([])), set())
+        self.assertEqual(db.statements, [])
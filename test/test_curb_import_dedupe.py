@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.sql.dml import Insert
+
+from app.curb.repository import CURBRepository
+from app.curb.services import CURBService
+
+
+def trip_row(record_id, period="202503", amount=10.0):
+    return {"record_id": record_id, "period": period, "cab_number": "5A11", "driver_id": "D1", "total_amount": amount}
+
+
+class FakeCURBRepository:
+    """Stored (record_id, period) keys, inserting the way the unique key does"""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.batches = []
+
+    async def insert_new_trips(self, trip_rows):
+        self.batches.append(trip_rows)
+        inserted = 0
+        for row in trip_rows:
+            key = (row["record_id"], row["period"] or "")
+            if key not in self.stored:
+                self.stored.add(key)
+                inserted += 1
+        return inserted
+
+
+class TestImportTripRows(unittest.TestCase):
+    def test_repeats_in_the_payload_are_dropped_before_the_insert(self):
+        repo = FakeCURBRepository(stored={("R1", "202503")})
+        service = CURBService(repo)
+        seen = set()
+
+        first = asyncio.run(service._import_trip_rows(
+            [trip_row("R1"), trip_row("R2"), trip_row("R2", amount=99.0), trip_row("R3"), trip_row("R3", period=None)], seen
+        ))
+        second = asyncio.run(service._import_trip_rows([trip_row("R3"), trip_row("R4")], seen))
+
+        self.assertEqual(first, (3, 2))
+        self.assertEqual(second, (1, 1))
+        # The first copy of each key is the one sent; keys are not sent twice across chunks
+        self.assertEqual(
+            [[(r["record_id"], r["period"], r["total_amount"]) for r in batch] for batch in repo.batches],
+            [[("R1", "202503", 10.0), ("R2", "202503", 10.0), ("R3", "202503", 10.0), ("R3", None, 10.0)], [("R4", "202503", 10.0)]],
+        )
+
+    def test_empty_chunk(self):
+        repo = FakeCURBRepository()
+
+        self.assertEqual(asyncio.run(CURBService(repo)._import_trip_rows([], set())), (0, 0))
+        self.assertEqual(repo.batches, [])
+
+
+def inserted_rows(statement):
+    return [{getattr(column, "key", column): value for column, value in row.items()} for row in statement._multi_values[0]]
+
+
+class FoundRowsSession:
+    """Reports affected rows the way MySQL does with CLIENT_FOUND_ROWS set"""
+
+    def __init__(self, dialect, stored=()):
+        self.dialect = dialect
+        self.stored = set(stored)
+        self.statements = []
+
+    def get_bind(self):
+        return mock.Mock(dialect=self.dialect)
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+        if not isinstance(statement, Insert):
+            return SimpleNamespace(all=lambda: [k for k in self.stored])
+        affected = 0
+        for row in inserted_rows(statement):
+            key = (row["record_id"], row["period"])
+            # 1 for an inserted row, 2 for a duplicate whose UPDATE changed it
+            affected += 2 if key in self.stored else 1
+            self.stored.add(key)
+        return SimpleNamespace(rowcount=affected)
+
+
+class TestInsertNewTrips(unittest.TestCase):
+    def test_mysql_counts_inserts_from_affected_rows_without_a_lookup(self):
+        db = FoundRowsSession(mysql.dialect(), stored={("R2", "202503")})
+        rows = [trip_row("R1"), trip_row("R2"), trip_row("R3")]
+
+        inserted = asyncio.run(CURBRepository(db).insert_new_trips(rows))
+
+        self.assertEqual(inserted, 2)
+        (statement,) = db.statements
+        sql = str(statement.compile(dialect=mysql.dialect()))
+        self.assertTrue(sql.startswith("INSERT INTO curb_trips"))
+        self.assertTrue(sql.endswith("ON DUPLICATE KEY UPDATE updated_on = now()"))
+
+    def test_mysql_all_duplicates(self):
+        db = FoundRowsSession(mysql.dialect(), stored={("R1", "202503"), ("R2", "202503")})
+
+        self.assertEqual(asyncio.run(CURBRepository(db).insert_new_trips([trip_row("R1"), trip_row("R2")])), 0)
+
+    def test_other_dialects_look_keys_up_and_insert_the_rest(self):
+        db = FoundRowsSession(sqlite.dialect(), stored={("R2", "202503")})
+
+        inserted = asyncio.run(CURBRepository(db).insert_new_trips([trip_row("R1"), trip_row("R2")]))
+
+        self.assertEqual(inserted, 1)
+        lookup, insert = db.statements
+        self.assertNotIsInstance(lookup, Insert)
+        self.assertEqual([row["record_id"] for row in inserted_rows(insert)], ["R1"])
+        self.assertNotIn("DUPLICATE", str(insert.compile(dialect=sqlite.dialect())))
+
+    def test_no_rows_no_statement(self):
+        db = FoundRowsSession(mysql.dialect())
+
+        self.assertEqual(asyncio.run(CURBRepository(db).insert_new_trips([])), 0)
+        self.assertEqual(db.statements, [])
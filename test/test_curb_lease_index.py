@@ -0,0 +1,100 @@
+import random
+import unittest
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.curb.utils import LeaseIntervalIndex, chunked
+
+DAY_ZERO = date(2025, 1, 1)
+
+
+def lease(lease_id, driver_id, medallion_number, start, end):
+    return SimpleNamespace(
+        lease_id=lease_id,
+        driver_id=driver_id,
+        medallion_number=medallion_number,
+        lease_start_date=start,
+        lease_end_date=end,
+    )
+
+
+def per_trip_lookup(leases, driver_id, medallion_number, on_date):
+    """The per-trip query the index replaced: active on the date, latest start first"""
+    matches = [
+        row for row in leases
+        if row.driver_id == driver_id
+        and row.medallion_number == medallion_number
+        and row.lease_start_date is not None
+        and row.lease_start_date <= on_date
+        and (row.lease_end_date is None or row.lease_end_date >= on_date)
+    ]
+    matches.sort(key=lambda row: row.lease_start_date, reverse=True)
+    return matches[0] if matches else None
+
+
+class TestLeaseIntervalIndex(unittest.TestCase):
+    def test_matches_per_trip_lookup(self):
+        rng = random.Random(20250301)
+        drivers, medallions = ["D1", "D2", "D3"], ["5A11", "5A12"]
+        leases = []
+        for lease_id in range(60):
+            # Distinct start days: equal starts have no defined order in SQL either
+            start = DAY_ZERO + timedelta(days=lease_id * 2 + rng.randrange(2))
+            end = None if rng.random() < 0.2 else start + timedelta(days=rng.randrange(30))
+            leases.append(lease(lease_id, rng.choice(drivers), rng.choice(medallions), start, end))
+        index = LeaseIntervalIndex(leases)
+
+        for offset in range(-5, 160):
+            on_date = DAY_ZERO + timedelta(days=offset)
+            for driver_id in drivers:
+                for medallion_number in medallions:
+                    with self.subTest(driver=driver_id, medallion=medallion_number, on_date=on_date):
+                        self.assertIs(
+                            index.resolve(driver_id, medallion_number, on_date),
+                            per_trip_lookup(leases, driver_id, medallion_number, on_date),
+                        )
+
+    def test_latest_start_wins_when_leases_overlap(self):
+        older = lease(1, "D1", "5A11", DAY_ZERO, None)
+        newer = lease(2, "D1", "5A11", DAY_ZERO + timedelta(days=10), DAY_ZERO + timedelta(days=20))
+        index = LeaseIntervalIndex([newer, older])
+
+        self.assertIs(index.resolve("D1", "5A11", DAY_ZERO + timedelta(days=15)), newer)
+        self.assertIs(index.resolve("D1", "5A11", DAY_ZERO + timedelta(days=25)), older)
+
+    def test_bounds_are_inclusive(self):
+        row = lease(1, "D1", "5A11", DAY_ZERO, DAY_ZERO + timedelta(days=6))
+        index = LeaseIntervalIndex([row])
+
+        self.assertIs(index.resolve("D1", "5A11", DAY_ZERO), row)
+        self.assertIs(index.resolve("D1", "5A11", DAY_ZERO + timedelta(days=6)), row)
+        self.assertIsNone(index.resolve("D1", "5A11", DAY_ZERO - timedelta(days=1)))
+        self.assertIsNone(index.resolve("D1", "5A11", DAY_ZERO + timedelta(days=7)))
+
+    def test_keys_are_stripped_and_compared_as_strings(self):
+        row = lease(1, 1001, " 5A11 ", DAY_ZERO, None)
+        index = LeaseIntervalIndex([row])
+
+        self.assertIs(index.resolve("1001 ", "5A11", DAY_ZERO), row)
+        self.assertIsNone(index.resolve("1001", "5A12", DAY_ZERO))
+
+    def test_missing_inputs_resolve_to_none(self):
+        index = LeaseIntervalIndex([
+            lease(1, "D1", "5A11", DAY_ZERO, None),
+            lease(2, "D1", "5A11", None, None),
+        ])
+
+        self.assertEqual(len(index), 1)
+        self.assertIsNone(index.resolve("", "5A11", DAY_ZERO))
+        self.assertIsNone(index.resolve("D1", None, DAY_ZERO))
+        self.assertIsNone(index.resolve("D1", "5A11", None))
+
+
+class TestChunked(unittest.TestCase):
+    def test_splits_in_order(self):
+        self.assertEqual(list(chunked(list(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(chunked([], 3)), [])
+
+    def test_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            list(chunked([1], 0))
@@ -0,0 +1,169 @@
+import asyncio
+import unittest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.curb.services import CURB_TRIP_REFERENCE_TYPE, CURBService
+from app.ledger.exceptions import InvalidLedgerEntryException
+from app.ledger.ids import ledger_ids
+from app.ledger.services import LedgerService
+
+ON = date(2025, 3, 3)
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+class FakeCURBRepository:
+    """Trips by id and candidate leases, with the batch reads and grouped writes association uses"""
+
+    def __init__(self, trips, leases):
+        self.db = FakeSession()
+        self.trips = {t.id: t for t in trips}
+        self.leases = leases
+
+    async def get_reconciled_unposted_trip_keys(self, after_id=0, limit=5000):
+        rows = sorted(
+            (t for t in self.trips.values() if t.is_reconciled and not t.is_posted and t.id > after_id),
+            key=lambda t: t.id,
+        )
+        return [SimpleNamespace(**vars(t)) for t in rows[:limit]]
+
+    async def get_candidate_leases(self, cab_numbers, driver_ids, date_from, date_to):
+        return self.leases
+
+    async def bulk_update_trips(self, trip_rows):
+        for row in trip_rows:
+            vars(self.trips[row["id"]]).update({k: v for k, v in row.items() if k != "id"})
+        return len(trip_rows)
+
+    async def update_trips_by_ids(self, trip_ids, values):
+        for trip_id in trip_ids:
+            vars(self.trips[trip_id]).update(values)
+        return len(trip_ids)
+
+
+def trip(trip_id, driver_id="D1", cab_number="5A11", total_amount=Decimal("25.50"), **fields):
+    values = dict(
+        id=trip_id, record_id=f"R{trip_id}", trip_number=f"T{trip_id}", cab_number=cab_number,
+        driver_id=driver_id, start_date=ON, total_amount=total_amount, is_reconciled=True,
+        is_posted=False, status="Imported", associate_failed_reason=None,
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+LEASE = SimpleNamespace(
+    lease_id=10, driver_id="D1", driver_pk=99, medallion_number="5A11", medallion_id=5,
+    vehicle_id=1, lease_start_date=date(2025, 1, 1), lease_end_date=None,
+)
+
+
+class TestAssociateAndPostTrips(unittest.TestCase):
+    def run_posting(self, trips, batch_size=2):
+        repo = FakeCURBRepository(trips, [LEASE])
+        with mock.patch.object(LedgerService, "create_earnings_postings_batch", return_value={}) as create:
+            result = asyncio.run(CURBService(repo).associate_and_post_trips(batch_size=batch_size))
+        return result, repo, [call.args for call in create.call_args_list]
+
+    def test_posted_trips_are_credited_as_earnings(self):
+        trips = [
+            trip(1),
+            trip(2, driver_id="D2"),
+            trip(3, total_amount=Decimal("0")),
+            trip(4, cab_number=None),
+            trip(5, total_amount=Decimal("12.00")),
+        ]
+
+        result, repo, batches = self.run_posting(trips)
+
+        self.assertEqual((result.posted_count, result.skipped_count, result.failed_count), (3, 1, 1))
+        self.assertEqual({t.id: t.status for t in repo.trips.values()}, {
+            1: "Posted", 2: "Imported", 3: "Posted", 4: "Failed", 5: "Posted",
+        })
+        self.assertEqual(repo.trips[2].associate_failed_reason, "No active lease found")
+        self.assertEqual(
+            {key: getattr(repo.trips[1], key) for key in ("is_posted", "driver_fk", "medallion_fk", "vehicle_fk")},
+            {"is_posted": True, "driver_fk": 99, "medallion_fk": 5, "vehicle_fk": 1},
+        )
+
+        # One ledger INSERT per batch, only for trips with something to credit
+        self.assertEqual({args[0] for args in batches}, {CURB_TRIP_REFERENCE_TYPE})
+        self.assertEqual([[e["reference_id"] for e in args[1]] for args in batches], [["1"], [], ["5"]])
+        self.assertEqual(batches[0][1][0], {
+            "reference_id": "1", "amount": Decimal("25.50"), "driver_id": 99, "vehicle_id": 1,
+            "medallion_id": 5, "lease_id": 10, "transaction_date": ON,
+            "description": f"CURB Trip T1 on {ON}",
+        })
+        self.assertEqual(repo.db.commits, 1)
+
+    def test_posting_failure_rolls_back_without_marking_trips(self):
+        repo = FakeCURBRepository([trip(1)], [LEASE])
+
+        with mock.patch.object(LedgerService, "create_earnings_postings_batch", side_effect=RuntimeError("boom")):
+            with self.assertRaises(Exception):
+                asyncio.run(CURBService(repo).associate_and_post_trips())
+
+        self.assertFalse(repo.trips[1].is_posted)
+        self.assertEqual(repo.db.commits, 0)
+
+
+class FakeLedgerRepository:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.postings = []
+
+    async def get_existing_posting_references(self, reference_ids, reference_type):
+        return {reference_id for reference_id in reference_ids if reference_id in self.existing}
+
+    async def bulk_insert_postings(self, rows):
+        self.postings.extend(rows)
+
+
+class TestCreateEarningsPostingsBatch(unittest.TestCase):
+    def create(self, earnings, existing=()):
+        service = LedgerService(db=None)
+        service.repo = FakeLedgerRepository(existing)
+        with mock.patch.object(ledger_ids, "posting_ids", side_effect=lambda n: [f"P{i}" for i in range(n)]):
+            created = asyncio.run(service.create_earnings_postings_batch(CURB_TRIP_REFERENCE_TYPE, earnings, created_by=7))
+        return created, service.repo
+
+    def test_credit_rows(self):
+        created, repo = self.create([{
+            "reference_id": "1", "amount": Decimal("25.50"), "driver_id": 99, "vehicle_id": 1,
+            "medallion_id": 5, "lease_id": 10, "transaction_date": ON, "description": "Trip",
+        }])
+
+        self.assertEqual(created, {"1": "P0"})
+        (posting,) = repo.postings
+        self.assertEqual({key: posting[key] for key in posting if key != "posted_on"}, {
+            "posting_id": "P0", "category": "Earnings", "entry_type": "Credit", "amount": Decimal("25.50"),
+            "driver_id": 99, "vehicle_id": 1, "medallion_id": 5, "lease_id": 10, "reference_id": "1",
+            "reference_type": CURB_TRIP_REFERENCE_TYPE, "status": "Posted", "transaction_date": ON,
+            "description": "Trip", "created_by": 7, "modified_by": 7,
+        })
+
+    def test_rerun_skips_references_already_posted(self):
+        earnings = [{"reference_id": str(n), "amount": Decimal("1.00"), "driver_id": 1} for n in range(3)]
+
+        created, repo = self.create(earnings, existing={"1"})
+
+        self.assertEqual(created, {"0": "P0", "2": "P1"})
+        self.assertEqual({row["transaction_date"] for row in repo.postings}, {date.today()})
+
+        created, repo = self.create(earnings, existing={"0", "1", "2"})
+        self.assertEqual((created, repo.postings), ({}, []))
+
+    def test_rejects_non_positive_amounts(self):
+        with self.assertRaises(InvalidLedgerEntryException):
+            self.create([{"reference_id": "1", "amount": Decimal("0"), "driver_id": 1}])
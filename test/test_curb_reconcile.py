@@ -0,0 +1,185 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.dialects import mysql
+
+from app.curb import services as curb_services
+from app.curb.exceptions import CURBReconciliationException
+from app.curb.repository import CURBRepository
+from app.curb.services import CURBService
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeCURBRepository:
+    """Trips by id, recording every grouped UPDATE and reconciliation INSERT"""
+
+    def __init__(self, trips):
+        self.db = FakeSession()
+        self.trips = {t.id: t for t in trips}
+        self.updates, self.inserts, self.key_reads = [], [], []
+
+    def _keys(self, trips):
+        return [SimpleNamespace(id=t.id, record_id=t.record_id, is_reconciled=t.is_reconciled) for t in trips]
+
+    async def get_trip_recon_keys(self, trip_ids):
+        self.key_reads.append(list(trip_ids))
+        return self._keys(sorted((self.trips[i] for i in trip_ids if i in self.trips), key=lambda t: t.id))
+
+    async def get_unreconciled_trip_keys(self, limit=None):
+        return self._keys(sorted((t for t in self.trips.values() if not t.is_reconciled), key=lambda t: t.id))
+
+    async def update_trips_by_ids(self, trip_ids, values):
+        self.updates.append(list(trip_ids))
+        for trip_id in trip_ids:
+            vars(self.trips[trip_id]).update(values)
+        return len(trip_ids)
+
+    async def bulk_insert_reconciliations(self, recon_rows):
+        self.inserts.append(recon_rows)
+        return len(recon_rows)
+
+
+def trip(trip_id, is_reconciled=False):
+    return SimpleNamespace(id=trip_id, record_id=f"R{trip_id}", is_reconciled=is_reconciled, recon_stat=None, status="Imported")
+
+
+def per_trip_reconciliation(trips, trip_ids, recon_stat):
+    """The per-trip loop the batches replaced: fields set and reconciliation rows added"""
+    fields, rows = {}, []
+    for trip_id in dict.fromkeys(trip_ids):
+        existing = trips.get(trip_id)
+        if existing is None or existing.is_reconciled:
+            continue
+        fields[trip_id] = {"is_reconciled": True, "recon_stat": recon_stat, "status": "Reconciled"}
+        rows.append({"trip_id": trip_id, "recon_stat": recon_stat, "reconciled_by": "ops"})
+    return fields, rows
+
+
+class TestReconcileTripsLocally(unittest.TestCase):
+    def test_matches_per_trip_reconciliation(self):
+        trips = [trip(n, is_reconciled=n in (3, 6)) for n in range(1, 9)]
+        trip_ids = [1, 2, 3, 4, 2, 5, 6, 7, 8, 42]
+        repo = FakeCURBRepository(trips)
+        expected_fields, expected_rows = per_trip_reconciliation(dict(repo.trips), trip_ids, 77)
+
+        result = asyncio.run(CURBService(repo).reconcile_trips_locally(trip_ids, recon_stat=77, recon_by="ops", batch_size=3))
+
+        for trip_id, fields in expected_fields.items():
+            self.assertEqual({key: getattr(repo.trips[trip_id], key) for key in fields}, fields)
+        self.assertEqual(
+            [{key: row[key] for key in ("trip_id", "recon_stat", "reconciled_by")} for rows in repo.inserts for row in rows],
+            expected_rows,
+        )
+        # Distinct IDs looked up and written batch_size at a time
+        self.assertEqual(repo.key_reads, [[1, 2, 3], [4, 5, 6], [7, 8, 42]])
+        self.assertEqual(repo.updates, [[1, 2, 4], [5, 7, 8]])
+        self.assertEqual([len(rows) for rows in repo.inserts], [3, 3])
+        self.assertEqual(
+            (result.total_processed, result.reconciled_count, result.already_reconciled_count, result.failed_count),
+            (8, 6, 2, 0),
+        )
+        self.assertEqual([b.trip_ids for b in result.batches], [[1, 2, 4], [5, 7, 8]])
+        self.assertEqual(repo.db.commits, 1)
+
+    def test_defaults_to_every_unreconciled_trip(self):
+        repo = FakeCURBRepository([trip(1), trip(2, is_reconciled=True), trip(3)])
+
+        result = asyncio.run(CURBService(repo).reconcile_trips_locally(batch_size=10))
+
+        self.assertEqual(repo.updates, [[1, 3]])
+        self.assertEqual(result.reconciled_count, 2)
+        self.assertGreater(result.recon_stat, 0)
+
+    def test_nothing_to_reconcile(self):
+        repo = FakeCURBRepository([trip(1, is_reconciled=True)])
+
+        result = asyncio.run(CURBService(repo).reconcile_trips_locally())
+
+        self.assertEqual((result.total_processed, result.message), (0, "No trips to reconcile"))
+        self.assertEqual((repo.updates, repo.inserts), ([], []))
+
+
+class TestReconcileTripsOnServer(unittest.TestCase):
+    def run_server(self, repo, failing=(), **kwargs):
+        calls = []
+
+        async def reconcile(record_ids, recon_stat, client=None):
+            calls.append(record_ids)
+            if set(record_ids) & set(failing):
+                raise RuntimeError("rejected")
+
+        with mock.patch.object(curb_services, "reconcile_trips_on_server", side_effect=reconcile):
+            result = asyncio.run(CURBService(repo).reconcile_trips_on_server(list(repo.trips), 77, **kwargs))
+        return result, calls
+
+    def test_only_accepted_batches_are_marked(self):
+        repo = FakeCURBRepository([trip(n) for n in range(1, 8)])
+
+        result, calls = self.run_server(repo, failing={"R4"}, batch_size=3, concurrency=2)
+
+        self.assertEqual(sorted(calls), [["R1", "R2", "R3"], ["R4", "R5", "R6"], ["R7"]])
+        self.assertEqual(repo.updates, [[1, 2, 3], [7]])
+        self.assertEqual([t.id for t in repo.trips.values() if t.is_reconciled], [1, 2, 3, 7])
+        self.assertFalse(result.success)
+        self.assertEqual((result.reconciled_count, result.failed_count), (4, 3))
+        self.assertEqual(
+            [(b.trip_ids, b.success, b.error) for b in result.batches],
+            [([1, 2, 3], True, None), ([4, 5, 6], False, "rejected"), ([7], True, None)],
+        )
+        self.assertEqual(repo.db.commits, 1)
+
+    def test_every_batch_failing_rolls_back(self):
+        repo = FakeCURBRepository([trip(1), trip(2)])
+
+        with self.assertRaisesRegex(CURBReconciliationException, "failed for all 1 batches: rejected"):
+            self.run_server(repo, failing={"R1"}, batch_size=5)
+
+        self.assertEqual((repo.updates, repo.db.commits, repo.db.rollbacks), ([], 0, 1))
+
+
+class CapturingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=2)
+
+
+class TestReconciliationStatements(unittest.TestCase):
+    def test_one_update_and_one_multi_row_insert(self):
+        db = CapturingSession()
+        repo = CURBRepository(db)
+
+        asyncio.run(repo.update_trips_by_ids([1, 2], {"is_reconciled": True, "recon_stat": 77, "status": "Reconciled"}))
+        asyncio.run(repo.bulk_insert_reconciliations([
+            {"trip_id": trip_id, "recon_stat": 77, "reconciled_by": "ops", "reconciled_at": None} for trip_id in (1, 2)
+        ]))
+
+        update_sql, insert_sql = (str(s.compile(dialect=mysql.dialect())) for s in db.statements)
+        self.assertTrue(update_sql.startswith("UPDATE curb_trips SET is_reconciled=%s, recon_stat=%s, status=%s"))
+        self.assertIn("WHERE curb_trips.id IN", update_sql)
+        self.assertTrue(insert_sql.startswith("INSERT INTO curb_trip_reconciliation"))
+        self.assertEqual(insert_sql.count("VALUES"), 1)
+        self.assertEqual(insert_sql.count("), ("), 1)
+
+    def test_empty_batches_issue_no_statement(self):
+        db = CapturingSession()
+        repo = CURBRepository(db)
+
+        self.assertEqual(asyncio.run(repo.update_trips_by_ids([], {"status": "Reconciled"})), 0)
+        self.assertEqual(asyncio.run(repo.bulk_insert_reconciliations([])), 0)
+        self.assertEqual(db.statements, [])
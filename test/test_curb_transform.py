@@ -0,0 +1,142 @@
+import unittest
+import xml.etree.ElementTree as ET
+
+from app.curb.schemas import CURBTripCreate
+from app.curb.transform import (
+    card_transactions_frame,
+    frame_to_rows,
+    trips_log_frame,
+    validate_trip_frame,
+)
+from app.curb.utils import _card_transaction_to_dict, _trip_record_to_dict
+
+IMPORT_LOG_ID = 42
+
+TRIP_LOG_RECORDS = [
+    {
+        "ID": "1001", "PERIOD": "202503", "CABNUMBER": "5A11", "DRIVER": "D1", "NUM_SERVICE": "7",
+        "START_DATE": "03/01/2025 09:30:15", "END_DATE": "03/01/2025 09:51",
+        "TRIP": "21.50", "TIPS": "4", "EXTRAS": "", "TOLLS": "6.94", "TAX": "0.50", "IMPTAX": "0.30",
+        "TOTAL_AMOUNT": "33.74", "GPS_START_LA": "40.75", "GPS_START_LO": "-73.99",
+        "FROM_ADDRESS": "1 Main St", "T": "$", "PASSENGER_NUM": "2", "DIST_SERVCE": "3.4",
+        "CONGFEE": "2.50", "airportFee": "1.75", "cbdt": "0.75",
+    },
+    {
+        "ID": "1002", "PERIOD": "202503", "CABNUMBER": "5A12", "DRIVER": "D2",
+        "START_DATE": "03/02/2025 23:59:59", "END_DATE": "03/03/2025 00:10:00",
+        "TRIP": "abc", "PASSENGER_NUM": "x", "CCNUMBER": "4111", "AUTHAMT": "12",
+    },
+]
+
+CARD_RECORDS = [
+    {
+        "ROWID": "9001", "CABNUMBER": "5A11", "TRIPDRIVERID": "D1", "NUM_SERVICE": "3",
+        "TRIPDATE": "03/02/2025", "TRIPTIMESTART": "23:10:00", "TRIPTIMEEND": "23:40",
+        "TRIPFARE": "18.25", "TRIPTIPS": "3", "TRIPTOLL": "", "AMOUNT": "24.05",
+        "FromLa": "40.7", "ToLo": "-73.9", "CRNUMBER": "4111", "BANK_APPROVAL": "A1",
+        "TRIPDIST": "5.2", "CongFee": "2.50", "cbdt": "1.5",
+    },
+    {
+        "ROWID": "9002", "CABNUMBER": "5A12", "TRIPDRIVERID": "D2",
+        "TRIPDATE": "03/04/2025", "TRIPTIMESTART": "bad", "AMOUNT": "n/a",
+    },
+]
+
+
+def record_element(attributes):
+    return ET.Element("RECORD", attributes)
+
+
+def tran_element(values):
+    element = ET.Element("tran", {"ROWID": values["ROWID"]})
+    for tag, text in values.items():
+        if tag != "ROWID":
+            ET.SubElement(element, tag).text = text
+    return element
+
+
+def per_trip_rows(trip_dicts):
+    """The per-trip path the frames replaced: convert, then validate with CURBTripCreate"""
+    return [CURBTripCreate(**trip, import_id=IMPORT_LOG_ID).model_dump() for trip in trip_dicts]
+
+
+class TestTripFrames(unittest.TestCase):
+    def assertRowsMatch(self, rows, expected):
+        self.assertEqual(len(rows), len(expected))
+        for row, model in zip(rows, expected):
+            with self.subTest(record_id=row["record_id"]):
+                self.assertEqual(row, {key: model[key] for key in row})
+
+    def test_trips_log_frame_matches_per_record_conversion(self):
+        valid, errors = validate_trip_frame(trips_log_frame(TRIP_LOG_RECORDS), IMPORT_LOG_ID)
+        expected = per_trip_rows(_trip_record_to_dict(record_element(r)) for r in TRIP_LOG_RECORDS)
+
+        self.assertTrue(errors.empty)
+        self.assertRowsMatch(frame_to_rows(valid), expected)
+
+    def test_card_transactions_frame_matches_per_record_conversion(self):
+        valid, errors = validate_trip_frame(card_transactions_frame(CARD_RECORDS), IMPORT_LOG_ID)
+        expected = per_trip_rows(_card_transaction_to_dict(tran_element(r)) for r in CARD_RECORDS)
+
+        self.assertTrue(errors.empty)
+        self.assertRowsMatch(frame_to_rows(valid), expected)
+
+    def test_rows_hold_plain_python_values(self):
+        valid, _ = validate_trip_frame(trips_log_frame(TRIP_LOG_RECORDS), IMPORT_LOG_ID)
+        row = frame_to_rows(valid)[1]
+
+        self.assertIs(type(row["passengers"]), int)
+        self.assertIs(type(row["trip_amount"]), float)
+        self.assertIsNone(row["from_address"])
+        self.assertEqual(row["payment_type"], "T")
+
+    def test_payment_type_defaults_only_when_missing(self):
+        frame = trips_log_frame([dict(TRIP_LOG_RECORDS[0], T="C"), TRIP_LOG_RECORDS[1]])
+
+        self.assertEqual(list(frame["payment_type"]), ["C", "T"])
+
+
+class TestValidateTripFrame(unittest.TestCase):
+    def test_rejects_rows_the_create_schema_rejects(self):
+        records = [
+            TRIP_LOG_RECORDS[0],
+            dict(TRIP_LOG_RECORDS[0], ID="1003", DRIVER=None),
+            dict(TRIP_LOG_RECORDS[0], ID="1004", START_DATE="not a date"),
+            {k: v for k, v in TRIP_LOG_RECORDS[0].items() if k != "CABNUMBER"} | {"ID": "1005"},
+        ]
+        for attributes in records[1:]:
+            trip = _trip_record_to_dict(record_element({k: v for k, v in attributes.items() if v is not None}))
+            with self.subTest(record_id=attributes["ID"]), self.assertRaises(ValueError):
+                CURBTripCreate(**trip)
+
+        valid, errors = validate_trip_frame(trips_log_frame(records), IMPORT_LOG_ID)
+
+        self.assertEqual(list(valid["record_id"]), ["1001"])
+        self.assertEqual(
+            dict(zip(errors["record_id"], errors["error"])),
+            {
+                "1003": "missing driver_id",
+                "1004": "missing start_date",
+                "1005": "missing cab_number",
+            },
+        )
+
+    def test_blank_identifiers_are_rejected(self):
+        records = [dict(TRIP_LOG_RECORDS[0], CABNUMBER="  ", DRIVER="")]
+
+        valid, errors = validate_trip_frame(trips_log_frame(records), IMPORT_LOG_ID)
+
+        self.assertTrue(valid.empty)
+        self.assertEqual(list(errors["error"]), ["missing cab_number; missing driver_id"])
+
+    def test_accepted_rows_carry_status_and_import_id(self):
+        valid, _ = validate_trip_frame(card_transactions_frame(CARD_RECORDS), IMPORT_LOG_ID)
+
+        self.assertEqual(set(valid["status"]), {"Imported"})
+        self.assertEqual(set(valid["import_id"]), {IMPORT_LOG_ID})
+
+    def test_empty_frame(self):
+        valid, errors = validate_trip_frame(trips_log_frame([]), IMPORT_LOG_ID)
+
+        self.assertEqual(frame_to_rows(valid), [])
+        self.assertTrue(errors.empty)
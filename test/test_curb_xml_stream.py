@@ -0,0 +1,152 @@
+import io
+import unittest
+from datetime import date, time
+from unittest import mock
+
+from app.curb import utils
+from app.curb.exceptions import CURBXMLParseException
+from app.curb.utils import (
+    iter_card_transactions_xml,
+    iter_trips_xml,
+    parse_card_transactions_xml,
+    parse_trips_xml,
+)
+
+TRIP_RECORD = (
+    '<RECORD ID="{id}" PERIOD="202503" CABNUMBER="5A{id}" DRIVER="D{id}" NUM_SERVICE="{id}" '
+    'START_DATE="03/01/2025 09:30:15" END_DATE="03/01/2025 09:51" TRIP="{id}.50" TIPS="2" '
+    'EXTRAS="" TOLLS="6.94" TAX="0.50" IMPTAX="0.30" TOTAL_AMOUNT="30.74" GPS_START_LA="40.75" '
+    'GPS_START_LO="-73.99" FROM_ADDRESS="1 Main &amp; 2nd" T="C" PASSENGER_NUM="2" '
+    'DIST_SERVCE="3.4" CONGFEE="2.50" airportFee="1.75" cbdt="0.75" />'
+)
+
+CARD_TRAN = (
+    '<tran ROWID="{id}"><CABNUMBER>5A{id}</CABNUMBER><TRIPDRIVERID>D{id}</TRIPDRIVERID>'
+    '<TRIPDATE>03/02/2025</TRIPDATE><TRIPTIMESTART>23:10:00</TRIPTIMESTART>'
+    '<TRIPTIMEEND>23:40</TRIPTIMEEND><TRIPFARE>{id}.25</TRIPFARE><TRIPTIPS>3</TRIPTIPS>'
+    '<AMOUNT>24.05</AMOUNT><CRNUMBER>4111</CRNUMBER><BANK_APPROVAL>A{id}</BANK_APPROVAL>'
+    '<TRIPDIST>5.2</TRIPDIST><CongFee>2.50</CongFee></tran>'
+)
+
+
+def trips_xml(count):
+    records = "".join(TRIP_RECORD.format(id=i) for i in range(1, count + 1))
+    return f'<?xml version="1.0"?><trips>{records}</trips>'
+
+
+def card_xml(count):
+    return "".join(CARD_TRAN.format(id=i) for i in range(1, count + 1))
+
+
+def flatten(chunks):
+    return [record for chunk in chunks for record in chunk]
+
+
+class TestIterTripsXml(unittest.TestCase):
+    def test_matches_full_tree_parser(self):
+        xml = trips_xml(7)
+        expected = parse_trips_xml(xml)
+        for chunk_size in (1, 2, 3, 7, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(iter_trips_xml(xml, chunk_size=chunk_size))
+                self.assertEqual(flatten(chunks), expected)
+                self.assertTrue(all(0 < len(chunk) <= chunk_size for chunk in chunks))
+                self.assertEqual(len(chunks), -(-7 // chunk_size))
+
+    def test_converts_record_like_the_per_record_parser(self):
+        trip = flatten(iter_trips_xml(trips_xml(1)))[0]
+
+        self.assertEqual(trip["record_id"], "1")
+        self.assertEqual(trip["period"], "202503")
+        self.assertEqual((trip["start_date"], trip["start_time"]), (date(2025, 3, 1), time(9, 30, 15)))
+        self.assertEqual((trip["end_date"], trip["end_time"]), (date(2025, 3, 1), time(9, 51)))
+        self.assertEqual(trip["trip_amount"], 1.5)
+        self.assertEqual(trip["extras"], 0.0)
+        self.assertEqual(trip["gps_end_lat"], 0.0)
+        self.assertEqual(trip["from_address"], "1 Main & 2nd")
+        self.assertIsNone(trip["to_address"])
+        self.assertEqual(trip["payment_type"], "C")
+        self.assertEqual(trip["passengers"], 2)
+        self.assertEqual(trip["airport_fee"], 1.75)
+        self.assertEqual(trip["cbdt_fee"], 0.75)
+
+    def test_bytes_and_file_inputs_match_string_input(self):
+        xml = trips_xml(5)
+        expected = parse_trips_xml(xml)
+        for source in (xml.encode(), io.StringIO(xml), io.BytesIO(xml.encode())):
+            with self.subTest(source=type(source).__name__):
+                self.assertEqual(flatten(iter_trips_xml(source, chunk_size=2)), expected)
+
+    def test_records_split_across_read_blocks(self):
+        xml = trips_xml(4)
+        with mock.patch.object(utils, "READ_BLOCK_SIZE", 7):
+            self.assertEqual(flatten(iter_trips_xml(io.StringIO(xml), chunk_size=3)), parse_trips_xml(xml))
+
+    def test_rootless_records_are_rejected_like_full_tree_parser(self):
+        siblings = "".join(TRIP_RECORD.format(id=i) for i in range(1, 3))
+        with self.assertRaises(CURBXMLParseException):
+            parse_trips_xml(siblings)
+        with self.assertRaises(CURBXMLParseException):
+            list(iter_trips_xml(siblings))
+
+    def test_raw_yields_unconverted_attributes(self):
+        record = flatten(iter_trips_xml(trips_xml(1), raw=True))[0]
+
+        self.assertEqual(record["ID"], "1")
+        self.assertEqual(record["TRIP"], "1.50")
+        self.assertEqual(record["START_DATE"], "03/01/2025 09:30:15")
+
+    def test_empty_input_yields_nothing(self):
+        self.assertEqual(list(iter_trips_xml("")), [])
+
+    def test_malformed_xml_raises(self):
+        with self.assertRaises(CURBXMLParseException):
+            list(iter_trips_xml('<trips><RECORD ID="1"></trips>'))
+
+    def test_chunk_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            list(iter_trips_xml(trips_xml(1), chunk_size=0))
+
+
+class TestIterCardTransactionsXml(unittest.TestCase):
+    def test_matches_full_tree_parser(self):
+        xml = card_xml(6)
+        expected = parse_card_transactions_xml(xml)
+        for chunk_size in (1, 4, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(iter_card_transactions_xml(xml, chunk_size=chunk_size))
+                self.assertEqual(flatten(chunks), expected)
+                self.assertTrue(all(len(chunk) <= chunk_size for chunk in chunks))
+
+    def test_converts_transaction_like_the_per_record_parser(self):
+        transaction = flatten(iter_card_transactions_xml(card_xml(1)))[0]
+
+        self.assertEqual(transaction["record_id"], "1")
+        self.assertEqual(transaction["start_date"], date(2025, 3, 2))
+        self.assertEqual(transaction["end_date"], date(2025, 3, 2))
+        self.assertEqual((transaction["start_time"], transaction["end_time"]), (time(23, 10), time(23, 40)))
+        self.assertEqual(transaction["trip_amount"], 1.25)
+        self.assertEqual(transaction["total_amount"], 24.05)
+        self.assertEqual(transaction["auth_amount"], 24.05)
+        self.assertEqual(transaction["auth_code"], "A1")
+        self.assertEqual(transaction["payment_type"], "C")
+        self.assertEqual(transaction["passengers"], 1)
+        self.assertEqual(transaction["tolls"], 0.0)
+
+    def test_file_input_split_across_read_blocks(self):
+        xml = card_xml(3)
+        with mock.patch.object(utils, "READ_BLOCK_SIZE", 5):
+            streamed = flatten(iter_card_transactions_xml(io.BytesIO(xml.encode()), chunk_size=2))
+
+        self.assertEqual(streamed, parse_card_transactions_xml(xml))
+
+    def test_raw_yields_child_texts_and_rowid(self):
+        record = flatten(iter_card_transactions_xml(card_xml(1), raw=True))[0]
+
+        self.assertEqual(record["ROWID"], "1")
+        self.assertEqual(record["TRIPFARE"], "1.25")
+        self.assertEqual(record["TRIPTIMEEND"], "23:40")
+
+    def test_malformed_xml_raises(self):
+        with self.assertRaises(CURBXMLParseException):
+            list(iter_card_transactions_xml("<tran ROWID='1'><AMOUNT>1</tran>"))
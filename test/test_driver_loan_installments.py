@@ -0,0 +1,456 @@
+import asyncio
+import copy
+import random
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+
+import app.drivers.models  # noqa: F401  (tables referenced by driver_loans foreign keys)
+import app.leases.models  # noqa: F401
+import app.medallions.models  # noqa: F401
+from app.driver_loans.exceptions import DriverLoanPostingException
+from app.driver_loans.models import DriverLoan, DriverLoanInstallment
+from app.driver_loans.repository import DriverLoanRepository
+from app.driver_loans.services import LOAN_INSTALLMENT_REFERENCE_TYPE, DriverLoanService
+from app.ledger import services as ledger_services
+from app.ledger.ids import ledger_ids
+
+SUNDAY = date(2025, 3, 2)
+
+
+class FakeDatabase:
+    """Loans, installments and ledger rows with commit/rollback to the last committed state"""
+
+    def __init__(self, loans, installments, postings=()):
+        self.state = {
+            "loans": {loan["id"]: dict(loan) for loan in loans},
+            "installments": {row["id"]: dict(row) for row in installments},
+            "postings": [dict(posting) for posting in postings],
+            "balances": [],
+            "logs": [],
+        }
+        self.committed = copy.deepcopy(self.state)
+        self.commits = 0
+
+    def __getattr__(self, name):
+        return self.__dict__["state"][name]
+
+    async def commit(self):
+        self.committed = copy.deepcopy(self.state)
+        self.commits += 1
+
+    async def rollback(self):
+        self.state = copy.deepcopy(self.committed)
+
+
+class FakeLoanRepository:
+    """The batch reads and writes process_due_installments uses, with one call log per method"""
+
+    def __init__(self, db, fail_on_batch=None):
+        self.db = db
+        self.fail_on_batch = fail_on_batch
+        self.reads, self.installment_updates, self.payments = [], [], []
+
+    async def mark_installments_due(self, as_of_date):
+        due = [
+            row for row in self.db.installments.values()
+            if row["status"] == "Scheduled" and row["week_start_date"] <= as_of_date
+        ]
+        for row in due:
+            row["status"] = "Due"
+        return len(due)
+
+    async def get_due_installment_rows(self, as_of_date, after_id=0, limit=1000):
+        rows = sorted(
+            (
+                row for row in self.db.installments.values()
+                if row["status"] == "Due" and row["week_start_date"] <= as_of_date and row["id"] > after_id
+            ),
+            key=lambda row: row["id"],
+        )[:limit]
+        self.reads.append([row["id"] for row in rows])
+        if self.fail_on_batch is not None and len(self.reads) == self.fail_on_batch:
+            raise RuntimeError("connection lost")
+        loans = self.db.loans
+        return [
+            SimpleNamespace(
+                **{key: row[key] for key in ("id", "installment_id", "loan_id", "principal_amount", "interest_amount", "total_due")},
+                loan_number=loans[row["loan_id"]]["loan_id"],
+                driver_id=loans[row["loan_id"]]["driver_id"],
+                medallion_id=loans[row["loan_id"]]["medallion_id"],
+                lease_id=loans[row["loan_id"]]["lease_id"],
+            )
+            for row in rows
+        ]
+
+    async def bulk_update_installments(self, installment_rows):
+        self.installment_updates.append(installment_rows)
+        for row in installment_rows:
+            self.db.installments[row["id"]].update({k: v for k, v in row.items() if k != "id"})
+        return len(installment_rows)
+
+    async def apply_loan_payments(self, payments):
+        self.payments.append(payments)
+        for loan_id, (principal, interest) in payments.items():
+            loan = self.db.loans[loan_id]
+            loan["total_principal_paid"] += principal
+            loan["total_interest_paid"] += interest
+            loan["outstanding_balance"] -= principal
+
+    async def close_completed_loans(self):
+        pending = {row["loan_id"] for row in self.db.installments.values() if row["status"] in ("Scheduled", "Due")}
+        closed = [
+            loan for loan in self.db.loans.values()
+            if loan["status"] == "Open" and loan["outstanding_balance"] <= 0 and loan["id"] not in pending
+        ]
+        for loan in closed:
+            loan["status"] = "Closed"
+        return len(closed)
+
+    async def create_log(self, log_data):
+        self.db.logs.append(log_data.model_dump())
+
+    async def commit(self):
+        await self.db.commit()
+
+    async def rollback(self):
+        await self.db.rollback()
+
+
+class FakeLedgerRepository:
+    """Postings and balances in the shared FakeDatabase"""
+
+    def __init__(self, db):
+        self.db = db
+        self.summary_deltas = []
+
+    async def get_existing_balance_references(self, reference_ids, reference_type):
+        return {
+            posting["reference_id"] for posting in self.db.postings
+            if posting["reference_type"] == reference_type and posting["reference_id"] in set(reference_ids)
+        }
+
+    async def get_debit_posting_ids_by_reference(self, reference_ids, reference_type):
+        return {
+            posting["reference_id"]: posting["posting_id"] for posting in self.db.postings
+            if posting["reference_type"] == reference_type and posting["reference_id"] in set(reference_ids)
+            and posting["entry_type"] == "Debit"
+        }
+
+    async def bulk_insert_postings(self, rows):
+        self.db.postings.extend(rows)
+
+    async def bulk_insert_balances(self, rows):
+        self.db.balances.extend(rows)
+
+    async def apply_balance_summary_deltas(self, deltas):
+        self.summary_deltas.append(deltas)
+
+
+def loan(loan_id, driver_id, balance, status="Open"):
+    return {
+        "id": loan_id, "loan_id": f"DLN2025-{loan_id:03d}", "driver_id": driver_id, "medallion_id": 50 + driver_id,
+        "lease_id": 70 + driver_id, "status": status, "total_principal_paid": Decimal("0.00"),
+        "total_interest_paid": Decimal("0.00"), "outstanding_balance": Decimal(balance),
+    }
+
+
+def installment(installment_id, loan_id, principal, interest="0.00", week=0, status="Scheduled"):
+    return {
+        "id": installment_id, "installment_id": f"DLN2025-{loan_id:03d}-{installment_id:02d}", "loan_id": loan_id,
+        "principal_amount": Decimal(principal), "interest_amount": Decimal(interest),
+        "total_due": Decimal(principal) + Decimal(interest), "week_start_date": SUNDAY + timedelta(weeks=week),
+        "status": status, "posting_date": None, "ledger_posting_ref": None,
+    }
+
+
+def per_installment_posting(loans, installments, as_of_date):
+    """The loop process_due_installments replaced: one posting and one loan UPDATE per installment"""
+    loans = copy.deepcopy(loans)
+    postings = []
+    for row in sorted(installments, key=lambda row: row["id"]):
+        if row["status"] not in ("Scheduled", "Due") or row["week_start_date"] > as_of_date:
+            continue
+        loan = loans[row["loan_id"]]
+        postings.append((row["installment_id"], loan["driver_id"], row["total_due"]))
+        loan["total_principal_paid"] += row["principal_amount"]
+        loan["total_interest_paid"] += row["interest_amount"]
+        loan["outstanding_balance"] -= row["principal_amount"]
+    return loans, postings
+
+
+def run_posting(db, batch_size, as_of_date=SUNDAY, fail_on_batch=None):
+    repo = FakeLoanRepository(db, fail_on_batch)
+    ledger_repo = FakeLedgerRepository(db)
+    counter = iter(range(len(db.postings) + 1, 10 ** 6))
+    with mock.patch.object(ledger_services, "LedgerRepository", return_value=ledger_repo), \
+            mock.patch.object(ledger_ids, "posting_ids", side_effect=lambda n: [f"POST-{next(counter)}" for _ in range(n)]), \
+            mock.patch.object(ledger_ids, "balance_ids", side_effect=lambda category, n: [f"BAL-{category}-{i}" for i in range(n)]):
+        result = asyncio.run(DriverLoanService(repo).process_due_installments(as_of_date, batch_size=batch_size))
+    return result, repo, ledger_repo
+
+
+class TestProcessDueInstallments(unittest.TestCase):
+    def test_totals_match_per_installment_posting(self):
+        rng = random.Random(25)
+        for case in range(60):
+            loans = [loan(n, driver_id=rng.randrange(1, 4), balance="400.00") for n in range(1, rng.randrange(2, 6))]
+            installments = [
+                installment(
+                    n, rng.choice(loans)["id"], f"{rng.randrange(1, 9000) / 100:.2f}", f"{rng.randrange(0, 500) / 100:.2f}",
+                    week=rng.randrange(-2, 3), status=rng.choice(["Scheduled", "Scheduled", "Due", "Posted"]),
+                )
+                for n in range(1, rng.randrange(1, 25))
+            ]
+            batch_size = rng.randrange(1, 8)
+            expected_loans, expected_postings = per_installment_posting(
+                {row["id"]: row for row in loans}, installments, SUNDAY
+            )
+
+            with self.subTest(case=case, batch_size=batch_size):
+                db = FakeDatabase(loans, installments)
+                result, repo, _ = run_posting(db, batch_size)
+
+                self.assertEqual(
+                    {loan_id: {key: row[key] for key in ("total_principal_paid", "total_interest_paid", "outstanding_balance")}
+                     for loan_id, row in db.loans.items()},
+                    {loan_id: {key: row[key] for key in ("total_principal_paid", "total_interest_paid", "outstanding_balance")}
+                     for loan_id, row in expected_loans.items()},
+                )
+                self.assertEqual(
+                    sorted((p["reference_id"], p["driver_id"], p["amount"]) for p in db.postings),
+                    sorted(expected_postings),
+                )
+                self.assertEqual(result.posted_count, len(expected_postings))
+                # One read per batch plus the empty read that ends the walk
+                self.assertEqual(len(repo.reads), -(-len(expected_postings) // batch_size) + 1)
+                self.assertTrue(all(len(ids) <= batch_size for ids in repo.reads))
+
+    def test_batch_postings_and_aggregated_loan_update(self):
+        db = FakeDatabase(
+            [loan(1, driver_id=7, balance="300.00"), loan(2, driver_id=8, balance="300.00")],
+            [
+                installment(1, 1, "100.00", "5.00"),
+                installment(2, 2, "50.00", "2.50"),
+                installment(3, 1, "100.00", "4.00", week=-1),
+                installment(4, 1, "100.00", "3.00", week=1),
+            ],
+        )
+
+        result, repo, ledger_repo = run_posting(db, batch_size=10)
+
+        self.assertEqual([p["reference_id"] for p in db.postings], ["DLN2025-001-01", "DLN2025-002-02", "DLN2025-001-03"])
+        posting = db.postings[0]
+        self.assertEqual(
+            {key: posting[key] for key in ("category", "reference_type", "driver_id", "medallion_id", "lease_id", "amount", "transaction_date")},
+            {
+                "category": "Loan", "reference_type": LOAN_INSTALLMENT_REFERENCE_TYPE, "driver_id": 7,
+                "medallion_id": 57, "lease_id": 77, "amount": Decimal("105.00"), "transaction_date": SUNDAY,
+            },
+        )
+        self.assertEqual(posting["description"], "Loan installment for DLN2025-001 (Principal: 100.00, Interest: 5.00)")
+        self.assertEqual(ledger_repo.summary_deltas, [{(7, "Loan"): (Decimal("209.00"), 2), (8, "Loan"): (Decimal("52.50"), 1)}])
+
+        # One UPDATE per batch, with one row per loan carrying the summed principal and interest
+        self.assertEqual(repo.payments, [{1: (Decimal("200.00"), Decimal("9.00")), 2: (Decimal("50.00"), Decimal("2.50"))}])
+        self.assertEqual(len(repo.installment_updates), 1)
+        self.assertEqual(
+            {row["id"]: (row["status"], row["ledger_posting_ref"]) for row in db.installments.values()},
+            {1: ("Posted", "POST-1"), 2: ("Posted", "POST-2"), 3: ("Posted", "POST-3"), 4: ("Scheduled", None)},
+        )
+        self.assertEqual(db.loans[1]["outstanding_balance"], Decimal("100.00"))
+        self.assertEqual((result.total_processed, result.posted_count, result.failed_count), (3, 3, 0))
+        # The marking commit, one per batch and the log
+        self.assertEqual(db.commits, 3)
+        self.assertEqual(db.logs[0]["details"], "Posted 3, Waived 0, Closed 0")
+
+    def test_rerun_reuses_existing_postings(self):
+        # An earlier run posted installment 1 to the ledger but did not mark it
+        existing = {
+            "posting_id": "POST-0000000000000000042", "reference_id": "DLN2025-001-01",
+            "reference_type": LOAN_INSTALLMENT_REFERENCE_TYPE, "entry_type": "Debit",
+            "driver_id": 7, "amount": Decimal("100.00"),
+        }
+        db = FakeDatabase(
+            [loan(1, driver_id=7, balance="200.00")],
+            [installment(1, 1, "100.00", status="Due"), installment(2, 1, "100.00", status="Due")],
+            postings=[existing],
+        )
+
+        run_posting(db, batch_size=10)
+
+        self.assertEqual([p["reference_id"] for p in db.postings], ["DLN2025-001-01", "DLN2025-001-02"])
+        self.assertEqual(
+            {row["id"]: row["ledger_posting_ref"] for row in db.installments.values()},
+            {1: "POST-0000000000000000042", 2: db.postings[1]["posting_id"]},
+        )
+        self.assertEqual(db.loans[1]["total_principal_paid"], Decimal("200.00"))
+
+        # Nothing is left Due, so a second run posts and applies nothing
+        before = copy.deepcopy(db.state)
+        result, repo, _ = run_posting(db, batch_size=10)
+
+        self.assertEqual(result.total_processed, 0)
+        self.assertEqual(repo.payments, [])
+        self.assertEqual(
+            {key: value for key, value in db.state.items() if key != "logs"},
+            {key: value for key, value in before.items() if key != "logs"},
+        )
+
+    def test_failed_batch_keeps_committed_batches(self):
+        db = FakeDatabase(
+            [loan(1, driver_id=7, balance="300.00")],
+            [installment(n, 1, "100.00") for n in range(1, 4)],
+        )
+
+        with self.assertRaises(DriverLoanPostingException):
+            run_posting(db, batch_size=2, fail_on_batch=2)
+
+        self.assertEqual([row["status"] for row in db.installments.values()], ["Posted", "Posted", "Due"])
+        self.assertEqual(db.loans[1]["total_principal_paid"], Decimal("200.00"))
+
+        result, _, _ = run_posting(db, batch_size=2)
+
+        self.assertEqual(result.posted_count, 1)
+        self.assertEqual(len(db.postings), 3)
+        self.assertEqual((db.loans[1]["outstanding_balance"], db.loans[1]["status"]), (Decimal("0.00"), "Closed"))
+
+    def test_zero_amount_installments_are_waived(self):
+        db = FakeDatabase(
+            [loan(1, driver_id=7, balance="100.00")],
+            [installment(1, 1, "100.00"), installment(2, 1, "0.00")],
+        )
+
+        result, repo, _ = run_posting(db, batch_size=10)
+
+        self.assertEqual([p["reference_id"] for p in db.postings], ["DLN2025-001-01"])
+        self.assertEqual(
+            {row["id"]: (row["status"], row["ledger_posting_ref"]) for row in db.installments.values()},
+            {1: ("Posted", "POST-1"), 2: ("Waived", None)},
+        )
+        self.assertIsNotNone(db.installments[2]["posting_date"])
+        self.assertEqual(
+            [(d["installment_id"], d["status"]) for d in result.details],
+            [("DLN2025-001-01", "Posted"), ("DLN2025-001-02", "Waived")],
+        )
+        self.assertEqual((result.total_processed, result.posted_count, result.failed_count), (2, 1, 0))
+        # A waived installment no longer keeps its loan open
+        self.assertEqual(db.loans[1]["status"], "Closed")
+        self.assertEqual(db.logs[0]["details"], "Posted 1, Waived 1, Closed 1")
+
+
+class SyncSession:
+    """Runs the repository's statements on a SQLite connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        return self.connection.execute(statement, params)
+
+
+class TestLoanPostingStatements(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        self.connection = engine.connect()
+        self.addCleanup(self.connection.close)
+        for table in (DriverLoan.__table__, DriverLoanInstallment.__table__):
+            table.create(self.connection)
+        self.db = SyncSession(self.connection)
+        self.repo = DriverLoanRepository(self.db)
+
+    def insert(self, loans, installments):
+        for row in loans:
+            self.connection.execute(DriverLoan.__table__.insert().values(
+                **row, loan_amount=Decimal("300.00"), loan_date=SUNDAY, start_week=SUNDAY,
+            ))
+        for row in installments:
+            self.connection.execute(DriverLoanInstallment.__table__.insert().values(
+                **row, installment_number=row["id"], week_end_date=row["week_start_date"] + timedelta(days=6),
+                outstanding_principal=row["principal_amount"], remaining_balance=Decimal("0.00"), payment_date=SUNDAY,
+            ))
+
+    def loans(self):
+        table = DriverLoan.__table__
+        return {row.id: row for row in self.connection.execute(select(table))}
+
+    def test_due_rows_walk_in_id_order(self):
+        self.insert(
+            [loan(1, driver_id=7, balance="300.00")],
+            [installment(n, 1, "10.00", status=status, week=week)
+             for n, (status, week) in enumerate([("Due", 0), ("Posted", 0), ("Due", 1), ("Due", -1), ("Due", 0)], 1)],
+        )
+
+        first = asyncio.run(self.repo.get_due_installment_rows(SUNDAY, limit=2))
+        rest = asyncio.run(self.repo.get_due_installment_rows(SUNDAY, after_id=first[-1].id, limit=2))
+
+        self.assertEqual([row.id for row in first], [1, 4])
+        self.assertEqual([row.id for row in rest], [5])
+        self.assertEqual(
+            (first[0].loan_number, first[0].driver_id, first[0].medallion_id, first[0].lease_id, first[0].total_due),
+            ("DLN2025-001", 7, 57, 77, Decimal("10.00")),
+        )
+
+    def test_installments_and_loans_are_updated_with_one_statement_each(self):
+        self.insert(
+            [loan(1, driver_id=7, balance="300.00"), loan(2, driver_id=8, balance="50.00")],
+            [installment(n, 1, "10.00", status="Due") for n in (1, 2)],
+        )
+
+        asyncio.run(self.repo.bulk_update_installments([
+            {"id": 1, "status": "Posted", "ledger_posting_ref": "POST-1"},
+            {"id": 2, "status": "Waived", "ledger_posting_ref": None},
+        ]))
+        asyncio.run(self.repo.apply_loan_payments({
+            1: (Decimal("110.00"), Decimal("6.25")), 2: (Decimal("50.00"), Decimal("0.00")),
+        }))
+
+        self.assertEqual(len(self.db.statements), 2)
+        installments = DriverLoanInstallment.__table__
+        self.assertEqual(
+            self.connection.execute(select(installments.c.status, installments.c.ledger_posting_ref).order_by(installments.c.id)).all(),
+            [("Posted", "POST-1"), ("Waived", None)],
+        )
+        loans = self.loans()
+        self.assertEqual(
+            (loans[1].total_principal_paid, loans[1].total_interest_paid, loans[1].outstanding_balance),
+            (Decimal("110.00"), Decimal("6.25"), Decimal("190.00")),
+        )
+        self.assertEqual(loans[2].outstanding_balance, Decimal("0.00"))
+
+    def test_close_completed_loans(self):
+        self.insert(
+            [
+                loan(1, driver_id=7, balance="0.00"),
+                loan(2, driver_id=7, balance="0.00"),
+                loan(3, driver_id=7, balance="0.00"),
+                loan(4, driver_id=7, balance="10.00"),
+                loan(5, driver_id=7, balance="0.00", status="Hold"),
+                loan(6, driver_id=7, balance="-0.01"),
+            ],
+            [
+                installment(1, 1, "10.00", status="Posted"),
+                installment(2, 1, "0.00", status="Waived"),
+                installment(3, 2, "10.00", status="Due"),
+                installment(4, 3, "10.00", status="Scheduled", week=5),
+                installment(5, 4, "10.00", status="Posted"),
+                installment(6, 5, "10.00", status="Posted"),
+                installment(7, 6, "10.00", status="Paid"),
+            ],
+        )
+
+        closed = asyncio.run(self.repo.close_completed_loans())
+
+        self.assertEqual(closed, 2)
+        self.assertEqual(
+            {loan_id: row.status for loan_id, row in self.loans().items()},
+            {1: "Closed", 2: "Open", 3: "Open", 4: "Open", 5: "Hold", 6: "Closed"},
+        )
+        self.assertEqual(asyncio.run(self.repo.close_completed_loans()), 0)
+
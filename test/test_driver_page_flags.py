@@ -0,0 +1,130 @@
+import random
+import unittest
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import and_, create_engine, exists, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.bpm.models import Case  # noqa: F401  audit_trail.case_id references cases
+from app.audit_trail.models import RELATED_ENTITY_KEYS, AuditTrail, AuditTrailLink
+from app.core.db import Base
+from app.drivers.search_service import get_driver_page_flags
+from app.leases.models import Lease, LeaseDriver
+from app.uploads.models import Document
+from app.vehicles.models import Vehicle
+
+AUDITS, LINKS, DOCUMENTS = AuditTrail.__table__, AuditTrailLink.__table__, Document.__table__
+LEASE_DRIVERS, LEASES, VEHICLES = LeaseDriver.__table__, Lease.__table__, Vehicle.__table__
+
+
+def per_driver_flags(db, driver):
+    """The four queries get_formatted_drivers used to run for each driver"""
+    current_date = func.current_date()
+    audit_trail = db.execute(
+        select(func.count()).select_from(AUDITS)
+        .where(func.json_extract(AUDITS.c.meta_data, "$.driver_id") == driver.id)
+    ).scalar()
+    has_documents = db.execute(
+        select(func.count()).select_from(DOCUMENTS)
+        .where(DOCUMENTS.c.object_lookup_id == driver.id, DOCUMENTS.c.object_type == "driver")
+    ).scalar()
+    has_vehicle = db.execute(select(exists().where(and_(
+        LEASE_DRIVERS.c.driver_id == driver.driver_id,
+        LEASES.c.id == LEASE_DRIVERS.c.lease_id,
+        VEHICLES.c.id == LEASES.c.vehicle_id,
+        LEASES.c.is_active == True,
+    )))).scalar()
+    has_active_lease = db.execute(select(exists().where(and_(
+        LEASE_DRIVERS.c.driver_id == driver.driver_id,
+        LEASES.c.id == LEASE_DRIVERS.c.lease_id,
+        LEASES.c.lease_start_date <= current_date,
+        LEASES.c.is_active == True,
+        or_(LEASES.c.lease_end_date >= current_date, LEASES.c.lease_end_date.is_(None)),
+    )))).scalar()
+    return bool(audit_trail), has_documents, bool(has_vehicle), bool(has_active_lease)
+
+
+def page_flags(flags, driver):
+    """How get_formatted_drivers reads one driver's flags from the page flags"""
+    return (
+        driver.id in flags["audit_trail"],
+        flags["document_counts"].get(str(driver.id), 0),
+        driver.driver_id in flags["vehicle"],
+        driver.driver_id in flags["active_lease"],
+    )
+
+
+class TestDriverPageFlags(unittest.TestCase):
+    def setUp(self):
+        self.db = self.new_database()
+
+    def new_database(self):
+        engine = create_engine("sqlite://")
+        self.addCleanup(engine.dispose)
+        Base.metadata.create_all(engine, tables=[AUDITS, LINKS, DOCUMENTS, VEHICLES, LEASES, LEASE_DRIVERS])
+        db = Session(engine)
+        self.addCleanup(db.close)
+        return db
+
+    def seed(self, rng, driver_count):
+        today = date.today()
+        audits, links = [], []
+        for audit_id in range(1, rng.randrange(2, 30)):
+            meta_data = {key: rng.randrange(1, driver_count + 3) for key in rng.sample(RELATED_ENTITY_KEYS, 2)}
+            timestamp = datetime(2025, 3, 1) + timedelta(minutes=audit_id)
+            audits.append({"id": audit_id, "case_id": 1, "case_type": "Driver", "meta_data": meta_data,
+                           "timestamp": timestamp, "audit_trail_type": "AUTOMATED"})
+            # What AuditTrailService.sync_audit_links writes for the entry
+            links += [
+                {"audit_trail_id": audit_id, "entity_type": key, "entity_id": value, "audit_timestamp": timestamp}
+                for key, value in meta_data.items()
+            ]
+        documents = [
+            {"object_type": rng.choice(["driver", "vehicle"]), "object_lookup_id": str(rng.randrange(1, driver_count + 3))}
+            for _ in range(rng.randrange(20))
+        ]
+        vehicles = [{"id": vehicle_id} for vehicle_id in range(1, 4)]
+        leases = [
+            {
+                "id": lease_id, "vehicle_id": rng.choice([None, 1, 2, 3, 9]), "is_active": rng.random() < 0.7,
+                "lease_start_date": today + timedelta(days=rng.randrange(-30, 3)),
+                "lease_end_date": rng.choice([None, today + timedelta(days=rng.randrange(-10, 30))]),
+            }
+            for lease_id in range(1, rng.randrange(2, 12))
+        ]
+        lease_drivers = [
+            {"driver_id": f"DRV{rng.randrange(1, driver_count + 3):04d}", "lease_id": rng.choice(leases)["id"]}
+            for _ in range(rng.randrange(15))
+        ]
+        for table, rows in ((AUDITS, audits), (LINKS, links), (DOCUMENTS, documents), (VEHICLES, vehicles),
+                            (LEASES, leases), (LEASE_DRIVERS, lease_drivers)):
+            if rows:
+                self.db.execute(table.insert(), rows)
+
+    def test_matches_per_driver_queries(self):
+        rng = random.Random(18)
+        for case in range(30):
+            with self.subTest(case=case):
+                self.db = self.new_database()
+                driver_count = rng.randrange(1, 10)
+                self.seed(rng, driver_count)
+                drivers = [SimpleNamespace(id=n, driver_id=f"DRV{n:04d}") for n in range(1, driver_count + 1)]
+
+                flags = get_driver_page_flags(self.db, drivers)
+
+                self.assertEqual(
+                    [page_flags(flags, driver) for driver in drivers],
+                    [per_driver_flags(self.db, driver) for driver in drivers],
+                )
+
+    def test_other_entity_links_do_not_flag_a_driver(self):
+        timestamp = datetime(2025, 3, 1)
+        self.db.execute(AUDITS.insert(), [{"id": 1, "case_id": 1, "case_type": "Driver", "timestamp": timestamp,
+                                          "audit_trail_type": "AUTOMATED", "meta_data": {"vehicle_id": 7}}])
+        self.db.execute(LINKS.insert(), [{"audit_trail_id": 1, "entity_type": "vehicle_id", "entity_id": 7,
+                                          "audit_timestamp": timestamp}])
+
+        flags = get_driver_page_flags(self.db, [SimpleNamespace(id=7, driver_id="DRV0007")])
+
+        self.assertEqual(flags, {"audit_trail": set(), "document_counts": {}, "vehicle": set(), "active_lease": set()})
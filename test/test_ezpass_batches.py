@@ -0,0 +1,258 @@
+import asyncio
+import unittest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.ezpass import services as ezpass_services
+from app.ezpass.services import EZPASS_REFERENCE_TYPE, EZPassService
+from app.ledger.exceptions import InvalidLedgerEntryException
+from app.ledger.ids import ledger_ids
+from app.ledger.schemas import LedgerCategory
+from app.ledger.services import LedgerService
+from app.vehicles.plate_index import PlateResolution
+
+ON = date(2025, 3, 1)
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+    async def refresh(self, row):
+        pass
+
+
+class FakeEZPassRepository:
+    """Transactions by id, with the batch reads and grouped writes the service uses"""
+
+    def __init__(self, transactions):
+        self.db = FakeSession()
+        self.transactions = {t.id: t for t in transactions}
+        self.reads, self.logs = [], []
+
+    def _batch(self, status, after_id, limit):
+        rows = sorted((t for t in self.transactions.values() if t.status == status and t.id > after_id), key=lambda t: t.id)
+        self.reads.append([t.id for t in rows[:limit]])
+        return [SimpleNamespace(**vars(t)) for t in rows[:limit]]
+
+    async def get_unassociated_transaction_keys(self, after_id=0, limit=5000):
+        return self._batch("Imported", after_id, limit)
+
+    async def get_unposted_transaction_rows(self, after_id=0, limit=5000):
+        return self._batch("Associated", after_id, limit)
+
+    async def bulk_update_transactions(self, transaction_rows):
+        for row in transaction_rows:
+            vars(self.transactions[row["id"]]).update({k: v for k, v in row.items() if k != "id"})
+        return len(transaction_rows)
+
+    async def update_transactions_by_ids(self, transaction_ids, values):
+        for transaction_id in transaction_ids:
+            vars(self.transactions[transaction_id]).update(values)
+        return len(transaction_ids)
+
+    async def create_log(self, log_data):
+        log = SimpleNamespace(id=1, **log_data.model_dump())
+        self.logs.append(log)
+        return log
+
+    async def update_log(self, log, **kwargs):
+        vars(log).update(kwargs)
+        return log
+
+
+def transaction(transaction_id, plate_no, status="Imported", **fields):
+    values = dict(
+        id=transaction_id, plate_no=plate_no, transaction_date=ON, status=status,
+        driver_id=None, vehicle_id=None, medallion_no=None, amount=Decimal("6.94"),
+        agency="MTA", entry_plaza="A", exit_plaza="B",
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+def per_transaction_association(transaction, resolution):
+    """The fields the per-transaction loop set on each transaction"""
+    if not resolution or not resolution.has_lease:
+        return {"status": "Failed", "associate_failed_reason": f"No active lease found for plate: {transaction.plate_no}"}
+    return {
+        "status": "Associated",
+        "driver_id": resolution.driver_id,
+        "vehicle_id": resolution.vehicle_id,
+        "medallion_no": resolution.medallion_no,
+        "associate_failed_reason": None,
+    }
+
+
+class TestAssociateTransactions(unittest.TestCase):
+    def test_batches_match_per_transaction_association(self):
+        resolutions = {
+            ("T100", ON): PlateResolution(vehicle_id=1, medallion_id=5, medallion_no="5M", lease_id=10, driver_id=99),
+            ("T200", ON): PlateResolution(vehicle_id=2),
+            ("T300", ON): None,
+        }
+        plates = ["T100", "T200", "T300", "T100", None, "T100"]
+        repo = FakeEZPassRepository([transaction(n + 1, plate) for n, plate in enumerate(plates)])
+        expected = {
+            t.id: per_transaction_association(t, resolutions.get((t.plate_no, t.transaction_date)))
+            for t in repo.transactions.values()
+        }
+
+        async def resolve(db, pairs):
+            return {pair: resolutions.get(pair) for pair in pairs}
+
+        with mock.patch.object(ezpass_services.plate_resolver, "resolve", side_effect=resolve):
+            result = asyncio.run(EZPassService(repo).associate_transactions(batch_size=4))
+
+        for transaction_id, fields in expected.items():
+            with self.subTest(transaction_id=transaction_id):
+                row = vars(repo.transactions[transaction_id])
+                self.assertEqual({key: row[key] for key in fields}, fields)
+        self.assertEqual((result.total_processed, result.associated_count, result.failed_count), (6, 3, 3))
+        self.assertEqual(repo.reads, [[1, 2, 3, 4], [5, 6], []])
+        # Initial log, one commit per batch, final status
+        self.assertEqual(repo.db.commits, 4)
+        log = repo.logs[0]
+        self.assertEqual((log.status, log.records_impacted, log.success_count, log.unidentified_count), ("Partial", 6, 3, 3))
+
+    def test_empty_backlog(self):
+        repo = FakeEZPassRepository([])
+
+        with mock.patch.object(ezpass_services.plate_resolver, "resolve") as resolve:
+            result = asyncio.run(EZPassService(repo).associate_transactions())
+
+        resolve.assert_not_called()
+        self.assertEqual(result.message, "No unassociated transactions found")
+        self.assertEqual(repo.logs[0].status, "Success")
+
+
+class TestPostTransactions(unittest.TestCase):
+    def test_posts_leased_transactions_and_groups_failures(self):
+        repo = FakeEZPassRepository([
+            transaction(1, "T100", status="Associated", driver_id=99, vehicle_id=1),
+            transaction(2, "T200", status="Associated", driver_id=98, vehicle_id=2),
+            transaction(3, "T100", status="Associated", driver_id=None, vehicle_id=1),
+            transaction(4, "T100", status="Associated", driver_id=99, vehicle_id=1, amount=Decimal("0")),
+            transaction(5, "T100", status="Associated", driver_id=99, vehicle_id=1),
+        ])
+        leases = {(1, ON): SimpleNamespace(lease_id=10, medallion_id=5)}
+
+        async def leases_on(db, pairs):
+            return {pair: leases[pair] for pair in pairs if pair in leases}
+
+        with mock.patch.object(ezpass_services.plate_resolver, "leases_on", side_effect=leases_on), \
+                mock.patch.object(LedgerService, "create_obligation_postings_batch", return_value={}) as create:
+            result = asyncio.run(EZPassService(repo).post_transactions_to_ledger(batch_size=3))
+
+        self.assertEqual({t.id: t.status for t in repo.transactions.values()}, {
+            1: "Posted", 2: "Failed", 3: "Failed", 4: "Failed", 5: "Posted",
+        })
+        self.assertEqual(
+            {t.id: t.post_failed_reason for t in repo.transactions.values() if t.status == "Failed"},
+            {
+                2: "No lease data found for posting",
+                3: "No driver associated with transaction",
+                4: "Amount must be positive",
+            },
+        )
+        self.assertEqual((result.posted_count, result.failed_count), (2, 3))
+
+        batches = [call.args for call in create.call_args_list]
+        self.assertEqual([[o["reference_id"] for o in args[2]] for args in batches], [["1"], ["5"]])
+        self.assertEqual({args[:2] for args in batches}, {(LedgerCategory.EZPASS, EZPASS_REFERENCE_TYPE)})
+        obligation = batches[0][2][0]
+        self.assertEqual(
+            {key: obligation[key] for key in ("amount", "driver_id", "vehicle_id", "plate", "medallion_id", "lease_id")},
+            {"amount": Decimal("6.94"), "driver_id": 99, "vehicle_id": 1, "plate": "T100", "medallion_id": 5, "lease_id": 10},
+        )
+        self.assertEqual(obligation["description"], "EZPass - MTA - T100 (Entry: A, Exit: B)")
+
+
+class FakeLedgerRepository:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.postings, self.balances, self.deltas = [], [], []
+
+    async def get_existing_balance_references(self, reference_ids, reference_type):
+        return {reference_id for reference_id in reference_ids if reference_id in self.existing}
+
+    async def bulk_insert_postings(self, rows):
+        self.postings.extend(rows)
+
+    async def bulk_insert_balances(self, rows):
+        self.balances.extend(rows)
+
+    async def apply_balance_summary_deltas(self, deltas):
+        self.deltas.append(deltas)
+
+
+class TestCreateObligationPostingsBatch(unittest.TestCase):
+    def create(self, obligations, existing=(), category=LedgerCategory.EZPASS):
+        service = LedgerService(db=None)
+        service.repo = FakeLedgerRepository(existing)
+        with mock.patch.object(ledger_ids, "posting_ids", side_effect=lambda n: [f"P{i}" for i in range(n)]), \
+                mock.patch.object(ledger_ids, "balance_ids", side_effect=lambda category, n: [f"B{i}" for i in range(n)]):
+            created = asyncio.run(service.create_obligation_postings_batch(category, "TEST", obligations, created_by=7))
+        return created, service.repo
+
+    def test_rows_match_single_obligation_posting(self):
+        obligation = {
+            "reference_id": "1", "amount": Decimal("6.94"), "driver_id": 99, "vehicle_id": 1,
+            "plate": "T100", "medallion_id": 5, "lease_id": 10, "transaction_date": ON, "description": "Toll",
+        }
+
+        created, repo = self.create([obligation])
+
+        self.assertEqual(created, {"1": "P0"})
+        (posting,), (balance,) = repo.postings, repo.balances
+        linkage = {
+            "category": "EZPass", "driver_id": 99, "vehicle_id": 1, "vin": None, "plate": "T100",
+            "medallion_id": 5, "lease_id": 10, "reference_id": "1", "reference_type": "TEST",
+            "description": "Toll", "created_by": 7, "modified_by": 7,
+        }
+        # The columns create_obligation_posting sets on its LedgerPosting and LedgerBalance
+        self.assertEqual({key: posting[key] for key in linkage}, linkage)
+        self.assertEqual(
+            {key: posting[key] for key in ("posting_id", "entry_type", "amount", "status", "transaction_date")},
+            {"posting_id": "P0", "entry_type": "Debit", "amount": Decimal("6.94"), "status": "Posted", "transaction_date": ON},
+        )
+        self.assertEqual({key: balance[key] for key in linkage}, linkage)
+        self.assertEqual(
+            {key: balance[key] for key in ("balance_id", "original_amount", "prior_balance", "payment", "balance", "status", "obligation_date")},
+            {
+                "balance_id": "B0", "original_amount": Decimal("6.94"), "prior_balance": Decimal("0.00"),
+                "payment": Decimal("0.00"), "balance": Decimal("6.94"), "status": "Open", "obligation_date": ON,
+            },
+        )
+
+    def test_skips_existing_references_and_sums_deltas(self):
+        obligations = [
+            {"reference_id": str(n), "amount": Decimal(amount), "driver_id": driver_id}
+            for n, (driver_id, amount) in enumerate([(1, "2.00"), (1, "3.50"), (2, "4.00"), (1, "9.99")])
+        ]
+
+        created, repo = self.create(obligations, existing={"3"})
+
+        self.assertEqual(created, {"0": "P0", "1": "P1", "2": "P2"})
+        self.assertEqual(repo.deltas, [{(1, "EZPass"): (Decimal("5.50"), 2), (2, "EZPass"): (Decimal("4.00"), 1)}])
+        self.assertEqual({row["obligation_date"] for row in repo.balances}, {date.today()})
+
+    def test_all_existing_writes_nothing(self):
+        created, repo = self.create([{"reference_id": "1", "amount": Decimal("1"), "driver_id": 1}], existing={"1"})
+
+        self.assertEqual(created, {})
+        self.assertEqual((repo.postings, repo.balances, repo.deltas), ([], [], []))
+
+    def test_rejects_non_positive_amounts_and_earnings(self):
+        with self.assertRaises(InvalidLedgerEntryException):
+            self.create([{"reference_id": "1", "amount": Decimal("0"), "driver_id": 1}])
+        with self.assertRaises(InvalidLedgerEntryException):
+            self.create([], category=LedgerCategory.EARNINGS)
@@ -0,0 +1,132 @@
+import random
+import re
+import unittest
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pandas as pd
+
+from app.ezpass.utils import DATE_FORMATS, FIELD_ALIASES, REQUIRED_FIELDS, TIME_FORMATS, _parse_amount, validate_ezpass_frame
+
+COLUMNS = ["Lane Txn ID", "Tag/Plate #", "Agency", "Entry Plaza", "Exit Plaza", "Class", "Date", "Exit Time", "Amount"]
+POOLS = {
+    "Lane Txn ID": ["T1", "T2", None, ""],
+    "Tag/Plate #": ["ABC1234", "T100", None, ""],
+    "Agency": ["MTA", "PANYNJ", None],
+    "Entry Plaza": ["GWB", None],
+    "Exit Plaza": ["LIN", None],
+    "Class": ["1", "2", None],
+    "Date": ["2025-10-11", "10/11/2025", "31/12/2025", "2025/01/02", "20251011", "13.10.2025", "2025-13-45",
+             "nope", 45215, 45215.0, date(2025, 3, 1), None, ""],
+    "Exit Time": ["14:30:00", "14:30", "2:30 PM", "02:30:05 PM", "bad", 0.5, 0.25, time(8, 15), None],
+    "Amount": ["$5.50", "1,234.56", "(2.50)", "-3", "abc", "nan", 7, 7.25, Decimal("1.10"), None],
+}
+
+
+def per_row_validation(records):
+    """The per-row loop validate_ezpass_frame replaced (_validate_rows and its parsers)"""
+    def normalize(row):
+        return {
+            re.sub(r"[^a-z0-9]+", "_", key.lower()).strip("_"): None if value in ("", "nan") else value
+            for key, value in row.items()
+        }
+
+    def get(row, field, default=None):
+        return next((row[k] for k in FIELD_ALIASES[field] if row.get(k) not in (None, "", "nan", "NaN")), default)
+
+    def parse_date(value):
+        if isinstance(value, date):
+            return value
+        if isinstance(value, (int, float)):
+            return pd.to_datetime(value, unit="D", origin="1899-12-30").date()
+        if isinstance(value, str):
+            for fmt in DATE_FORMATS:
+                try:
+                    return datetime.strptime(value.strip(), fmt).date()
+                except ValueError:
+                    continue
+        raise ValueError(f"Invalid date format: {value}")
+
+    def parse_time(value):
+        if isinstance(value, time):
+            return value
+        if isinstance(value, float):
+            seconds = value * 86400
+            return time(int(seconds // 3600), int((seconds % 3600) // 60), int(seconds % 60))
+        if isinstance(value, str):
+            for fmt in TIME_FORMATS:
+                try:
+                    return datetime.strptime(value.strip(), fmt).time()
+                except ValueError:
+                    continue
+        return None
+
+    rows, errors = [], []
+    for idx, raw in enumerate(records, start=1):
+        row = normalize(raw)
+        if not any(value is not None for value in row.values()):
+            continue
+        try:
+            for field in REQUIRED_FIELDS:
+                if not row.get(field):
+                    raise ValueError(f"Missing required field: {field}")
+            rows.append({
+                "transaction_id": get(row, "transaction_id"),
+                "transaction_date": parse_date(get(row, "transaction_date")),
+                "transaction_time": parse_time(get(row, "transaction_time")),
+                "plate_no": get(row, "plate_no"),
+                "tag_or_plate": get(row, "tag_or_plate", ""),
+                "agency": get(row, "agency"),
+                "entry_plaza": get(row, "entry_plaza"),
+                "exit_plaza": get(row, "exit_plaza"),
+                "vehicle_class": get(row, "vehicle_class"),
+                "amount": _parse_amount(get(row, "amount")),
+            })
+        except ValueError as e:
+            errors.append(f"Row {idx} validation failed: {e}")
+    return rows, errors
+
+
+class TestValidateEZPassFrame(unittest.TestCase):
+    def test_matches_per_row_validation(self):
+        rng = random.Random(23)
+        for case in range(60):
+            records = [
+                {column: rng.choice(POOLS[column]) for column in COLUMNS}
+                for _ in range(rng.randrange(1, 25))
+            ]
+            with self.subTest(case=case):
+                self.assertEqual(
+                    validate_ezpass_frame(pd.DataFrame(records, columns=COLUMNS, dtype=object)),
+                    per_row_validation(records),
+                )
+
+    def test_row_numbers_continue_across_chunks(self):
+        frame = pd.DataFrame([{"Date": "bad", "Amount": "1", "Tag/Plate #": "P1"}])
+
+        _, errors = validate_ezpass_frame(frame, first_row=5001)
+
+        self.assertEqual(errors, ["Row 5001 validation failed: Invalid date format: bad"])
+
+    def test_missing_required_column(self):
+        frame = pd.DataFrame([{"Date": "2025-10-11", "Amount": "1.00"}])
+
+        rows, errors = validate_ezpass_frame(frame)
+
+        self.assertEqual(rows, [])
+        self.assertEqual(errors, ["Row 1 validation failed: Missing required field: tag_plate"])
+
+    def test_valid_row(self):
+        frame = pd.DataFrame([{
+            "Lane Txn ID": "987", "Tag/Plate #": "T100", "Agency": "MTA", "Date": "10/11/2025",
+            "Exit Time": "2:30 PM", "Amount": "($6.94)",
+        }])
+
+        rows, errors = validate_ezpass_frame(frame)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(rows, [{
+            "transaction_id": "987", "transaction_date": date(2025, 10, 11), "transaction_time": time(14, 30),
+            "plate_no": "T100", "tag_or_plate": "T100", "agency": "MTA", "entry_plaza": None,
+            "exit_plaza": None, "vehicle_class": None, "amount": -6.94,
+        }])
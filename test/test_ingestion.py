@@ -0,0 +1,129 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app.utils import ingestion
+from app.utils.ingestion import is_supported_file, iter_frames, remove_spooled, spool_upload
+
+HEADER = ["Lane Txn ID", "Tag/Plate #", "Date", "Amount"]
+ROWS = [[f"T{n}", f"P{n % 7}", f"03/{n % 28 + 1:02d}/2025", f"{n}.25"] for n in range(23)]
+
+
+def whole_file_rows(path):
+    """The old CSV read: the whole upload through csv.DictReader"""
+    with open(path, encoding="utf-8-sig", newline="") as handle:
+        return [row for row in csv.DictReader(handle) if any(row.values())]
+
+
+class TestIterFrames(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_csv(self, rows, name="upload.csv"):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8-sig", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def write_xlsx(self, rows):
+        path = os.path.join(self.directory, "upload.xlsx")
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+        return path
+
+    def test_csv_chunks_match_whole_file_read(self):
+        rows = ROWS[:10] + [["", "", "", ""]] + ROWS[10:]
+        path = self.write_csv(rows)
+        expected = whole_file_rows(path)
+
+        for chunk_size in (1, 4, 23, 100):
+            with self.subTest(chunk_size=chunk_size):
+                frames = list(iter_frames(path, chunk_size))
+
+                self.assertTrue(all(len(frame) <= chunk_size for frame in frames))
+                self.assertEqual([r for frame in frames for r in frame.to_dict("records")], expected)
+
+    def test_csv_values_are_strings(self):
+        frame = next(iter_frames(self.write_csv([["T1", "P1", "03/01/2025", ""]])))
+
+        self.assertEqual(list(frame.columns), HEADER)
+        self.assertEqual(frame.iloc[0].tolist(), ["T1", "P1", "03/01/2025", ""])
+
+    def test_xlsx_chunks_match_whole_sheet_read(self):
+        rows = [[n, f"P{n}", pd.Timestamp(2025, 3, n % 28 + 1).to_pydatetime(), n + 0.25] for n in range(11)]
+        path = self.write_xlsx(rows[:5] + [[None, None, None, None]] + rows[5:])
+        expected = pd.read_excel(path).dropna(how="all").to_dict("records")
+
+        for chunk_size in (1, 3, 11):
+            with self.subTest(chunk_size=chunk_size):
+                frames = list(iter_frames(path, chunk_size))
+
+                self.assertEqual([len(frame) for frame in frames][:-1], [chunk_size] * (len(frames) - 1))
+                self.assertEqual([r for frame in frames for r in frame.to_dict("records")], expected)
+
+    def test_xlsx_short_rows_are_padded(self):
+        path = self.write_xlsx([["T1", "P1"]])
+
+        (frame,) = iter_frames(path, 10)
+
+        self.assertEqual(frame.iloc[0].tolist(), ["T1", "P1", None, None])
+
+    def test_header_only_files_yield_nothing(self):
+        self.assertEqual(list(iter_frames(self.write_csv([]))), [])
+        self.assertEqual(list(iter_frames(self.write_xlsx([]))), [])
+
+    def test_default_chunk_size_comes_from_settings(self):
+        path = self.write_csv(ROWS)
+
+        with mock.patch.object(ingestion.settings, "ingestion_chunk_size", 10):
+            self.assertEqual([len(frame) for frame in iter_frames(path)], [10, 10, 3])
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(ValueError):
+            list(iter_frames(os.path.join(self.directory, "upload.txt")))
+
+
+class TestSpoolUpload(unittest.TestCase):
+    def test_copies_upload_and_keeps_extension(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        content = b"Date,Amount\n" + b"03/01/2025,1.00\n" * 5000
+        upload = SimpleNamespace(filename="Tolls.CSV", file=io.BytesIO(content))
+        upload.file.read(10)
+
+        with mock.patch.object(ingestion.settings, "ingestion_spool_dir", directory), \
+                mock.patch.object(ingestion, "SPOOL_BLOCK_SIZE", 1024):
+            path = spool_upload(upload, prefix="ezpass-")
+
+        self.assertEqual(os.path.dirname(path), directory)
+        self.assertTrue(os.path.basename(path).startswith("ezpass-"))
+        self.assertTrue(path.endswith(".csv"))
+        with open(path, "rb") as spooled:
+            self.assertEqual(spooled.read(), content)
+
+        remove_spooled(path)
+        self.assertFalse(os.path.exists(path))
+        remove_spooled(path)
+        remove_spooled(None)
+
+    def test_supported_files(self):
+        self.assertTrue(is_supported_file("tolls.CSV"))
+        self.assertTrue(is_supported_file("tolls.xlsx"))
+        self.assertTrue(is_supported_file("tolls.xls"))
+        self.assertFalse(is_supported_file("tolls.txt"))
+        self.assertFalse(is_supported_file(None))
@@ -0,0 +1,224 @@
+import asyncio
+import random
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import Column, Integer, MetaData, Table, bindparam, create_engine, func, insert, select, update
+from sqlalchemy.dialects import mysql
+
+from app.ledger.models import LedgerBalance, LedgerBalanceSummary, LedgerPosting
+from app.ledger.repository import LedgerRepository
+from app.ledger.services import PAYMENT_HIERARCHY, LedgerService
+
+CATEGORIES = [category.value for category in PAYMENT_HIERARCHY]
+BALANCES = LedgerBalance.__table__
+SUMMARIES = LedgerBalanceSummary.__table__
+
+
+def ledger_metadata():
+    """The ledger tables plus bare parents for their foreign keys"""
+    metadata = MetaData()
+    for parent in ("users", "drivers", "vehicles", "medallions", "leases"):
+        Table(parent, metadata, Column("id", Integer, primary_key=True))
+    for model in (LedgerPosting, LedgerBalance, LedgerBalanceSummary):
+        model.__table__.to_metadata(metadata)
+    return metadata
+
+
+class ConnectionSession:
+    """The AsyncSession calls apply_balance_summary_deltas makes, on a sync connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_bind(self):
+        return self.connection.engine
+
+    async def execute(self, *args, **kwargs):
+        return self.connection.execute(*args, **kwargs)
+
+
+class TestSummaryMatchesRawAggregate(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        ledger_metadata().create_all(self.engine)
+        self.connection = self.engine.connect()
+        self.repo = LedgerRepository(ConnectionSession(self.connection))
+        self.service = LedgerService(db=None)
+        self.rng = random.Random(8)
+        self.next_id = 1
+
+    def tearDown(self):
+        self.connection.close()
+        self.engine.dispose()
+
+    def raw_aggregate(self):
+        """What driver summaries computed before the summary table existed"""
+        rows = self.connection.execute(
+            select(BALANCES.c.driver_id, BALANCES.c.category, func.sum(BALANCES.c.balance), func.count())
+            .where(BALANCES.c.status == "Open")
+            .group_by(BALANCES.c.driver_id, BALANCES.c.category)
+        )
+        return {(driver_id, category): (total, count) for driver_id, category, total, count in rows}
+
+    def summary(self):
+        rows = self.connection.execute(
+            select(SUMMARIES.c.driver_id, SUMMARIES.c.category, SUMMARIES.c.total_due, SUMMARIES.c.open_count)
+        )
+        return {
+            (driver_id, category): (total, count)
+            for driver_id, category, total, count in rows
+            if total or count
+        }
+
+    def apply(self, deltas):
+        asyncio.run(self.repo.apply_balance_summary_deltas(deltas))
+
+    def open_balances(self, driver_id=None):
+        stmt = select(BALANCES).where(BALANCES.c.status == "Open").order_by(BALANCES.c.id)
+        if driver_id is not None:
+            stmt = stmt.where(BALANCES.c.driver_id == driver_id)
+        return [SimpleNamespace(**row._mapping) for row in self.connection.execute(stmt)]
+
+    def add_obligations(self, count):
+        deltas = {}
+        for _ in range(count):
+            amount = Decimal(self.rng.randrange(100, 50000)) / 100
+            row = {
+                "id": self.next_id,
+                "balance_id": f"BAL-{self.next_id}",
+                "category": self.rng.choice(CATEGORIES),
+                "driver_id": self.rng.randrange(1, 5),
+                "reference_id": f"REF-{self.next_id}",
+                "reference_type": "TEST",
+                "original_amount": amount,
+                "prior_balance": Decimal("0.00"),
+                "payment": Decimal("0.00"),
+                "balance": amount,
+                "status": "Open",
+                "updated_on": datetime(2025, 3, 1),
+            }
+            self.next_id += 1
+            self.connection.execute(insert(BALANCES).values(row))
+            # create_obligation_postings_batch accumulates exactly this per key
+            key = (row["driver_id"], row["category"])
+            total, opened = deltas.get(key, (Decimal("0.00"), 0))
+            deltas[key] = (total + amount, opened + 1)
+        self.apply(deltas)
+
+    def pay_or_void(self, balance, amount, void_debit):
+        """Single-balance change, summarised the way apply_payment / void_posting do"""
+        before = self.service._open_position(balance)
+        balance.balance -= amount
+        if balance.balance <= Decimal("0.01"):
+            balance.balance, balance.status = Decimal("0.00"), "Closed"
+        if not void_debit:
+            balance.payment += amount
+        self.connection.execute(
+            update(BALANCES).where(BALANCES.c.id == balance.id)
+            .values(balance=balance.balance, payment=balance.payment, status=balance.status)
+        )
+        self.apply(self.service._summary_delta(balance, before))
+
+    def settle_earnings(self, earnings_by_driver):
+        posting_ids = iter(str(n) for n in range(10_000))
+        balance_rows, summary_deltas = [], {}
+        for driver_id, earnings in earnings_by_driver.items():
+            self.service._allocate_earnings(
+                driver_id=driver_id,
+                earnings_amount=earnings,
+                balances=self.open_balances(driver_id),
+                earnings_batch_id="WK",
+                transaction_date=None,
+                created_by=None,
+                posting_ids=posting_ids,
+                posting_rows=[],
+                balance_rows=balance_rows,
+                summary_deltas=summary_deltas,
+            )
+        if balance_rows:
+            self.connection.execute(
+                update(BALANCES).where(BALANCES.c.id == bindparam("row_id")).values(
+                    balance=bindparam("new_balance"), status=bindparam("new_status")
+                ),
+                [
+                    {"row_id": row["id"], "new_balance": row["balance"], "new_status": row["status"]}
+                    for row in balance_rows
+                ],
+            )
+        self.apply(summary_deltas)
+
+    def test_summary_tracks_obligations_payments_voids_and_earnings(self):
+        for step in range(40):
+            self.add_obligations(self.rng.randrange(0, 4))
+            open_rows = self.open_balances()
+            if open_rows and self.rng.random() < 0.6:
+                balance = self.rng.choice(open_rows)
+                amount = min(balance.balance, Decimal(self.rng.randrange(1, 30000)) / 100)
+                self.pay_or_void(balance, amount, void_debit=self.rng.random() < 0.3)
+            if step % 5 == 4:
+                self.settle_earnings({
+                    driver_id: Decimal(self.rng.randrange(1, 80000)) / 100 for driver_id in range(1, 5)
+                })
+
+            with self.subTest(step=step):
+                self.assertEqual(self.summary(), self.raw_aggregate())
+
+    def test_reopened_balance_counts_again(self):
+        self.add_obligations(1)
+        balance = self.open_balances()[0]
+        original = balance.balance
+        self.pay_or_void(balance, original, void_debit=False)
+        self.assertEqual(self.summary(), {})
+
+        # Voiding the payment reopens the balance (void_posting's credit branch)
+        before = self.service._open_position(balance)
+        balance.balance, balance.status = original, "Open"
+        self.connection.execute(
+            update(BALANCES).where(BALANCES.c.id == balance.id).values(balance=original, status="Open")
+        )
+        self.apply(self.service._summary_delta(balance, before))
+
+        self.assertEqual(self.summary(), {(balance.driver_id, balance.category): (original, 1)})
+        self.assertEqual(self.summary(), self.raw_aggregate())
+
+
+class CapturingSession:
+    def __init__(self):
+        self.statements = []
+
+    def get_bind(self):
+        return mock.Mock(dialect=mysql.dialect())
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+
+
+class TestApplyBalanceSummaryDeltas(unittest.TestCase):
+    def test_mysql_sends_one_upsert_adding_the_deltas(self):
+        db = CapturingSession()
+
+        written = asyncio.run(LedgerRepository(db).apply_balance_summary_deltas({
+            (2, "Loan"): (Decimal("-10.00"), -1),
+            (None, "Lease"): (Decimal("5.00"), 1),
+            (1, "Lease"): (Decimal("25.00"), 1),
+            (1, "Misc"): (Decimal("0.00"), 0),
+        }))
+
+        self.assertEqual(written, 2)
+        self.assertEqual(len(db.statements), 1)
+        sql = str(db.statements[0].compile(dialect=mysql.dialect()))
+        self.assertIn("ON DUPLICATE KEY UPDATE", sql)
+        self.assertIn("total_due = (ledger_balance_summaries.total_due + VALUES(total_due))", sql)
+        self.assertIn("open_count = (ledger_balance_summaries.open_count + VALUES(open_count))", sql)
+
+    def test_empty_deltas_write_nothing(self):
+        db = CapturingSession()
+
+        written = asyncio.run(LedgerRepository(db).apply_balance_summary_deltas({(1, "Lease"): (Decimal("0"), 0)}))
+
+        self.assertEqual(written, 0)
+        self.assertEqual(db.statements, [])
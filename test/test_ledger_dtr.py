@@ -0,0 +1,167 @@
+import random
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.ledger import tasks as ledger_tasks
+from app.ledger.dtr import assemble_dtr_data, build_dtr_data
+
+FROM, TO = date(2025, 3, 2), date(2025, 3, 8)
+CATEGORIES = ["Lease", "EZPass", "PVB", "Earnings", "InterimPayment", "Misc"]
+
+
+def random_chunk(rng, driver_ids):
+    """Chunk-wide rows in the order prefetch_dtr_data queries them"""
+    day = lambda: FROM + timedelta(days=rng.randrange(7))
+    owner = lambda: rng.choice(driver_ids + [999])
+    trips = sorted(
+        (SimpleNamespace(
+            id=n, driver_fk=owner(), start_date=day(), payment_type=rng.choice("C$"),
+            total_amount=rng.randrange(5, 90), tax=0.5, imp_tax=0.3, congestion_fee=rng.choice([0, 2.75]),
+            airport_fee=rng.choice([0, 1.75]), cbdt_fee=rng.choice([0, 0.75]),
+        ) for n in range(rng.randrange(40))),
+        key=lambda t: t.start_date,
+    )
+    tolls = [SimpleNamespace(id=n, driver_id=owner(), amount=Decimal("6.94")) for n in range(rng.randrange(10))]
+    tickets = [SimpleNamespace(id=n, driver_id=owner(), amount_due=Decimal("65")) for n in range(rng.randrange(5))]
+    postings = [
+        SimpleNamespace(
+            id=n, driver_id=owner(), category=(category := rng.choice(CATEGORIES)),
+            entry_type="Credit" if category in ("Earnings", "InterimPayment") or rng.random() < 0.3 else "Debit",
+            amount=Decimal(rng.randrange(1, 400)),
+        )
+        for n in range(rng.randrange(30))
+    ]
+    leases = sorted(
+        (SimpleNamespace(id=n, lease_start_date=FROM - timedelta(days=rng.randrange(60)),
+                         medallion_id=rng.choice([None, 1, 2]), vehicle_id=rng.choice([None, 10, 11]))
+         for n in range(rng.randrange(8))),
+        key=lambda lease: lease.lease_start_date,
+    )
+    lease_rows = [(owner(), lease) for lease in leases]
+    previous = {d: Decimal(rng.randrange(500)) for d in driver_ids if rng.random() < 0.6}
+    current = {d: Decimal(rng.randrange(500)) for d in driver_ids if rng.random() < 0.6}
+    return dict(
+        trips=trips, tolls=tolls, tickets=tickets, postings=postings,
+        previous_balances=previous, current_balances=current, lease_rows=lease_rows,
+        medallions={1: "M1", 2: "M2"}, vehicles={10: "V10", 11: "V11"},
+    )
+
+
+def per_driver_dtr(driver, rows):
+    """What the per-driver path loaded: one filtered query per source for one driver"""
+    mine = [lease for driver_pk, lease in rows["lease_rows"] if driver_pk == driver.id]
+    lease = mine[-1] if mine else None
+    return build_dtr_data(
+        driver=driver, from_date=FROM, to_date=TO,
+        trips=[t for t in rows["trips"] if t.driver_fk == driver.id],
+        tolls=[t for t in rows["tolls"] if t.driver_id == driver.id],
+        tickets=[t for t in rows["tickets"] if t.driver_id == driver.id],
+        postings=[p for p in rows["postings"] if p.driver_id == driver.id],
+        previous_balance=float(rows["previous_balances"].get(driver.id) or 0),
+        current_balance=float(rows["current_balances"].get(driver.id) or 0),
+        lease=lease,
+        medallion=rows["medallions"].get(lease.medallion_id) if lease else None,
+        vehicle=rows["vehicles"].get(lease.vehicle_id) if lease else None,
+    )
+
+
+def comparable(dtr):
+    dtr = dict(dtr)
+    receipt = dtr.pop("receipt")
+    return dtr, (receipt.receipt_number, receipt.balance)
+
+
+class TestAssembleDTRData(unittest.TestCase):
+    def test_matches_per_driver_output(self):
+        rng = random.Random(10)
+        for case in range(40):
+            drivers = [SimpleNamespace(id=driver_id) for driver_id in rng.sample(range(1, 30), rng.randrange(1, 8))]
+            rows = random_chunk(rng, [d.id for d in drivers])
+
+            with self.subTest(case=case):
+                chunk = assemble_dtr_data(drivers, FROM, TO, **rows)
+
+                self.assertEqual(list(chunk), [d.id for d in drivers])
+                for driver in drivers:
+                    self.assertEqual(comparable(chunk[driver.id]), comparable(per_driver_dtr(driver, rows)))
+
+
+def posting(category, entry_type, amount):
+    return SimpleNamespace(driver_id=1, category=category, entry_type=entry_type, amount=Decimal(amount))
+
+
+class TestBuildDTRData(unittest.TestCase):
+    def test_balance_is_the_outstanding_ledger_balance(self):
+        trips = [
+            SimpleNamespace(payment_type="C", total_amount=100, tax=0.5, imp_tax=1, congestion_fee=2.5, airport_fee=0, cbdt_fee=1),
+            SimpleNamespace(payment_type="$", total_amount=40, tax=0.5, imp_tax=1, congestion_fee=2.5, airport_fee=0, cbdt_fee=1),
+        ]
+        postings = [
+            posting("Lease", "Debit", "400"), posting("EZPass", "Debit", "20"), posting("Lease", "Credit", "150"),
+            posting("InterimPayment", "Credit", "50"), posting("Earnings", "Credit", "100"),
+        ]
+
+        dtr = build_dtr_data(
+            driver=SimpleNamespace(id=1), from_date=FROM, to_date=TO, trips=trips,
+            tolls=[SimpleNamespace(amount=Decimal("20"))], tickets=[SimpleNamespace(amount_due=Decimal("65"))],
+            postings=postings, previous_balance=30.0, current_balance=315.0, lease=None, medallion=None, vehicle=None,
+        )
+
+        self.assertEqual(dtr["account_balance"], {
+            "cc_earnings": 100, "total_surcharges": 5.0, "ezpass_tolls": 20.0, "tickets": 65.0,
+            "leasing_charges": 400.0, "payment": 200.0, "previous_balance": 30.0, "total_due": 450.0,
+            "balance": 315.0,
+        })
+        self.assertEqual(dtr["receipt"].balance, 315.0)
+        self.assertEqual(dtr["receipt"].receipt_number, "DTR-1-20250302")
+
+
+class TestWeeklyDTRChord(unittest.TestCase):
+    def test_every_active_driver_is_rendered_once(self):
+        driver_ids = list(range(1, 124))
+        with mock.patch.object(ledger_tasks, "SessionLocal"), \
+                mock.patch.object(ledger_tasks, "get_active_dtr_driver_ids", return_value=driver_ids), \
+                mock.patch.object(ledger_tasks.settings, "dtr_render_chunk_size", 50), \
+                mock.patch.object(ledger_tasks, "chord") as chord:
+            result = ledger_tasks.generate_weekly_dtrs.apply().get()
+
+        header = list(chord.call_args.args[0])
+        chunks = [signature.args[0] for signature in header]
+        self.assertEqual(result, {"drivers": 123, "chunks": 3})
+        self.assertEqual([len(chunk) for chunk in chunks], [50, 50, 23])
+        self.assertEqual([d for chunk in chunks for d in chunk], driver_ids)
+        (period,) = {signature.args[1:] for signature in header}
+        self.assertEqual(date.fromisoformat(period[1]) - date.fromisoformat(period[0]), timedelta(days=6))
+        chord.return_value.assert_called_once()
+
+    def test_no_active_drivers_dispatches_nothing(self):
+        with mock.patch.object(ledger_tasks, "SessionLocal"), \
+                mock.patch.object(ledger_tasks, "get_active_dtr_driver_ids", return_value=[]), \
+                mock.patch.object(ledger_tasks, "chord") as chord:
+            result = ledger_tasks.generate_weekly_dtrs.apply().get()
+
+        self.assertEqual(result, {"drivers": 0, "chunks": 0})
+        chord.assert_not_called()
+
+    def test_chunk_renders_each_driver_and_collects_errors(self):
+        def render(data):
+            if data["driver"] == 2:
+                raise ValueError("no medallion")
+            return {"pdf": f"dtr/{data['driver']}.pdf"}
+
+        prefetched = {driver_id: {"driver": driver_id} for driver_id in (1, 2, 3)}
+        with mock.patch.object(ledger_tasks, "SessionLocal"), \
+                mock.patch.object(ledger_tasks, "prefetch_dtr_data", return_value=prefetched) as prefetch, \
+                mock.patch.object(ledger_tasks, "render_dtr_documents", side_effect=render):
+            result = ledger_tasks.render_dtr_chunk([1, 2, 3], FROM.isoformat(), TO.isoformat())
+
+        self.assertEqual(prefetch.call_args.args[1:], ([1, 2, 3], FROM, TO))
+        self.assertEqual(result, {"generated": {1: {"pdf": "dtr/1.pdf"}, 3: {"pdf": "dtr/3.pdf"}}, "errors": {2: "no medallion"}})
+
+    def test_summary_totals_every_chunk(self):
+        results = [{"generated": {1: {}, 2: {}}, "errors": {}}, {"generated": {3: {}}, "errors": {4: "boom"}}]
+
+        self.assertEqual(ledger_tasks.summarize_dtr_run(results, "task"), {"generated": 3, "failed": 1})
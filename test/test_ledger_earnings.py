@@ -0,0 +1,217 @@
+import asyncio
+import json
+import random
+import unittest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.ledger.ids import ledger_ids
+from app.ledger.schemas import LedgerCategory
+from app.ledger.services import PAYMENT_HIERARCHY, LedgerService
+
+BATCH_ID = "WK-2025-10"
+CATEGORIES = [category.value for category in PAYMENT_HIERARCHY]
+
+
+def balance(row_id, driver_id, category, amount, refs=None):
+    return SimpleNamespace(
+        id=row_id,
+        balance_id=f"BAL-{row_id}",
+        category=category,
+        driver_id=driver_id,
+        vehicle_id=None,
+        vin=None,
+        plate=None,
+        medallion_id=None,
+        lease_id=None,
+        reference_id=f"REF-{row_id}",
+        reference_type="TEST",
+        payment=Decimal("0.00"),
+        balance=Decimal(amount),
+        applied_payment_refs=refs,
+    )
+
+
+def per_driver_waterfall(balances, earnings):
+    """The per-category, per-balance loop the batch replaced"""
+    remaining = earnings
+    applied = []
+    for category in PAYMENT_HIERARCHY:
+        if remaining <= Decimal("0.01"):
+            break
+        for row in (b for b in balances if b.category == category.value):
+            if remaining <= Decimal("0.01"):
+                break
+            payment = min(remaining, row.balance)
+            after = row.balance - payment
+            applied.append((row.balance_id, payment, Decimal("0.00") if after <= Decimal("0.01") else after))
+            remaining -= payment
+    return applied, remaining
+
+
+def sequential_ids():
+    return iter(f"P{n:04d}" for n in range(1000))
+
+
+def allocate(balances, earnings, driver_id=1):
+    posting_rows, balance_rows, summary_deltas = [], [], {}
+    service = LedgerService(db=None)
+    result = service._allocate_earnings(
+        driver_id=driver_id,
+        earnings_amount=Decimal(earnings),
+        balances=balances,
+        earnings_batch_id=BATCH_ID,
+        transaction_date=None,
+        created_by=7,
+        posting_ids=sequential_ids(),
+        posting_rows=posting_rows,
+        balance_rows=balance_rows,
+        summary_deltas=summary_deltas,
+    )
+    return result, posting_rows, balance_rows, summary_deltas
+
+
+class TestAllocateEarnings(unittest.TestCase):
+    def test_matches_per_driver_waterfall(self):
+        rng = random.Random(7)
+        for case in range(200):
+            balances = [
+                balance(n, 1, rng.choice(CATEGORIES), f"{rng.randrange(1, 40000) / 100:.2f}")
+                for n in range(rng.randrange(0, 12))
+            ]
+            earnings = Decimal(f"{rng.randrange(1, 150000) / 100:.2f}")
+            with self.subTest(case=case):
+                result, posting_rows, balance_rows, _ = allocate(balances, earnings)
+                expected, net = per_driver_waterfall(balances, earnings)
+
+                self.assertEqual(
+                    [(a["balance_id"], Decimal(a["amount_applied"]), Decimal(a["balance_after"]))
+                     for a in result["allocations"]],
+                    expected,
+                )
+                self.assertEqual(result["net_earnings"], net)
+                self.assertEqual(result["total_allocated"], earnings - net)
+                self.assertEqual([row["amount"] for row in posting_rows], [e[1] for e in expected])
+                self.assertEqual([row["balance"] for row in balance_rows], [e[2] for e in expected])
+
+    def test_hierarchy_then_fifo_within_category(self):
+        balances = [
+            balance(1, 1, LedgerCategory.LEASE.value, "100.00"),
+            balance(2, 1, LedgerCategory.MISC.value, "50.00"),
+            balance(3, 1, LedgerCategory.TAXES.value, "20.00"),
+            balance(4, 1, LedgerCategory.LEASE.value, "100.00"),
+        ]
+
+        result, _, _, _ = allocate(balances, "150.00")
+
+        self.assertEqual(
+            [(a["balance_id"], a["amount_applied"]) for a in result["allocations"]],
+            [("BAL-3", "20.00"), ("BAL-1", "100.00"), ("BAL-4", "30.00")],
+        )
+        self.assertEqual(result["net_earnings"], Decimal("0.00"))
+
+    def test_rows_close_paid_balances_and_append_payment_refs(self):
+        previous = json.dumps([{"source": "INTERIM", "amount": "5.00"}])
+        balances = [
+            balance(1, 1, LedgerCategory.LEASE.value, "40.00", refs=previous),
+            balance(2, 1, LedgerCategory.LOAN.value, "40.00"),
+        ]
+
+        result, posting_rows, balance_rows, _ = allocate(balances, "60.00")
+
+        self.assertEqual([row["posting_id"] for row in posting_rows], ["P0000", "P0001"])
+        self.assertEqual({row["reference_type"] for row in posting_rows}, {f"CURB_EARNINGS-{BATCH_ID}"})
+        self.assertEqual([a["posting_id"] for a in result["allocations"]], ["P0000", "P0001"])
+
+        closed, partial = balance_rows
+        self.assertEqual((closed["status"], closed["balance"], closed["payment"]), ("Closed", Decimal("0.00"), Decimal("40.00")))
+        self.assertIsNotNone(closed["closed_on"])
+        self.assertEqual([ref["source"] for ref in json.loads(closed["applied_payment_refs"])], ["INTERIM", "CURB_EARNINGS"])
+        self.assertEqual((partial["status"], partial["balance"], partial["payment"]), ("Open", Decimal("20.00"), Decimal("20.00")))
+        self.assertIsNone(partial["closed_on"])
+
+    def test_summary_deltas_track_balance_and_open_count(self):
+        balances = [
+            balance(1, 1, LedgerCategory.LEASE.value, "40.00"),
+            balance(2, 1, LedgerCategory.LEASE.value, "40.00"),
+            balance(3, 1, LedgerCategory.LOAN.value, "10.00"),
+        ]
+
+        _, _, _, summary_deltas = allocate(balances, "50.00")
+
+        self.assertEqual(summary_deltas, {
+            (1, LedgerCategory.LEASE.value): (Decimal("-50.00"), -1),
+        })
+
+    def test_balance_within_a_cent_is_closed(self):
+        balances = [balance(1, 1, LedgerCategory.LEASE.value, "10.00")]
+
+        result, _, balance_rows, _ = allocate(balances, "9.99")
+
+        self.assertEqual(balance_rows[0]["status"], "Closed")
+        self.assertEqual(result["allocations"][0]["balance_after"], "0.00")
+
+    def test_sub_cent_earnings_are_not_allocated(self):
+        result, posting_rows, _, _ = allocate([balance(1, 1, LedgerCategory.LEASE.value, "10.00")], "0.01")
+
+        self.assertEqual(posting_rows, [])
+        self.assertEqual(result["net_earnings"], Decimal("0.01"))
+
+
+class FakeLedgerRepository:
+    def __init__(self, balances):
+        self.balances = balances
+        self.loads, self.postings, self.updates, self.deltas = [], [], [], []
+        self.committed = False
+
+    async def get_open_balances_for_drivers(self, driver_ids, categories):
+        self.loads.append(list(driver_ids))
+        return [b for b in self.balances if b.driver_id in driver_ids]
+
+    async def bulk_insert_postings(self, rows):
+        self.postings.extend(rows)
+
+    async def bulk_update_balances(self, rows):
+        self.updates.extend(rows)
+
+    async def apply_balance_summary_deltas(self, deltas):
+        self.deltas.append(dict(deltas))
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+class TestApplyEarningsBatch(unittest.TestCase):
+    def test_batches_match_one_driver_at_a_time(self):
+        balances = [
+            balance(1, 10, LedgerCategory.LEASE.value, "300.00"),
+            balance(2, 20, LedgerCategory.TAXES.value, "15.00"),
+            balance(3, 20, LedgerCategory.EZPASS.value, "25.00"),
+            balance(4, 30, LedgerCategory.MISC.value, "5.00"),
+        ]
+        earnings = {10: Decimal("120.00"), 20: Decimal("30.00"), 30: Decimal("0"), 40: Decimal("10.00")}
+        service = LedgerService(db=None)
+        service.repo = FakeLedgerRepository(balances)
+
+        with mock.patch.object(ledger_ids, "posting_ids", side_effect=lambda n: [f"P{i}" for i in range(n)]):
+            results = asyncio.run(service.apply_earnings_batch(earnings, BATCH_ID, batch_size=2))
+
+        self.assertEqual(service.repo.loads, [[10, 20], [40]])
+        self.assertTrue(service.repo.committed)
+        self.assertNotIn(30, results)
+        for driver_id in (10, 20, 40):
+            expected, net = per_driver_waterfall(
+                [b for b in balances if b.driver_id == driver_id], earnings[driver_id]
+            )
+            with self.subTest(driver_id=driver_id):
+                self.assertEqual(results[driver_id]["net_earnings"], net)
+                self.assertEqual(
+                    [(a["balance_id"], Decimal(a["amount_applied"])) for a in results[driver_id]["allocations"]],
+                    [(e[0], e[1]) for e in expected],
+                )
+        self.assertEqual(len(service.repo.postings), 3)
+        self.assertEqual(len(service.repo.updates), 3)
@@ -0,0 +1,223 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+import redis
+
+from app.core.config import settings
+from app.ledger import ids
+from app.ledger.ids import (
+    MAX_SEQUENCE,
+    MAX_WORKER_ID,
+    SEQUENCE_BITS,
+    WORKER_ID_BITS,
+    LedgerIdGenerator,
+    default_worker_id,
+    hashed_worker_id,
+    reserve_worker_id,
+)
+
+FROZEN_NOW = 1760000000.0
+
+
+class FakeClock:
+    """Wall clock that only moves when the generator sleeps (or the test advances it)"""
+
+    def __init__(self, now=FROZEN_NOW):
+        self.now = now
+        self.sleeps = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds
+
+    def advance_ms(self, ms):
+        self.now += ms / 1000
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for worker id reservation"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+
+def unreachable_redis():
+    raise redis.ConnectionError("redis is down")
+
+
+def split(value):
+    return (
+        value >> (WORKER_ID_BITS + SEQUENCE_BITS),
+        (value >> SEQUENCE_BITS) & MAX_WORKER_ID,
+        value & MAX_SEQUENCE,
+    )
+
+
+def generator_on(clock, worker_id=5):
+    return LedgerIdGenerator(worker_id=worker_id, clock=clock, sleep=clock.sleep)
+
+
+class TestLedgerIdGenerator(unittest.TestCase):
+    def test_ids_are_strictly_increasing(self):
+        ticks = iter([FROZEN_NOW, FROZEN_NOW, FROZEN_NOW + 0.001, FROZEN_NOW - 5, FROZEN_NOW + 0.002])
+        generator = LedgerIdGenerator(worker_id=7, clock=lambda: next(ticks))
+
+        ids = [value for _ in range(5) for value in generator.next_ints(3)]
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_rendered_ids_sort_like_integers(self):
+        generator = LedgerIdGenerator(worker_id=1, clock=lambda: FROZEN_NOW)
+
+        posting_ids = generator.posting_ids(10)
+        balance_ids = generator.balance_ids("Lease", 10)
+
+        self.assertEqual(posting_ids, sorted(posting_ids))
+        self.assertEqual(balance_ids, sorted(balance_ids))
+        self.assertTrue(all(b.endswith("-LEA") for b in balance_ids))
+
+    def test_sequence_overflow_waits_for_the_next_millisecond(self):
+        clock = FakeClock()
+        generator = generator_on(clock)
+
+        ids = generator.next_ints(MAX_SEQUENCE + 1) + generator.next_ints(10)
+
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        first_ms, worker_id, _ = split(ids[0])
+        self.assertEqual(worker_id, 5)
+        self.assertEqual(split(ids[MAX_SEQUENCE]), (first_ms, 5, MAX_SEQUENCE))
+        self.assertEqual(split(ids[MAX_SEQUENCE + 1]), (first_ms + 1, 5, 0))
+        # The next millisecond was waited for, not borrowed
+        self.assertGreater(clock.sleeps, 0)
+        self.assertLessEqual(split(ids[-1])[0], generator._now_ms())
+
+    def test_ids_stay_monotonic_across_a_restart_after_overflow(self):
+        clock = FakeClock()
+        before = generator_on(clock)
+        minted = before.next_ints(3 * (MAX_SEQUENCE + 1) + 5)
+        self.assertEqual(split(minted[-1])[0] - split(minted[0])[0], 3)
+
+        # The process restarts with the same worker id a millisecond later.
+        # Had the overflow borrowed future milliseconds, the new process would
+        # start inside one of them and reissue its IDs.
+        clock.advance_ms(1)
+        after = generator_on(clock)
+        reissued = after.next_ints(MAX_SEQUENCE + 10)
+
+        self.assertGreater(min(reissued), max(minted))
+        self.assertEqual(len(set(minted + reissued)), len(minted) + len(reissued))
+
+    def test_clock_stepping_back_does_not_stall(self):
+        clock = FakeClock()
+        generator = generator_on(clock)
+        first = generator.next_ints(10)
+        clock.advance_ms(-5000)
+
+        later = generator.next_ints(MAX_SEQUENCE + 10)
+
+        self.assertGreater(min(later), max(first))
+        self.assertEqual(clock.sleeps, 0)
+
+    def test_generators_with_distinct_worker_ids_never_collide(self):
+        a = LedgerIdGenerator(worker_id=1, clock=lambda: FROZEN_NOW)
+        b = LedgerIdGenerator(worker_id=2, clock=lambda: FROZEN_NOW)
+
+        self.assertFalse(set(a.next_ints(4000)) & set(b.next_ints(4000)))
+
+
+class TestWorkerIdAssignment(unittest.TestCase):
+    def test_hashed_worker_id_is_stable_and_in_range(self):
+        self.assertEqual(hashed_worker_id("host-a:100"), hashed_worker_id("host-a:100"))
+        worker_ids = {hashed_worker_id(f"host-a:{pid}") for pid in range(5000)}
+        self.assertTrue(all(0 <= worker_id <= MAX_WORKER_ID for worker_id in worker_ids))
+        self.assertGreater(len(worker_ids), MAX_WORKER_ID // 2)
+
+    def test_minting_needs_no_redis_by_default(self):
+        with mock.patch.object(settings, "ledger_worker_id_redis", False), \
+                mock.patch.object(ids, "_redis_client", side_effect=unreachable_redis) as client:
+            generator = LedgerIdGenerator(clock=lambda: FROZEN_NOW)
+            value = generator.next_int()
+
+        client.assert_not_called()
+        self.assertEqual(split(value)[1], hashed_worker_id())
+
+    def test_redis_reserves_the_hashed_id_or_the_next_free_one(self):
+        client = FakeRedis()
+
+        self.assertEqual(reserve_worker_id(7, client_factory=lambda: client), 7)
+        self.assertEqual(reserve_worker_id(7, client_factory=lambda: client), 8)
+        self.assertEqual(reserve_worker_id(MAX_WORKER_ID, client_factory=lambda: client), MAX_WORKER_ID)
+        self.assertEqual(reserve_worker_id(MAX_WORKER_ID, client_factory=lambda: client), 0)
+        self.assertEqual(set(client.data), {f"ledger:worker-id:{n}" for n in (7, 8, MAX_WORKER_ID, 0)})
+
+    def test_unreachable_redis_falls_back_to_the_hashed_id(self):
+        with mock.patch.object(settings, "ledger_worker_id_redis", True), \
+                mock.patch.object(ids, "_redis_client", side_effect=unreachable_redis):
+            self.assertEqual(default_worker_id(), hashed_worker_id())
+
+    def test_pool_child_takes_base_plus_index(self):
+        with mock.patch.object(settings, "ledger_worker_id_base", 40):
+            generator = LedgerIdGenerator(clock=lambda: FROZEN_NOW)
+            generator.assign_pool_worker_id(3)
+
+        self.assertEqual(generator.worker_id, 43)
+        self.assertEqual(split(generator.next_int())[1], 43)
+
+    def test_pool_child_without_base_hashes_on_first_mint(self):
+        with mock.patch.object(settings, "ledger_worker_id_base", None):
+            generator = LedgerIdGenerator(clock=lambda: FROZEN_NOW)
+            generator.assign_pool_worker_id(3)
+
+        self.assertIsNone(generator.worker_id)
+
+    def test_pool_child_out_of_range_fails(self):
+        with mock.patch.object(settings, "ledger_worker_id_base", 1020):
+            with self.assertRaises(ValueError):
+                LedgerIdGenerator().assign_pool_worker_id(4)
+
+    def test_ids_unique_across_forked_pool_children(self):
+        generator = LedgerIdGenerator(clock=lambda: FROZEN_NOW)
+        os.register_at_fork(after_in_child=generator.reset_after_fork)
+
+        children = []
+        with mock.patch.object(settings, "ledger_worker_id_base", 8):
+            for index in range(4):
+                read_fd, write_fd = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read_fd)
+                    status = 0
+                    try:
+                        assert generator.worker_id is None
+                        generator.assign_pool_worker_id(index)
+                        with os.fdopen(write_fd, "w") as out:
+                            json.dump(generator.next_ints(MAX_SEQUENCE), out)
+                    except BaseException:
+                        status = 1
+                    os._exit(status)
+                os.close(write_fd)
+                children.append((pid, read_fd))
+
+        minted = []
+        for pid, read_fd in children:
+            with os.fdopen(read_fd) as result:
+                minted.extend(json.load(result))
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(status, 0)
+
+        self.assertEqual(len(minted), 4 * MAX_SEQUENCE)
+        self.assertEqual(len(set(minted)), len(minted))
+        self.assertEqual({split(value)[1] for value in minted}, {8, 9, 10, 11})
@@ -0,0 +1,238 @@
+import enum
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import Column, DateTime, Enum, Integer, Numeric, String, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from app.core.config import settings
+from app.utils import pagination
+from app.utils.pagination import (
+    SortKey,
+    count_query,
+    decode_cursor,
+    encode_cursor,
+    keyset_order,
+    paginate,
+    to_page,
+)
+
+Base = declarative_base()
+
+
+class Color(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+    BLUE = "blue"
+
+
+class Item(Base):
+    __tablename__ = "pagination_items"
+
+    id = Column(Integer, primary_key=True)
+    rank = Column(Integer, nullable=True)
+    name = Column(String(16), nullable=True)
+    amount = Column(Numeric(10, 2), nullable=True)
+    created_on = Column(DateTime, nullable=True)
+    color = Column(Enum(Color), nullable=True)
+
+
+BASE_TIME = datetime(2025, 3, 1, 9, 30)
+RANKS = [3, None, 1, 3, None, 2, 1, None, 3, 2, None, 1]
+
+
+def walk(session, order, per_page):
+    """Every row, page by page, following next_cursor"""
+    seen, cursor = [], None
+    while True:
+        rows = session.execute(paginate(select(Item), order, per_page, cursor=cursor)).scalars().all()
+        page = to_page(rows, order, per_page)
+        seen.extend(item.id for item in page)
+        if page.next_cursor is None:
+            return seen
+        cursor = page.next_cursor
+
+
+def mysql_order(items, attribute, descending):
+    """Expected order: NULLs first ascending, last descending, id as tie-breaker"""
+    def key(item):
+        value = getattr(item, attribute)
+        return (value is not None, value if value is not None else 0, item.id)
+    ordered = sorted(items, key=key, reverse=descending)
+    return [item.id for item in ordered]
+
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        colors = list(Color)
+        self.items = [
+            Item(
+                id=index + 1,
+                rank=rank,
+                name=None if rank is None else f"n{rank}",
+                amount=None if rank is None else Decimal(rank) + Decimal("0.25"),
+                created_on=None if rank is None else BASE_TIME + timedelta(minutes=rank),
+                color=None if rank is None else colors[rank % 3],
+            )
+            for index, rank in enumerate(RANKS)
+        ]
+        self.session.add_all(self.items)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def test_null_ordering_ascending(self):
+        for attribute in ("rank", "name", "amount", "created_on"):
+            order = keyset_order(getattr(Item, attribute), False, Item.id)
+            for per_page in (1, 2, 5):
+                with self.subTest(attribute=attribute, per_page=per_page):
+                    self.assertEqual(
+                        walk(self.session, order, per_page),
+                        mysql_order(self.items, attribute, descending=False),
+                    )
+
+    def test_null_ordering_descending(self):
+        for attribute in ("rank", "name", "amount", "created_on"):
+            order = keyset_order(getattr(Item, attribute), True, Item.id)
+            for per_page in (1, 2, 5):
+                with self.subTest(attribute=attribute, per_page=per_page):
+                    self.assertEqual(
+                        walk(self.session, order, per_page),
+                        mysql_order(self.items, attribute, descending=True),
+                    )
+
+    def test_enum_sort_key_pages_through_all_rows(self):
+        order = keyset_order(Item.color, False, Item.id)
+
+        self.assertEqual(sorted(walk(self.session, order, 3)), [item.id for item in self.items])
+
+    def test_offset_pages_match_cursor_pages(self):
+        order = keyset_order(Item.rank, True, Item.id)
+        by_offset = []
+        for page in range(1, 4):
+            rows = self.session.execute(paginate(select(Item), order, 5, page=page)).scalars().all()
+            by_offset.extend(item.id for item in to_page(rows, order, 5))
+
+        self.assertEqual(by_offset, walk(self.session, order, 5))
+
+    def test_last_page_has_no_next_cursor(self):
+        order = keyset_order(Item.id, False, Item.id)
+        rows = self.session.execute(paginate(select(Item), order, len(RANKS))).scalars().all()
+
+        self.assertIsNone(to_page(rows, order, len(RANKS)).next_cursor)
+
+    def test_cursor_for_other_sort_keys_is_rejected(self):
+        issued = encode_cursor([BASE_TIME, 4])
+        for order in (
+            keyset_order(Item.rank, False, Item.id),
+            keyset_order(Item.amount, False, Item.id),
+            keyset_order(Item.color, False, Item.id),
+            [SortKey(Item.id)],
+        ):
+            with self.subTest(order=order[0].attribute, keys=len(order)):
+                with self.assertRaises(ValueError):
+                    paginate(select(Item), order, 5, cursor=issued)
+
+    def test_enum_cursor_value_must_be_a_member(self):
+        order = keyset_order(Item.color, False, Item.id)
+
+        with self.assertRaises(ValueError):
+            paginate(select(Item), order, 5, cursor=encode_cursor(["purple", 1]))
+        paginate(select(Item), order, 5, cursor=encode_cursor([Color.RED, 1]))
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("not-base64!", encode_cursor([1])[:-2], "W1sieCIsIDFdXQ=="):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor, 1)
+
+
+class TestCursorValues(unittest.TestCase):
+    def test_typed_values_survive_round_trip(self):
+        values = [
+            Decimal("1234.50"),
+            datetime(2025, 3, 1, 9, 30, 15, 250000, tzinfo=timezone.utc),
+            datetime(2025, 3, 1, 9, 30),
+            Color.GREEN,
+            None,
+            7,
+            "text",
+        ]
+
+        decoded = decode_cursor(encode_cursor(values), len(values))
+
+        self.assertEqual(decoded[0], Decimal("1234.50"))
+        self.assertIsInstance(decoded[0], Decimal)
+        self.assertEqual(decoded[1], values[1])
+        self.assertEqual(decoded[1].tzinfo, timezone.utc)
+        self.assertEqual(decoded[2], values[2])
+        self.assertIsNone(decoded[2].tzinfo)
+        self.assertEqual(decoded[3], Color.GREEN.value)
+        self.assertEqual(decoded[4:], [None, 7, "text"])
+
+    def test_wrong_number_of_values_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor([1, 2]), 3)
+
+    def test_unsupported_value_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_cursor([object()])
+
+
+class TestCountCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.session.add_all([Item(id=1, rank=1), Item(id=2, rank=2)])
+        self.session.commit()
+        pagination._count_cache.clear()
+
+    def tearDown(self):
+        pagination._count_cache.clear()
+        self.session.close()
+        self.engine.dispose()
+
+    def add_item(self, item_id):
+        self.session.add(Item(id=item_id, rank=1))
+        self.session.commit()
+
+    def test_cached_total_is_reused_until_it_expires(self):
+        query = self.session.query(Item).filter(Item.rank >= 1)
+        clock = [1000.0]
+        with mock.patch.object(settings, "pagination_count_cache_seconds", 30), \
+                mock.patch.object(pagination.time, "monotonic", side_effect=lambda: clock[0]):
+            self.assertEqual(count_query(query, cached=True), 2)
+            self.add_item(3)
+
+            clock[0] += 29
+            self.assertEqual(count_query(query, cached=True), 2)
+
+            clock[0] += 2
+            self.assertEqual(count_query(query, cached=True), 3)
+
+    def test_uncached_count_is_always_fresh(self):
+        query = self.session.query(Item)
+        with mock.patch.object(settings, "pagination_count_cache_seconds", 30):
+            self.assertEqual(count_query(query, cached=True), 2)
+            self.add_item(3)
+            self.assertEqual(count_query(query), 3)
+
+    def test_cache_is_keyed_by_filter_values(self):
+        with mock.patch.object(settings, "pagination_count_cache_seconds", 30):
+            self.assertEqual(count_query(self.session.query(Item).filter(Item.rank == 1), cached=True), 1)
+            self.assertEqual(count_query(self.session.query(Item).filter(Item.rank >= 1), cached=True), 2)
+
+    def test_cache_disabled_by_zero_seconds(self):
+        query = self.session.query(Item)
+        with mock.patch.object(settings, "pagination_count_cache_seconds", 0):
+            self.assertEqual(count_query(query, cached=True), 2)
+            self.add_item(3)
+            self.assertEqual(count_query(query, cached=True), 3)
@@ -0,0 +1,144 @@
+import asyncio
+import random
+import unittest
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from app.ezpass.utils import clean_plate_number
+from app.vehicles.plate_index import PlateIndex, PlateResolution, PlateResolver
+
+DAY_ZERO = date(2025, 1, 1)
+
+
+def registration(vehicle_id, plate_number, start=None, expiry=None, medallion_id=None):
+    return SimpleNamespace(
+        vehicle_id=vehicle_id,
+        plate_number=plate_number,
+        registration_date=start,
+        registration_expiry_date=expiry,
+        medallion_id=medallion_id,
+    )
+
+
+def lease(lease_id, vehicle_id, start, end=None, medallion_id=None, driver_pk=None):
+    return SimpleNamespace(
+        lease_id=lease_id,
+        vehicle_id=vehicle_id,
+        medallion_id=medallion_id,
+        medallion_number=f"{medallion_id}M" if medallion_id else None,
+        lease_start_date=start,
+        lease_end_date=end,
+        driver_pk=driver_pk,
+    )
+
+
+def per_row_vehicle(registrations, plate_no):
+    """The per-transaction lookup the index replaced: plate LIKE 'X%', one vehicle or none"""
+    cleaned = clean_plate_number(plate_no)
+    vehicles = {
+        row.vehicle_id for row in registrations
+        if row.plate_number.startswith(plate_no) or row.plate_number.startswith(cleaned)
+    }
+    return vehicles.pop() if len(vehicles) == 1 else None
+
+
+class TestPlateIndex(unittest.TestCase):
+    def test_matches_per_row_lookup_for_single_vehicle_plates(self):
+        rng = random.Random(21)
+        alphabet = "AB12"
+        registrations = [
+            registration(vehicle_id, "".join(rng.choice(alphabet) for _ in range(rng.randrange(3, 6))))
+            for vehicle_id in range(40)
+        ]
+        index = PlateIndex(registrations)
+
+        for _ in range(400):
+            plate_no = "".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 6)))
+            expected = per_row_vehicle(registrations, plate_no)
+            if expected is None:
+                # Several vehicles: the old scalar_one_or_none lookup raised
+                continue
+            with self.subTest(plate_no=plate_no):
+                found = index.registration_for(plate_no, DAY_ZERO)
+                self.assertIsNotNone(found)
+                self.assertEqual(found.vehicle_id, expected)
+
+    def test_plates_are_normalized(self):
+        index = PlateIndex([registration(1, "ab-12 3"), registration(2, " ")])
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.registration_for(" AB 123", DAY_ZERO).vehicle_id, 1)
+        self.assertIsNone(index.registration_for("--", DAY_ZERO))
+        self.assertIsNone(index.registration_for(None, DAY_ZERO))
+
+    def test_exact_plate_wins_over_prefix(self):
+        index = PlateIndex([registration(1, "AB1234"), registration(2, "AB123")])
+
+        self.assertEqual(index.registration_for("AB123", DAY_ZERO).vehicle_id, 2)
+        self.assertEqual(index.registration_for("AB12", DAY_ZERO).vehicle_id, 1)
+        self.assertIsNone(index.registration_for("AB9", DAY_ZERO))
+
+    def test_registration_period_on_the_date(self):
+        first = registration(1, "T100", DAY_ZERO, DAY_ZERO + timedelta(days=99))
+        second = registration(2, "T100", DAY_ZERO + timedelta(days=200), DAY_ZERO + timedelta(days=299))
+        index = PlateIndex([second, first])
+
+        self.assertEqual(index.registration_for("T100", DAY_ZERO + timedelta(days=99)).vehicle_id, 1)
+        self.assertEqual(index.registration_for("T100", DAY_ZERO + timedelta(days=200)).vehicle_id, 2)
+        # Lapsed: latest registration started before the date
+        self.assertEqual(index.registration_for("T100", DAY_ZERO + timedelta(days=150)).vehicle_id, 1)
+        self.assertEqual(index.registration_for("T100", DAY_ZERO + timedelta(days=400)).vehicle_id, 2)
+        # Before any registration, or no date: latest overall
+        self.assertEqual(index.registration_for("T100", DAY_ZERO - timedelta(days=1)).vehicle_id, 2)
+        self.assertEqual(index.registration_for("T100", None).vehicle_id, 2)
+
+    def test_undated_registration_covers_every_date(self):
+        index = PlateIndex([registration(1, "T200")])
+
+        self.assertEqual(index.registration_for("T200", DAY_ZERO).vehicle_id, 1)
+
+
+class TestLeaseOn(unittest.TestCase):
+    def test_latest_started_active_lease(self):
+        older = lease(1, 7, DAY_ZERO)
+        newer = lease(2, 7, DAY_ZERO + timedelta(days=10), DAY_ZERO + timedelta(days=20))
+        # _candidate_leases orders each vehicle's leases latest start first
+        leases = [newer, older]
+
+        self.assertIs(PlateResolver._lease_on(leases, DAY_ZERO + timedelta(days=10)), newer)
+        self.assertIs(PlateResolver._lease_on(leases, DAY_ZERO + timedelta(days=20)), newer)
+        self.assertIs(PlateResolver._lease_on(leases, DAY_ZERO + timedelta(days=21)), older)
+        self.assertIsNone(PlateResolver._lease_on(leases, DAY_ZERO - timedelta(days=1)))
+        self.assertIsNone(PlateResolver._lease_on(leases, None))
+
+
+class TestResolve(unittest.TestCase):
+    def test_resolves_vehicle_lease_driver_and_medallion(self):
+        index = PlateIndex([
+            registration(1, "T100", medallion_id=None),
+            registration(2, "T200", medallion_id=None),
+        ])
+        leases = {1: [lease(10, 1, DAY_ZERO, DAY_ZERO + timedelta(days=30), medallion_id=5, driver_pk=99)]}
+        resolver = PlateResolver()
+        pairs = [
+            ("T100", DAY_ZERO + timedelta(days=3)),
+            ("T100", DAY_ZERO + timedelta(days=60)),
+            ("T200", DAY_ZERO),
+            ("ZZZ", DAY_ZERO),
+        ]
+
+        with mock.patch.object(resolver, "get_index", return_value=index), \
+                mock.patch.object(PlateResolver, "_candidate_leases", return_value=leases) as candidates:
+            resolved = asyncio.run(resolver.resolve(None, pairs + pairs[:1]))
+
+        self.assertEqual(resolved, {
+            pairs[0]: PlateResolution(vehicle_id=1, medallion_id=5, medallion_no="5M", lease_id=10, driver_id=99),
+            pairs[1]: PlateResolution(vehicle_id=1),
+            pairs[2]: PlateResolution(vehicle_id=2),
+            pairs[3]: None,
+        })
+        self.assertTrue(resolved[pairs[0]].has_lease)
+        self.assertFalse(resolved[pairs[1]].has_lease)
+        self.assertEqual(candidates.call_count, 1)
+        self.assertEqual(candidates.call_args.args[1], {1, 2})
@@ -0,0 +1,183 @@
+import asyncio
+import random
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.pvb.repository import PVBRepository
+from app.pvb.schemas import PVBViolationCreate
+from app.pvb.services import PVBService
+
+LOG_ID = 3
+
+
+def violation_row(summons, plate="T100", issue_date="03/01/2025"):
+    return {
+        "PLATE": plate, "STATE": "NY", "SUMMONS": summons, "ISSUE DATE": issue_date,
+        "AMOUNT DUE": "65.00", "ISSUE TIME": "0930",
+    }
+
+
+class FakePVBRepository:
+    """Stored summons numbers by log, with the batch lookups and inserts the import uses"""
+
+    def __init__(self, stored=(), taken_concurrently=()):
+        self.stored = {summons: 1 for summons in stored}
+        self.taken_concurrently = set(taken_concurrently)
+        self.inserted = []
+
+    async def get_existing_summons(self, summons_numbers, log_id=None):
+        return {
+            s for s in summons_numbers
+            if s in self.stored and (log_id is None or self.stored[s] == log_id)
+        }
+
+    async def insert_violation_rows(self, violation_rows):
+        # Another import commits these summons between the lookup and the INSERT
+        for summons in self.taken_concurrently:
+            self.stored.setdefault(summons, 99)
+        count = 0
+        for row in violation_rows:
+            summons = row["summons_number"]
+            if summons in self.stored:
+                continue
+            if summons:
+                self.stored[summons] = row["log_id"]
+            self.inserted.append(row)
+            count += 1
+        return count
+
+
+class PerRowRepository:
+    """The lookups the per-row import made: one query and one flush per row"""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.inserted = []
+
+    async def get_violation_by_summons(self, summons):
+        return summons if summons in self.stored else None
+
+    async def create_violation(self, violation_create):
+        row = violation_create.model_dump()
+        if row["summons_number"]:
+            self.stored.add(row["summons_number"])
+        self.inserted.append(row)
+
+
+async def per_row_import(service, rows, failed_rows):
+    """The per-row loop the batch replaced"""
+    imported, failed = 0, 0
+    for idx, row in enumerate(rows):
+        try:
+            violation_data = await service._parse_violation_data(row, LOG_ID)
+            if violation_data.get("summons_number"):
+                existing = await service.repo.get_violation_by_summons(violation_data["summons_number"])
+                if existing:
+                    failed += 1
+                    failed_rows[row.get("SUMMONS", f"row_{idx}")] = "Duplicate summons number"
+                    continue
+            await service.repo.create_violation(PVBViolationCreate(**violation_data))
+            imported += 1
+        except Exception as e:
+            failed += 1
+            failed_rows[row.get("SUMMONS", f"row_{idx}")] = str(getattr(e, "message", e))
+    return imported, failed
+
+
+def run_batch(rows, stored=(), taken_concurrently=()):
+    service = PVBService(FakePVBRepository(stored, taken_concurrently))
+    failed_rows = {}
+    counts = asyncio.run(service._import_violation_rows(rows, LOG_ID, failed_rows))
+    return counts, failed_rows, service.repo
+
+
+class TestImportViolationRows(unittest.TestCase):
+    def test_matches_per_row_import(self):
+        rng = random.Random(24)
+        for case in range(80):
+            stored = {str(1000 + n) for n in range(10) if rng.random() < 0.3}
+            rows = [
+                violation_row(str(1000 + rng.randrange(15)), issue_date=rng.choice(["03/01/2025", "2025-03-02", "not a date"]))
+                for _ in range(rng.randrange(1, 20))
+            ]
+            expected_repo = PerRowRepository(stored)
+            expected_failed = {}
+            expected = asyncio.run(per_row_import(PVBService(expected_repo), rows, expected_failed))
+
+            with self.subTest(case=case):
+                counts, failed_rows, repo = run_batch(rows, stored)
+
+                self.assertEqual(counts, expected)
+                self.assertEqual(failed_rows, expected_failed)
+                self.assertEqual(repo.inserted, expected_repo.inserted)
+
+    def test_duplicates_within_the_batch_keep_the_first_row(self):
+        rows = [violation_row("1000", plate="T100"), violation_row("1000", plate="T200"), violation_row("1001")]
+
+        counts, failed_rows, repo = run_batch(rows)
+
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual(failed_rows, {"1000": "Duplicate summons number"})
+        self.assertEqual([(r["summons_number"], r["plate_number"]) for r in repo.inserted], [("1000", "T100"), ("1001", "T100")])
+
+    def test_summons_taken_by_a_concurrent_import(self):
+        rows = [violation_row("1000"), violation_row("1001"), violation_row("1002")]
+
+        counts, failed_rows, repo = run_batch(rows, taken_concurrently={"1001"})
+
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual(failed_rows, {"1001": "Duplicate summons number"})
+        self.assertEqual([r["summons_number"] for r in repo.inserted], ["1000", "1002"])
+
+    def test_parse_errors_are_reported_per_row(self):
+        rows = [violation_row("1000", issue_date="31.02.2025"), violation_row("1001")]
+
+        counts, failed_rows, _ = run_batch(rows)
+
+        self.assertEqual(counts, (1, 1))
+        self.assertEqual(list(failed_rows), ["1000"])
+
+
+class CapturingSession:
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.statements = []
+
+    def get_bind(self):
+        return mock.Mock(dialect=self.dialect)
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=len(statement._multi_values[0]))
+
+
+class TestInsertViolationRows(unittest.TestCase):
+    ROWS = [
+        {"plate_number": "T100", "state": "NY", "summons_number": str(n), "status": "Imported", "log_id": LOG_ID}
+        for n in range(3)
+    ]
+
+    def test_mysql_ignores_existing_summons_in_one_statement(self):
+        db = CapturingSession(mysql.dialect())
+
+        inserted = asyncio.run(PVBRepository(db).insert_violation_rows(self.ROWS))
+
+        self.assertEqual(inserted, 3)
+        (statement,) = db.statements
+        self.assertTrue(str(statement.compile(dialect=mysql.dialect())).startswith("INSERT IGNORE INTO pvb_violations"))
+
+    def test_other_dialects_use_a_plain_insert(self):
+        db = CapturingSession(sqlite.dialect())
+
+        asyncio.run(PVBRepository(db).insert_violation_rows(self.ROWS))
+
+        self.assertNotIn("IGNORE", str(db.statements[0].compile(dialect=sqlite.dialect())))
+
+    def test_no_rows_no_statement(self):
+        db = CapturingSession(mysql.dialect())
+
+        self.assertEqual(asyncio.run(PVBRepository(db).insert_violation_rows([])), 0)
+        self.assertEqual(db.statements, [])
@@ -0,0 +1,64 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.pvb.exceptions import PVBFileValidationException
+from app.pvb.utils import iter_pvb_file
+
+HEADER = [" PLATE", "STATE ", "SUMMONS", "ISSUE DATE", "AMOUNT DUE", "VC"]
+
+
+def violation(summons, plate="T100"):
+    return [plate, "NY", summons, "03/01/2025", "65.00", "21"]
+
+
+class TestIterPVBFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_csv(self, rows, header=HEADER):
+        path = os.path.join(self.directory, "violations.csv")
+        with open(path, "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def test_chunks_keep_rows_with_plate_and_summons(self):
+        rows = [violation(str(1000 + n)) for n in range(7)]
+        rows[2][0] = ""
+        rows[5][2] = ""
+        path = self.write_csv(rows)
+
+        chunks = list(iter_pvb_file(path, chunk_size=3))
+
+        self.assertEqual(len(chunks), 3)
+        valid = [row for rows, _ in chunks for row in rows]
+        failed = {key: reason for _, failed_rows in chunks for key, reason in failed_rows.items()}
+        self.assertEqual([row["SUMMONS"] for row in valid], ["1000", "1001", "1003", "1004", "1006"])
+        self.assertEqual(failed, {"1002": "Missing PLATE or SUMMONS", "row_6": "Missing PLATE or SUMMONS"})
+        # Column names are stripped, as the whole-file check did
+        self.assertEqual(set(valid[0]), {name.strip() for name in HEADER})
+
+    def test_missing_required_columns(self):
+        path = self.write_csv([violation("1000")[:4]], header=HEADER[:4])
+
+        with self.assertRaises(PVBFileValidationException) as raised:
+            list(iter_pvb_file(path))
+
+        self.assertIn("Missing required columns: AMOUNT DUE", str(raised.exception))
+
+    def test_empty_file(self):
+        with self.assertRaisesRegex(PVBFileValidationException, "no data rows"):
+            list(iter_pvb_file(self.write_csv([])))
+
+    def test_no_row_with_plate_and_summons(self):
+        with self.assertRaisesRegex(PVBFileValidationException, "No valid data rows"):
+            list(iter_pvb_file(self.write_csv([violation("", plate="T100"), violation("1000", plate="")])))
+
+    def test_unreadable_file(self):
+        with self.assertRaisesRegex(PVBFileValidationException, "File validation error"):
+            list(iter_pvb_file(os.path.join(self.directory, "violations.txt")))